@@ -57,10 +57,13 @@ CREATE TABLE repo_snapshots (
     snapshot_type ENUM('pre_build', 'post_build', 'error_state') DEFAULT 'pre_build',
     git_commit_hash VARCHAR(40),
     git_branch VARCHAR(100),
+    snapshot_ref VARCHAR(255),
+    base_commit VARCHAR(40),
     config_files JSON,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (build_id) REFERENCES builds(build_id) ON DELETE CASCADE,
-    INDEX idx_build_snapshot (build_id, snapshot_type)
+    INDEX idx_build_snapshot (build_id, snapshot_type),
+    INDEX idx_snapshot_ref (snapshot_ref)
 );
 
 -- Next build reports
@@ -50,7 +50,7 @@ echo "rootsbindir=/usr/sbin" > configparms
              --disable-nscd                           \
              libc_cv_slibdir=/usr/lib
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make install
 
 sed '/RTLDLIST=/s@/usr@@g' -i /usr/bin/ldd
@@ -85,7 +85,7 @@ tar -xf zlib-1.3.1.tar.gz
 cd zlib-1.3.1
 
 ./configure --prefix=/usr
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make install
 rm -fv /usr/lib/libz.a
 
@@ -104,7 +104,7 @@ sed -i "s@(PREFIX)/man@(PREFIX)/share/man@g" Makefile
 
 make -f Makefile-libbz2_so
 make clean
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make PREFIX=/usr install
 
 cp -av libbz2.so.* /usr/lib
@@ -122,7 +122,7 @@ cd xz-5.8.1
             --disable-static \
             --docdir=/usr/share/doc/xz-5.8.1
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make install
 
 cd /sources
@@ -134,7 +134,7 @@ tar -xf file-5.46.tar.gz
 cd file-5.46
 
 ./configure --prefix=/usr
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make install
 
 cd /sources
@@ -153,7 +153,7 @@ sed -i '/{OLDSUFF}/c:' support/shlib-install
             --with-curses    \
             --docdir=/usr/share/doc/readline-8.3
 
-make SHLIB_LIBS="-lncursesw" -j$(nproc)
+make SHLIB_LIBS="-lncursesw" -j${LFS_MAKE_JOBS:-$(nproc)}
 make SHLIB_LIBS="-lncursesw" install
 
 cd /sources
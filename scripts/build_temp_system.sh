@@ -8,7 +8,8 @@ echo "=== LFS Temporary System Build ==="
 
 export LFS=/mnt/lfs
 export LFS_TGT=$(uname -m)-lfs-linux-gnu
-export PATH="$LFS/tools/bin:$PATH"
+# Keep the compiler cache masquerade ahead of the cross tools when the build engine provides one
+export PATH="${LFS_CCACHE_BIN:+$LFS_CCACHE_BIN:}$LFS/tools/bin:$PATH"
 export CONFIG_SITE="$LFS/usr/share/config.site"
 
 cd $LFS/sources
@@ -30,7 +31,7 @@ cd build
     --disable-libstdcxx-pch         \
     --with-gxx-include-dir=/tools/$LFS_TGT/include/c++/15.2.0
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS install
 rm -v $LFS/usr/lib/lib{stdc++,stdc++fs,supc++}.la
 
@@ -46,7 +47,7 @@ cd m4-1.4.20
             --host=$LFS_TGT \
             --build=$(build-aux/config.guess)
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS install
 
 cd $LFS/sources
@@ -79,7 +80,7 @@ popd
             --disable-stripping          \
             --enable-widec
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS TIC_PATH=$(pwd)/build/progs/tic install
 echo "INPUT(-lncursesw)" > $LFS/usr/lib/libncurses.so
 
@@ -96,7 +97,7 @@ cd bash-5.3
             --host=$LFS_TGT                     \
             --without-bash-malloc
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS install
 ln -sv bash $LFS/bin/sh
 
@@ -114,7 +115,7 @@ cd coreutils-9.7
             --enable-install-program=hostname \
             --enable-no-install-program=kill,uptime
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS install
 
 mv -v $LFS/usr/bin/chroot              $LFS/usr/sbin
@@ -134,7 +135,7 @@ cd diffutils-3.12
             --host=$LFS_TGT \
             --build=$(./build-aux/config.guess)
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS install
 
 cd $LFS/sources
@@ -156,7 +157,7 @@ popd
 
 ./configure --prefix=/usr --host=$LFS_TGT --build=$(./config.guess)
 
-make FILE_COMPILE=$(pwd)/build/src/file -j$(nproc)
+make FILE_COMPILE=$(pwd)/build/src/file -j${LFS_MAKE_JOBS:-$(nproc)}
 make DESTDIR=$LFS install
 rm -v $LFS/usr/lib/libmagic.la
 
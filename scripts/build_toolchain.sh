@@ -5,7 +5,8 @@ echo "=== LFS Cross-Compilation Toolchain Build ==="
 
 export LFS=/mnt/lfs
 export LFS_TGT=$(uname -m)-lfs-linux-gnu
-export PATH="$LFS/tools/bin:$PATH"
+# Keep the compiler cache masquerade ahead of the cross tools when the build engine provides one
+export PATH="${LFS_CCACHE_BIN:+$LFS_CCACHE_BIN:}$LFS/tools/bin:$PATH"
 
 # Ensure directories exist
 mkdir -p $LFS/tools
@@ -53,7 +54,7 @@ cd build
              --disable-werror \
              --enable-default-hash-style=gnu
 
-make -j$(nproc)
+make -j${LFS_MAKE_JOBS:-$(nproc)}
 make install
 
 echo "Binutils build completed successfully"
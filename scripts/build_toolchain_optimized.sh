@@ -5,7 +5,8 @@ echo "=== LFS Cross-Compilation Toolchain Build (Optimized) ==="
 
 export LFS=/mnt/lfs
 export LFS_TGT=$(uname -m)-lfs-linux-gnu
-export PATH="$LFS/tools/bin:$PATH"
+# Keep the compiler cache masquerade ahead of the cross tools when the build engine provides one
+export PATH="${LFS_CCACHE_BIN:+$LFS_CCACHE_BIN:}$LFS/tools/bin:$PATH"
 
 # Ensure directories exist
 mkdir -p $LFS/tools
@@ -60,7 +61,7 @@ echo "Configuring Binutils with optimized settings..."
 
 echo "Starting Binutils compilation..."
 # Use fewer parallel jobs to avoid overwhelming the system
-make -j2
+make -j${LFS_MAKE_JOBS:-2}
 
 echo "Installing Binutils..."
 make install
@@ -11,6 +11,8 @@ from collections import Counter, defaultdict
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 
+from .pattern_engine import get_pattern_engine
+
 # Import advanced analysis modules
 try:
     from .predictive_analyzer import PredictiveAnalyzer
@@ -39,7 +41,9 @@ class FaultPattern:
 class FaultAnalyzer:
     def __init__(self, db_manager):
         self.db = db_manager
-        self.fault_patterns = self._initialize_patterns()
+        self.fault_patterns = self.default_patterns()
+        self.pattern_engine = get_pattern_engine()
+        self.pattern_engine.register('fault_analyzer', [(p.name, p.pattern) for p in self.fault_patterns])
         
         # Initialize advanced analyzers
         self.predictive_analyzer = PredictiveAnalyzer(db_manager) if PredictiveAnalyzer else None
@@ -47,7 +51,8 @@ class FaultAnalyzer:
         self.performance_analyzer = PerformanceAnalyzer(db_manager) if PerformanceAnalyzer else None
         self.guidance_engine = IntelligentGuidanceEngine(db_manager) if IntelligentGuidanceEngine else None
     
-    def _initialize_patterns(self) -> List[FaultPattern]:
+    @staticmethod
+    def default_patterns() -> List[FaultPattern]:
         """Initialize common LFS build fault patterns with auto-fix commands"""
         return [
             # Critical Issues
@@ -516,11 +521,7 @@ class FaultAnalyzer:
             for error_text, count in error_counter.most_common(20):
                 if count >= min_occurrences:
                     # Check if this error is already covered by existing patterns
-                    is_covered = False
-                    for pattern in self.fault_patterns:
-                        if pattern.pattern.search(error_text):
-                            is_covered = True
-                            break
+                    is_covered = bool(self.pattern_engine.matched_keys(error_text, 'fault_analyzer'))
                     
                     if not is_covered:
                         # Suggest a new pattern
@@ -754,8 +755,9 @@ class FaultAnalyzer:
     
     def _analyze_content(self, content: str, build_id: str, build_time: datetime, failed_stages: List[str] = None):
         """Analyze content for fault patterns with stage context"""
+        matched = self.pattern_engine.matched_keys(content, 'fault_analyzer')
         for pattern in self.fault_patterns:
-            if pattern.pattern.search(content):
+            if pattern.name in matched:
                 pattern.count += 1
                 pattern.recent_builds.append({
                     'build_id': build_id,
@@ -3,6 +3,8 @@ from datetime import datetime
 import json
 from pathlib import Path
 
+from .pattern_engine import get_pattern_engine
+
 class IntegratedFaultAnalyzer:
     """Enhanced fault analyzer with database integration for all system components"""
     
@@ -12,6 +14,7 @@ class IntegratedFaultAnalyzer:
         self.parallel_engine = parallel_engine
         self.api_server = api_server
         self.analysis_cache = {}
+        self.pattern_engine = get_pattern_engine()
         
         # Initialize analysis tables
         self._init_analysis_tables()
@@ -115,14 +118,23 @@ class IntegratedFaultAnalyzer:
             findings = []
             risk_score = 0
             
-            for pattern in patterns:
-                if self._match_pattern(error_logs, pattern):
+            # Match the log once against every database pattern; the set is
+            # only recompiled when the stored patterns change. Stored patterns
+            # may describe several lines of a log
+            set_name = 'fault_patterns.build'
+            self.pattern_engine.register(set_name, [
+                (index, pattern['pattern_regex']) for index, pattern in enumerate(patterns)
+            ], multiline=True)
+            first_matches = self.pattern_engine.first_matches(error_logs, set_name)
+            
+            for index, pattern in enumerate(patterns):
+                if index in first_matches:
                     finding = {
                         'pattern_name': pattern['pattern_name'],
                         'severity': pattern['severity'],
                         'description': pattern['description'],
                         'auto_fix': pattern['auto_fix_command'],
-                        'matched_text': self._extract_match(error_logs, pattern)
+                        'matched_text': first_matches[index].text
                     }
                     findings.append(finding)
                     
@@ -363,22 +375,18 @@ class IntegratedFaultAnalyzer:
     
     def _match_pattern(self, text: str, pattern: Dict) -> bool:
         """Match text against fault pattern"""
-        import re
         try:
-            if pattern['pattern_regex']:
-                return bool(re.search(pattern['pattern_regex'], text, re.IGNORECASE))
-            return False
+            regex = self.pattern_engine.compile(pattern['pattern_regex']) if pattern['pattern_regex'] else None
+            return bool(regex and regex.search(text))
         except:
             return False
     
     def _extract_match(self, text: str, pattern: Dict) -> str:
         """Extract matched text from pattern"""
-        import re
         try:
-            if pattern['pattern_regex']:
-                match = re.search(pattern['pattern_regex'], text, re.IGNORECASE)
-                return match.group(0) if match else ""
-            return ""
+            regex = self.pattern_engine.compile(pattern['pattern_regex']) if pattern['pattern_regex'] else None
+            match = regex.search(text) if regex else None
+            return match.group(0) if match else ""
         except:
             return ""
     
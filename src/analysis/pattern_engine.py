@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Shared Pattern Engine for LFS Build System
+Compiles the log patterns of every analyzer once into a combined literal automaton,
+scans each log line once and fans confirmed regex hits out to subscribers.
+In sets registered as multiline, patterns that can match a line break are
+confirmed against the whole text instead.
+"""
+
+import re
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Literals shorter than this match almost every line, so patterns whose best
+# required literal is shorter are confirmed on every line instead
+MIN_LITERAL_LENGTH = 3
+
+_REPEAT_OPS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) + (
+    (sre_parse.POSSESSIVE_REPEAT,) if hasattr(sre_parse, 'POSSESSIVE_REPEAT') else ())
+_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+# Character categories that include "\n"
+_NEWLINE_CATEGORIES = {sre_parse.CATEGORY_SPACE, sre_parse.CATEGORY_NOT_DIGIT,
+                       sre_parse.CATEGORY_NOT_WORD, sre_parse.CATEGORY_LINEBREAK}
+
+
+@dataclass
+class CompiledPattern:
+    """A registered pattern with its required literals"""
+    set_name: str
+    key: Hashable
+    regex: 're.Pattern'
+    literals: Tuple[str, ...]  # empty: confirmed on every line
+    multiline: bool = False  # multiline set and can match a line break: confirmed against the whole text
+
+
+@dataclass
+class PatternMatch:
+    """A confirmed pattern hit on one log line"""
+    set_name: str
+    key: Hashable
+    line_number: int  # 1-based
+    line: str
+    match: 're.Match'
+    pattern: CompiledPattern = field(repr=False)
+    
+    @property
+    def text(self) -> str:
+        return self.match.group(0)
+    
+    @property
+    def value(self) -> str:
+        """First capture group if the pattern has one, otherwise the whole match"""
+        return self.match.group(1) if self.match.groups() else self.match.group(0)
+
+
+def _sequence_literals(items) -> Optional[List[str]]:
+    """Best set of literals of which at least one occurs in every match of a sequence"""
+    best = None
+    run = []
+    
+    def consider(candidate):
+        nonlocal best
+        if not candidate:
+            return
+        score = (min(len(literal) for literal in candidate), -len(candidate))
+        if best is None or score > (min(len(literal) for literal in best), -len(best)):
+            best = candidate
+    
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        
+        if run:
+            consider([''.join(run).lower()])
+            run = []
+        
+        if op is sre_parse.SUBPATTERN:
+            consider(_sequence_literals(av[-1]))
+        elif op is sre_parse.BRANCH:
+            branches = [_sequence_literals(branch) for branch in av[1]]
+            if all(branches):
+                consider(sorted({literal for branch in branches for literal in branch}))
+        elif op in _REPEAT_OPS and av[0] >= 1:
+            consider(_sequence_literals(av[2]))
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            consider(_sequence_literals(av))
+    
+    if run:
+        consider([''.join(run).lower()])
+    
+    return best
+
+
+def required_literals(regex: str, flags: int = 0) -> Tuple[str, ...]:
+    """Lowercased literals of which at least one must appear in any match of regex"""
+    try:
+        parsed = sre_parse.parse(regex, flags)
+    except Exception:
+        return ()
+    
+    literals = _sequence_literals(list(parsed))
+    if not literals or min(len(literal) for literal in literals) < MIN_LITERAL_LENGTH:
+        return ()
+    return tuple(literals)
+
+
+def _class_matches_newline(items) -> bool:
+    negated = bool(items) and items[0][0] is sre_parse.NEGATE
+    hit = False
+    for op, av in items:
+        if op is sre_parse.LITERAL and av == 10:
+            hit = True
+        elif op is sre_parse.RANGE and av[0] <= 10 <= av[1]:
+            hit = True
+        elif op is sre_parse.CATEGORY and av in _NEWLINE_CATEGORIES:
+            hit = True
+    return hit != negated
+
+
+def _sequence_spans_lines(items, dotall: bool) -> bool:
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            if av == 10:
+                return True
+        elif op is sre_parse.NOT_LITERAL:
+            if av != 10:
+                return True
+        elif op is sre_parse.ANY:
+            if dotall:
+                return True
+        elif op is sre_parse.IN:
+            if _class_matches_newline(av):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            # Inline (?s:...) groups switch DOTALL on for their contents
+            if _sequence_spans_lines(av[-1], dotall or bool(av[1] & sre_parse.SRE_FLAG_DOTALL)):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_sequence_spans_lines(branch, dotall) for branch in av[1]):
+                return True
+        elif op in _REPEAT_OPS:
+            if _sequence_spans_lines(av[2], dotall):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _sequence_spans_lines(av[1], dotall):
+                return True
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            if _sequence_spans_lines(av, dotall):
+                return True
+    return False
+
+
+def spans_lines(regex: str, flags: int = 0) -> bool:
+    """Whether any match of regex can contain a line break"""
+    try:
+        parsed = sre_parse.parse(regex, flags)
+    except Exception:
+        return False
+    flags = getattr(parsed.state, 'flags', flags)
+    return _sequence_spans_lines(list(parsed), bool(flags & sre_parse.SRE_FLAG_DOTALL))
+
+
+def _trie_regex(literals: Iterable[str]) -> str:
+    """Build a regex matching the longest of the literals at a position, sharing prefixes"""
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = True
+    
+    def build(node) -> str:
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        if '' in node:
+            body = '(?:' + body + ')?'
+        return body
+    
+    return build(trie)
+
+
+class _LiteralAutomaton:
+    """Combined prefilter over the required literals of a group of patterns.
+    
+    The literals are folded into a prefix-sharing trie and compiled into one
+    zero-width regex, so a single pass of the C regex engine reports every
+    (overlapping) position where a literal starts, like an Aho-Corasick walk.
+    """
+    
+    def __init__(self, patterns: List[CompiledPattern]):
+        self.patterns = patterns
+        self.unfiltered = tuple(index for index, pattern in enumerate(patterns)
+                                if not pattern.literals and not pattern.multiline)
+        self.multiline = frozenset(index for index, pattern in enumerate(patterns) if pattern.multiline)
+        
+        direct = defaultdict(set)
+        for index, pattern in enumerate(patterns):
+            for literal in pattern.literals:
+                direct[literal].add(index)
+        
+        # The prefilter reports the longest literal starting at a position; any
+        # shorter literal that is its prefix occurs there as well
+        self.owners: Dict[str, Tuple[int, ...]] = {}
+        for literal in direct:
+            owners = set()
+            for prefix, indexes in direct.items():
+                if literal.startswith(prefix):
+                    owners.update(indexes)
+            self.owners[literal] = tuple(owners)
+        
+        self.regex = re.compile('(?=(' + _trie_regex(direct) + '))') if direct else None
+
+
+class PatternEngine:
+    """Process-wide registry of named pattern sets matched in a single pass per line"""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._sets: Dict[str, List[CompiledPattern]] = {}
+        self._signatures: Dict[str, tuple] = {}
+        self._regex_cache: Dict[Tuple[str, int], Optional['re.Pattern']] = {}
+        self._automata: Dict[Optional[frozenset], _LiteralAutomaton] = {}
+        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        self.stats = {'scans': 0, 'lines': 0, 'candidates': 0, 'matches': 0}
+    
+    def compile(self, regex: str, flags: int = re.IGNORECASE) -> Optional['re.Pattern']:
+        """Compile a regex once per process; invalid regexes yield None"""
+        cache_key = (regex, flags)
+        with self._lock:
+            if cache_key in self._regex_cache:
+                return self._regex_cache[cache_key]
+            try:
+                compiled = re.compile(regex, flags)
+            except re.error as e:
+                self.logger.warning(f"Ignoring invalid pattern {regex!r}: {e}")
+                compiled = None
+            self._regex_cache[cache_key] = compiled
+            return compiled
+    
+    def register(self, set_name: str, patterns, flags: int = re.IGNORECASE, multiline: bool = False) -> bool:
+        """Register or replace a pattern set.
+        
+        ``patterns`` is a dict of key -> regex, an iterable of (key, regex) pairs
+        or an iterable of regexes (each keyed by itself). Regexes may be strings
+        or already compiled patterns. Patterns are matched line by line, so
+        ``\\s*`` or ``(?:\\n|$)`` never reach into the next line; with
+        ``multiline`` the ones that can match a line break are matched against
+        the whole text. Returns False when the set is unchanged.
+        """
+        if isinstance(patterns, dict):
+            entries = list(patterns.items())
+        else:
+            entries = [entry if isinstance(entry, tuple) else (entry, entry) for entry in patterns]
+        
+        signature = (multiline,) + tuple(
+            (key, regex.pattern, regex.flags) if isinstance(regex, re.Pattern) else (key, regex, flags)
+            for key, regex in entries
+        )
+        
+        with self._lock:
+            if self._signatures.get(set_name) == signature:
+                return False
+            
+            compiled_patterns = []
+            for key, regex in entries:
+                if isinstance(regex, re.Pattern):
+                    compiled = regex
+                else:
+                    compiled = self.compile(regex, flags) if regex else None
+                if compiled is None:
+                    continue
+                compiled_patterns.append(CompiledPattern(
+                    set_name=set_name,
+                    key=key,
+                    regex=compiled,
+                    literals=required_literals(compiled.pattern, compiled.flags),
+                    multiline=multiline and spans_lines(compiled.pattern, compiled.flags)
+                ))
+            
+            self._sets[set_name] = compiled_patterns
+            self._signatures[set_name] = signature
+            self._automata.clear()
+            return True
+    
+    def unregister(self, set_name: str):
+        """Remove a pattern set"""
+        with self._lock:
+            self._sets.pop(set_name, None)
+            self._signatures.pop(set_name, None)
+            self._automata.clear()
+    
+    def has_set(self, set_name: str) -> bool:
+        with self._lock:
+            return set_name in self._sets
+    
+    def subscribe(self, set_name: str, callback: Callable[[PatternMatch, Optional[Dict]], Any]):
+        """Call ``callback(match, context)`` for every hit of a set found by any scan"""
+        with self._lock:
+            self._subscribers[set_name].append(callback)
+    
+    def unsubscribe(self, set_name: str, callback: Callable):
+        with self._lock:
+            if callback in self._subscribers.get(set_name, []):
+                self._subscribers[set_name].remove(callback)
+    
+    def subscribed_sets(self) -> frozenset:
+        """Registered sets that currently have subscribers"""
+        with self._lock:
+            return frozenset(name for name, callbacks in self._subscribers.items()
+                             if callbacks and name in self._sets)
+    
+    def scan(self, text: str, sets: Iterable[str] = None, context: Dict = None) -> List[PatternMatch]:
+        """Match every line of text once against the selected sets (all sets by default).
+        
+        Hits are returned in line order, and within a line in registration order.
+        Subscribers of the matched sets are notified with ``context``.
+        """
+        if not text:
+            return []
+        
+        automaton = self._automaton_for(sets)
+        if not automaton.patterns:
+            return []
+        
+        lines = text.split('\n')
+        candidates = defaultdict(set)
+        # Multiline patterns with a required literal somewhere in the text
+        present = set()
+        
+        if automaton.regex is not None:
+            lowered = text.lower()
+            newlines = [m.start() for m in re.finditer('\n', lowered)]
+            for hit in automaton.regex.finditer(lowered):
+                owners = automaton.owners[hit.group(1)]
+                if automaton.multiline:
+                    present.update(index for index in owners if index in automaton.multiline)
+                    owners = [index for index in owners if index not in automaton.multiline]
+                line_index = bisect.bisect_left(newlines, hit.start())
+                candidates[line_index].update(owners)
+        
+        if automaton.unfiltered:
+            line_indexes = range(len(lines))
+        else:
+            line_indexes = sorted(candidates)
+        
+        hits = []
+        candidate_count = 0
+        for line_index in line_indexes:
+            indexes = candidates.get(line_index, ())
+            if automaton.unfiltered:
+                indexes = set(indexes).union(automaton.unfiltered)
+            for index in sorted(indexes):
+                candidate_count += 1
+                match = automaton.patterns[index].regex.search(lines[line_index])
+                if match:
+                    hits.append((line_index, index, match))
+        
+        if automaton.multiline:
+            # Matched against the joined text, as a line cannot hold a line break
+            text_newlines = [m.start() for m in re.finditer('\n', text)]
+            for index in sorted(automaton.multiline):
+                pattern = automaton.patterns[index]
+                if pattern.literals and index not in present:
+                    continue
+                candidate_count += 1
+                for match in pattern.regex.finditer(text):
+                    hits.append((bisect.bisect_left(text_newlines, match.start()), index, match))
+            hits.sort(key=lambda hit: (hit[0], hit[1], hit[2].start()))
+        
+        matches = []
+        for line_index, index, match in hits:
+            pattern = automaton.patterns[index]
+            matches.append(PatternMatch(
+                set_name=pattern.set_name,
+                key=pattern.key,
+                line_number=line_index + 1,
+                line=lines[line_index],
+                match=match,
+                pattern=pattern
+            ))
+        
+        self.stats['scans'] += 1
+        self.stats['lines'] += len(lines)
+        self.stats['candidates'] += candidate_count
+        self.stats['matches'] += len(matches)
+        
+        if matches and self._subscribers:
+            self._dispatch(matches, context)
+        
+        return matches
+    
+    def first_matches(self, text: str, set_name: str) -> Dict[Hashable, PatternMatch]:
+        """Earliest hit of each pattern key of a set in text"""
+        first = {}
+        for match in self.scan(text, (set_name,)):
+            first.setdefault(match.key, match)
+        return first
+    
+    def matched_keys(self, text: str, set_name: str) -> set:
+        """Keys of the patterns of a set that match anywhere in text"""
+        return {match.key for match in self.scan(text, (set_name,))}
+    
+    def _automaton_for(self, sets: Optional[Iterable[str]]) -> _LiteralAutomaton:
+        selection = frozenset(sets) if sets is not None else None
+        with self._lock:
+            automaton = self._automata.get(selection)
+            if automaton is None:
+                patterns = [
+                    pattern
+                    for set_name, set_patterns in self._sets.items()
+                    if selection is None or set_name in selection
+                    for pattern in set_patterns
+                ]
+                automaton = _LiteralAutomaton(patterns)
+                self._automata[selection] = automaton
+            return automaton
+    
+    def _dispatch(self, matches: List[PatternMatch], context: Optional[Dict]):
+        with self._lock:
+            subscribers = {name: list(callbacks) for name, callbacks in self._subscribers.items() if callbacks}
+        
+        for match in matches:
+            for callback in subscribers.get(match.set_name, ()):
+                try:
+                    callback(match, context)
+                except Exception as e:
+                    self.logger.error(f"Pattern subscriber failed for {match.set_name}: {e}")
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'sets': {name: len(patterns) for name, patterns in self._sets.items()},
+                'unfiltered_patterns': sum(
+                    1 for patterns in self._sets.values() for pattern in patterns if not pattern.literals
+                ),
+                'multiline_patterns': sum(
+                    1 for patterns in self._sets.values() for pattern in patterns if pattern.multiline
+                ),
+                'compiled_regexes': len(self._regex_cache)
+            }
+
+
+_pattern_engine = None
+_pattern_engine_lock = threading.Lock()
+
+
+def get_pattern_engine() -> PatternEngine:
+    """Return the process-wide pattern engine shared by all analyzers"""
+    global _pattern_engine
+    if _pattern_engine is None:
+        with _pattern_engine_lock:
+            if _pattern_engine is None:
+                _pattern_engine = PatternEngine()
+    return _pattern_engine
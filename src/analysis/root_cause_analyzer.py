@@ -7,14 +7,24 @@ Analyzes dependency chains and environmental factors to identify root causes of
 import re
 from typing import Dict, List, Tuple, Optional, Set
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
 import json
 
+from .pattern_engine import get_pattern_engine
+
+ENVIRONMENT_PATTERN_SETS = ('root_cause.resource', 'root_cause.network', 'root_cause.compatibility')
+
 class RootCauseAnalyzer:
     def __init__(self, db_manager):
         self.db = db_manager
         self.dependency_patterns = self._initialize_dependency_patterns()
         self.environmental_correlations = self._initialize_environmental_correlations()
+        
+        self.environmental_patterns = self._initialize_environmental_patterns()
+        self.pattern_engine = get_pattern_engine()
+        for set_name, patterns in self.environmental_patterns.items():
+            self.pattern_engine.register(set_name, patterns)
+        self._document_matches = OrderedDict()
     
     def _initialize_dependency_patterns(self) -> Dict:
         """Initialize patterns for dependency chain analysis"""
@@ -59,6 +69,46 @@ class RootCauseAnalyzer:
             }
         }
     
+    def _initialize_environmental_patterns(self) -> Dict:
+        """Initialize environmental issue patterns, keyed by what each one indicates"""
+        return {
+            'root_cause.resource': [
+                ('memory', r'out of memory|memory.*exhausted|cannot allocate memory'),
+                ('memory', r'virtual memory.*exceeded|malloc.*failed'),
+                ('disk_space', r'no space left on device|disk.*full|cannot write'),
+                ('disk_space', r'insufficient.*space|disk.*quota.*exceeded'),
+                ('cpu', r'load.*average.*high|cpu.*overload|system.*overloaded')
+            ],
+            'root_cause.network': [
+                ('network', r'connection.*refused|connection.*timeout|network.*unreachable'),
+                ('network', r'download.*failed|404.*not found|mirror.*unavailable'),
+                ('network', r'dns.*resolution.*failed|host.*not found')
+            ],
+            'root_cause.compatibility': [
+                ('compatibility', r'version.*mismatch|incompatible.*version|unsupported.*version'),
+                ('compatibility', r'command not found|no such file or directory.*bin/'),
+                ('compatibility', r'library.*not found|shared.*library.*error')
+            ],
+            'root_cause.severity': [
+                ('critical', r'fatal error|critical error|segmentation fault'),
+                ('high', r'error:|compilation.*error|linker.*error'),
+                ('medium', r'warning:|deprecated|implicit')
+            ]
+        }
+    
+    def _match_document(self, content: str) -> set:
+        """Match a document against all environmental pattern sets in a single pass"""
+        if not content:
+            return set()
+        
+        matched = self._document_matches.get(content)
+        if matched is None:
+            matched = {(hit.set_name, hit.key) for hit in self.pattern_engine.scan(content, ENVIRONMENT_PATTERN_SETS)}
+            self._document_matches[content] = matched
+            if len(self._document_matches) > 64:
+                self._document_matches.popitem(last=False)
+        return matched
+    
     def analyze_failure_root_cause(self, build_id: str) -> Dict:
         """Perform comprehensive root cause analysis for a failed build"""
         try:
@@ -323,36 +373,22 @@ class RootCauseAnalyzer:
         """Extract system resource issues from documents"""
         resource_issues = []
         
-        resource_patterns = {
-            'memory': [
-                r'out of memory|memory.*exhausted|cannot allocate memory',
-                r'virtual memory.*exceeded|malloc.*failed'
-            ],
-            'disk_space': [
-                r'no space left on device|disk.*full|cannot write',
-                r'insufficient.*space|disk.*quota.*exceeded'
-            ],
-            'cpu': [
-                r'load.*average.*high|cpu.*overload|system.*overloaded'
-            ]
-        }
+        resource_types = dict.fromkeys(key for key, _ in self.environmental_patterns['root_cause.resource'])
         
         for doc in documents:
             if not isinstance(doc, dict):
                 continue
-            content = doc.get('content', '')
+            matched = self._match_document(doc.get('content', ''))
             
-            for resource_type, patterns in resource_patterns.items():
-                for pattern in patterns:
-                    if re.search(pattern, content, re.IGNORECASE):
-                        resource_issues.append({
-                            'type': 'resource',
-                            'factor': f'{resource_type}_exhaustion',
-                            'details': f'{resource_type.title()} resource exhaustion detected',
-                            'impact': 'high',
-                            'explanation': f'System {resource_type} resources were insufficient for build requirements'
-                        })
-                        break
+            for resource_type in resource_types:
+                if ('root_cause.resource', resource_type) in matched:
+                    resource_issues.append({
+                        'type': 'resource',
+                        'factor': f'{resource_type}_exhaustion',
+                        'details': f'{resource_type.title()} resource exhaustion detected',
+                        'impact': 'high',
+                        'explanation': f'System {resource_type} resources were insufficient for build requirements'
+                    })
         
         return resource_issues
     
@@ -360,27 +396,18 @@ class RootCauseAnalyzer:
         """Extract network/connectivity issues from documents"""
         network_issues = []
         
-        network_patterns = [
-            r'connection.*refused|connection.*timeout|network.*unreachable',
-            r'download.*failed|404.*not found|mirror.*unavailable',
-            r'dns.*resolution.*failed|host.*not found'
-        ]
-        
         for doc in documents:
             if not isinstance(doc, dict):
                 continue
-            content = doc.get('content', '')
             
-            for pattern in network_patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    network_issues.append({
-                        'type': 'network',
-                        'factor': 'connectivity_issue',
-                        'details': 'Network connectivity or mirror availability issue detected',
-                        'impact': 'medium',
-                        'explanation': 'Network issues prevented package downloads or updates'
-                    })
-                    break
+            if ('root_cause.network', 'network') in self._match_document(doc.get('content', '')):
+                network_issues.append({
+                    'type': 'network',
+                    'factor': 'connectivity_issue',
+                    'details': 'Network connectivity or mirror availability issue detected',
+                    'impact': 'medium',
+                    'explanation': 'Network issues prevented package downloads or updates'
+                })
         
         return network_issues
     
@@ -388,27 +415,18 @@ class RootCauseAnalyzer:
         """Extract host system compatibility issues from documents"""
         compatibility_issues = []
         
-        compatibility_patterns = [
-            r'version.*mismatch|incompatible.*version|unsupported.*version',
-            r'command not found|no such file or directory.*bin/',
-            r'library.*not found|shared.*library.*error'
-        ]
-        
         for doc in documents:
             if not isinstance(doc, dict):
                 continue
-            content = doc.get('content', '')
             
-            for pattern in compatibility_patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    compatibility_issues.append({
-                        'type': 'compatibility',
-                        'factor': 'host_system_incompatibility',
-                        'details': 'Host system compatibility issue detected',
-                        'impact': 'high',
-                        'explanation': 'Host system lacks required tools or has incompatible versions'
-                    })
-                    break
+            if ('root_cause.compatibility', 'compatibility') in self._match_document(doc.get('content', '')):
+                compatibility_issues.append({
+                    'type': 'compatibility',
+                    'factor': 'host_system_incompatibility',
+                    'details': 'Host system compatibility issue detected',
+                    'impact': 'high',
+                    'explanation': 'Host system lacks required tools or has incompatible versions'
+                })
         
         return compatibility_issues
     
@@ -437,21 +455,11 @@ class RootCauseAnalyzer:
     
     def _classify_error_severity(self, content: str) -> str:
         """Classify error severity based on content"""
-        critical_patterns = [r'fatal error|critical error|segmentation fault']
-        high_patterns = [r'error:|compilation.*error|linker.*error']
-        medium_patterns = [r'warning:|deprecated|implicit']
-        
-        for pattern in critical_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                return 'critical'
-        
-        for pattern in high_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                return 'high'
+        matched = self.pattern_engine.matched_keys(content, 'root_cause.severity') if content else set()
         
-        for pattern in medium_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                return 'medium'
+        for severity in ('critical', 'high', 'medium'):
+            if severity in matched:
+                return severity
         
         return 'low'
     
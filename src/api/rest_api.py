@@ -7,6 +7,11 @@ import http.server
 import socketserver
 from urllib.parse import urlparse, parse_qs
 
+try:
+    from ..build.output_capture import OutputLog
+except ImportError:
+    from build.output_capture import OutputLog
+
 class SimpleAPIHandler(http.server.BaseHTTPRequestHandler):
     """Simple HTTP handler for basic API functionality"""
     
@@ -26,6 +31,14 @@ class SimpleAPIHandler(http.server.BaseHTTPRequestHandler):
                 response = self.api.get_builds_summary()
             elif path == '/api/health':
                 response = self.api.get_health_summary()
+            elif path.startswith('/api/builds/') and '/output/' in path:
+                # /api/builds/<build_id>/output/<stage>?stream=stdout&start=0&count=500
+                build_id, stage_name = path[len('/api/builds/'):].split('/output/', 1)
+                query = parse_qs(parsed_path.query)
+                response = self.api.get_stage_output(
+                    build_id, stage_name, query.get('stream', ['stdout'])[0],
+                    int(query.get('start', [0])[0]), int(query.get('count', [500])[0])
+                )
             else:
                 response = {'error': 'Endpoint not found'}
                 self.send_response(404)
@@ -81,6 +94,30 @@ class LFSBuildAPI:
         except Exception as e:
             return {'error': str(e)}
     
+    def get_stage_output(self, build_id: str, stage_name: str, stream: str = 'stdout',
+                         start: int = 0, count: int = 500) -> Dict:
+        """Get a range of lines from a stage's captured output"""
+        try:
+            if stream not in ('stdout', 'stderr') or '/' in build_id + stage_name or '..' in build_id + stage_name:
+                return {'error': 'invalid stage output'}
+            path = OutputLog.stage_path(build_id, stage_name, stream)
+            if not path.exists():
+                return {'error': 'no captured output for this stage'}
+            log = OutputLog.open(path)
+            count = max(min(count, 5000), 0)
+            if start < 0:
+                start = max(log.line_count + start, 0)
+            return {
+                'build_id': build_id,
+                'stage': stage_name,
+                'stream': stream,
+                'total_lines': log.line_count,
+                'start': start,
+                'lines': log.read_lines(start, start + count)
+            }
+        except Exception as e:
+            return {'error': str(e)}
+    
     def get_health_summary(self) -> Dict:
         """Get health summary"""
         try:
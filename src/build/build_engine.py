@@ -1,5 +1,6 @@
 import subprocess
 import hashlib
+import re
 import uuid
 from datetime import datetime
 from typing import Dict, List, Callable, Any
@@ -12,19 +13,41 @@ import tempfile
 
 from ..database.db_manager import DatabaseManager
 from .downloader import LFSDownloader
+from .compiler_cache import CompilerCache
+from .stage_cache import StageCache
+from .checkpoint_manager import CheckpointManager
+from .stage_resources import StageResourceManager
+from .workspace import WorkspaceManager
+from .source_cache import PreparedSourceCache
+from .package_graph import PackageBuildManager, parse_stage_script
+from .output_capture import OutputLog
 from ..analysis.integrated_analyzer import IntegratedFaultAnalyzer
+from ..analysis.pattern_engine import get_pattern_engine
+from ..database.metrics_sampler import get_metrics_sampler
+
+# Keyword sets checked against each line of stage output; every line is matched
+# once against all registered pattern sets and hits are fanned out to subscribers
+STAGE_OUTPUT_PATTERNS = {
+    'build.activity': ['building', 'compiling', 'installing', 'extracting', 'configuring', 'make', 'gcc', 'error', 'failed'],
+    'build.stderr_notice': ['warning:', 'note:', 'info:', 'makeinfo is missing', 'documentation will not be built'],
+    'build.sudo_prompt': ['password for', '[sudo] password', 'sudo password', 'enter password']
+}
+STAGE_OUTPUT_SETS = frozenset(STAGE_OUTPUT_PATTERNS)
 
 class BuildStage:
     def __init__(self, name: str, order: int, command: str, 
-                 dependencies: List[str] = None, rollback_command: str = ""):
+                 dependencies: List[str] = None, rollback_command: str = "", config: Dict = None):
         self.name = name
         self.order = order
         self.command = command
         self.dependencies = dependencies or []
         self.rollback_command = rollback_command
+        self.config = config or {'name': name, 'command': command, 'dependencies': self.dependencies}
         self.status = "pending"
+        # Tails of the stage's stdout and stderr; the full streams are in output_logs
         self.output = ""
         self.error = ""
+        self.output_logs = {}
 
 class BuildEngine:
     def __init__(self, db_manager: DatabaseManager, repo_manager=None):
@@ -32,6 +55,22 @@ class BuildEngine:
         self.repo = repo_manager
         self.downloader = LFSDownloader(repo_manager, db_manager) if repo_manager else None
         self.fault_analyzer = IntegratedFaultAnalyzer(db_manager, self)
+        self.pattern_engine = get_pattern_engine()
+        for set_name, keywords in STAGE_OUTPUT_PATTERNS.items():
+            self.pattern_engine.register(set_name, [(keyword, re.escape(keyword)) for keyword in keywords])
+        self.compiler_cache = CompilerCache()
+        self.stage_cache = StageCache()
+        self.checkpoints = CheckpointManager()
+        self.stage_resources = StageResourceManager()
+        self.package_builds = PackageBuildManager()
+        self.workspaces = WorkspaceManager()
+        self.source_cache = PreparedSourceCache()
+        # Pointer-tracked source tarballs of the repository, opened on first use
+        self._source_repo = None
+        # Host metrics for the whole build come from the shared sampler, tagged per stage
+        self.metrics_sampler = get_metrics_sampler()
+        self.metrics_sampler.attach_database(db_manager)
+        self.build_config = {}
         self.stages = {}
         self.build_queue = queue.Queue()
         self.current_build = None
@@ -39,10 +78,14 @@ class BuildEngine:
         self.build_cancelled = False
         self.current_process = None
         self.sudo_password = None
+        self.ml_engine = None
         self.callbacks = {
             'stage_start': [],
             'stage_complete': [],
+            'stage_output_error': [],
+            'build_complete': [],
             'build_error': [],
+            'build_finished': [],
             'sudo_required': []
         }
     
@@ -50,6 +93,16 @@ class BuildEngine:
         if event in self.callbacks:
             self.callbacks[event].append(callback)
     
+    def _match_output_line(self, build_id: str, stage_name: str, line: str, stream: str) -> set:
+        """Match a stage output line once against the stage output sets and any subscribed sets"""
+        if not line:
+            return set()
+        # Sets nobody listens to (such as the stored fault patterns) are left to the analyzers
+        sets = STAGE_OUTPUT_SETS | self.pattern_engine.subscribed_sets()
+        hits = self.pattern_engine.scan(line, sets,
+                                        context={'build_id': build_id, 'stage': stage_name, 'stream': stream})
+        return {hit.set_name for hit in hits}
+    
     def emit_event(self, event: str, data: Any):
         for callback in self.callbacks.get(event, []):
             try:
@@ -61,6 +114,10 @@ class BuildEngine:
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
         
+        self._apply_build_config(config)
+    
+    def _apply_build_config(self, config: Dict):
+        self.build_config = config or {}
         self.stages.clear()
         for stage_config in config.get('stages', []):
             stage = BuildStage(
@@ -68,13 +125,46 @@ class BuildEngine:
                 order=stage_config['order'],
                 command=stage_config['command'],
                 dependencies=stage_config.get('dependencies', []),
-                rollback_command=stage_config.get('rollback_command', '')
+                rollback_command=stage_config.get('rollback_command', ''),
+                config=stage_config
             )
             self.stages[stage.name] = stage
     
     def create_default_lfs_config(self, output_path: str):
         default_config = {
             'name': 'Linux From Scratch Build',
+            'compiler_cache': {
+                'enabled': True,
+                'max_size': '10G'
+            },
+            'stage_cache': {
+                'enabled': True,
+                'max_size_gb': 20
+            },
+            'checkpoints': {
+                'enabled': True,
+                'strategy': 'auto',
+                'keep_builds': 5
+            },
+            'resources': {
+                'method': 'auto',
+                'default_limits': {}
+            },
+            'package_graph': {
+                'enabled': True,
+                'stages': ['build_temp_system'],
+                'retries': 1
+            },
+            'workspace': {
+                'backend': 'auto',
+                'tmpfs_size': '16G',
+                'memory_reserve': '4G'
+            },
+            'source_cache': {
+                'enabled': True,
+                'max_size_gb': 30,
+                'link_mode': 'reflink'
+            },
             'version': '12.4',
             'stages': [
                 {
@@ -170,6 +260,15 @@ class BuildEngine:
         
         total_stages = len(self.stages)
         
+        # Per configuration compiler cache shared by the stages of this build
+        self.compiler_cache.prepare(self.build_config)
+        self.stage_cache.configure(self.build_config)
+        self.checkpoints.configure(self.build_config)
+        self.stage_resources.configure(self.build_config)
+        self.package_builds.configure(self.build_config)
+        self.workspaces.configure(self.build_config)
+        self.source_cache.configure(self.build_config.get('source_cache'))
+        
         if not self.db.create_build(build_id, build_name or "unnamed-build", total_stages):
             raise Exception("Failed to create build record")
         
@@ -181,12 +280,15 @@ class BuildEngine:
             config_content, {'config_path': config_path}
         )
         
+        self.checkpoints.begin(build_id, config_path, config_content)
+        
         self.current_build = {
             'id': build_id,
             'config_hash': config_hash,
             'stages': dict(self.stages),
             'completed_stages': 0,
-            'branch': build_branch
+            'branch': build_branch,
+            'stage_keys': {}
         }
         
         if self.build_thread and self.build_thread.is_alive():
@@ -199,6 +301,8 @@ class BuildEngine:
         return build_id
     
     def _execute_build(self, build_id: str):
+        # Recorded with the checkpoints however the build ends
+        outcome = 'failed'
         try:
             if not self.current_build:
                 return
@@ -206,6 +310,9 @@ class BuildEngine:
             # Commit initial build state to branch
             self._commit_build_start(build_id)
             
+            # The build branch only tracks pointers; put the tarballs it needs in place
+            self._materialize_sources()
+            
             # Setup LFS permissions before starting build (non-blocking)
             try:
                 self._setup_lfs_permissions(build_id)
@@ -234,7 +341,11 @@ class BuildEngine:
             # Start ML monitoring for this build
             try:
                 from ..ml.ml_engine import MLEngine
-                ml_engine = MLEngine(self.db)
+                if self.ml_engine is None:
+                    self.ml_engine = MLEngine(self.db)
+                    # Drive real-time inference from stage and log events
+                    self.ml_engine.real_time_inference.attach_to_build_engine(self)
+                ml_engine = self.ml_engine
                 if ml_engine.is_enabled():
                     ml_engine.start_build_monitoring(build_id)
                     print(f"🤖 ML monitoring started for build {build_id}")
@@ -250,16 +361,33 @@ class BuildEngine:
                 if self.build_cancelled:
                     print(f"🚫 Build cancelled before stage {stage.name}")
                     self.db.update_build_status(build_id, 'cancelled', self.current_build.get('completed_stages', 0))
+                    outcome = 'cancelled'
                     return
                 
+                if stage.name in self.current_build.get('resumed_stages', ()):
+                    stage.status = 'success'
+                    print(f"⏭️ Stage {stage.name} already completed in checkpoint of {self.current_build['resumed_from']}")
+                    continue
+                
                 if not self._check_dependencies(stage):
                     self._fail_stage(build_id, stage, "Dependencies not met")
                     continue
                 
-                self._execute_stage(build_id, stage)
+                # Unchanged stages are restored from the stage cache instead of executed
+                stage_key = self._stage_cache_key(stage)
+                if self._restore_stage_from_cache(build_id, stage, stage_key):
+                    self.current_build['completed_stages'] = self.current_build.get('completed_stages', 0) + 1
+                    self._commit_stage_completion(build_id, stage)
+                    self._save_checkpoint(build_id, stage)
+                    continue
+                
+                cache_snapshot = self.stage_cache.snapshot() if self.stage_cache.is_cacheable(stage.config) else None
+                
+                self._execute_stage_in_workspace(build_id, stage)
                 
                 if stage.status == 'failed' or self.build_cancelled:
                     status = 'cancelled' if self.build_cancelled else 'failed'
+                    outcome = status
                     self.db.update_build_status(build_id, status, self.current_build.get('completed_stages', 0))
                     # Perform automatic cleanup on failure
                     self._perform_build_cleanup(build_id, status, stage.name)
@@ -268,11 +396,17 @@ class BuildEngine:
                     self.emit_event('build_error', {'build_id': build_id, 'stage': stage.name})
                     return
                 
+                if cache_snapshot is not None:
+                    self.stage_cache.store(stage_key, stage.name, cache_snapshot, build_id, stage.output)
+                
                 self.current_build['completed_stages'] = self.current_build.get('completed_stages', 0) + 1
                 # Commit stage completion to build branch
                 self._commit_stage_completion(build_id, stage)
+                self._save_checkpoint(build_id, stage)
+                self._prefetch_sources(stage)
             
             self.db.update_build_status(build_id, 'success', self.current_build.get('completed_stages', 0))
+            outcome = 'success'
             # Commit successful build completion
             self._commit_build_completion(build_id, 'success')
             self.emit_event('build_complete', {'build_id': build_id, 'status': 'success'})
@@ -293,6 +427,339 @@ class BuildEngine:
                 self.emit_event('build_error', {'build_id': build_id, 'error': str(e)})
             except Exception as db_error:
                 print(f"Database error during exception handling: {db_error}")
+        finally:
+            # Successful builds are no longer resumable, so their checkpoints may be pruned
+            self.checkpoints.finish(build_id, outcome)
+            if self.ml_engine is not None:
+                self.ml_engine.stop_build_monitoring(build_id)
+            self.source_cache.release('upcoming-stages')
+            self._source_maintenance()
+            # Sent however the build ended: success, failure, cancellation or exception
+            self.emit_event('build_finished', {'build_id': build_id})
+    
+    def _execute_stage_in_workspace(self, build_id: str, stage: BuildStage):
+        """Run a stage inside its managed source workspace, spilling to disk if a tmpfs fills up"""
+        workspace = self.workspaces.acquire(build_id, stage.config)
+        try:
+            self._execute_stage(build_id, stage)
+        finally:
+            workspace_stats = self.workspaces.release(workspace)
+        
+        if stage.status == 'failed' and not self.build_cancelled and \
+                self.workspaces.should_spill(workspace, f"{stage.error}\n{stage.output[-65536:]}"):
+            print(f"💽 Stage {stage.name} filled its {workspace_stats['size_budget_bytes'] // (1024 * 1024)} MB "
+                  f"tmpfs workspace - rerunning it on disk")
+            self.db.add_document(
+                build_id, 'log', f'Workspace Spill: {stage.name}',
+                f"Stage {stage.name} ran out of room in its tmpfs workspace "
+                f"(peak {workspace_stats['peak_bytes'] // (1024 * 1024)} MB) and is rerun on a disk overlay",
+                {'stage_order': stage.order, 'workspace_spill': True}
+            )
+            self.db.record_stage_workspace(build_id, stage.name, stage.order, workspace_stats)
+            workspace = self.workspaces.acquire(build_id, stage.config, force_backend='overlay')
+            workspace.spilled = True
+            try:
+                self._execute_stage(build_id, stage)
+            finally:
+                workspace_stats = self.workspaces.release(workspace)
+        
+        self.db.record_stage_workspace(build_id, stage.name, stage.order, workspace_stats)
+        if workspace_stats['backend'] != 'plain':
+            print(f"🗂️ Stage {stage.name} workspace: {workspace_stats['backend']}, "
+                  f"peak {workspace_stats['peak_bytes'] // (1024 * 1024)} MB, "
+                  f"setup {workspace_stats['setup_seconds']}s, teardown {workspace_stats['teardown_seconds']}s"
+                  f"{', kept ' + ', '.join(workspace_stats['synced_files']) if workspace_stats['synced_files'] else ''}")
+    
+    def _stage_tarballs(self, after_order: int = 0) -> List[str]:
+        """File names of the tarballs unpacked by package-granular stages after ``after_order``"""
+        project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        tarballs = []
+        for stage in sorted(self.stages.values(), key=lambda x: x.order):
+            if stage.order <= after_order or 'scripts/' not in stage.command:
+                continue
+            if not self.package_builds.applies_to(stage.config):
+                continue
+            script_path = os.path.join(project_dir, 'scripts', stage.command.split('scripts/')[1].split()[0])
+            try:
+                with open(script_path) as f:
+                    _, nodes = parse_stage_script(f.read())
+            except OSError:
+                continue
+            tarballs.extend(node.tarball for node in nodes if node.tarball)
+        return list(dict.fromkeys(tarballs))
+    
+    def _source_repository(self):
+        if self._source_repo is None and self.repo:
+            from ..repository.source_repo_manager import SourceRepositoryManager
+            self._source_repo = SourceRepositoryManager(self.db, self.repo)
+        return self._source_repo
+    
+    def _materialize_sources(self):
+        """Copy the tarballs package stages need, and the sources directory lacks, out of the source store"""
+        sources_dir = self.package_builds.sources_dir
+        missing = [name for name in self._stage_tarballs()
+                   if sources_dir and not os.path.isfile(os.path.join(sources_dir, name))]
+        if not missing:
+            return
+        try:
+            source_repo = self._source_repository()
+            if source_repo:
+                version = self.build_config.get('version', '12.4')
+                written = source_repo.materialize_packages(version, sources_dir, missing)
+                print(f"📦 Materialized {len(written)} of {len(missing)} missing source tarballs into {sources_dir}")
+        except Exception as e:
+            print(f"⚠️ Could not materialize source tarballs: {e}")
+    
+    def _source_maintenance(self):
+        """Prune old build snapshots and the stored tarballs no ref needs; at most daily"""
+        try:
+            source_repo = self._source_repository()
+            if source_repo:
+                source_repo.run_maintenance()
+        except Exception as e:
+            print(f"⚠️ Source store maintenance failed: {e}")
+    
+    def _prefetch_sources(self, completed_stage: BuildStage):
+        """Pre-extract the tarballs of upcoming package-granular stages while the build goes on"""
+        if not self.source_cache.enabled:
+            return
+        tarballs = [os.path.join(self.package_builds.sources_dir, name)
+                    for name in self._stage_tarballs(completed_stage.order)]
+        tarballs = [path for path in tarballs if os.path.isfile(path)]
+        # Trees of stages already run may go; those still ahead stay pinned
+        self.source_cache.release('upcoming-stages')
+        if tarballs:
+            print(f"📦 Pre-extracting {len(tarballs)} source tarballs for upcoming stages")
+            self.source_cache.prefetch(tarballs, owner='upcoming-stages')
+    
+    def _stage_cache_key(self, stage: BuildStage) -> str:
+        """Content key of a stage, chained to the keys of the stages it depends on"""
+        stage_keys = self.current_build.setdefault('stage_keys', {})
+        dependency_keys = [stage_keys.get(dep, dep) for dep in stage.dependencies]
+        project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            key = self.stage_cache.stage_key(stage.config, os.environ, dependency_keys, project_dir)
+        except OSError as e:
+            print(f"⚠️ Could not compute stage cache key for {stage.name}: {e}")
+            key = None
+        stage_keys[stage.name] = key or f"uncached:{stage.name}:{uuid.uuid4()}"
+        return key
+    
+    def _restore_stage_from_cache(self, build_id: str, stage: BuildStage, stage_key: str) -> bool:
+        """Restore a stage's filesystem delta from the stage cache; returns False on a miss"""
+        if not stage_key or not self.stage_cache.is_cacheable(stage.config):
+            return False
+        entry = self.stage_cache.lookup(stage_key)
+        if not entry:
+            return False
+        
+        stage.status = 'running'
+        self.emit_event('stage_start', {'build_id': build_id, 'stage': stage.name, 'cached': True})
+        print(f"♻️ Restoring stage {stage.name} from cache ({stage_key[:12]}, built by {entry.get('build_id')})")
+        
+        if not self.stage_cache.restore(stage_key):
+            stage.status = 'pending'
+            return False
+        
+        stage.status = 'success'
+        stage.output = self.stage_cache.cached_output(stage_key)
+        self.db.add_stage_log(build_id, stage.name, 'success', stage.output)
+        self.db.add_document(
+            build_id, 'log', f'Stage Restored From Cache: {stage.name}',
+            f"Stage {stage.name} was unchanged and restored from the stage cache\n"
+            f"Cache key: {stage_key}\n"
+            f"Originally built by: {entry.get('build_id')}\n"
+            f"Paths changed: {entry.get('changed')}, removed: {entry.get('removed')}",
+            {'stage_order': stage.order, 'stage_cache': True, 'cache_key': stage_key}
+        )
+        self.emit_event('stage_complete', {
+            'build_id': build_id,
+            'stage': stage.name,
+            'status': stage.status,
+            'cached': True
+        })
+        return True
+    
+    def _save_checkpoint(self, build_id: str, stage: BuildStage):
+        """Persist a resumable checkpoint after a successful stage"""
+        completed = [s.name for s in sorted(self.stages.values(), key=lambda x: x.order) if s.status == 'success']
+        try:
+            checkpoint = self.checkpoints.checkpoint(
+                build_id, stage.name, stage.order, completed, self.current_build.get('stage_keys')
+            )
+        except Exception as e:
+            print(f"⚠️ Checkpoint after stage {stage.name} failed: {e}")
+            return
+        
+        if checkpoint:
+            print(f"💾 Checkpoint {checkpoint['name']} saved ({checkpoint['strategy']}, "
+                  f"{len(checkpoint['changed'])} paths, {checkpoint['size_bytes'] // (1024 * 1024)} MB)")
+            self.db.record_build_checkpoint(build_id, stage.name, stage.order, checkpoint)
+    
+    def resume_build(self, build_id: str, checkpoint_name: str = None) -> str:
+        """Restart a failed or cancelled build from its last good checkpoint under a new build id"""
+        if self.build_thread and self.build_thread.is_alive():
+            raise Exception("Another build is already running")
+        
+        state = self.checkpoints.load_state(build_id)
+        config_content = self.checkpoints.config_content(build_id)
+        if not state or config_content is None:
+            raise Exception(f"No checkpoints recorded for build {build_id}")
+        
+        if checkpoint_name:
+            checkpoint = next((c for c in state['checkpoints'] if c['name'] == checkpoint_name), None)
+            if checkpoint:
+                checkpoint = dict(checkpoint, build_id=build_id)
+        else:
+            checkpoint = self.checkpoints.latest(build_id)
+        if not checkpoint:
+            raise Exception(f"No checkpoint to resume build {build_id} from")
+        
+        self._apply_build_config(yaml.safe_load(config_content))
+        self.compiler_cache.prepare(self.build_config)
+        self.stage_cache.configure(self.build_config)
+        self.checkpoints.configure(self.build_config)
+        self.stage_resources.configure(self.build_config)
+        self.package_builds.configure(self.build_config)
+        self.workspaces.configure(self.build_config)
+        self.source_cache.configure(self.build_config.get('source_cache'))
+        
+        print(f"⏪ Restoring LFS tree to checkpoint {checkpoint['name']} of build {checkpoint['build_id']}")
+        restore_result = self.checkpoints.restore(checkpoint['build_id'], checkpoint['name'])
+        
+        new_build_id = f"lfs-resume-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:8]}"
+        build_name = f"{self.build_config.get('name', 'unnamed-build')} (resumed)"
+        if not self.db.create_build(new_build_id, build_name, len(self.stages)):
+            raise Exception("Failed to create build record")
+        
+        self.db.record_build_resume(new_build_id, build_id, checkpoint['name'], restore_result)
+        
+        completed_stages = [name for name in checkpoint['completed_stages'] if name in self.stages]
+        for name in completed_stages:
+            self.stages[name].status = 'success'
+            self.db.add_stage_log(new_build_id, name, 'success',
+                                  f"Restored from checkpoint {checkpoint['name']} of build {checkpoint['build_id']}")
+        
+        resume_summary = (
+            f"Resumed from build {build_id} at checkpoint {checkpoint['name']}\n"
+            f"Completed stages carried over: {', '.join(completed_stages)}\n"
+            f"Paths removed: {restore_result['removed']}, restored: {restore_result['restored']}\n"
+            f"Restore duration: {restore_result['duration_seconds']} seconds"
+        )
+        self.db.add_document(new_build_id, 'log', 'Build Resumed From Checkpoint', resume_summary,
+                             {'resumed_from': build_id, 'checkpoint': checkpoint['name']})
+        self.db.add_document(build_id, 'log', 'Build Resumed', f"Build resumed as {new_build_id}\n\n{resume_summary}",
+                             {'resumed_as': new_build_id, 'checkpoint': checkpoint['name']})
+        
+        self.checkpoints.begin(new_build_id, state.get('config_path'), config_content,
+                               resumed_from=checkpoint['build_id'], resumed_checkpoint=checkpoint['name'])
+        
+        self.current_build = {
+            'id': new_build_id,
+            'config_hash': hashlib.sha256(config_content.encode()).hexdigest()[:16],
+            'stages': dict(self.stages),
+            'completed_stages': len(completed_stages),
+            'branch': self._create_build_branch(new_build_id),
+            'stage_keys': dict(checkpoint.get('stage_keys', {})),
+            'resumed_from': build_id,
+            'resumed_stages': set(completed_stages),
+            'environment': checkpoint.get('environment', {})
+        }
+        
+        self.build_cancelled = False
+        self.build_thread = threading.Thread(target=self._execute_build, args=(new_build_id,), daemon=True)
+        self.build_thread.start()
+        
+        return new_build_id
+    
+    def _record_package_builds(self, build_id: str, stage: BuildStage) -> List[Dict]:
+        """Store per-package results of a package-granular stage"""
+        packages = self.package_builds.results(build_id, stage.name)
+        self.db.record_package_builds(build_id, stage.name, packages)
+        
+        failed = [p['name'] for p in packages if p['status'] == 'failed']
+        blocked = [p['name'] for p in packages if p['status'] == 'blocked']
+        timings = '\n'.join(
+            f"{p['name']:<24} {p['status']:<10} {p['duration_seconds']:>9.1f}s  "
+            f"source setup {p.get('prepare_seconds', 0):.1f}s  attempts {p['attempts']}  make -j{p['make_jobs']}  {p.get('log_path') or ''}"
+            for p in packages
+        )
+        self.db.add_document(
+            build_id, 'error' if failed or blocked else 'log', f'Package Builds: {stage.name}',
+            f"Packages: {len(packages)}\n"
+            f"Failed: {', '.join(failed) or 'none'}\n"
+            f"Blocked by failures: {', '.join(blocked) or 'none'}\n\n{timings}",
+            {'stage_order': stage.order, 'package_graph': True, 'failed_packages': failed,
+             'blocked_packages': blocked}
+        )
+        if failed:
+            print(f"📦 Failed packages in {stage.name}: {', '.join(failed)} - "
+                  f"retry them with retry_packages('{build_id}', '{stage.name}')")
+        return packages
+    
+    def retry_packages(self, build_id: str, stage_name: str, packages: List[str] = None) -> Dict:
+        """Rebuild failed packages of a package-granular stage in place, without rerunning the stage
+        
+        Only the given packages (by default every package that did not succeed)
+        and the packages they blocked are built. When the whole stage then
+        succeeds a checkpoint is saved for it, so ``resume_build`` continues
+        after the stage instead of restoring the tree to before it.
+        """
+        if self.build_thread and self.build_thread.is_alive():
+            raise Exception("Another build is already running")
+        
+        config_content = self.checkpoints.config_content(build_id)
+        if config_content is not None:
+            self._apply_build_config(yaml.safe_load(config_content))
+        stage = self.stages.get(stage_name)
+        if not stage or 'scripts/' not in stage.command:
+            raise Exception(f"Stage {stage_name} of build {build_id} is not a script stage")
+        
+        self.compiler_cache.prepare(self.build_config)
+        self.checkpoints.configure(self.build_config)
+        self.package_builds.configure(self.build_config)
+        
+        only = packages or self.package_builds.failed_packages(build_id, stage_name)
+        if not only:
+            print(f"✅ No failed packages to retry in {stage_name} of build {build_id}")
+            return {'return_code': 0, 'packages': self.package_builds.results(build_id, stage_name)}
+        
+        project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        script_path = os.path.join(project_dir, 'scripts', stage.command.split('scripts/')[1].split()[0])
+        command = self.package_builds.prepare(build_id, stage.config, script_path, only=only, command=stage.command)
+        if not command:
+            raise Exception(f"No packages found in {script_path}")
+        
+        env = os.environ.copy()
+        self.compiler_cache.apply_to_env(env, stage_name)
+        print(f"🔁 Retrying packages {', '.join(only)} of {stage_name} in build {build_id}")
+        result = subprocess.run(command, shell=True, cwd=project_dir, env=env, stdin=subprocess.DEVNULL)
+        
+        stage.status = 'success' if result.returncode == 0 else 'failed'
+        results = self._record_package_builds(build_id, stage)
+        
+        if result.returncode == 0:
+            self.db.add_stage_log(build_id, stage_name, 'success',
+                                  f"Completed by retrying packages: {', '.join(only)}")
+            latest = self.checkpoints.latest(build_id)
+            completed = list((latest or {}).get('completed_stages', []))
+            try:
+                checkpoint = self.checkpoints.checkpoint(build_id, stage_name, stage.order, completed + [stage_name],
+                                                         (latest or {}).get('stage_keys'))
+            except Exception as e:
+                print(f"⚠️ Checkpoint after package retry of {stage_name} failed: {e}")
+                checkpoint = None
+            if checkpoint:
+                self.db.record_build_checkpoint(build_id, stage_name, stage.order, checkpoint)
+                print(f"💾 Checkpoint {checkpoint['name']} saved - resume_build('{build_id}') continues after {stage_name}")
+        
+        return {'return_code': result.returncode, 'packages': results}
+    
+    def invalidate_stage_cache(self, stage_name: str = None) -> int:
+        """Drop cached results of a stage, or of all stages"""
+        removed = self.stage_cache.invalidate(stage_name=stage_name)
+        print(f"🗑️ Invalidated {removed} cached stage result(s){f' for {stage_name}' if stage_name else ''}")
+        return removed
     
     def _check_dependencies(self, stage: BuildStage) -> bool:
         for dep_name in stage.dependencies:
@@ -306,14 +773,22 @@ class BuildEngine:
         stage.status = 'running'
         self.db.add_stage_log(build_id, stage.name, 'running')
         self.emit_event('stage_start', {'build_id': build_id, 'stage': stage.name})
+        self.metrics_sampler.set_context(build_id, stage.name)
         
         # Collect warnings for this stage
         stage_warnings = []
+        resource_scope = None
+        package_graph = False
+        stdout_log = stderr_log = None
         
         try:
             # Modify command to use sudo with password if needed
             command = stage.command
             env = os.environ.copy()  # Always copy environment
+            if self.current_build and self.current_build.get('environment'):
+                # Resumed builds run with the environment captured at their checkpoint
+                env.update(self.current_build['environment'])
+            cache_applied = self.compiler_cache.apply_to_env(env, stage.name)
             
             if self.sudo_password:
                 # Set SUDO_ASKPASS environment variable and use -A flag
@@ -356,10 +831,24 @@ class BuildEngine:
                 if not os.path.exists(script_path):
                     raise Exception(f"Script not found: {script_path}")
                 print(f"✅ Script found: {script_path}")
-            
-            process = subprocess.Popen(
+                
+                # Package-granular stages run through the package graph driver instead
+                if self.package_builds.applies_to(stage.config):
+                    driver_command = self.package_builds.prepare(build_id, stage.config, script_path, command=command)
+                    if driver_command:
+                        command = driver_command
+                        package_graph = True
+                        print(f"🧩 Building {stage.name} package by package "
+                              f"(logs in {self.package_builds.state_dir(build_id, stage.name)})")
+            
+            cache_before = self.compiler_cache.read_stats() if cache_applied else None
+            stage_started_at = datetime.now()
+            
+            # Account the stage's whole process tree (and apply its limits) in its own scope
+            resource_scope = self.stage_resources.open_scope(build_id, stage.name, stage.config.get('resources'))
+            
+            process = resource_scope.spawn(
                 command,
-                shell=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 stdin=subprocess.DEVNULL,  # Prevent stdin input
@@ -389,9 +878,10 @@ class BuildEngine:
                 {'stage_order': stage.order, 'stage_start': True}
             )
             
-            # Read output in real-time with periodic logging
-            stdout_lines = []
-            stderr_lines = []
+            # Read output in real-time with periodic logging; only a tail stays in memory
+            stdout_log = OutputLog.for_stage(build_id, stage.name, 'stdout')
+            stderr_log = OutputLog.for_stage(build_id, stage.name, 'stderr')
+            stage.output_logs = {'stdout': str(stdout_log.path), 'stderr': str(stderr_log.path)}
             line_count = 0
             
             while True:
@@ -405,6 +895,7 @@ class BuildEngine:
                     stage.status = 'cancelled'
                     stage.error = 'Build was cancelled by user'
                     self.current_process = None
+                    self._close_output_logs(stage, stdout_log, stderr_log)
                     return
                 
                 # Check for timeout (no output for too long) and log status periodically
@@ -439,6 +930,7 @@ class BuildEngine:
                     stage.status = 'failed'
                     stage.error = f'Stage timed out after {timeout_seconds} seconds of no output'
                     self.current_process = None
+                    self._close_output_logs(stage, stdout_log, stderr_log)
                     return
                 
                 stdout_line = process.stdout.readline()
@@ -449,17 +941,18 @@ class BuildEngine:
                     last_output_time = current_time
                 
                 if stdout_line:
-                    stdout_lines.append(stdout_line)
+                    stdout_log.append(stdout_line)
                     line_count += 1
                     
                     # Show every line in CLI for debugging stuck builds
                     line_stripped = stdout_line.strip()
                     if line_stripped:
                         print(f"📋 {stage.name}: {line_stripped}")
+                    line_sets = self._match_output_line(build_id, stage.name, line_stripped, 'stdout')
                     
                     # Log progress every 5 lines for better monitoring of stuck builds
                     if line_count % 5 == 0:
-                        partial_output = ''.join(stdout_lines[-3:])  # Last 3 lines
+                        partial_output = stdout_log.tail(3)  # Last 3 lines
                         print(f"🔄 Stage {stage.name} running... ({line_count} lines processed)")
                         
                         self.db.add_document(
@@ -469,8 +962,7 @@ class BuildEngine:
                         )
                     
                     # Also log every significant line immediately to database
-                    if any(keyword in line_stripped.lower() for keyword in 
-                           ['building', 'compiling', 'installing', 'extracting', 'configuring', 'make', 'gcc', 'error', 'failed']):
+                    if 'build.activity' in line_sets:
                         self.db.add_document(
                             build_id, 'log', f'Stage Activity: {stage.name}',
                             f"Activity: {line_stripped}",
@@ -478,13 +970,13 @@ class BuildEngine:
                         )
                 
                 if stderr_line:
-                    stderr_lines.append(stderr_line)
+                    stderr_log.append(stderr_line)
                     line_stripped = stderr_line.strip()
                     if line_stripped:
+                        line_sets = self._match_output_line(build_id, stage.name, line_stripped, 'stderr')
+                        
                         # Check for sudo password prompts
-                        if any(prompt in line_stripped.lower() for prompt in [
-                            'password for', '[sudo] password', 'sudo password', 'enter password'
-                        ]):
+                        if 'build.sudo_prompt' in line_sets:
                             print(f"🚨 SUDO PROMPT DETECTED in {stage.name}: {line_stripped}")
                             self.db.add_document(
                                 build_id, 'error', f'Sudo Prompt Detected: {stage.name}',
@@ -503,13 +995,14 @@ class BuildEngine:
                             except subprocess.TimeoutExpired:
                                 process.kill()
                             self.current_process = None
+                            self._close_output_logs(stage, stdout_log, stderr_log)
                             return
                         
                         # Show all stderr output for debugging
                         print(f"🚨 {stage.name} stderr: {line_stripped}")
                         
                         # Check if it's a warning or info message
-                        if any(word in stderr_line.lower() for word in ['warning:', 'note:', 'info:', 'makeinfo is missing', 'documentation will not be built']):
+                        if 'build.stderr_notice' in line_sets:
                             stage_warnings.append(line_stripped)
                         else:
                             # Log actual errors immediately
@@ -518,30 +1011,81 @@ class BuildEngine:
                                 f"Error line: {line_stripped}",
                                 {'stage_order': stage.order, 'error_line': True}
                             )
+                            self.emit_event('stage_output_error', {
+                                'build_id': build_id,
+                                'stage': stage.name,
+                                'line': line_stripped
+                            })
                 
                 if process.poll() is not None:
                     break
             
             # Get final output
             remaining_stdout, remaining_stderr = process.communicate()
-            if remaining_stdout:
-                stdout_lines.append(remaining_stdout)
-            if remaining_stderr:
-                stderr_lines.append(remaining_stderr)
+            stdout_log.append(remaining_stdout)
+            stderr_log.append(remaining_stderr)
+            stdout_log.close()
+            stderr_log.close()
             
-            stdout = ''.join(stdout_lines)
-            stderr = ''.join(stderr_lines)
+            stdout = self._output_excerpt(stdout_log)
+            stderr = self._output_excerpt(stderr_log)
             
             # Clear current process reference
             self.current_process = None
+            stage_finished_at = datetime.now()
+            resource_usage = self._close_resource_scope(build_id, stage, resource_scope)
+            
+            self.db.record_stage_performance(
+                build_id, stage.name, stage.order, stage_started_at, stage_finished_at,
+                process.returncode, warnings_count=len(stage_warnings), lines_processed=line_count,
+                resource_usage=resource_usage
+            )
+            print(f"📏 Stage {stage.name} used {resource_usage['cpu_seconds']}s CPU, "
+                  f"peak {resource_usage['peak_memory_bytes'] // (1024 * 1024)} MB RSS, "
+                  f"{(resource_usage['read_bytes'] + resource_usage['write_bytes']) // (1024 * 1024)} MB I/O "
+                  f"({resource_usage['method']})")
+            
+            if resource_usage['oom_kills'] and process.returncode != 0:
+                self.db.add_document(
+                    build_id, 'error', f'Stage Memory Limit: {stage.name}',
+                    f"Stage {stage.name} was killed after exceeding its memory limit "
+                    f"({resource_scope.limits.get('memory_max')})\n"
+                    f"Peak memory: {resource_usage['peak_memory_bytes'] // (1024 * 1024)} MB\n"
+                    f"Memory pressure stall: {resource_usage['memory_pressure_seconds']} seconds",
+                    {'stage_order': stage.order, 'oom_kills': resource_usage['oom_kills']}
+                )
+            
+            if package_graph:
+                self._record_package_builds(build_id, stage)
+            
+            if cache_applied:
+                cache_stats = self.compiler_cache.stage_stats(cache_before, self.compiler_cache.read_stats())
+                print(f"🗃️ Stage {stage.name} compiler cache: {cache_stats['hits']} hits, "
+                      f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)")
+                self.db.record_stage_cache_stats(
+                    build_id, stage.name, stage.order, self.compiler_cache.settings['config_key'], cache_stats
+                )
+                self.db.add_document(
+                    build_id, 'log', f'Compiler Cache: {stage.name}',
+                    f"Cache directory: {self.compiler_cache.settings['cache_dir']}\n"
+                    f"Hits: {cache_stats['hits']} (direct {cache_stats['direct_hits']}, "
+                    f"preprocessed {cache_stats['preprocessed_hits']})\n"
+                    f"Misses: {cache_stats['misses']}\n"
+                    f"Hit rate: {cache_stats['hit_rate']:.1%}\n"
+                    f"Cache size: {cache_stats['cache_size_mb']} MB",
+                    {'stage_order': stage.order, 'compiler_cache': True, **cache_stats}
+                )
             
             # Log final line count and show completion status
             if line_count > 0:
                 print(f"📊 Stage {stage.name} generated {line_count} lines of output")
                 self.db.add_document(
                     build_id, 'log', f'Stage Output Summary: {stage.name}',
-                    f"Total output lines: {line_count}\nStdout size: {len(stdout)} chars\nStderr size: {len(stderr)} chars",
-                    {'stage_order': stage.order, 'summary': True, 'total_lines': line_count}
+                    f"Total output lines: {line_count}\nStdout size: {stdout_log.char_count} chars\n"
+                    f"Stderr size: {stderr_log.char_count} chars\n"
+                    f"Full output: {stdout_log.path}, {stderr_log.path}",
+                    {'stage_order': stage.order, 'summary': True, 'total_lines': line_count,
+                     'output_logs': stage.output_logs}
                 )
             
             stage.output = stdout
@@ -558,7 +1102,7 @@ class BuildEngine:
             if process.returncode == 0:
                 stage.status = 'success'
                 print(f"✅ Stage {stage.name} completed successfully (return code 0)")
-                print(f"📊 Stage output: {len(stdout)} chars stdout, {len(stderr)} chars stderr")
+                print(f"📊 Stage output: {stdout_log.char_count} chars stdout, {stderr_log.char_count} chars stderr")
                 self.db.add_stage_log(build_id, stage.name, 'success', stdout)
                 
                 self.db.add_document(
@@ -581,7 +1125,7 @@ class BuildEngine:
             else:
                 stage.status = 'failed'
                 print(f"❌ Stage {stage.name} failed with return code {process.returncode}")
-                print(f"📊 Stage output: {len(stdout)} chars stdout, {len(stderr)} chars stderr")
+                print(f"📊 Stage output: {stdout_log.char_count} chars stdout, {stderr_log.char_count} chars stderr")
                 if stderr.strip():
                     print(f"🔍 Error details: {stderr.strip()[:500]}...")  # Show first 500 chars
                 if stdout.strip():
@@ -623,6 +1167,18 @@ class BuildEngine:
             self.db.add_stage_log(build_id, stage.name, 'failed', str(e))
             # Clear current process reference on exception
             self.current_process = None
+            if stdout_log is not None:
+                self._close_output_logs(stage, stdout_log, stderr_log)
+        
+        finally:
+            # Cancelled, timed out and sudo-blocked stages return early; their
+            # cgroup or sampler must still be torn down and their usage kept
+            if resource_scope is not None:
+                try:
+                    self._close_resource_scope(build_id, stage, resource_scope)
+                except Exception as e:
+                    print(f"⚠️ Failed to close resource scope of stage {stage.name}: {e}")
+            self.metrics_sampler.set_context(None)
         
         self.emit_event('stage_complete', {
             'build_id': build_id, 
@@ -630,6 +1186,31 @@ class BuildEngine:
             'status': stage.status
         })
     
+    def _close_resource_scope(self, build_id: str, stage: BuildStage, resource_scope) -> Dict:
+        """Close a stage's resource scope and store its usage, once"""
+        if resource_scope.usage is not None:
+            return resource_scope.usage
+        resource_usage = resource_scope.close()
+        if resource_scope.process is not None:
+            self.db.record_stage_resource_usage(build_id, stage.name, stage.order, resource_usage,
+                                                resource_scope.limits)
+        return resource_usage
+    
+    @staticmethod
+    def _output_excerpt(log: OutputLog) -> str:
+        """The in-memory tail of a stage stream, marked when earlier output was left on disk"""
+        tail = log.tail()
+        omitted = log.line_count - len(tail.splitlines())
+        if omitted > 0:
+            return f"[{omitted} earlier lines in {log.path}]\n{tail}"
+        return tail
+    
+    def _close_output_logs(self, stage: BuildStage, stdout_log: OutputLog, stderr_log: OutputLog):
+        """Finish the output logs of a stage that ended early"""
+        stdout_log.close()
+        stderr_log.close()
+        stage.output = self._output_excerpt(stdout_log)
+    
     def _fail_stage(self, build_id: str, stage: BuildStage, reason: str):
         stage.status = 'failed'
         stage.error = reason
@@ -968,6 +1549,9 @@ class BuildEngine:
         try:
             branch_name = f"build/{build_id}"
             
+            # Let earlier builds' queued commits land on their own branches first
+            self.repo.commit_queue.drain()
+            
             # Create and switch to new branch
             if self.repo.create_branch(branch_name):
                 self.repo.switch_branch(branch_name)
@@ -985,26 +1569,19 @@ class BuildEngine:
             return
         
         try:
-            # Stage any changes
-            self.repo.stage_all_changes()
-            
-            # Commit build start
+            # Queue build start; it is committed with the first stages
             commit_msg = f"Start build {build_id}\n\nBuild configuration loaded with {len(self.stages)} stages"
-            self.repo.commit_changes(commit_msg)
+            self.repo.commit_queue.record(commit_msg, build_id=build_id, branch=self.current_build['branch'])
             
         except Exception as e:
             print(f"Failed to commit build start: {e}")
     
     def _commit_stage_completion(self, build_id: str, stage: BuildStage):
-        """Commit stage completion to the build branch"""
+        """Queue a commit of the stage's changes to the build branch"""
         if not self.repo or not self.current_build.get('branch'):
             return
         
         try:
-            # Stage any changes
-            self.repo.stage_all_changes()
-            
-            # Commit stage completion
             status_emoji = "✅" if stage.status == 'success' else "❌"
             commit_msg = f"{status_emoji} Stage {stage.order}: {stage.name} - {stage.status}\n\nBuild: {build_id}\nStage: {stage.name}\nStatus: {stage.status}"
             
@@ -1013,7 +1590,8 @@ class BuildEngine:
             else:
                 commit_msg += f"\nFailed at stage {stage.order} of {len(self.stages)}"
             
-            self.repo.commit_changes(commit_msg)
+            # Coalesced with the build's other stages by the commit queue, off the build thread
+            self.repo.commit_queue.record(commit_msg, build_id=build_id, branch=self.current_build['branch'])
             
         except Exception as e:
             print(f"Failed to commit stage completion: {e}")
@@ -1024,10 +1602,7 @@ class BuildEngine:
             return
         
         try:
-            # Stage any changes
-            self.repo.stage_all_changes()
-            
-            # Commit build completion
+            # Commit build completion together with the stages still queued
             status_emoji = {"success": "🎉", "failed": "💥", "cancelled": "🛑"}.get(status, "❓")
             completed_stages = self.current_build.get('completed_stages', 0)
             total_stages = len(self.stages)
@@ -1037,13 +1612,15 @@ class BuildEngine:
             commit_msg += f"Final status: {status}\n"
             commit_msg += f"Build branch: {self.current_build.get('branch')}"
             
-            self.repo.commit_changes(commit_msg)
+            queue = self.repo.commit_queue
+            queue.record(commit_msg, build_id=build_id, branch=self.current_build['branch'])
+            queue.flush(build_id)
             
-            # Tag successful builds
+            # Tag successful builds once their final commit is written
             if status == 'success':
                 tag_name = f"build-{build_id}-success"
                 tag_msg = f"Successful LFS build {build_id}\nCompleted all {total_stages} stages"
-                self.repo.create_tag(tag_name, tag_msg)
+                queue.tag(tag_name, tag_msg, build_id=build_id)
             
         except Exception as e:
             print(f"Failed to commit build completion: {e}")
@@ -1057,7 +1634,13 @@ class BuildEngine:
         print(f"🧹 Starting automatic cleanup for build {build_id} (status: {status}, reason: {reason})")
         
         try:
-            # 1. Clean up build directories
+            # 1. Unmount tmpfs/overlay source workspaces the build left behind
+            try:
+                cleanup_actions.extend(self.workspaces.teardown_all(build_id))
+            except Exception as e:
+                cleanup_errors.append(f"Error unmounting build workspaces: {str(e)}")
+            
+            # 2. Clean up build directories
             lfs_sources = "/mnt/lfs/sources"
             if os.path.exists(lfs_sources):
                 try:
@@ -1085,7 +1668,7 @@ class BuildEngine:
                 except Exception as e:
                     cleanup_errors.append(f"Error during source directory cleanup: {str(e)}")
             
-            # 2. Clean up temporary build files
+            # 3. Clean up temporary build files
             temp_patterns = ["/tmp/lfs_*", "/tmp/build_*", "/tmp/askpass_*"]
             for pattern in temp_patterns:
                 try:
@@ -1105,7 +1688,7 @@ class BuildEngine:
                 except Exception as e:
                     cleanup_errors.append(f"Error cleaning temp files with pattern {pattern}: {str(e)}")
             
-            # 3. Kill any remaining build processes
+            # 4. Kill any remaining build processes
             killed_processes = []
             try:
                 import psutil
@@ -1131,13 +1714,20 @@ class BuildEngine:
             except Exception as e:
                 cleanup_errors.append(f"Error during process cleanup: {str(e)}")
             
-            # 4. Reset build state variables
+            # 5. Reset build state variables
             if self.current_build and self.current_build['id'] == build_id:
                 self.current_process = None
                 self.build_cancelled = False
                 cleanup_actions.append("Reset build engine state variables")
             
-            # 5. Clean up askpass scripts
+            # 6. Point at the checkpoint a resume would start from
+            checkpoint = self.checkpoints.latest(build_id)
+            if checkpoint:
+                cleanup_actions.append(
+                    f"Checkpoint {checkpoint['name']} after stage {checkpoint['stage']} kept for resume_build('{build_id}')"
+                )
+            
+            # 7. Clean up askpass scripts
             if hasattr(self, '_current_askpass_script'):
                 try:
                     os.unlink(self._current_askpass_script)
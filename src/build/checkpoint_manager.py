@@ -0,0 +1,354 @@
+import os
+import re
+import stat
+import json
+import time
+import fcntl
+import shutil
+import tarfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .stage_cache import DEFAULT_TREE_EXCLUDES, scan_tree, diff_manifests
+
+# ioctl cloning a whole file on copy-on-write filesystems (btrfs, XFS with reflink)
+FICLONE = 0x40049409
+
+# Environment variables never persisted with a checkpoint
+_SENSITIVE_ENV = re.compile(r'PASSWORD|PASSWD|SECRET|TOKEN|ASKPASS|CREDENTIAL|_KEY$', re.IGNORECASE)
+_VOLATILE_ENV = {'PWD', 'OLDPWD', 'SHLVL', '_', 'LFS_CCACHE_BIN'}
+
+class CheckpointManager:
+    """Durable stage boundary checkpoints of a build.
+    
+    After every successful stage the LFS tree delta since the previous
+    checkpoint is saved next to the full tree manifest, the completed stage
+    set and the build environment. Deltas are reflink clones when the
+    checkpoint directory shares a copy-on-write filesystem with the LFS tree
+    and tar archives otherwise. Restoring a checkpoint only touches the paths
+    that differ from it, so rolling back a failed stage costs about as much as
+    the stage changed, not a rebuild.
+    """
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'checkpoints')
+    
+    def __init__(self, root_dir: str = None, keep_builds: int = 5):
+        self.root_dir = Path(root_dir or os.environ.get('LFS_CHECKPOINT_ROOT', self.DEFAULT_ROOT))
+        self.keep_builds = keep_builds
+        self.lfs_root = os.environ.get('LFS', '/mnt/lfs')
+        self.options = {}
+        self.enabled = False
+        self._manifests = {}
+    
+    def configure(self, build_config: Dict):
+        """Apply the ``checkpoints`` section of a build configuration"""
+        self.options = build_config.get('checkpoints', {}) or {}
+        self.enabled = bool(self.options.get('enabled', True))
+        self.lfs_root = self.options.get('lfs_root', os.environ.get('LFS', '/mnt/lfs'))
+        self.keep_builds = int(self.options.get('keep_builds', self.keep_builds))
+    
+    def begin(self, build_id: str, config_path: str, config_content: str,
+              resumed_from: str = None, resumed_checkpoint: str = None):
+        """Record the baseline manifest of a build before its first stage"""
+        if not self.enabled:
+            return
+        build_dir = self.root_dir / build_id
+        build_dir.mkdir(parents=True, exist_ok=True)
+        
+        manifest = self._scan()
+        self._manifests[build_id] = manifest
+        self._write_json(build_dir / 'baseline.json', manifest)
+        (build_dir / 'config.yaml').write_text(config_content)
+        self._write_state(build_id, {
+            'build_id': build_id,
+            'config_path': config_path,
+            'resumed_from': resumed_from,
+            'resumed_checkpoint': resumed_checkpoint,
+            'status': 'running',
+            'created': time.time(),
+            'checkpoints': []
+        })
+        self._prune(keep=build_id)
+    
+    def finish(self, build_id: str, status: str):
+        """Record how a build ended; only successful builds stop being resumable"""
+        state = self.load_state(build_id)
+        if state is None:
+            return
+        state['status'] = status
+        self._write_state(build_id, state)
+    
+    def checkpoint(self, build_id: str, stage_name: str, stage_order: int,
+                   completed_stages: List[str], stage_keys: Dict = None) -> Optional[Dict]:
+        """Save the state of a build after a successful stage"""
+        if not self.enabled:
+            return None
+        state = self.load_state(build_id)
+        if state is None:
+            return None
+        
+        previous = self._manifests.get(build_id)
+        if previous is None:
+            previous = self._read_json(self._manifest_path(build_id, state['checkpoints'][-1]['name'])
+                                       if state['checkpoints'] else self.root_dir / build_id / 'baseline.json') or {}
+        manifest = self._scan()
+        changed, removed = diff_manifests(previous, manifest)
+        
+        name = f"{len(state['checkpoints']) + 1:02d}-{stage_name}"
+        checkpoint_dir = self.root_dir / build_id / name
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        checkpoint_dir.mkdir(parents=True)
+        
+        started = time.time()
+        strategy = self._save_delta(checkpoint_dir, changed)
+        if strategy is None:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+            return None
+        
+        self._write_json(checkpoint_dir / 'manifest.json', manifest)
+        entry = {
+            'name': name,
+            'stage': stage_name,
+            'stage_order': stage_order,
+            'completed_stages': list(completed_stages),
+            'stage_keys': dict(stage_keys or {}),
+            'environment': self.capture_environment(),
+            'strategy': strategy,
+            'changed': changed,
+            'removed': len(removed),
+            'size_bytes': self._dir_size(checkpoint_dir),
+            'duration_seconds': round(time.time() - started, 2),
+            'created': time.time()
+        }
+        state['checkpoints'].append(entry)
+        self._write_state(build_id, state)
+        self._manifests[build_id] = manifest
+        return entry
+    
+    def latest(self, build_id: str) -> Optional[Dict]:
+        """Last good checkpoint of a build, or of the build it resumed if it saved none yet"""
+        if not self.load_state(build_id):
+            return None
+        chain = self._lineage(build_id)
+        return dict(chain[-1][1], build_id=chain[-1][0]) if chain else None
+    
+    def restore(self, build_id: str, checkpoint_name: str = None) -> Dict:
+        """Bring the LFS tree back to a checkpoint; returns what was done"""
+        chain = self._lineage(build_id, checkpoint_name) if self.load_state(build_id) else []
+        if not chain:
+            raise ValueError(f"No checkpoints recorded for build {build_id}")
+        
+        target_build, target_checkpoint = chain[-1]
+        target = self._read_json(self._manifest_path(target_build, target_checkpoint['name']))
+        if target is None:
+            raise ValueError(f"Checkpoint {target_checkpoint['name']} of build {build_id} is incomplete")
+        
+        started = time.time()
+        current = self._scan()
+        _, extra = diff_manifests(current, target)
+        
+        # Paths the stages after the checkpoint created
+        for path in sorted(extra, reverse=True):
+            full_path = os.path.join(self.lfs_root, path)
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                shutil.rmtree(full_path, ignore_errors=True)
+            elif os.path.lexists(full_path):
+                os.unlink(full_path)
+        
+        # Paths changed or removed since: take each from the newest checkpoint that saved it
+        wanted = set(path for path in target if current.get(path) != target[path])
+        sources = {}
+        for position in range(len(chain) - 1, -1, -1):
+            for path in chain[position][1]['changed']:
+                if path in wanted and path not in sources:
+                    sources[path] = position
+        unrecoverable = sorted(
+            path for path in wanted - set(sources)
+            if not (stat.S_ISDIR(target[path][0]) and os.path.isdir(os.path.join(self.lfs_root, path)))
+        )
+        
+        for position, (owner, checkpoint) in enumerate(chain):
+            paths = sorted(path for path, source in sources.items() if source == position)
+            if paths:
+                self._restore_delta(self.root_dir / owner / checkpoint['name'], checkpoint['strategy'], paths)
+        
+        if unrecoverable:
+            print(f"⚠️ {len(unrecoverable)} paths predate the first checkpoint and could not be restored")
+        
+        return {
+            'checkpoint': target_checkpoint['name'],
+            'removed': len(extra),
+            'restored': len(sources),
+            'unrecoverable': unrecoverable[:100],
+            'duration_seconds': round(time.time() - started, 2)
+        }
+    
+    def _lineage(self, build_id: str, checkpoint_name: str = None) -> List:
+        """(build id, checkpoint) pairs up to a checkpoint, following resumed builds back to their origin"""
+        state = self.load_state(build_id)
+        names = [c['name'] for c in state['checkpoints']]
+        if checkpoint_name and checkpoint_name not in names:
+            raise ValueError(f"Unknown checkpoint {checkpoint_name} for build {build_id}")
+        index = names.index(checkpoint_name) if checkpoint_name else len(names) - 1
+        chain = [(build_id, checkpoint) for checkpoint in state['checkpoints'][:index + 1]]
+        
+        parent = state.get('resumed_from')
+        if parent and self.load_state(parent) and self.load_state(parent)['checkpoints']:
+            chain = self._lineage(parent, state.get('resumed_checkpoint')) + chain
+        return chain
+    
+    def load_state(self, build_id: str) -> Optional[Dict]:
+        return self._read_json(self.root_dir / build_id / 'checkpoint.json')
+    
+    def config_content(self, build_id: str) -> Optional[str]:
+        try:
+            return (self.root_dir / build_id / 'config.yaml').read_text()
+        except OSError:
+            return None
+    
+    def discard(self, build_id: str):
+        """Remove all checkpoints of a build"""
+        self._manifests.pop(build_id, None)
+        shutil.rmtree(self.root_dir / build_id, ignore_errors=True)
+    
+    @staticmethod
+    def capture_environment() -> Dict[str, str]:
+        return {
+            name: value for name, value in os.environ.items()
+            if name not in _VOLATILE_ENV and not _SENSITIVE_ENV.search(name)
+        }
+    
+    def _scan(self) -> Dict:
+        if not os.path.isdir(self.lfs_root):
+            return {}
+        return {path: list(state) for path, state in
+                scan_tree(self.lfs_root, self.options.get('exclude', DEFAULT_TREE_EXCLUDES)).items()}
+    
+    def _save_delta(self, checkpoint_dir: Path, changed: List[str]) -> Optional[str]:
+        strategy = self.options.get('strategy', 'auto')
+        if strategy in ('auto', 'reflink'):
+            try:
+                self._clone_paths(self.lfs_root, checkpoint_dir / 'tree', changed)
+                return 'reflink'
+            except OSError as e:
+                shutil.rmtree(checkpoint_dir / 'tree', ignore_errors=True)
+                if strategy == 'reflink':
+                    print(f"⚠️ Reflink checkpoint failed, falling back to tar: {e}")
+        
+        try:
+            with tarfile.open(checkpoint_dir / 'delta.tar', 'w') as archive:
+                for path in changed:
+                    archive.add(os.path.join(self.lfs_root, path), arcname=path, recursive=False)
+            return 'tar'
+        except (OSError, tarfile.TarError) as e:
+            print(f"⚠️ Failed to save checkpoint delta: {e}")
+            return None
+    
+    def _restore_delta(self, checkpoint_dir: Path, strategy: str, paths: List[str]):
+        if strategy == 'reflink':
+            self._clone_paths(str(checkpoint_dir / 'tree'), self.lfs_root, paths)
+            return
+        
+        wanted = set(paths)
+        with tarfile.open(checkpoint_dir / 'delta.tar', 'r') as archive:
+            members = [member for member in archive.getmembers() if member.name in wanted]
+            for member in members:
+                target = os.path.join(self.lfs_root, member.name)
+                if os.path.lexists(target) and not os.path.isdir(target):
+                    os.unlink(target)
+            if hasattr(tarfile, 'data_filter'):
+                archive.extractall(self.lfs_root, members=members, filter='fully_trusted')
+            else:
+                archive.extractall(self.lfs_root, members=members)
+    
+    @staticmethod
+    def _clone_paths(source_root: str, target_root, paths: List[str]):
+        """Copy paths between trees, cloning file extents instead of copying data"""
+        for path in paths:
+            source = os.path.join(source_root, path)
+            target = os.path.join(str(target_root), path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            
+            if os.path.islink(source):
+                if os.path.lexists(target):
+                    os.unlink(target)
+                os.symlink(os.readlink(source), target)
+            elif os.path.isdir(source):
+                os.makedirs(target, exist_ok=True)
+                shutil.copystat(source, target)
+            else:
+                if os.path.lexists(target) and not os.path.isdir(target):
+                    os.unlink(target)
+                with open(source, 'rb') as src, open(target, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                shutil.copystat(source, target)
+    
+    def _prune(self, keep: str):
+        """Keep checkpoints of the most recent builds and of every build that can still be resumed"""
+        builds = sorted(
+            (entry for entry in self.root_dir.iterdir() if entry.is_dir() and entry.name != keep),
+            key=lambda entry: entry.stat().st_mtime, reverse=True
+        )
+        protected = self._resumable_lineage(keep)
+        for entry in builds[max(self.keep_builds - 1, 0):]:
+            if entry.name in protected:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            self._manifests.pop(entry.name, None)
+    
+    def _resumable_lineage(self, current: str) -> set:
+        """Builds whose checkpoints a resume could still restore from
+        
+        A build that did not succeed and was not itself resumed can be resumed;
+        restoring it needs its own checkpoints and those of every build it was
+        resumed from. Only the ``keep_builds`` most recent such builds stay
+        resumable, so repeated failures do not keep checkpoints forever.
+        """
+        states = {entry.name: self.load_state(entry.name) or {}
+                  for entry in self.root_dir.iterdir() if entry.is_dir()}
+        resumed = {state.get('resumed_from') for state in states.values()}
+        failed = sorted((build_id for build_id, state in states.items()
+                         if build_id != current and state.get('status') != 'success' and build_id not in resumed),
+                        key=lambda build_id: states[build_id].get('created', 0), reverse=True)
+        roots = [current] + failed[:self.keep_builds]
+        
+        protected = set()
+        for build_id in roots:
+            while build_id and build_id in states and build_id not in protected:
+                protected.add(build_id)
+                build_id = states[build_id].get('resumed_from')
+        return protected
+    
+    def _manifest_path(self, build_id: str, checkpoint_name: str) -> Path:
+        return self.root_dir / build_id / checkpoint_name / 'manifest.json'
+    
+    def _write_state(self, build_id: str, state: Dict):
+        self._write_json(self.root_dir / build_id / 'checkpoint.json', state)
+    
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+    
+    @staticmethod
+    def _read_json(path: Path):
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _write_json(path: Path, data):
+        # Write and rename so a crash or reboot never leaves a torn checkpoint
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,214 @@
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Counters reported by `ccache --print-stats` (ccache >= 4) and the matching
+# labels of the human readable `ccache -s` output of older releases
+_PRINT_STATS_KEYS = {
+    'direct_cache_hit': 'direct_hits',
+    'preprocessed_cache_hit': 'preprocessed_hits',
+    'cache_miss': 'misses',
+    'cache_size_kibibyte': 'cache_size_kb'
+}
+_LEGACY_STATS_LABELS = {
+    'cache hit (direct)': 'direct_hits',
+    'cache hit (preprocessed)': 'preprocessed_hits',
+    'cache miss': 'misses'
+}
+
+class CompilerCache:
+    """Per build configuration ccache management for build stages.
+    
+    Each configuration gets its own cache directory with a size limit enforced by
+    ccache itself; whole configuration caches are evicted least recently used
+    first when their total exceeds ``max_total_size_gb``. Stages see the cache
+    through a masquerade directory of compiler symlinks put first on ``PATH``
+    (and exported as ``LFS_CCACHE_BIN`` for scripts that reorder ``PATH``).
+    """
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'ccache')
+    COMPILER_NAMES = ['cc', 'c++', 'gcc', 'g++']
+    
+    def __init__(self, root_dir: str = None, max_total_size_gb: float = 40.0):
+        self.root_dir = Path(root_dir or os.environ.get('LFS_CCACHE_ROOT', self.DEFAULT_ROOT))
+        self.max_total_size_gb = max_total_size_gb
+        self.ccache_binary = shutil.which('ccache')
+        self.settings = None
+    
+    @property
+    def available(self) -> bool:
+        return self.ccache_binary is not None
+    
+    def prepare(self, build_config: Dict) -> Optional[Dict]:
+        """Set up the cache for a build configuration; returns the active settings or None"""
+        self.settings = None
+        options = build_config.get('compiler_cache', {}) or {}
+        if not options.get('enabled', True):
+            return None
+        if not self.available:
+            print("⚠️ ccache not found - stages will compile without a compiler cache")
+            return None
+        
+        config_key = self._config_key(build_config.get('name', 'default'))
+        cache_dir = Path(options.get('dir') or self.root_dir / config_key)
+        bin_dir = cache_dir / 'bin'
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        
+        target = options.get('target') or f"{os.uname().machine}-lfs-linux-gnu"
+        for name in self.COMPILER_NAMES + [f"{target}-gcc", f"{target}-g++"]:
+            link = bin_dir / name
+            if not link.is_symlink():
+                if link.exists():
+                    link.unlink()
+                link.symlink_to(self.ccache_binary)
+        
+        self.settings = {
+            'config_key': config_key,
+            'cache_dir': str(cache_dir),
+            'bin_dir': str(bin_dir),
+            'max_size': str(options.get('max_size', '10G')),
+            'stages': options.get('stages'),
+            'env': {
+                'CCACHE_DIR': str(cache_dir),
+                'CCACHE_MAXSIZE': str(options.get('max_size', '10G')),
+                'CCACHE_BASEDIR': options.get('base_dir', '/mnt/lfs'),
+                'CCACHE_NOHASHDIR': '1',
+                # Toolchains are rebuilt every build, so compare compiler content, not mtime
+                'CCACHE_COMPILERCHECK': options.get('compiler_check', 'content'),
+                'CCACHE_SLOPPINESS': options.get('sloppiness', 'include_file_mtime,include_file_ctime,time_macros'),
+                'LFS_CCACHE_BIN': str(bin_dir)
+            }
+        }
+        
+        # Persist the size limit so ccache evicts within this configuration's budget
+        self._run_ccache(['-M', self.settings['max_size']])
+        (cache_dir / '.last_used').touch()
+        self._evict_configurations(keep=cache_dir)
+        
+        return self.settings
+    
+    @staticmethod
+    def _config_key(config_name) -> str:
+        return re.sub(r'[^A-Za-z0-9_.-]+', '-', str(config_name)).strip('-').lower() or 'default'
+    
+    def applies_to(self, stage_name: str) -> bool:
+        if not self.settings:
+            return False
+        stages = self.settings.get('stages')
+        return stages is None or stage_name in stages
+    
+    def apply_to_env(self, env: Dict, stage_name: str) -> bool:
+        """Inject the cache into a stage environment; returns False if the stage is not cached"""
+        if not self.applies_to(stage_name):
+            return False
+        env.update(self.settings['env'])
+        env['PATH'] = f"{self.settings['bin_dir']}{os.pathsep}{env.get('PATH', '')}"
+        return True
+    
+    def read_stats(self) -> Dict[str, int]:
+        """Read the cumulative counters of the active cache"""
+        stats = {'direct_hits': 0, 'preprocessed_hits': 0, 'misses': 0, 'cache_size_kb': 0}
+        if not self.settings:
+            return stats
+        
+        output = self._run_ccache(['--print-stats'])
+        if output is not None:
+            for line in output.splitlines():
+                key, _, value = line.partition('\t')
+                if key in _PRINT_STATS_KEYS and value.strip().isdigit():
+                    stats[_PRINT_STATS_KEYS[key]] = int(value)
+            return stats
+        
+        output = self._run_ccache(['-s']) or ''
+        for line in output.splitlines():
+            for label, key in _LEGACY_STATS_LABELS.items():
+                if line.lower().startswith(label):
+                    value = line[len(label):].strip().split()
+                    if value and value[0].isdigit():
+                        stats[key] = int(value[0])
+        return stats
+    
+    @staticmethod
+    def stage_stats(before: Dict[str, int], after: Dict[str, int]) -> Dict:
+        """Hit and miss statistics of a stage from counters read around it"""
+        direct = max(after['direct_hits'] - before['direct_hits'], 0)
+        preprocessed = max(after['preprocessed_hits'] - before['preprocessed_hits'], 0)
+        misses = max(after['misses'] - before['misses'], 0)
+        hits = direct + preprocessed
+        return {
+            'hits': hits,
+            'direct_hits': direct,
+            'preprocessed_hits': preprocessed,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'cache_size_mb': round(after.get('cache_size_kb', 0) / 1024, 1)
+        }
+    
+    def clear(self, config_name: str = None):
+        """Remove the cache of a configuration (the active one by default)"""
+        if config_name:
+            cache_dir = self.root_dir / self._config_key(config_name)
+        elif self.settings:
+            cache_dir = Path(self.settings['cache_dir'])
+        else:
+            return
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    
+    def list_caches(self) -> List[Dict]:
+        """Configuration caches under the root with their size and last use"""
+        caches = []
+        if not self.root_dir.exists():
+            return caches
+        for cache_dir in self.root_dir.iterdir():
+            if not cache_dir.is_dir():
+                continue
+            stamp = cache_dir / '.last_used'
+            caches.append({
+                'config_key': cache_dir.name,
+                'path': str(cache_dir),
+                'size_bytes': self._dir_size(cache_dir),
+                'last_used': stamp.stat().st_mtime if stamp.exists() else cache_dir.stat().st_mtime
+            })
+        return caches
+    
+    def _evict_configurations(self, keep: Path):
+        """Drop least recently used configuration caches beyond the total budget"""
+        if not self.root_dir.exists() or sum(1 for entry in self.root_dir.iterdir() if entry.is_dir()) <= 1:
+            return
+        
+        caches = sorted(self.list_caches(), key=lambda c: c['last_used'])
+        total = sum(c['size_bytes'] for c in caches)
+        budget = self.max_total_size_gb * 1024 ** 3
+        
+        for cache in caches:
+            if total <= budget:
+                break
+            if Path(cache['path']) == keep:
+                continue
+            shutil.rmtree(cache['path'], ignore_errors=True)
+            total -= cache['size_bytes']
+            print(f"🧹 Evicted compiler cache for configuration {cache['config_key']}")
+    
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+    
+    def _run_ccache(self, args: List[str]) -> Optional[str]:
+        env = os.environ.copy()
+        env.update(self.settings['env'])
+        try:
+            result = subprocess.run([self.ccache_binary] + args, capture_output=True, text=True,
+                                    env=env, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
@@ -0,0 +1,226 @@
+import os
+import json
+import zlib
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Iterator, List
+
+class OutputLog:
+    """Bounded-memory capture of a command's output.
+    
+    Every line is appended to a gzip file made of independent members of
+    ``block_lines`` lines each, so the file stays a plain ``.gz`` for zcat and
+    less while an index of member offsets gives random access by line number
+    without inflating the whole log. Only the member being filled and a tail
+    of ``tail_lines`` lines (at most ``tail_bytes``) are kept in memory, no
+    matter how much a test suite prints.
+    """
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'logs')
+    
+    def __init__(self, path: str, tail_lines: int = 2000, tail_bytes: int = 1024 * 1024,
+                 block_lines: int = 4096, block_bytes: int = 1024 * 1024):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + '.idx')
+        self.tail_lines = tail_lines
+        self.tail_bytes = tail_bytes
+        self.block_lines = block_lines
+        self.block_bytes = block_bytes
+        self.line_count = 0
+        self.char_count = 0
+        self.blocks = []  # [compressed offset, first line] of each gzip member
+        self._tail = deque()
+        self._tail_size = 0
+        self._block = []
+        self._block_size = 0
+        self._partial = ''  # unterminated end of the last append, completed by the next one
+        self._file = None
+        self._lock = threading.Lock()
+        self.closed = False
+    
+    @classmethod
+    def stage_path(cls, build_id: str, stage_name: str, stream: str, root_dir: str = None) -> Path:
+        root = Path(root_dir or os.environ.get('LFS_LOG_ROOT', cls.DEFAULT_ROOT))
+        return root / build_id / f"{stage_name}.{stream}.gz"
+    
+    @classmethod
+    def for_stage(cls, build_id: str, stage_name: str, stream: str, root_dir: str = None, **options) -> 'OutputLog':
+        return cls(cls.stage_path(build_id, stage_name, stream, root_dir), **options)
+    
+    @classmethod
+    def open(cls, path: str) -> 'OutputLog':
+        """A finished log, for viewers and analyzers"""
+        log = cls(path)
+        log.closed = True
+        try:
+            index = json.loads(log.index_path.read_text())
+            log.blocks = index['blocks']
+            log.line_count = index['line_count']
+            log.char_count = index['char_count']
+        except (OSError, ValueError, KeyError):
+            log._rebuild_index()
+        return log
+    
+    def append(self, text: str):
+        """Add output; normally one line, but any text is accepted"""
+        if not text:
+            return
+        with self._lock:
+            lines = (self._partial + text).splitlines(keepends=True)
+            # Stored lines must stay lines when members are split again on read,
+            # so an unterminated end (or a \r that a \n may follow) waits here
+            self._partial = ''
+            if not lines[-1].endswith('\n'):
+                self._partial = lines.pop()
+            self._add_lines(lines)
+    
+    def _add_lines(self, lines: List[str]):
+        for line in lines:
+            size = len(line)
+            self.line_count += 1
+            self.char_count += size
+            self._block.append(line)
+            self._block_size += size
+            self._tail.append(line)
+            self._tail_size += size
+            while len(self._tail) > self.tail_lines or (self._tail_size > self.tail_bytes and len(self._tail) > 1):
+                self._tail_size -= len(self._tail.popleft())
+            if len(self._block) >= self.block_lines or self._block_size >= self.block_bytes:
+                self._flush_block()
+    
+    def _flush_block(self):
+        if not self._block:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'wb')
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        data = compressor.compress(''.join(self._block).encode('utf-8', errors='replace')) + compressor.flush()
+        self.blocks.append([self._file.tell(), self.line_count - len(self._block)])
+        self._file.write(data)
+        self._block = []
+        self._block_size = 0
+    
+    def close(self):
+        """Write out the last member and the line index"""
+        with self._lock:
+            if self.closed:
+                return
+            if self._partial:
+                self._add_lines([self._partial])
+                self._partial = ''
+            self._flush_block()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self.index_path.write_text(json.dumps({
+                    'line_count': self.line_count, 'char_count': self.char_count, 'blocks': self.blocks
+                }))
+            self.closed = True
+    
+    def tail(self, lines: int = None) -> str:
+        """The last lines of output, from memory"""
+        with self._lock:
+            tail = list(self._tail) + ([self._partial] if self._partial else [])
+        if not tail and self.line_count:
+            # Opened from disk: read the tail back from the last members
+            return ''.join(self.read_lines(max(self.line_count - (lines or self.tail_lines), 0)))
+        return ''.join(tail[-lines:] if lines else tail)
+    
+    def read_lines(self, start: int, end: int = None) -> List[str]:
+        """Lines ``start`` (inclusive) to ``end`` (exclusive), zero-based"""
+        end = self.line_count if end is None else min(end, self.line_count)
+        return list(self._iter_range(start, end)) if start < end else []
+    
+    def iter_lines(self) -> Iterator[str]:
+        return self._iter_range(0, self.line_count)
+    
+    def _iter_range(self, start: int, end: int) -> Iterator[str]:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            blocks = list(self.blocks)
+            pending = list(self._block)
+            first_pending = self.line_count - len(pending)
+        
+        # Start at the last member beginning at or before the first wanted line
+        position = 0
+        for index, (offset, first_line) in enumerate(blocks):
+            if first_line <= start:
+                position = index
+        line_number = blocks[position][1] if blocks else 0
+        if blocks:
+            with open(self.path, 'rb') as f:
+                for index in range(position, len(blocks)):
+                    if line_number >= end:
+                        return
+                    f.seek(blocks[index][0])
+                    length = (blocks[index + 1][0] if index + 1 < len(blocks) else None)
+                    data = f.read(length - blocks[index][0]) if length is not None else f.read()
+                    for line in zlib.decompress(data, 31).decode('utf-8', errors='replace').splitlines(keepends=True):
+                        if start <= line_number < end:
+                            yield line
+                        line_number += 1
+        for line in pending:
+            if first_pending >= end:
+                return
+            if first_pending >= start:
+                yield line
+            first_pending += 1
+    
+    @staticmethod
+    def read_tail(path: str, max_bytes: int = 1024 * 1024) -> str:
+        """The last whole lines of an uncompressed log file, read without loading all of it"""
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(size - max_bytes, 0))
+            data = f.read()
+        if size > max_bytes:
+            data = data.split(b'\n', 1)[-1]
+        return data.decode('utf-8', errors='replace')
+    
+    def text(self) -> str:
+        """The whole output as one string; only for callers that really need all of it"""
+        return ''.join(self.iter_lines())
+    
+    def _rebuild_index(self):
+        """Recover the member index of a log whose index was lost (e.g. a crash before close)"""
+        self.blocks, self.line_count, self.char_count = [], 0, 0
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return
+        with f:
+            offset, consumed, pending = 0, 0, b''
+            decompressor, text = zlib.decompressobj(31), []
+            while True:
+                chunk = pending or f.read(1024 * 1024)
+                pending = b''
+                if not chunk:
+                    # Whatever is left is a member cut short by the crash
+                    return
+                try:
+                    text.append(decompressor.decompress(chunk))
+                except zlib.error:
+                    return
+                consumed += len(chunk) - len(decompressor.unused_data)
+                if decompressor.eof:
+                    member = b''.join(text).decode('utf-8', errors='replace')
+                    self.blocks.append([offset, self.line_count])
+                    self.line_count += len(member.splitlines())
+                    self.char_count += len(member)
+                    offset = consumed
+                    pending = decompressor.unused_data
+                    decompressor, text = zlib.decompressobj(31), []
+    
+    def stats(self) -> dict:
+        return {
+            'path': str(self.path),
+            'lines': self.line_count,
+            'chars': self.char_count,
+            'compressed_bytes': self.path.stat().st_size if self.path.exists() else 0
+        }
+    
+    def __len__(self) -> int:
+        return self.line_count
@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+"""
+Package-granular build graph for LFS stage scripts
+Splits a stage script into one node per package, orders them by the LFS book
+plus declared dependencies and builds independent packages concurrently with
+a per-package make jobs allotment, log, timing and retry.
+
+Run as a script it is the driver the build engine uses for a stage:
+    python3 src/build/package_graph.py <state_dir> [script arguments ...]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+try:
+    from .source_cache import PreparedSourceCache
+except ImportError:  # Run as the stage driver script
+    from source_cache import PreparedSourceCache
+
+# Cross toolchain packages of the LFS book: everything built after them needs
+# them installed, so they serialize the graph (chapters 5 and the second passes)
+DEFAULT_BARRIERS = ['binutils', 'gcc', 'linux-api-headers', 'linux-headers', 'glibc', 'libstdc++']
+
+# Links the book makes between otherwise independent temporary tools
+DEFAULT_DEPENDENCIES = {'bash': ['ncurses'], 'readline': ['ncurses']}
+
+# Seconds a package may go without writing to its log, as the build engine
+# allows a stage; the driver's heartbeat would otherwise hide a hung package
+DEFAULT_SILENCE_TIMEOUT = 1800
+
+_BLOCK_COMMENT = re.compile(r'^#\s*Build\s+(.+?)\s*$')
+_BLOCK_ECHO = re.compile(r'''^echo\s+["']Building\s+(.+?)\.\.\.["']\s*$''')
+_TARBALL = re.compile(r'^\s*tar\s+-?x\w*\s+(\S+)')
+_CHDIR = re.compile(r'^\s*cd\s+([A-Za-z0-9][A-Za-z0-9+_.-]*)\s*$')
+_CLEANUP = re.compile(r'^\s*rm\s+-rf\s+\S+\s*$')
+
+@dataclass
+class PackageNode:
+    name: str
+    title: str
+    order: int
+    body: str
+    tarball: Optional[str] = None
+    source_dir: Optional[str] = None
+    depends: Set[str] = field(default_factory=set)
+    status: str = 'pending'
+    attempts: int = 0
+    make_jobs: int = 0
+    duration_seconds: float = 0.0
+    prepare_seconds: float = 0.0
+    return_code: Optional[int] = None
+    timed_out: bool = False
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    log_path: Optional[str] = None
+
+# The script call of a stage command: optional shell with its options, then scripts/<name>
+SCRIPT_CALL = re.compile(r'(?:(?:^|(?<=\s))(?:\S*/)?(?:bash|sh)((?:\s+-[A-Za-z]+)*)\s+)?\S*scripts/\S+')
+
+def driver_command(command: str, driver: str) -> Optional[Dict]:
+    """Replace the script call in a stage command with ``driver``
+    
+    Everything around the call (environment assignments, wrappers such as
+    ``sudo -E``, the script arguments and any following commands) is kept,
+    so the shell expands it exactly as it did for the script; the arguments
+    reach the driver as its trailing argv. Returns the command and the
+    shell options of the call, or None without a script call.
+    """
+    match = SCRIPT_CALL.search(command)
+    if not match:
+        return None
+    return {
+        'command': command[:match.start()] + driver + command[match.end():],
+        'shell_options': (match.group(1) or '').split()
+    }
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9+]+', '-', text.lower()).strip('-') or 'package'
+
+def parse_stage_script(script_text: str):
+    """Split a stage script into its preamble and one node per ``# Build X`` block
+    
+    Returns ``(preamble, nodes)``. A block starts at a ``# Build X`` comment or at
+    an ``echo "Building X..."`` not directly preceded by one, and runs to the next
+    block; trailing lines after the last package's cleanup are left out.
+    """
+    lines = script_text.splitlines()
+    starts = []
+    for index, line in enumerate(lines):
+        match = _BLOCK_COMMENT.match(line)
+        if match:
+            starts.append((index, match.group(1)))
+            continue
+        match = _BLOCK_ECHO.match(line.strip())
+        if match and not (starts and starts[-1][0] >= index - 1 and _BLOCK_COMMENT.match(lines[index - 1])):
+            starts.append((index, match.group(1)))
+    
+    if not starts:
+        return script_text, []
+    
+    preamble = '\n'.join(lines[:starts[0][0]])
+    nodes = []
+    names = set()
+    for position, (start, title) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else len(lines)
+        block = lines[start:end]
+        if position + 1 == len(starts):
+            # Keep the stage epilogue ("✓ ... completed") out of the last package
+            cleanup = [i for i, line in enumerate(block) if _CLEANUP.match(line)]
+            if cleanup:
+                block = block[:cleanup[-1] + 1]
+        
+        # "Glibc (final)" stays "glibc" unless the book builds it twice in one script
+        name = _slug(re.sub(r'\(.*?\)|\bfrom\b.*$', '', title, flags=re.IGNORECASE))
+        if name in names:
+            name = _slug(title)
+        suffix = 2
+        while name in names:
+            name = f"{_slug(title)}-{suffix}"
+            suffix += 1
+        names.add(name)
+        
+        node = PackageNode(name=name, title=title, order=position, body='\n'.join(block))
+        for index, line in enumerate(block):
+            tar_match = _TARBALL.match(line)
+            if tar_match:
+                node.tarball = tar_match.group(1)
+                for following in block[index + 1:]:
+                    dir_match = _CHDIR.match(following)
+                    if dir_match:
+                        node.source_dir = dir_match.group(1)
+                        break
+                break
+        nodes.append(node)
+    
+    return preamble, nodes
+
+class PackageGraph:
+    """Dependency graph of the packages of one stage script
+    
+    In ``book`` mode a barrier package (the cross toolchain by default) depends on
+    every package before it and every other package on the last barrier before
+    it, so the independent packages between two barriers build concurrently.
+    ``serial`` mode chains the packages in book order, for stages (like the final
+    system) whose dependencies are not declared. Declared ``dependencies`` are
+    added on top, and packages unpacking the same source directory never overlap.
+    """
+    
+    def __init__(self, nodes: List[PackageNode], mode: str = 'book', barriers: List[str] = None,
+                 dependencies: Dict[str, List[str]] = None):
+        self.nodes: Dict[str, PackageNode] = {node.name: node for node in nodes}
+        self.ordered = sorted(nodes, key=lambda node: node.order)
+        barrier_names = set(DEFAULT_BARRIERS if barriers is None else barriers)
+        
+        last_barrier = None
+        last_user_of_dir = {}
+        for position, node in enumerate(self.ordered):
+            previous = self.ordered[:position]
+            base_name = re.split(r'-(?:pass|final|\d)', node.name)[0]
+            if mode == 'serial':
+                if previous:
+                    node.depends.add(previous[-1].name)
+            elif base_name in barrier_names:
+                node.depends.update(p.name for p in previous)
+                last_barrier = node.name
+            elif last_barrier:
+                node.depends.add(last_barrier)
+            
+            if node.source_dir:
+                if node.source_dir in last_user_of_dir:
+                    node.depends.add(last_user_of_dir[node.source_dir])
+                last_user_of_dir[node.source_dir] = node.name
+        
+        declared = {**DEFAULT_DEPENDENCIES, **(dependencies or {})}
+        for name, extra in declared.items():
+            if name in self.nodes:
+                self.nodes[name].depends.update(dep for dep in extra if dep in self.nodes and dep != name)
+    
+    def ready(self) -> List[PackageNode]:
+        return [node for node in self.ordered if node.status == 'pending'
+                and all(self.nodes[dep].status == 'success' for dep in node.depends)]
+    
+    def block_dependents(self) -> List[PackageNode]:
+        """Mark pending packages whose dependencies failed; returns the newly blocked"""
+        blocked = []
+        changed = True
+        while changed:
+            changed = False
+            for node in self.ordered:
+                if node.status == 'pending' and any(self.nodes[dep].status in ('failed', 'blocked')
+                                                    for dep in node.depends):
+                    node.status = 'blocked'
+                    blocked.append(node)
+                    changed = True
+        return blocked
+    
+    def critical_path(self, durations: Dict[str, float]) -> Dict[str, float]:
+        """Longest expected time from the start of each package to the end of the stage"""
+        dependents = {name: [] for name in self.nodes}
+        for node in self.ordered:
+            for dep in node.depends:
+                dependents[dep].append(node.name)
+        remaining = {}
+        for node in reversed(self.ordered):
+            remaining[node.name] = durations.get(node.name, 60.0) + max(
+                (remaining[child] for child in dependents[node.name] if child in remaining), default=0.0)
+        return remaining
+
+class PackageScheduler:
+    """Builds the packages of a graph on a bounded pool of concurrent packages
+    
+    Each package starts with ``jobs_budget`` cores divided among the packages
+    that can run at that moment (never less than one), exported as
+    ``LFS_MAKE_JOBS`` for the ``make -j`` of the scripts. Ready packages start
+    longest critical path first, using the durations of earlier runs. A failed
+    package blocks only its dependents; it is retried ``retries`` times, the
+    retries with a single make job. A package whose log stays silent for
+    ``silence_timeout`` seconds is killed and fails without a retry. With a
+    prepared source cache, tarballs
+    are pre-extracted in schedule order and each package's ``tar -x`` becomes
+    a copy of the cached tree.
+    """
+    
+    def __init__(self, graph: PackageGraph, preamble: str, state_dir: str, env: Dict = None,
+                 jobs_budget: int = None, max_parallel: int = None, retries: int = 1,
+                 durations: Dict[str, float] = None, source_cache: PreparedSourceCache = None,
+                 sources_dir: str = None, script: str = 'bash', script_args: List[str] = None,
+                 shell_options: List[str] = None, silence_timeout: float = None):
+        self.graph = graph
+        self.preamble = preamble
+        self.state_dir = Path(state_dir)
+        self.log_dir = self.state_dir / 'logs'
+        self.env = dict(env if env is not None else os.environ)
+        self.jobs_budget = max(int(jobs_budget or os.cpu_count() or 1), 1)
+        self.max_parallel = max(int(max_parallel or self.jobs_budget), 1)
+        self.retries = max(int(retries), 0)
+        self.heartbeat_seconds = 300
+        self.silence_timeout = float(silence_timeout or DEFAULT_SILENCE_TIMEOUT)
+        self.priority = graph.critical_path(durations or {})
+        self.source_cache = source_cache
+        self.sources_dir = sources_dir
+        # $0, positional parameters and shell options the stage gave its script
+        self.script = script
+        self.script_args = list(script_args or [])
+        self.shell_options = list(shell_options or [])
+        self.cancelled = threading.Event()
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._lock = threading.Lock()
+    
+    def run(self, only: List[str] = None) -> Dict:
+        """Build pending packages (or just ``only`` and what they unblock)"""
+        try:
+            return self._run(only)
+        finally:
+            # Prepared trees stay pinned until the whole stage is over
+            if self.source_cache:
+                self.source_cache.release('packages')
+    
+    def _run(self, only: List[str] = None) -> Dict:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        if only:
+            selected = set(only)
+            for node in self.graph.ordered:
+                if node.depends & selected:
+                    selected.add(node.name)
+            for node in self.graph.ordered:
+                if node.name not in selected and node.status != 'success':
+                    node.status = 'skipped'
+        
+        if self.source_cache and self.sources_dir:
+            pending = sorted((node for node in self.graph.ordered if node.status == 'pending' and node.tarball),
+                             key=lambda n: (-self.priority[n.name], n.order))
+            self.source_cache.prefetch(list(dict.fromkeys(
+                os.path.join(self.sources_dir, node.tarball) for node in pending)), owner='packages')
+        
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            while True:
+                for node in self.graph.block_dependents():
+                    print(f"⛔ [{node.name}] blocked by a failed dependency", flush=True)
+                
+                if not self.cancelled.is_set():
+                    ready = sorted(self.graph.ready(), key=lambda n: (-self.priority[n.name], n.order))
+                    slots = self.max_parallel - len(running)
+                    concurrent = min(self.max_parallel, len(running) + len(ready))
+                    for node in ready[:max(slots, 0)]:
+                        node.status = 'running'
+                        node.make_jobs = max(self.jobs_budget // max(concurrent, 1), 1)
+                        running[pool.submit(self._build_package, node)] = node
+                    if running:
+                        self.save_state()
+                
+                if not running:
+                    break
+                done, _ = wait(list(running), timeout=self.heartbeat_seconds, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Long packages print nothing on the driver's stdout; keep the stage visibly alive
+                    print(f"⏳ Building {', '.join(node.name for node in running.values())}", flush=True)
+                for future in done:
+                    node = running.pop(future)
+                    if future.exception():
+                        node.status = 'failed'
+                        print(f"❌ [{node.name}] scheduler error: {future.exception()}", file=sys.stderr, flush=True)
+                self.save_state()
+        
+        for node in self.graph.ordered:
+            if node.status == 'pending':
+                if self.cancelled.is_set():
+                    node.status = 'cancelled'
+                else:
+                    node.status = 'blocked'
+                    print(f"⛔ [{node.name}] never became ready (dependency cycle?)", file=sys.stderr, flush=True)
+        self.save_state()
+        return self.summary()
+    
+    def cancel(self):
+        """Stop scheduling and kill the process groups of running packages"""
+        self.cancelled.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+    
+    def _build_package(self, node: PackageNode):
+        node.log_path = str(self.log_dir / f"{node.order + 1:03d}-{node.name}.log")
+        node.started_at = time.time()
+        attempts_left = self.retries + 1
+        
+        while attempts_left and not self.cancelled.is_set():
+            attempts_left -= 1
+            node.attempts += 1
+            if node.attempts > 1:
+                # Parallel make races are the usual transient failure; retry serially
+                node.make_jobs = 1
+            print(f"📦 [{node.name}] building (attempt {node.attempts}, make -j{node.make_jobs})", flush=True)
+            
+            started = time.time()
+            node.return_code = self._run_script(node)
+            node.duration_seconds = round(time.time() - started, 2)
+            if node.return_code == 0:
+                break
+            print(f"❌ [{node.name}] failed with return code {node.return_code} "
+                  f"after {node.duration_seconds}s (log: {node.log_path})", file=sys.stderr, flush=True)
+            for line in self._log_tail(node.log_path):
+                print(f"   [{node.name}] {line}", file=sys.stderr, flush=True)
+            if node.timed_out:
+                # A hang is rarely a make race; another attempt would just wait again
+                break
+        
+        node.finished_at = time.time()
+        if self.cancelled.is_set() and node.return_code != 0:
+            node.status = 'cancelled'
+        elif node.return_code == 0:
+            node.status = 'success'
+            print(f"✅ [{node.name}] built in {node.duration_seconds}s", flush=True)
+        else:
+            node.status = 'failed'
+    
+    def _run_script(self, node: PackageNode) -> int:
+        script = [self.preamble, 'set -e']
+        if node.source_dir:
+            # A failed attempt leaves a half-built tree behind; always start from the tarball
+            script.append(f"rm -rf {node.source_dir}")
+        script.append(self._with_prepared_source(node))
+        
+        env = dict(self.env, LFS_MAKE_JOBS=str(node.make_jobs), LFS_PACKAGE=node.name)
+        with open(node.log_path, 'a') as log:
+            log.write(f"=== {node.title} (attempt {node.attempts}, make -j{node.make_jobs}) ===\n")
+            log.flush()
+            process = subprocess.Popen(['bash', *self.shell_options, '-c', '\n'.join(script), self.script,
+                                        *self.script_args], stdout=log, stderr=subprocess.STDOUT,
+                                       stdin=subprocess.DEVNULL, env=env, start_new_session=True)
+            with self._lock:
+                self._processes[node.name] = process
+            try:
+                return self._wait(node, process)
+            finally:
+                with self._lock:
+                    self._processes.pop(node.name, None)
+    
+    def _wait(self, node: PackageNode, process: subprocess.Popen) -> int:
+        """Wait for a package's script; kill it once its log has been silent too long"""
+        while True:
+            try:
+                return process.wait(timeout=min(self.silence_timeout, 10))
+            except subprocess.TimeoutExpired:
+                pass
+            try:
+                silent = time.time() - os.path.getmtime(node.log_path)
+            except OSError:
+                silent = 0
+            if silent < self.silence_timeout:
+                continue
+            
+            node.timed_out = True
+            print(f"⏰ [{node.name}] no output for {int(silent)}s, killing it", file=sys.stderr, flush=True)
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+                try:
+                    return process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            return process.wait()
+    
+    def _with_prepared_source(self, node: PackageNode) -> str:
+        """Package body with its tarball extraction replaced by a copy of the prepared tree"""
+        if not (self.source_cache and self.sources_dir and node.tarball and node.source_dir):
+            return node.body
+        started = time.time()
+        try:
+            checkout = self.source_cache.checkout_command(os.path.join(self.sources_dir, node.tarball),
+                                                          owner='packages')
+        except OSError as e:
+            print(f"⚠️ [{node.name}] prepared source unavailable, extracting the tarball: {e}", flush=True)
+            checkout = None
+        node.prepare_seconds = round(time.time() - started, 2)
+        if not checkout:
+            return node.body
+        
+        lines = node.body.splitlines()
+        for index, line in enumerate(lines):
+            match = _TARBALL.match(line)
+            if match and match.group(1) == node.tarball:
+                lines[index] = checkout
+                break
+        return '\n'.join(lines)
+    
+    @staticmethod
+    def _log_tail(log_path: str, lines: int = 20) -> List[str]:
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(f.tell() - 8192, 0))
+                return f.read().decode(errors='replace').splitlines()[-lines:]
+        except OSError:
+            return []
+    
+    def summary(self) -> Dict:
+        counts = {}
+        for node in self.graph.ordered:
+            counts[node.status] = counts.get(node.status, 0) + 1
+        return {'packages': len(self.graph.ordered), **counts}
+    
+    def save_state(self):
+        save_state(self.state_dir, self.graph)
+
+def load_state(state_dir) -> Dict:
+    try:
+        with open(Path(state_dir) / 'state.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state_dir, graph: PackageGraph):
+    """Write per-package status atomically so a retry knows what already succeeded"""
+    state_dir = Path(state_dir)
+    packages = []
+    for node in graph.ordered:
+        record = asdict(node)
+        record.pop('body')
+        record['depends'] = sorted(node.depends)
+        packages.append(record)
+    temp_path = state_dir / 'state.json.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'updated': time.time(), 'packages': packages}, f, indent=2)
+    os.replace(temp_path, state_dir / 'state.json')
+
+class PackageBuildManager:
+    """Runs selected stages package by package through the graph driver
+    
+    Configured by the ``package_graph`` section of a build configuration. Stage
+    state (options, per-package status and logs) lives under
+    ``<root>/<build_id>/<stage>``; durations of successful packages are kept
+    across builds to order later schedules by critical path.
+    """
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'packages')
+    
+    def __init__(self, root_dir: str = None):
+        self.root_dir = Path(root_dir or os.environ.get('LFS_PACKAGE_ROOT', self.DEFAULT_ROOT))
+        self.options = {}
+        self.source_options = {}
+        self.sources_dir = None
+    
+    def configure(self, build_config: Dict):
+        self.options = build_config.get('package_graph', {}) or {}
+        self.source_options = build_config.get('source_cache', {}) or {}
+        lfs_root = (build_config.get('workspace') or {}).get('lfs_root', os.environ.get('LFS', '/mnt/lfs'))
+        self.sources_dir = (build_config.get('workspace') or {}).get('source_dir', os.path.join(lfs_root, 'sources'))
+    
+    def applies_to(self, stage_config: Dict) -> bool:
+        stage_option = stage_config.get('package_graph')
+        if stage_option is not None:
+            return bool(stage_option)
+        if not self.options.get('enabled', False):
+            return False
+        return stage_config.get('name') in (self.options.get('stages') or [])
+    
+    def state_dir(self, build_id: str, stage_name: str) -> Path:
+        return self.root_dir / build_id / stage_name
+    
+    def prepare(self, build_id: str, stage_config: Dict, script_path: str, only: List[str] = None,
+                command: str = None) -> Optional[str]:
+        """Write the stage's driver options; returns the driver command or None if the script has no packages
+        
+        ``command`` is the stage command; its script call is replaced by the
+        driver and everything else in it is kept.
+        """
+        with open(script_path) as f:
+            _, nodes = parse_stage_script(f.read())
+        if len(nodes) < 1:
+            return None
+        
+        stage_name = stage_config['name']
+        state_dir = self.state_dir(build_id, stage_name)
+        driver = f"{sys.executable} {os.path.abspath(__file__)} {state_dir}"
+        call = driver_command(command or stage_config.get('command') or '', driver) or \
+            {'command': driver, 'shell_options': []}
+        
+        stage_option = stage_config.get('package_graph')
+        stage_option = stage_option if isinstance(stage_option, dict) else {}
+        serial_stages = self.options.get('serial_stages', ['build_final_system'])
+        state_dir.mkdir(parents=True, exist_ok=True)
+        
+        options = {
+            'stage': stage_name,
+            'script': os.path.abspath(script_path),
+            'mode': stage_option.get('mode', 'serial' if stage_name in serial_stages else 'book'),
+            'barriers': stage_option.get('barriers', self.options.get('barriers')),
+            'dependencies': {**(self.options.get('dependencies') or {}), **(stage_option.get('dependencies') or {})},
+            'jobs': stage_option.get('jobs', self.options.get('jobs')),
+            'max_parallel': stage_option.get('max_parallel', self.options.get('max_parallel')),
+            'retries': stage_option.get('retries', self.options.get('retries', 1)),
+            'silence_timeout': stage_option.get('silence_timeout', self.options.get('silence_timeout')),
+            'durations': self._load_durations().get(stage_name, {}),
+            'source_cache': self.source_options,
+            'sources_dir': self.sources_dir,
+            'shell_options': call['shell_options'],
+            'only': only
+        }
+        with open(state_dir / 'options.json', 'w') as f:
+            json.dump(options, f, indent=2)
+        return call['command']
+    
+    def results(self, build_id: str, stage_name: str) -> List[Dict]:
+        """Per-package records of a stage run; also remembers successful durations"""
+        packages = load_state(self.state_dir(build_id, stage_name)).get('packages', [])
+        durations = self._load_durations()
+        stage_durations = durations.setdefault(stage_name, {})
+        for package in packages:
+            if package['status'] == 'success':
+                stage_durations[package['name']] = package['duration_seconds']
+        if packages:
+            self.root_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.root_dir / 'durations.json', 'w') as f:
+                json.dump(durations, f, indent=2)
+        return packages
+    
+    def failed_packages(self, build_id: str, stage_name: str) -> List[str]:
+        packages = load_state(self.state_dir(build_id, stage_name)).get('packages', [])
+        return [p['name'] for p in packages if p['status'] not in ('success', 'skipped')]
+    
+    def _load_durations(self) -> Dict:
+        try:
+            with open(self.root_dir / 'durations.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2:
+        print(f"usage: {argv[0]} <state_dir> [script arguments ...]", file=sys.stderr)
+        return 2
+    state_dir = Path(argv[1])
+    with open(state_dir / 'options.json') as f:
+        options = json.load(f)
+    with open(options['script']) as f:
+        preamble, nodes = parse_stage_script(f.read())
+    
+    graph = PackageGraph(nodes, options.get('mode', 'book'), options.get('barriers'), options.get('dependencies'))
+    # A retry keeps what already succeeded in this stage and rebuilds the rest
+    previous = {p['name']: p for p in load_state(state_dir).get('packages', [])}
+    for node in graph.ordered:
+        if node.name in previous:
+            node.attempts = previous[node.name].get('attempts', 0)
+            if previous[node.name].get('status') == 'success':
+                node.status = 'success'
+                node.duration_seconds = previous[node.name].get('duration_seconds', 0.0)
+                node.log_path = previous[node.name].get('log_path')
+    
+    source_cache = None
+    if (options.get('source_cache') or {}).get('enabled', True):
+        source_cache = PreparedSourceCache()
+        source_cache.configure(options.get('source_cache'))
+    
+    scheduler = PackageScheduler(graph, preamble, state_dir, jobs_budget=options.get('jobs'),
+                                 max_parallel=options.get('max_parallel'), retries=options.get('retries', 1),
+                                 durations=options.get('durations'), source_cache=source_cache,
+                                 sources_dir=options.get('sources_dir'), script=options['script'],
+                                 script_args=argv[2:], shell_options=options.get('shell_options'),
+                                 silence_timeout=options.get('silence_timeout'))
+    
+    def handle_signal(signum, frame):
+        print(f"🚫 Package build cancelled (signal {signum})", file=sys.stderr, flush=True)
+        scheduler.cancel()
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    print(f"🧩 {options['stage']}: {len(graph.ordered)} packages, {options.get('mode', 'book')} order, "
+          f"{scheduler.max_parallel} concurrent, {scheduler.jobs_budget} make jobs", flush=True)
+    summary = scheduler.run(only=options.get('only'))
+    print(f"🧩 {options['stage']}: " + ', '.join(f"{count} {status}" for status, count in summary.items()
+                                                 if status != 'packages'), flush=True)
+    
+    if scheduler.cancelled.is_set():
+        return 143
+    return 0 if all(node.status in ('success', 'skipped') for node in graph.ordered) else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
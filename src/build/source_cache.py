@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Multi-threaded decompressors tried before tar's built-in ones, per suffix
+PARALLEL_DECOMPRESSORS = {
+    ('.tar.xz', '.txz'): [['xz', '-T0', '-dc'], ['pixz', '-d']],
+    ('.tar.gz', '.tgz'): [['pigz', '-dc'], ['gzip', '-dc']],
+    ('.tar.bz2', '.tbz2'): [['lbzip2', '-dc'], ['pbzip2', '-dc'], ['bzip2', '-dc']],
+    ('.tar.zst', '.tzst'): [['zstd', '-T0', '-dc']],
+    ('.tar.lz',): [['plzip', '-dc'], ['lzip', '-dc']]
+}
+
+class PreparedSourceCache:
+    """Deduplicated cache of extracted source tarballs.
+    
+    Each tarball is extracted once, with a multi-threaded decompressor when one
+    is installed, into ``<root>/<sha256>/tree`` and never modified afterwards.
+    Stages get working copies of that tree: reflinked (copy-on-write) where the
+    filesystem supports it, otherwise copied, or hardlinked when ``link_mode``
+    is ``hardlink`` (only safe for scripts that never rewrite files in place).
+    ``prefetch`` prepares tarballs in the background while earlier packages
+    compile; least recently used trees are evicted beyond ``max_size_gb``.
+    Trees queued for or checked out by a stage are pinned under
+    ``<root>/.pins/<sha256>/<pid>.<owner>`` until that owner releases them, so
+    eviction in any process skips them.
+    
+    The cache defaults to ``$LFS/.cache/sources``: reflinks and hardlinks only
+    work within one filesystem, and stages unpack into the LFS tree. When $LFS
+    is not writable it falls back to ``~/.cache/lfs-build/sources``.
+    """
+    
+    def __init__(self, root_dir: str = None, max_size_gb: float = 30.0, link_mode: str = 'reflink',
+                 prefetch_workers: int = 2):
+        self.root_dir = Path(root_dir or os.environ.get('LFS_SOURCE_CACHE_ROOT') or self.default_root())
+        self.max_size_gb = max_size_gb
+        self.link_mode = link_mode
+        self.prefetch_workers = prefetch_workers
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._preparing: Dict[str, threading.Event] = {}
+        self._digest_memo = None
+        self._pool = None
+        self.stats = {'hits': 0, 'extracted': 0, 'extract_seconds': 0.0, 'failures': 0}
+    
+    @staticmethod
+    def default_root() -> str:
+        lfs_root = os.environ.get('LFS', '/mnt/lfs')
+        if os.path.isdir(lfs_root) and os.access(lfs_root, os.W_OK):
+            return os.path.join(lfs_root, '.cache', 'sources')
+        return os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'sources')
+    
+    def configure(self, options: Dict):
+        """Apply the ``source_cache`` section of a build configuration"""
+        options = options or {}
+        self.enabled = bool(options.get('enabled', True))
+        if options.get('dir'):
+            self.root_dir = Path(options['dir'])
+        self.max_size_gb = float(options.get('max_size_gb', self.max_size_gb))
+        self.link_mode = options.get('link_mode', self.link_mode)
+        self.prefetch_workers = int(options.get('prefetch_workers', self.prefetch_workers))
+    
+    def settings(self) -> Dict:
+        return {'enabled': self.enabled, 'dir': str(self.root_dir), 'max_size_gb': self.max_size_gb,
+                'link_mode': self.link_mode, 'prefetch_workers': self.prefetch_workers}
+    
+    def prefetch(self, tarballs: List[str], owner: str = None):
+        """Prepare tarballs in the background, in the given order, pinned for ``owner``"""
+        if not self.enabled:
+            return
+        if owner:
+            self.pin(tarballs, owner)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(self.prefetch_workers, 1),
+                                                thread_name_prefix='source-prefetch')
+        for tarball in tarballs:
+            self._pool.submit(self._prefetch_one, tarball)
+    
+    def _prefetch_one(self, tarball: str):
+        try:
+            self.prepare(tarball)
+        except Exception as e:
+            print(f"⚠️ Could not pre-extract {os.path.basename(tarball)}: {e}")
+    
+    def prepare(self, tarball: str) -> Optional[Path]:
+        """Extracted read-only tree of a tarball, extracting it on first use"""
+        if not self.enabled or not os.path.isfile(tarball):
+            return None
+        digest = self.digest(tarball)
+        entry_dir = self.root_dir / digest
+        tree = entry_dir / 'tree'
+        
+        while True:
+            if (entry_dir / '.complete').exists():
+                (entry_dir / '.complete').touch()
+                return tree
+            with self._lock:
+                waiting = self._preparing.get(digest)
+                if waiting is None:
+                    self._preparing[digest] = threading.Event()
+            if waiting is None:
+                break
+            waiting.wait()
+        
+        try:
+            return self._extract(tarball, entry_dir)
+        finally:
+            with self._lock:
+                self._preparing.pop(digest).set()
+    
+    def _extract(self, tarball: str, entry_dir: Path) -> Optional[Path]:
+        started = time.time()
+        # Extract beside the entry and rename it into place, so concurrent
+        # processes never see a half-written tree
+        staging = entry_dir.parent / f".{entry_dir.name}.{os.getpid()}.{threading.get_ident()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        (staging / 'tree').mkdir(parents=True)
+        
+        if not self._untar(tarball, staging / 'tree'):
+            shutil.rmtree(staging, ignore_errors=True)
+            self.stats['failures'] += 1
+            return None
+        
+        (staging / 'source.json').write_text(json.dumps({
+            'tarball': os.path.basename(tarball),
+            'size_bytes': os.path.getsize(tarball),
+            'tree_bytes': self._dir_size(staging / 'tree'),
+            'extract_seconds': round(time.time() - started, 2),
+            'created': time.time()
+        }))
+        (staging / '.complete').touch()
+        try:
+            os.rename(staging, entry_dir)
+        except OSError:
+            # Another process finished the same tarball first
+            shutil.rmtree(staging, ignore_errors=True)
+        
+        self.stats['extracted'] += 1
+        self.stats['extract_seconds'] += time.time() - started
+        self._evict(keep=entry_dir.name)
+        return entry_dir / 'tree'
+    
+    def _untar(self, tarball: str, destination: Path) -> bool:
+        decompressor = self._decompressor(tarball)
+        if decompressor:
+            with open(tarball, 'rb') as source:
+                unpack = subprocess.Popen(decompressor, stdin=source, stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL)
+                result = subprocess.run(['tar', '-xf', '-', '-C', str(destination)], stdin=unpack.stdout,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                unpack.stdout.close()
+                if unpack.wait() == 0 and result.returncode == 0:
+                    return True
+            shutil.rmtree(destination, ignore_errors=True)
+            destination.mkdir(parents=True)
+        result = subprocess.run(['tar', '-xf', tarball, '-C', str(destination)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        return result.returncode == 0
+    
+    @staticmethod
+    def _decompressor(tarball: str) -> Optional[List[str]]:
+        for suffixes, candidates in PARALLEL_DECOMPRESSORS.items():
+            if tarball.endswith(suffixes):
+                return next((command for command in candidates if shutil.which(command[0])), None)
+        return None
+    
+    def checkout_command(self, tarball: str, owner: str = None) -> Optional[str]:
+        """Shell command that puts a working copy of the tarball's tree into the current directory"""
+        if owner and self.enabled and os.path.isfile(tarball):
+            # Pinned before preparing: the tree must survive until ``cp`` has run
+            self.pin([tarball], owner)
+        tree = self.prepare(tarball)
+        if tree is None:
+            return None
+        self.stats['hits'] += 1
+        if self.link_mode == 'hardlink':
+            return f"cp -al '{tree}/.' ."
+        if self.link_mode == 'copy':
+            return f"cp -a '{tree}/.' ."
+        return f"cp -a --reflink=auto '{tree}/.' ."
+    
+    def pin(self, tarballs: List[str], owner: str):
+        """Protect the trees of tarballs from eviction until ``release(owner)``"""
+        for tarball in tarballs:
+            try:
+                pin_dir = self.root_dir / '.pins' / self.digest(tarball)
+                pin_dir.mkdir(parents=True, exist_ok=True)
+                (pin_dir / f"{os.getpid()}.{owner}").touch()
+            except OSError as e:
+                print(f"⚠️ Could not pin prepared source {os.path.basename(tarball)}: {e}")
+    
+    def release(self, owner: str):
+        """Drop every pin this process holds for ``owner``"""
+        pins_root = self.root_dir / '.pins'
+        if not pins_root.exists():
+            return
+        for pin_file in pins_root.glob(f"*/{os.getpid()}.{owner}"):
+            try:
+                pin_file.unlink()
+                pin_file.parent.rmdir()
+            except OSError:
+                pass
+    
+    def _pinned(self, digest: str) -> bool:
+        """Whether a live process holds a pin on a tree; pins of dead processes are removed"""
+        pinned = False
+        pin_dir = self.root_dir / '.pins' / digest
+        if not pin_dir.exists():
+            return False
+        for pin_file in pin_dir.iterdir():
+            try:
+                os.kill(int(pin_file.name.split('.', 1)[0]), 0)
+                pinned = True
+            except PermissionError:
+                pinned = True
+            except (ValueError, ProcessLookupError):
+                pin_file.unlink(missing_ok=True)
+        return pinned
+    
+    def digest(self, tarball: str) -> str:
+        """sha256 of a tarball, memoized by path, size and mtime"""
+        info = os.stat(tarball)
+        memo_key = f"{os.path.abspath(tarball)}:{info.st_size}:{info.st_mtime_ns}"
+        with self._lock:
+            if self._digest_memo is None:
+                self._digest_memo = self._read_json(self.root_dir / 'digests.json') or {}
+            if memo_key in self._digest_memo:
+                return self._digest_memo[memo_key]
+        
+        sha256 = hashlib.sha256()
+        with open(tarball, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        
+        with self._lock:
+            self._digest_memo[memo_key] = digest
+            self.root_dir.mkdir(parents=True, exist_ok=True)
+            temp_path = self.root_dir / f".digests.{os.getpid()}.json"
+            temp_path.write_text(json.dumps(self._digest_memo))
+            os.replace(temp_path, self.root_dir / 'digests.json')
+        return digest
+    
+    def get_stats(self) -> Dict:
+        entries = self._entries() if self.root_dir.exists() else []
+        return {
+            **self.stats,
+            'extract_seconds': round(self.stats['extract_seconds'], 2),
+            'entries': len(entries),
+            'size_bytes': sum(self._entry_size(entry) for entry in entries)
+        }
+    
+    def _evict(self, keep: str):
+        """Drop least recently used trees beyond the size budget, never pinned ones"""
+        entries = self._entries()
+        budget = self.max_size_gb * 1024 ** 3
+        sized = [(entry, self._entry_size(entry)) for entry in entries]
+        total = sum(size for _, size in sized)
+        
+        for entry, size in sorted(sized, key=lambda item: (item[0] / '.complete').stat().st_mtime):
+            if total <= budget:
+                break
+            if entry.name == keep or self._pinned(entry.name):
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            print(f"🧹 Evicted prepared source {entry.name[:12]}")
+    
+    def _entries(self) -> List[Path]:
+        # Dot-prefixed directories are extractions still in progress
+        return [entry for entry in self.root_dir.iterdir()
+                if not entry.name.startswith('.') and (entry / '.complete').exists()]
+    
+    def _entry_size(self, entry: Path) -> int:
+        info = self._read_json(entry / 'source.json') or {}
+        return info.get('tree_bytes') or self._dir_size(entry)
+    
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+    
+    @staticmethod
+    def _read_json(path: Path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
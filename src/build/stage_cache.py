@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tarfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Environment variables that change what a stage produces
+DEFAULT_KEY_ENV = ['LFS', 'LFS_TGT', 'MAKEFLAGS', 'LC_ALL', 'CONFIG_SITE', 'CFLAGS', 'CXXFLAGS']
+
+# Stages that act on the host rather than the LFS tree can never be restored from an archive
+# (downloads land in the excluded sources directory and are cached by the downloader)
+DEFAULT_UNCACHEABLE_STAGES = ['prepare_host', 'create_partition', 'download_sources', 'enter_chroot']
+
+# LFS tree paths never archived: downloaded sources and the prepared source cache in $LFS/.cache
+DEFAULT_TREE_EXCLUDES = ['sources', '.cache']
+
+# Build config sections that do not influence stage outputs
+_NON_OUTPUT_SECTIONS = ('name', 'stages', 'compiler_cache', 'stage_cache')
+
+def scan_tree(root: str, exclude: List[str] = None) -> Dict[str, Tuple[int, int, int]]:
+    """Manifest of a tree: relative path -> (mode, size, mtime_ns) without following symlinks"""
+    manifest = {}
+    root = os.path.abspath(root)
+    excluded = {os.path.join(root, path) for path in (exclude or [])}
+    pending = [root]
+    
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.path in excluded:
+                continue
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            manifest[os.path.relpath(entry.path, root)] = (info.st_mode, info.st_size, info.st_mtime_ns)
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+    
+    return manifest
+
+def diff_manifests(before: Dict, after: Dict) -> Tuple[List[str], List[str]]:
+    """Paths added or changed, and paths removed, between two manifests"""
+    changed = sorted(path for path, state in after.items() if before.get(path) != state)
+    removed = sorted(path for path in before if path not in after)
+    return changed, removed
+
+class StageCache:
+    """Content addressed cache of stage results.
+    
+    A stage key hashes the stage command and script, the relevant environment,
+    the output affecting build config, the digests of the input tarballs and
+    the keys of the stages it depends on, so a change to one stage re-runs it
+    and everything downstream while earlier stages are restored. The artifact
+    of a stage is the filesystem delta it made to the LFS tree (a tar archive
+    of added/changed paths plus the list of removed paths).
+    """
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'stages')
+    
+    def __init__(self, root_dir: str = None, max_size_gb: float = 20.0):
+        self.root_dir = Path(root_dir or os.environ.get('LFS_STAGE_CACHE_ROOT', self.DEFAULT_ROOT))
+        self.max_size_gb = max_size_gb
+        self.lfs_root = os.environ.get('LFS', '/mnt/lfs')
+        self.options = {}
+        self.enabled = False
+        self._lock = threading.RLock()
+        self._index = None
+        self._digest_memo = None
+        self._config_digest = None
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'restore_failures': 0}
+    
+    def configure(self, build_config: Dict):
+        """Apply the ``stage_cache`` section of a build configuration"""
+        self.options = build_config.get('stage_cache', {}) or {}
+        self.enabled = bool(self.options.get('enabled', True))
+        self.lfs_root = self.options.get('lfs_root', os.environ.get('LFS', '/mnt/lfs'))
+        if 'max_size_gb' in self.options:
+            self.max_size_gb = float(self.options['max_size_gb'])
+        self._config_digest = self._hash_json({
+            key: value for key, value in build_config.items() if key not in _NON_OUTPUT_SECTIONS
+        })
+    
+    def is_cacheable(self, stage_config: Dict) -> bool:
+        if not self.enabled:
+            return False
+        if 'cache' in stage_config:
+            return bool(stage_config['cache'])
+        return stage_config.get('name') not in self.options.get('uncacheable_stages', DEFAULT_UNCACHEABLE_STAGES)
+    
+    def stage_key(self, stage_config: Dict, env: Dict, dependency_keys: List[str], project_dir: str) -> str:
+        """Content hash identifying the result of a stage"""
+        command = stage_config.get('command', '')
+        key_env = self.options.get('key_env', DEFAULT_KEY_ENV)
+        
+        material = {
+            'command': command,
+            'scripts': self._script_digests(command, project_dir),
+            'env': {name: env.get(name) for name in key_env},
+            'config': self._config_digest,
+            'stage': {k: v for k, v in stage_config.items() if k not in ('rollback_command', 'order')},
+            'inputs': self.input_digests(stage_config),
+            'dependencies': list(dependency_keys)
+        }
+        return self._hash_json(material)
+    
+    def input_digests(self, stage_config: Dict) -> Dict[str, str]:
+        """SHA-256 of the input files (source tarballs by default) of a stage"""
+        inputs = stage_config.get('inputs', self.options.get('inputs', ['sources/*']))
+        digests = {}
+        for pattern in inputs:
+            for path in sorted(Path(self.lfs_root).glob(pattern)):
+                if path.is_file():
+                    digests[str(path.relative_to(self.lfs_root))] = self._file_digest(path)
+        if digests:
+            self._save_digest_memo()
+        return digests
+    
+    def _script_digests(self, command: str, project_dir: str) -> Dict[str, str]:
+        digests = {}
+        for token in command.split():
+            path = Path(project_dir) / token
+            if token.startswith('scripts/') and path.is_file():
+                digests[token] = self._file_digest(path)
+        return digests
+    
+    def _file_digest(self, path: Path) -> str:
+        """Digest of a file, remembered by (size, mtime) so tarballs are hashed once"""
+        info = path.stat()
+        memo = self._load_digest_memo()
+        cache_key = str(path)
+        cached = memo.get(cache_key)
+        if cached and cached[0] == info.st_size and cached[1] == info.st_mtime_ns:
+            return cached[2]
+        
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(block)
+        memo[cache_key] = [info.st_size, info.st_mtime_ns, sha256.hexdigest()]
+        return memo[cache_key][2]
+    
+    @staticmethod
+    def _hash_json(data) -> str:
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def lookup(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry and not (self.root_dir / key / 'delta.tar').exists():
+                self._load_index().pop(key, None)
+                self._save_index()
+                entry = None
+            if entry:
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+            return dict(entry) if entry else None
+    
+    def snapshot(self) -> Optional[Dict]:
+        """Manifest of the LFS tree taken before a stage runs"""
+        if not os.path.isdir(self.lfs_root):
+            return None
+        return scan_tree(self.lfs_root, self.options.get('exclude', DEFAULT_TREE_EXCLUDES))
+    
+    def store(self, key: str, stage_name: str, before: Dict, build_id: str = None,
+              output: str = '') -> Optional[Dict]:
+        """Archive the filesystem delta a stage made since ``before``"""
+        if before is None:
+            return None
+        
+        after = scan_tree(self.lfs_root, self.options.get('exclude', DEFAULT_TREE_EXCLUDES))
+        changed, removed = diff_manifests(before, after)
+        
+        entry_dir = self.root_dir / key
+        staging_dir = self.root_dir / f".{key}.{os.getpid()}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+        
+        try:
+            compression = self.options.get('compression', 'gz')
+            mode = f"w:{compression}" if compression else 'w'
+            kwargs = {'compresslevel': 1} if compression == 'gz' else {}
+            with tarfile.open(staging_dir / 'delta.tar', mode, **kwargs) as archive:
+                for path in changed:
+                    # Directories are added without recursion; their changed children are listed themselves
+                    archive.add(os.path.join(self.lfs_root, path), arcname=path, recursive=False)
+            
+            (staging_dir / 'removed.json').write_text(json.dumps(removed))
+            (staging_dir / 'output.log').write_text(output[-200000:])
+            
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging_dir, entry_dir)
+        except (OSError, tarfile.TarError) as e:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            print(f"⚠️ Could not archive stage {stage_name} for the stage cache: {e}")
+            return None
+        
+        entry = {
+            'stage': stage_name,
+            'build_id': build_id,
+            'created': time.time(),
+            'last_used': time.time(),
+            'size_bytes': (entry_dir / 'delta.tar').stat().st_size,
+            'changed': len(changed),
+            'removed': len(removed)
+        }
+        with self._lock:
+            self._load_index()[key] = entry
+            self.stats['stored'] += 1
+            self._evict()
+            self._save_index()
+        return entry
+    
+    def restore(self, key: str) -> bool:
+        """Apply a cached stage delta to the LFS tree in place of running the stage"""
+        entry_dir = self.root_dir / key
+        try:
+            removed = json.loads((entry_dir / 'removed.json').read_text())
+            for path in sorted(removed, reverse=True):
+                target = os.path.join(self.lfs_root, path)
+                if os.path.isdir(target) and not os.path.islink(target):
+                    shutil.rmtree(target, ignore_errors=True)
+                elif os.path.lexists(target):
+                    os.unlink(target)
+            
+            with tarfile.open(entry_dir / 'delta.tar', 'r:*') as archive:
+                if hasattr(tarfile, 'data_filter'):
+                    archive.extractall(self.lfs_root, filter='fully_trusted')
+                else:
+                    archive.extractall(self.lfs_root)
+        except (OSError, ValueError, tarfile.TarError) as e:
+            print(f"⚠️ Failed to restore cached stage {key[:12]}: {e}")
+            self.stats['restore_failures'] += 1
+            self.invalidate(key=key)
+            return False
+        
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry:
+                entry['last_used'] = time.time()
+                self._save_index()
+        return True
+    
+    def cached_output(self, key: str) -> str:
+        try:
+            return (self.root_dir / key / 'output.log').read_text()
+        except OSError:
+            return ''
+    
+    def invalidate(self, stage_name: str = None, key: str = None) -> int:
+        """Drop cached results of a stage (or one key, or everything); returns entries removed"""
+        with self._lock:
+            index = self._load_index()
+            if key:
+                keys = [key] if key in index else []
+            elif stage_name:
+                keys = [k for k, entry in index.items() if entry.get('stage') == stage_name]
+            else:
+                keys = list(index)
+            
+            for k in keys:
+                index.pop(k, None)
+                shutil.rmtree(self.root_dir / k, ignore_errors=True)
+            self._save_index()
+            return len(keys)
+    
+    def _evict(self):
+        """Remove least recently used entries beyond the size budget"""
+        index = self._load_index()
+        budget = self.max_size_gb * 1024 ** 3
+        total = sum(entry.get('size_bytes', 0) for entry in index.values())
+        
+        for k, entry in sorted(index.items(), key=lambda item: item[1].get('last_used', 0)):
+            if total <= budget:
+                break
+            index.pop(k, None)
+            shutil.rmtree(self.root_dir / k, ignore_errors=True)
+            total -= entry.get('size_bytes', 0)
+            print(f"🧹 Evicted cached stage {entry.get('stage')} ({k[:12]})")
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            index = self._load_index()
+            return {
+                **self.stats,
+                'entries': len(index),
+                'size_mb': round(sum(e.get('size_bytes', 0) for e in index.values()) / (1024 * 1024), 1),
+                'max_size_gb': self.max_size_gb
+            }
+    
+    def _load_index(self) -> Dict:
+        if self._index is None:
+            try:
+                self._index = json.loads((self.root_dir / 'index.json').read_text())
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+    
+    def _save_index(self):
+        self._write_json(self.root_dir / 'index.json', self._load_index())
+    
+    def _load_digest_memo(self) -> Dict:
+        if self._digest_memo is None:
+            try:
+                self._digest_memo = json.loads((self.root_dir / 'digests.json').read_text())
+            except (OSError, ValueError):
+                self._digest_memo = {}
+        return self._digest_memo
+    
+    def _save_digest_memo(self):
+        self._write_json(self.root_dir / 'digests.json', self._load_digest_memo())
+    
+    @staticmethod
+    def _write_json(path: Path, data):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write {path}: {e}")
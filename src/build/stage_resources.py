@@ -0,0 +1,427 @@
+import os
+import re
+import sys
+import time
+import signal
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+CGROUP_MOUNT = Path('/sys/fs/cgroup')
+PSI_RESOURCES = ('cpu', 'memory', 'io')
+_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+# Holds a spawned stage until the parent has moved it into its cgroup, then
+# execs the stage shell; nothing of the stage runs (or forks) before the move
+_CGROUP_GATE = (
+    "import os, sys\n"
+    "gate = int(sys.argv[1])\n"
+    "released = os.read(gate, 1)\n"
+    "os.close(gate)\n"
+    "if released != b'1':\n"
+    "    sys.exit(125)\n"
+    "os.execv('/bin/sh', ['/bin/sh', '-c', sys.argv[2]])\n"
+)
+
+def parse_size(value) -> Optional[int]:
+    """Bytes of a size such as 8G, 512M or a plain number"""
+    if value in (None, '', 'max'):
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * _SIZE_UNITS.get(match.group(2).upper(), 1))
+
+def read_pressure(path: Path) -> Dict[str, float]:
+    """Cumulative stall seconds ('some' and 'full') of a PSI file"""
+    totals = {}
+    try:
+        for line in path.read_text().splitlines():
+            kind, _, fields = line.partition(' ')
+            total = re.search(r'total=(\d+)', fields)
+            if total:
+                totals[kind] = int(total.group(1)) / 1e6
+    except OSError:
+        pass
+    return totals
+
+class StageResourceScope:
+    """Accounting (and optional limits) for the process tree of one stage"""
+    
+    method = 'none'
+    
+    def __init__(self, name: str, limits: Dict = None):
+        self.name = name
+        self.limits = limits or {}
+        self.process = None
+        self.started_at = None
+        self.usage = None
+    
+    def spawn(self, command: str, **popen_kwargs) -> subprocess.Popen:
+        """Start a stage's shell command in this scope"""
+        process = subprocess.Popen(command, shell=True, **popen_kwargs)
+        self.attach(process)
+        return process
+    
+    def attach(self, process):
+        self.process = process
+        self.started_at = time.time()
+    
+    def close(self) -> Dict:
+        """Stop accounting and return the stage usage; safe to call more than once"""
+        if self.usage is None:
+            self.usage = self._collect()
+            self.usage['method'] = self.method
+            self.usage['wall_seconds'] = round(time.time() - self.started_at, 2) if self.started_at else 0
+        return self.usage
+    
+    def _collect(self) -> Dict:
+        return {}
+
+class CgroupStageScope(StageResourceScope):
+    """Runs a stage in its own cgroup v2 and reads exact counters from it"""
+    
+    method = 'cgroup'
+    
+    def __init__(self, name: str, parent: Path, limits: Dict = None):
+        super().__init__(name, limits)
+        self.path = parent / name
+        self.path.mkdir()
+        self._procs_file = str(self.path / 'cgroup.procs')
+        self._pressure_before = {}
+        self._apply_limits()
+    
+    def _apply_limits(self):
+        memory_max = parse_size(self.limits.get('memory_max'))
+        if memory_max:
+            self._write('memory.max', str(memory_max))
+            # Reclaim hard before the cap so the kernel throttles instead of OOM killing at once
+            self._write('memory.high', str(int(memory_max * 0.9)))
+            self._write('memory.swap.max', '0')
+        if self.limits.get('cpu_max'):
+            period = 100000
+            self._write('cpu.max', f"{int(float(self.limits['cpu_max']) * period)} {period}")
+        if self.limits.get('io_weight'):
+            self._write('io.weight', str(int(self.limits['io_weight'])))
+    
+    def spawn(self, command: str, **popen_kwargs) -> subprocess.Popen:
+        """Start the command held at a gate, move it into the cgroup from here, then release it
+        
+        The move happens in the parent rather than in a ``preexec_fn``, which
+        is not safe while other threads (monitors, the commit queue) run.
+        """
+        gate_read, gate_write = os.pipe()
+        try:
+            process = subprocess.Popen([sys.executable, '-I', '-c', _CGROUP_GATE, str(gate_read), command],
+                                       pass_fds=(gate_read,), **popen_kwargs)
+        except BaseException:
+            os.close(gate_write)
+            raise
+        finally:
+            os.close(gate_read)
+        
+        try:
+            try:
+                with open(self._procs_file, 'w') as f:
+                    f.write(str(process.pid))
+            except OSError as e:
+                print(f"⚠️ Could not move stage {self.name} into its cgroup, it runs unaccounted: {e}")
+            os.write(gate_write, b'1')
+        finally:
+            os.close(gate_write)
+        self.attach(process)
+        return process
+    
+    def attach(self, process):
+        super().attach(process)
+        self._pressure_before = {resource_name: read_pressure(self.path / f"{resource_name}.pressure")
+                                 for resource_name in PSI_RESOURCES}
+    
+    def _collect(self) -> Dict:
+        cpu = self._read_keyed('cpu.stat')
+        memory_events = self._read_keyed('memory.events')
+        
+        read_bytes = write_bytes = 0
+        for line in self._read('io.stat').splitlines():
+            read_bytes += sum(int(v) for v in re.findall(r'rbytes=(\d+)', line))
+            write_bytes += sum(int(v) for v in re.findall(r'wbytes=(\d+)', line))
+        
+        peak = self._read('memory.peak').strip()
+        usage = {
+            'cpu_seconds': round(cpu.get('usage_usec', 0) / 1e6, 2),
+            'user_seconds': round(cpu.get('user_usec', 0) / 1e6, 2),
+            'system_seconds': round(cpu.get('system_usec', 0) / 1e6, 2),
+            'cpu_throttled_seconds': round(cpu.get('throttled_usec', 0) / 1e6, 2),
+            'peak_memory_bytes': int(peak) if peak.isdigit() else 0,
+            'read_bytes': read_bytes,
+            'write_bytes': write_bytes,
+            'oom_kills': memory_events.get('oom_kill', 0),
+            'memory_high_events': memory_events.get('high', 0)
+        }
+        
+        for resource_name in PSI_RESOURCES:
+            after = read_pressure(self.path / f"{resource_name}.pressure")
+            before = self._pressure_before.get(resource_name, {})
+            usage[f"{resource_name}_pressure_seconds"] = round(after.get('some', 0) - before.get('some', 0), 2)
+        
+        self._remove()
+        return usage
+    
+    def _remove(self):
+        """Kill stragglers left by the stage and delete the cgroup"""
+        kill_file = self.path / 'cgroup.kill'
+        if kill_file.exists():
+            self._write('cgroup.kill', '1')
+        else:
+            for pid in self._read('cgroup.procs').split():
+                try:
+                    os.kill(int(pid), signal.SIGKILL)
+                except (OSError, ValueError):
+                    pass
+        
+        for _ in range(50):
+            try:
+                self.path.rmdir()
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.1)
+        print(f"⚠️ Could not remove cgroup {self.path}")
+    
+    def _read(self, filename: str) -> str:
+        try:
+            return (self.path / filename).read_text()
+        except OSError:
+            return ''
+    
+    def _read_keyed(self, filename: str) -> Dict[str, int]:
+        values = {}
+        for line in self._read(filename).splitlines():
+            key, _, value = line.partition(' ')
+            if value.strip().isdigit():
+                values[key] = int(value)
+        return values
+    
+    def _write(self, filename: str, value: str):
+        try:
+            (self.path / filename).write_text(value)
+        except OSError as e:
+            print(f"⚠️ Could not set {filename}={value} for stage cgroup {self.name}: {e}")
+
+def _tree_counters(proc) -> Dict[str, float]:
+    """CPU seconds and storage I/O of a process, its reaped descendants and its live ones
+    
+    The kernel folds a reaped child's CPU time and I/O into its parent's
+    children counters, so adding the live children recursively counts every
+    process of the tree exactly once.
+    """
+    import psutil
+    
+    times = proc.cpu_times()
+    totals = {
+        'user': times.user + getattr(times, 'children_user', 0),
+        'system': times.system + getattr(times, 'children_system', 0),
+        'read_bytes': 0,
+        'write_bytes': 0
+    }
+    try:
+        io = proc.io_counters()
+        totals['read_bytes'], totals['write_bytes'] = io.read_bytes, io.write_bytes
+    except (psutil.Error, AttributeError):
+        pass
+    for child in proc.children():
+        try:
+            for key, value in _tree_counters(child).items():
+                totals[key] += value
+        except psutil.Error:
+            pass
+    return totals
+
+class ProcessTreeStageScope(StageResourceScope):
+    """psutil based accounting when cgroups are unavailable.
+    
+    CPU time, block I/O and peak memory come from sampling the stage's own
+    process tree, so other stages, git or workers running at the same time
+    are not counted. Work done after the last sample before the stage exits
+    is missed, so the figures are a lower bound within one sample interval.
+    A memory cap is enforced by killing the tree. Pressure is host wide,
+    not per stage.
+    """
+    
+    method = 'process_tree'
+    
+    def __init__(self, name: str, limits: Dict = None, sample_interval: float = 1.0):
+        super().__init__(name, limits)
+        self.sample_interval = sample_interval
+        self.memory_max = parse_size(self.limits.get('memory_max'))
+        self.peak_memory_bytes = 0
+        self.oom_kills = 0
+        self.counters = {'user': 0.0, 'system': 0.0, 'read_bytes': 0, 'write_bytes': 0}
+        self._pressure_before = {}
+        self._stop = threading.Event()
+        self._sampler = None
+    
+    def attach(self, process):
+        super().attach(process)
+        self._pressure_before = {name: read_pressure(Path('/proc/pressure') / name) for name in PSI_RESOURCES}
+        if self.limits.get('cpu_max'):
+            print(f"⚠️ cpu_max for stage {self.name} needs cgroup v2 and is not enforced")
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+    
+    def _sample_loop(self):
+        try:
+            import psutil
+        except ImportError:
+            return
+        
+        try:
+            root = psutil.Process(self.process.pid)
+        except psutil.Error:
+            return
+        
+        while not self._stop.is_set():
+            try:
+                tree = [root] + root.children(recursive=True)
+            except psutil.Error:
+                break
+            
+            rss = 0
+            for proc in tree:
+                try:
+                    rss += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak_memory_bytes = max(self.peak_memory_bytes, rss)
+            try:
+                sample = _tree_counters(root)
+            except psutil.Error:
+                break
+            # Counters only grow; keep the largest reading of each
+            for key, value in sample.items():
+                self.counters[key] = max(self.counters[key], value)
+            
+            if self.memory_max and rss > self.memory_max:
+                print(f"🛑 Stage {self.name} exceeded its memory cap ({rss // (1024 * 1024)} MB), killing it")
+                for proc in reversed(tree):
+                    try:
+                        proc.kill()
+                    except psutil.Error:
+                        pass
+                self.oom_kills += 1
+                break
+            
+            self._stop.wait(self.sample_interval)
+    
+    def _collect(self) -> Dict:
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=5)
+        
+        user, system = self.counters['user'], self.counters['system']
+        usage = {
+            'cpu_seconds': round(user + system, 2),
+            'user_seconds': round(user, 2),
+            'system_seconds': round(system, 2),
+            'cpu_throttled_seconds': 0,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'read_bytes': self.counters['read_bytes'],
+            'write_bytes': self.counters['write_bytes'],
+            'oom_kills': self.oom_kills,
+            'memory_high_events': 0
+        }
+        
+        for name in PSI_RESOURCES:
+            pressure_after = read_pressure(Path('/proc/pressure') / name)
+            pressure_before = self._pressure_before.get(name, {})
+            usage[f"{name}_pressure_seconds"] = round(
+                pressure_after.get('some', 0) - pressure_before.get('some', 0), 2)
+        return usage
+
+class StageResourceManager:
+    """Creates a resource scope per stage, preferring cgroup v2 over psutil accounting"""
+    
+    def __init__(self, cgroup_base: str = None):
+        self.configured_base = cgroup_base or os.environ.get('LFS_CGROUP_BASE')
+        self.options = {}
+        self._cgroup_parent = None
+        self._probed = False
+    
+    def configure(self, build_config: Dict):
+        """Apply the ``resources`` section of a build configuration"""
+        self.options = build_config.get('resources', {}) or {}
+        if self.options.get('cgroup_base'):
+            self.configured_base = self.options['cgroup_base']
+            self._probed = False
+    
+    @property
+    def cgroup_parent(self) -> Optional[Path]:
+        if not self._probed:
+            self._probed = True
+            self._cgroup_parent = None if self.options.get('method') == 'process_tree' else self._find_cgroup_parent()
+            if self._cgroup_parent:
+                print(f"📏 Stage resource accounting via cgroup v2 under {self._cgroup_parent}")
+            else:
+                print("📏 cgroup v2 not writable - stage resource accounting falls back to process tree sampling")
+        return self._cgroup_parent
+    
+    def open_scope(self, build_id: str, stage_name: str, stage_limits: Dict = None) -> StageResourceScope:
+        limits = dict(self.options.get('default_limits', {}) or {})
+        limits.update(stage_limits or {})
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '-', f"{stage_name}-{build_id}")[:200]
+        
+        parent = self.cgroup_parent
+        if parent is not None:
+            try:
+                return CgroupStageScope(name, parent, limits)
+            except OSError as e:
+                print(f"⚠️ Could not create cgroup for stage {stage_name}: {e}")
+        return ProcessTreeStageScope(name, limits, float(self.options.get('sample_interval', 1.0)))
+    
+    def _find_cgroup_parent(self) -> Optional[Path]:
+        if not (CGROUP_MOUNT / 'cgroup.controllers').exists():
+            return None
+        
+        candidates = []
+        if self.configured_base:
+            candidates.append(Path(self.configured_base))
+        candidates.append(CGROUP_MOUNT / 'lfs-build')
+        
+        for candidate in candidates:
+            if self._prepare_parent(candidate, move_self=False):
+                return candidate
+        
+        # Delegated cgroup (e.g. systemd-run --user -p Delegate=yes): move the engine
+        # into a leaf so controllers can be enabled for sibling stage cgroups
+        own = self._own_cgroup()
+        if own is not None and os.access(own, os.W_OK) and self._prepare_parent(own, move_self=True):
+            return own
+        return None
+    
+    @staticmethod
+    def _own_cgroup() -> Optional[Path]:
+        try:
+            for line in Path('/proc/self/cgroup').read_text().splitlines():
+                if line.startswith('0::'):
+                    return CGROUP_MOUNT / line[3:].lstrip('/')
+        except OSError:
+            pass
+        return None
+    
+    @staticmethod
+    def _prepare_parent(parent: Path, move_self: bool) -> bool:
+        try:
+            parent.mkdir(exist_ok=True)
+            if move_self:
+                engine_leaf = parent / 'lfs-engine'
+                engine_leaf.mkdir(exist_ok=True)
+                (engine_leaf / 'cgroup.procs').write_text(str(os.getpid()))
+            available = (parent / 'cgroup.controllers').read_text().split()
+            wanted = [c for c in ('cpu', 'memory', 'io') if c in available]
+            if wanted:
+                (parent / 'cgroup.subtree_control').write_text(' '.join(f"+{c}" for c in wanted))
+            return 'memory' in wanted and 'cpu' in wanted
+        except OSError:
+            return False
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .stage_resources import parse_size
+
+def _meminfo_available() -> Optional[int]:
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+class BuildWorkspace:
+    """The plain source directory: stages extract and compile on the LFS disk"""
+    
+    backend = 'plain'
+    
+    def __init__(self, build_id: str, stage_name: str, target: Path):
+        self.build_id = build_id
+        self.stage_name = stage_name
+        self.target = target
+        self.size_budget = None
+        self.peak_bytes = 0
+        self.setup_seconds = 0.0
+        self.teardown_seconds = 0.0
+        self.synced_files = []
+        self.spilled = False
+        self.note = None
+    
+    def mount(self, run):
+        pass
+    
+    def release(self, run) -> Dict:
+        return self.stats()
+    
+    def usage_fraction(self) -> float:
+        return 0.0
+    
+    def stats(self) -> Dict:
+        return {
+            'backend': self.backend,
+            'target': str(self.target),
+            'size_budget_bytes': self.size_budget,
+            'peak_bytes': self.peak_bytes,
+            'setup_seconds': round(self.setup_seconds, 2),
+            'teardown_seconds': round(self.teardown_seconds, 2),
+            'synced_files': list(self.synced_files),
+            'spilled': self.spilled,
+            'note': self.note
+        }
+
+class OverlayWorkspace(BuildWorkspace):
+    """An overlayfs over the source directory with its writable layer on disk
+    
+    Tarballs and patches stay visible from the pristine lower directory while
+    extracted trees and objects land in the upper layer, which is discarded at
+    teardown instead of being deleted file by file. New top-level files (a
+    tarball fetched by a stage) are copied back into the base first.
+    """
+    
+    backend = 'overlay'
+    
+    def __init__(self, build_id: str, stage_name: str, target: Path, scratch: Path):
+        super().__init__(build_id, stage_name, target)
+        self.scratch = scratch
+        self.upper = scratch / 'upper'
+        self.work = scratch / 'work'
+        self.mounted = False
+        self._stop = threading.Event()
+        self._watcher = None
+    
+    def _prepare_scratch(self, run):
+        self.scratch.mkdir(parents=True, exist_ok=True)
+    
+    def mount(self, run):
+        started = time.time()
+        self._prepare_scratch(run)
+        run(['mkdir', '-p', str(self.upper), str(self.work)])
+        run(['mount', '-t', 'overlay', 'overlay', '-o',
+             f"lowerdir={self.target},upperdir={self.upper},workdir={self.work}", str(self.target)])
+        self.mounted = True
+        self.setup_seconds = time.time() - started
+        self._watcher = threading.Thread(target=self._watch, name=f"workspace-{self.stage_name}", daemon=True)
+        self._watcher.start()
+    
+    def _watch(self):
+        while not self._stop.wait(self._watch_interval()):
+            self.peak_bytes = max(self.peak_bytes, self._used_bytes())
+    
+    def _watch_interval(self) -> float:
+        # Walking a disk upper layer is not free; sample it rarely
+        return 60.0
+    
+    def _used_bytes(self) -> int:
+        return _tree_size(self.upper)
+    
+    def release(self, run) -> Dict:
+        if not self.mounted:
+            return self.stats()
+        started = time.time()
+        self._stop.set()
+        self.peak_bytes = max(self.peak_bytes, self._used_bytes())
+        
+        if run(['umount', str(self.target)], check=False) != 0:
+            # Something still has a cwd in the workspace; detach it and let the kernel finish
+            run(['umount', '-l', str(self.target)], check=False)
+        self.mounted = False
+        
+        self._sync_back(run)
+        self._discard_scratch(run)
+        self.teardown_seconds = time.time() - started
+        return self.stats()
+    
+    def _sync_back(self, run):
+        """Copy new top-level files of the upper layer into the base directory"""
+        try:
+            entries = list(self.upper.iterdir())
+        except OSError:
+            return
+        for entry in entries:
+            # Whiteouts (character devices 0:0) record deletions; the base keeps its files
+            if not entry.is_file() or entry.is_symlink():
+                continue
+            run(['cp', '-p', str(entry), str(self.target / entry.name)], check=False)
+            self.synced_files.append(entry.name)
+    
+    def _discard_scratch(self, run):
+        run(['rm', '-rf', str(self.scratch)], check=False)
+        try:
+            self.scratch.parent.rmdir()
+        except OSError:
+            pass
+
+class TmpfsWorkspace(OverlayWorkspace):
+    """An overlay whose writable layer lives on a size-capped tmpfs"""
+    
+    backend = 'tmpfs'
+    
+    def __init__(self, build_id: str, stage_name: str, target: Path, scratch: Path, size_budget: int):
+        super().__init__(build_id, stage_name, target, scratch)
+        self.size_budget = size_budget
+    
+    def _prepare_scratch(self, run):
+        super()._prepare_scratch(run)
+        run(['mount', '-t', 'tmpfs', '-o', f"size={self.size_budget},mode=0755", 'lfs-workspace', str(self.scratch)])
+    
+    def _watch_interval(self) -> float:
+        return 5.0
+    
+    def _used_bytes(self) -> int:
+        try:
+            stat = os.statvfs(self.scratch)
+            return (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+        except OSError:
+            return 0
+    
+    def usage_fraction(self) -> float:
+        if not self.size_budget:
+            return 0.0
+        return max(self.peak_bytes, self._used_bytes() if self.mounted else 0) / self.size_budget
+    
+    def _discard_scratch(self, run):
+        if run(['umount', str(self.scratch)], check=False) != 0:
+            run(['umount', '-l', str(self.scratch)], check=False)
+        super()._discard_scratch(run)
+
+class WorkspaceManager:
+    """Chooses and manages the source workspace of each build stage
+    
+    Configured by the ``workspace`` section of a build configuration:
+    ``backend`` is ``tmpfs``, ``overlay``, ``plain`` or ``auto`` (tmpfs when the
+    stage's previous peak fits the ``tmpfs_size`` budget and free memory,
+    otherwise an overlay on disk). Stages can override it with their own
+    ``workspace`` key. Mounting needs root or password-less sudo; when it fails
+    the stage falls back to the plain directory. Peak usage per stage is kept
+    across builds so later builds spill big stages to disk up front.
+    """
+    
+    DEFAULT_STAGES = ['build_toolchain', 'build_temp_system', 'build_final_system']
+    HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'workspace-history.json')
+    
+    def __init__(self):
+        self.options = {}
+        self.active: Dict[str, BuildWorkspace] = {}
+        self._lock = threading.Lock()
+    
+    def configure(self, build_config: Dict):
+        self.options = build_config.get('workspace', {}) or {}
+    
+    def applies_to(self, stage_config: Dict) -> bool:
+        if stage_config.get('workspace'):
+            return stage_config['workspace'] != 'plain'
+        return (self.options.get('backend', 'plain') != 'plain'
+                and stage_config.get('name') in self.options.get('stages', self.DEFAULT_STAGES))
+    
+    def acquire(self, build_id: str, stage_config: Dict, force_backend: str = None) -> BuildWorkspace:
+        """Mount the workspace of a stage; never raises, falls back to the plain directory"""
+        stage_name = stage_config['name']
+        lfs_root = Path(self.options.get('lfs_root', os.environ.get('LFS', '/mnt/lfs')))
+        target = Path(self.options.get('source_dir', lfs_root / 'sources'))
+        plain = BuildWorkspace(build_id, stage_name, target)
+        if not force_backend and not self.applies_to(stage_config):
+            return plain
+        
+        backend = force_backend or stage_config.get('workspace') or self.options.get('backend', 'plain')
+        size_budget = parse_size(self.options.get('tmpfs_size', '16G'))
+        if backend == 'auto':
+            backend, reason = self._choose_backend(stage_name, size_budget)
+            print(f"🗂️ Workspace for {stage_name}: {backend} ({reason})")
+        
+        scratch_root = Path(self.options.get('scratch_dir', lfs_root / '.workspaces'))
+        scratch = scratch_root / f"{build_id}-{stage_name}"
+        if backend == 'tmpfs':
+            workspace = TmpfsWorkspace(build_id, stage_name, target, scratch, size_budget)
+        elif backend == 'overlay':
+            workspace = OverlayWorkspace(build_id, stage_name, target, scratch)
+        else:
+            return plain
+        
+        try:
+            if not target.is_dir():
+                raise OSError(f"{target} does not exist")
+            workspace.mount(self._run)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ Could not mount {backend} workspace for {stage_name}, using {target} directly: {e}")
+            if workspace.mounted:
+                workspace.release(self._run)
+            else:
+                workspace._discard_scratch(self._run)
+            plain.note = f"{backend} workspace unavailable: {e}"
+            return plain
+        
+        with self._lock:
+            self.active[f"{build_id}:{stage_name}"] = workspace
+        print(f"🗂️ Mounted {backend} workspace over {target} for {stage_name}"
+              f"{f' ({size_budget // (1024 * 1024)} MB budget)' if backend == 'tmpfs' else ''}")
+        return workspace
+    
+    def release(self, workspace: BuildWorkspace) -> Dict:
+        """Unmount a stage workspace and remember its peak usage"""
+        with self._lock:
+            self.active.pop(f"{workspace.build_id}:{workspace.stage_name}", None)
+        stats = workspace.release(self._run)
+        if workspace.backend != 'plain':
+            self._remember_peak(workspace.stage_name, workspace.peak_bytes)
+        return stats
+    
+    def should_spill(self, workspace: BuildWorkspace, stage_output: str = '') -> bool:
+        """Whether a failed stage ran out of room in its tmpfs and should be rerun on disk"""
+        if workspace.backend != 'tmpfs' or not self.options.get('spill_on_full', True):
+            return False
+        return workspace.usage_fraction() >= 0.95 or 'No space left on device' in (stage_output or '')
+    
+    def teardown_all(self, build_id: str) -> List[str]:
+        """Release every workspace a build still has mounted; returns cleanup actions"""
+        with self._lock:
+            workspaces = [w for key, w in self.active.items() if key.startswith(f"{build_id}:")]
+        actions = []
+        for workspace in workspaces:
+            self.release(workspace)
+            actions.append(f"Unmounted {workspace.backend} workspace of stage {workspace.stage_name} "
+                           f"(peak {workspace.peak_bytes // (1024 * 1024)} MB)")
+        return actions
+    
+    def _choose_backend(self, stage_name: str, size_budget: int):
+        available = _meminfo_available()
+        reserve = parse_size(self.options.get('memory_reserve', '4G'))
+        expected = self._load_history().get(stage_name)
+        if available is not None and available - reserve < size_budget:
+            return 'overlay', f"only {available // (1024 ** 3)} GB memory available"
+        if expected and expected > size_budget * 0.9:
+            return 'overlay', f"previous peak {expected // (1024 ** 3)} GB exceeds the tmpfs budget"
+        return 'tmpfs', 'fits the tmpfs budget'
+    
+    def _remember_peak(self, stage_name: str, peak_bytes: int):
+        if not peak_bytes:
+            return
+        history = self._load_history()
+        history[stage_name] = peak_bytes
+        try:
+            os.makedirs(os.path.dirname(self.HISTORY_PATH), exist_ok=True)
+            with open(self.HISTORY_PATH, 'w') as f:
+                json.dump(history, f, indent=2)
+        except OSError:
+            pass
+    
+    def _load_history(self) -> Dict:
+        try:
+            with open(self.HISTORY_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def _run(command: List[str], check: bool = True) -> int:
+        """Run a mount-related command as root, through password-less sudo if needed"""
+        if os.geteuid() != 0 and shutil.which('sudo'):
+            command = ['sudo', '-n'] + command
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, timeout=120)
+        if check and result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, command, stderr=result.stderr)
+        return result.returncode
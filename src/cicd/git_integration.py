@@ -1,18 +1,45 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import json
+import time
+import hashlib
+import threading
 import subprocess
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from .path_filter import PathFilter
+
+# Git hooks drop trigger events here; the running application picks them up
+TRIGGER_SPOOL = os.environ.get('LFS_CICD_TRIGGER_SPOOL', os.path.join(
+    os.path.expanduser('~'), '.cache', 'lfs-build', 'cicd-triggers'))
+
 class GitIntegration:
-    """Git integration for CI/CD pipeline triggers"""
+    """Git integration for CI/CD pipeline triggers
+    
+    Hooks only record the newest commit per branch in the trigger spool, so a
+    burst of pushes collapses into one event; the trigger watcher waits until
+    a branch has been quiet for ``debounce_seconds`` and then triggers for the
+    newest commit with the files changed since the last triggered one.
+    Pipelines declare ``paths``/``paths_ignore`` under their trigger, jobs
+    declare ``changes``; both are matched against those files.
+    """
     
-    def __init__(self, pipeline_engine, repo_manager):
+    def __init__(self, pipeline_engine, repo_manager, debounce_seconds: float = 5, spool_dir: str = None):
         self.pipeline_engine = pipeline_engine
         self.repo_manager = repo_manager
         self.hooks_installed = False
+        self.debounce_seconds = debounce_seconds
+        self.spool_dir = spool_dir or TRIGGER_SPOOL
+        self.last_triggered = self._load_last_triggered()
+        self.pipeline_cache_seconds = 30
+        self._pipelines = None
+        self._pipelines_loaded = 0
+        self._rules = {}
+        self._watcher = None
+        self._watching = threading.Event()
         
     def setup_git_hooks(self):
         """Setup Git hooks for automatic pipeline triggering"""
@@ -34,6 +61,8 @@ class GitIntegration:
             
             self.hooks_installed = True
             print("✅ Git hooks installed for CI/CD integration")
+            # The hooks only spool events; something has to pick them up
+            self.start_trigger_watcher()
             return True
             
         except Exception as e:
@@ -49,15 +78,14 @@ class GitIntegration:
 BRANCH=$(git rev-parse --abbrev-ref HEAD)
 COMMIT=$(git rev-parse HEAD)
 
-# Trigger CI/CD pipeline
+# Record the trigger; the LFS build application runs the pipelines
 python3 -c "
 import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.cicd.git_integration import trigger_on_commit
+sys.path.insert(0, '{src_dir}')
+from cicd.git_integration import trigger_on_commit
 trigger_on_commit('$BRANCH', '$COMMIT')
 "
-'''
+'''.replace('{src_dir}', self._source_dir())
         
         with open(hook_path, 'w') as f:
             f.write(hook_content)
@@ -74,15 +102,14 @@ trigger_on_commit('$BRANCH', '$COMMIT')
 BRANCH=$(git rev-parse --abbrev-ref HEAD)
 COMMIT=$(git rev-parse HEAD)
 
-# Trigger CI/CD pipeline for merge
+# Record the trigger; the LFS build application runs the pipelines
 python3 -c "
 import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.cicd.git_integration import trigger_on_merge
+sys.path.insert(0, '{src_dir}')
+from cicd.git_integration import trigger_on_merge
 trigger_on_merge('$BRANCH', '$COMMIT')
 "
-'''
+'''.replace('{src_dir}', self._source_dir())
         
         with open(hook_path, 'w') as f:
             f.write(hook_content)
@@ -90,78 +117,188 @@ trigger_on_merge('$BRANCH', '$COMMIT')
         # Make executable
         os.chmod(hook_path, 0o755)
     
-    def trigger_pipelines_for_branch(self, branch: str, commit_hash: str, trigger_type: str = 'push'):
-        """Trigger pipelines configured for a specific branch"""
-        try:
-            # Get all active pipelines
-            pipelines = self.pipeline_engine.db.execute_query("""
+    @staticmethod
+    def _source_dir() -> str:
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    def _active_pipelines(self) -> List[Dict]:
+        """Active pipelines, re-read from the database at most every ``pipeline_cache_seconds``"""
+        if self._pipelines is None or time.time() - self._pipelines_loaded > self.pipeline_cache_seconds:
+            self._pipelines = self.pipeline_engine.db.execute_query("""
                 SELECT id, name, config_path FROM cicd_pipelines 
                 WHERE status = 'active'
             """, fetch=True) or []
+            self._pipelines_loaded = time.time()
+        return self._pipelines
+    
+    def invalidate_pipeline_cache(self):
+        """Forget cached pipelines and rules (after creating or editing a pipeline)"""
+        self._pipelines = None
+        self._rules.clear()
+    
+    def _trigger_rules(self, pipeline_id: str, config: Dict, trigger_type: str) -> Optional[Dict]:
+        """Branch patterns and path filter of a pipeline's trigger, compiled once per config"""
+        key = (pipeline_id, trigger_type)
+        cached = self._rules.get(key)
+        if cached and cached[0] is config:
+            return cached[1]
+        
+        trigger = (config.get('triggers') or {}).get(trigger_type)
+        rules = None
+        if trigger is not None:
+            trigger = trigger or {}
+            branches = trigger.get('branches', ['main', 'master'])
+            rules = {
+                'branches': [re.compile(re.escape(pattern).replace(r'\*', '.*') + '$') for pattern in branches],
+                'paths': PathFilter(trigger.get('paths'), trigger.get('paths_ignore'))
+            }
+        self._rules[key] = (config, rules)
+        return rules
+    
+    def trigger_pipelines_for_branch(self, branch: str, commit_hash: str, trigger_type: str = 'push',
+                                     base_commit: str = None) -> List[str]:
+        """Trigger the pipelines whose branch and path rules match the changes since ``base_commit``"""
+        run_ids = []
+        try:
+            changed_files = self.get_changed_files(commit_hash, base_commit)
             
-            triggered_count = 0
-            
-            for pipeline in pipelines:
+            for pipeline in self._active_pipelines():
                 pipeline_id = pipeline['id']
                 config = self.pipeline_engine.get_pipeline_config(pipeline_id)
                 
                 if not config:
                     continue
                 
-                # Check if pipeline should trigger for this branch
-                if self.should_trigger_pipeline(config, branch, trigger_type):
+                # Check if pipeline should trigger for this branch and these changes
+                if self.should_trigger_pipeline(config, branch, trigger_type, changed_files, pipeline_id):
                     trigger_data = {
                         'branch': branch,
                         'commit': commit_hash,
+                        'base_commit': base_commit,
+                        'changed_files': changed_files,
                         'trigger_time': datetime.now().isoformat()
                     }
                     
+                    # Runs of merge triggers are recorded as pushes of the merge commit
                     run_id = self.pipeline_engine.trigger_pipeline(
-                        pipeline_id, trigger_type, trigger_data
+                        pipeline_id, 'push' if trigger_type == 'merge' else trigger_type, trigger_data
                     )
                     
                     print(f"🚀 Triggered pipeline '{pipeline['name']}' (run: {run_id})")
-                    triggered_count += 1
+                    run_ids.append(run_id)
             
-            if triggered_count > 0:
-                print(f"✅ Triggered {triggered_count} pipelines for {trigger_type} on {branch}")
+            if run_ids:
+                print(f"✅ Triggered {len(run_ids)} pipelines for {trigger_type} on {branch}")
             else:
-                print(f"ℹ️ No pipelines configured for {trigger_type} on {branch}")
+                print(f"ℹ️ No pipelines configured for {trigger_type} on {branch} "
+                      f"touching {len(changed_files) if changed_files is not None else 'unknown'} changed file(s)")
+            
+            self.last_triggered[branch] = commit_hash
+            self._save_last_triggered()
                 
         except Exception as e:
             print(f"❌ Error triggering pipelines: {e}")
+        return run_ids
     
-    def should_trigger_pipeline(self, config: Dict, branch: str, trigger_type: str) -> bool:
-        """Check if pipeline should trigger for given branch and trigger type"""
+    def should_trigger_pipeline(self, config: Dict, branch: str, trigger_type: str,
+                                changed_files: List[str] = None, pipeline_id: str = None) -> bool:
+        """Check if pipeline should trigger for given branch, trigger type and changed files"""
         try:
-            triggers = config.get('triggers', {})
-            
-            if trigger_type == 'push' and 'push' in triggers:
-                push_config = triggers['push']
-                target_branches = push_config.get('branches', ['main', 'master'])
-                
-                # Check if branch matches
-                if branch in target_branches:
-                    return True
-                
-                # Check for pattern matching
-                for pattern in target_branches:
-                    if '*' in pattern:
-                        # Simple wildcard matching
-                        if pattern.replace('*', '') in branch:
-                            return True
-            
-            elif trigger_type == 'merge' and 'merge' in triggers:
-                merge_config = triggers['merge']
-                target_branches = merge_config.get('branches', ['main', 'master'])
-                return branch in target_branches
-            
-            return False
+            rules = self._trigger_rules(pipeline_id or str(id(config)), config, trigger_type)
+            if rules is None:
+                return False
+            if not any(pattern.match(branch) for pattern in rules['branches']):
+                return False
+            # Unknown changes (None) trigger; a change set the filters exclude does not
+            return rules['paths'].any_match(changed_files)
             
         except Exception as e:
             print(f"❌ Error checking pipeline trigger conditions: {e}")
             return False
     
+    def _spool_path(self, branch: str) -> str:
+        return os.path.join(self.spool_dir, spool_file_name(branch))
+    
+    def notify_push(self, branch: str, commit_hash: str, trigger_type: str = 'push'):
+        """Record a new commit on a branch; replaces a pending one, so bursts collapse"""
+        record_trigger(branch, commit_hash, trigger_type, self.spool_dir)
+    
+    def process_pending_triggers(self, force: bool = False) -> List[str]:
+        """Trigger pipelines for branches that have been quiet for ``debounce_seconds``"""
+        run_ids = []
+        try:
+            entries = sorted(os.listdir(self.spool_dir))
+        except OSError:
+            return run_ids
+        
+        for name in entries:
+            path = os.path.join(self.spool_dir, name)
+            if not name.endswith('.json'):
+                continue
+            try:
+                if not force and time.time() - os.path.getmtime(path) < self.debounce_seconds:
+                    continue
+                # Claim the event first: only one watcher wins the rename, and a hook
+                # recording a newer commit meanwhile starts a fresh spool file
+                claimed = f"{path}.{os.getpid()}.{threading.get_ident()}.claimed"
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            try:
+                with open(claimed) as f:
+                    event = json.load(f)
+            except (OSError, ValueError):
+                continue
+            finally:
+                try:
+                    os.unlink(claimed)
+                except OSError:
+                    pass
+            
+            branch = event['branch']
+            if event.get('collapsed'):
+                print(f"🔀 {event['collapsed']} earlier commit(s) on {branch} superseded by {event['commit'][:8]}")
+            run_ids.extend(self.trigger_pipelines_for_branch(
+                branch, event['commit'], event.get('trigger_type', 'push'), self.last_triggered.get(branch)))
+        return run_ids
+    
+    def start_trigger_watcher(self, interval: float = 1.0):
+        """Poll the trigger spool in the background"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watching.set()
+        
+        def watch():
+            while self._watching.is_set():
+                self.process_pending_triggers()
+                time.sleep(interval)
+        
+        self._watcher = threading.Thread(target=watch, daemon=True, name='cicd-trigger-watcher')
+        self._watcher.start()
+    
+    def stop_trigger_watcher(self):
+        self._watching.clear()
+    
+    def _state_path(self) -> str:
+        return os.path.join(self.spool_dir, 'state', 'last_triggered.json')
+    
+    def _load_last_triggered(self) -> Dict[str, str]:
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_last_triggered(self):
+        try:
+            os.makedirs(os.path.dirname(self._state_path()), exist_ok=True)
+            temp_path = self._state_path() + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.last_triggered, f)
+            os.replace(temp_path, self._state_path())
+        except OSError as e:
+            print(f"❌ Error saving trigger state: {e}")
+    
     def get_commit_info(self, commit_hash: str) -> Dict:
         """Get detailed commit information"""
         try:
@@ -191,25 +328,31 @@ trigger_on_merge('$BRANCH', '$COMMIT')
             print(f"❌ Error getting commit info: {e}")
             return {'hash': commit_hash}
     
-    def get_changed_files(self, commit_hash: str) -> List[str]:
-        """Get list of files changed in commit"""
+    def get_changed_files(self, commit_hash: str, base_commit: str = None) -> Optional[List[str]]:
+        """Get list of files changed in commit, or since ``base_commit``; None if git cannot tell"""
         try:
             repo_path = getattr(self.repo_manager, 'repo_path', '.')
             
-            cmd = f"git diff-tree --no-commit-id --name-only -r {commit_hash}"
+            if base_commit:
+                cmd = ['git', 'diff', '--name-only', f"{base_commit}..{commit_hash}"]
+            else:
+                cmd = ['git', 'diff-tree', '--no-commit-id', '--name-only', '-r', '--root', '-m', commit_hash]
             result = subprocess.run(
-                cmd, shell=True, cwd=repo_path,
+                cmd, cwd=repo_path,
                 capture_output=True, text=True
             )
             
+            if result.returncode != 0 and base_commit:
+                # The base is gone (rebased or force-pushed): fall back to the commit itself
+                return self.get_changed_files(commit_hash)
             if result.returncode == 0:
-                return [f.strip() for f in result.stdout.split('\n') if f.strip()]
+                return sorted({f.strip() for f in result.stdout.split('\n') if f.strip()})
             
-            return []
+            return None
             
         except Exception as e:
             print(f"❌ Error getting changed files: {e}")
-            return []
+            return None
     
     def create_pipeline_status_commit(self, run_id: str, status: str, pipeline_name: str):
         """Create a commit with pipeline status (optional)"""
@@ -247,17 +390,35 @@ trigger_on_merge('$BRANCH', '$COMMIT')
             print(f"❌ Error creating status commit: {e}")
 
 # Global functions for Git hooks
+def spool_file_name(branch: str) -> str:
+    """Spool file of a branch: readable, and distinct for names that sanitize alike (feature/x, feature_x)"""
+    digest = hashlib.sha1(branch.encode('utf-8')).hexdigest()[:12]
+    return f"{re.sub(r'[^A-Za-z0-9._-]', '_', branch)}.{digest}.json"
+
+def record_trigger(branch: str, commit_hash: str, trigger_type: str = 'push', spool_dir: str = None):
+    """Spool the newest commit of a branch, replacing (and counting) any still pending"""
+    spool_dir = spool_dir or TRIGGER_SPOOL
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, spool_file_name(branch))
+    collapsed = 0
+    try:
+        with open(path) as f:
+            pending = json.load(f)
+        collapsed = pending.get('collapsed', 0) + 1
+    except (OSError, ValueError):
+        pass
+    
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'branch': branch, 'commit': commit_hash, 'trigger_type': trigger_type,
+                   'collapsed': collapsed, 'recorded_at': datetime.now().isoformat()}, f)
+    os.replace(temp_path, path)
+
 def trigger_on_commit(branch: str, commit_hash: str):
     """Called by post-commit hook"""
     try:
-        # This would be called by the Git hook
-        # For now, just log the event
         print(f"🔗 Git commit detected: {commit_hash} on {branch}")
-        
-        # In a real implementation, this would:
-        # 1. Load the pipeline engine
-        # 2. Trigger appropriate pipelines
-        # 3. Update the database
+        record_trigger(branch, commit_hash, 'push')
         
     except Exception as e:
         print(f"❌ Error in commit trigger: {e}")
@@ -266,8 +427,7 @@ def trigger_on_merge(branch: str, commit_hash: str):
     """Called by post-merge hook"""
     try:
         print(f"🔗 Git merge detected: {commit_hash} on {branch}")
-        
-        # Similar to commit trigger but for merges
+        record_trigger(branch, commit_hash, 'merge')
         
     except Exception as e:
         print(f"❌ Error in merge trigger: {e}")
\ No newline at end of file
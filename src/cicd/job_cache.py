@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import os
+import glob
+import hashlib
+import tarfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class JobCache:
+    """Directories saved by one pipeline run and restored in the next
+    
+    A job declares its cache as ``paths`` to keep (dependency directories,
+    build trees) and ``inputs``, globs of the files those paths are derived
+    from. The cache key hashes the job name, an optional ``key`` string and the
+    contents of every input file, so changing a lock file or a source starts
+    a fresh cache while unchanged inputs restore the saved tarball before the
+    job's first step.
+    """
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'cicd-cache')
+    
+    def __init__(self, root_dir: str = None, max_bytes: int = 5 * 1024 ** 3):
+        self.root = Path(root_dir or self.DEFAULT_ROOT)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+    
+    def key(self, job_name: str, cache_config: Dict, workdir: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{job_name}\0{cache_config.get('key', '')}\0".encode())
+        for pattern in sorted(cache_config.get('inputs', [])):
+            matches = sorted(glob.glob(os.path.join(workdir, pattern), recursive=True))
+            for path in matches:
+                if not os.path.isfile(path):
+                    continue
+                digest.update(os.path.relpath(path, workdir).encode() + b'\0')
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _archive(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.tar.gz"
+    
+    def restore(self, key: str, workdir: str) -> bool:
+        archive = self._archive(key)
+        if not archive.exists():
+            return False
+        with tarfile.open(archive, 'r:gz') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(workdir, filter='data')
+            else:
+                members = [member for member in tar.getmembers()
+                           if not member.name.startswith('/') and '..' not in Path(member.name).parts]
+                tar.extractall(workdir, members=members)
+        os.utime(archive)
+        return True
+    
+    def save(self, key: str, workdir: str, paths: List[str]) -> Optional[int]:
+        """Archive ``paths`` under ``key``; returns the archive size, or None if nothing was saved"""
+        archive = self._archive(key)
+        present = [path for path in paths if os.path.exists(os.path.join(workdir, path))]
+        if archive.exists() or not present:
+            return None
+        
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = archive.with_name(f".{archive.name}.{os.getpid()}.{threading.get_ident()}")
+        with tarfile.open(temp_path, 'w:gz') as tar:
+            for path in present:
+                tar.add(os.path.join(workdir, path), arcname=os.path.normpath(path))
+        os.replace(temp_path, archive)
+        self.prune()
+        return archive.stat().st_size
+    
+    def prune(self):
+        """Drop the least recently restored archives beyond ``max_bytes``"""
+        with self._lock:
+            archives = sorted(self.root.glob('*/*.tar.gz'), key=lambda path: path.stat().st_mtime, reverse=True)
+            total = 0
+            for archive in archives:
+                total += archive.stat().st_size
+                if total > self.max_bytes:
+                    archive.unlink(missing_ok=True)
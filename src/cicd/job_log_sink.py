@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from ..build.output_capture import OutputLog
+except ImportError:
+    from build.output_capture import OutputLog
+
+class JobLogSink:
+    """Where CI/CD job output goes, without a database round-trip per line
+    
+    Every line is appended to the job's compressed, line-indexed log segment
+    (``<log_dir>/<job_id>.log.gz``), which serves line-range reads and
+    followers. Only lines at ``db_levels`` (warnings and errors by default)
+    also go to ``cicd_job_logs``, queued and written by a background thread as
+    multi-row INSERTs of up to ``batch_size`` rows every ``flush_interval``
+    seconds, so a chatty job never holds a pool connection per line.
+    """
+    
+    DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'cicd-logs')
+    
+    def __init__(self, db_manager=None, log_dir: str = None, db_levels=('warning', 'error'),
+                 batch_size: int = 500, flush_interval: float = 0.5):
+        self.db = db_manager
+        self.log_dir = log_dir or os.environ.get('LFS_CICD_LOG_DIR', self.DEFAULT_DIR)
+        self.db_levels = set(db_levels)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._logs: Dict[str, OutputLog] = {}
+        self._pending_rows = []
+        self._condition = threading.Condition()
+        self._flusher = None
+        self._stopped = False
+    
+    def log_path(self, job_id: str) -> str:
+        return os.path.join(self.log_dir, f"{job_id}.log.gz")
+    
+    def _log(self, job_id: str) -> OutputLog:
+        log = self._logs.get(job_id)
+        if log is None:
+            log = self._logs[job_id] = OutputLog(self.log_path(job_id), tail_lines=200, tail_bytes=64 * 1024)
+        return log
+    
+    def append(self, job_id: str, level: str, message: str):
+        """Record one message; cheap enough to call for every output line"""
+        timestamp = datetime.now()
+        line = f"{timestamp.isoformat(timespec='milliseconds')}\t{level}\t{message}\n"
+        with self._condition:
+            self._log(job_id).append(line)
+            if self.db is not None and level in self.db_levels:
+                self._pending_rows.append((job_id, level, message, timestamp))
+                self._ensure_flusher()
+            # Wake followers and, for a full batch, the flusher
+            self._condition.notify_all()
+    
+    def close_job(self, job_id: str):
+        """Finish the job's segment (writes its line index) and push its queued rows"""
+        with self._condition:
+            log = self._logs.pop(job_id, None)
+        if log is not None:
+            log.close()
+        self.flush()
+        with self._condition:
+            self._condition.notify_all()
+    
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name='cicd-log-flusher')
+            self._flusher.start()
+    
+    def _flush_loop(self):
+        while True:
+            with self._condition:
+                deadline = time.time() + self.flush_interval
+                while not self._stopped and len(self._pending_rows) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stopped and not self._pending_rows:
+                    return
+            self.flush()
+    
+    def flush(self):
+        """Write queued database rows now, in batches"""
+        with self._condition:
+            rows, self._pending_rows = self._pending_rows, []
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            params = [value for row in batch for value in row]
+            try:
+                self.db.execute_query(
+                    "INSERT INTO cicd_job_logs (job_id, log_level, message, timestamp) VALUES "
+                    + ", ".join(["(%s, %s, %s, %s)"] * len(batch)), tuple(params))
+            except Exception as e:
+                print(f"❌ Error writing {len(batch)} job log rows: {e}")
+    
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+    
+    def _reader(self, job_id: str) -> Optional[OutputLog]:
+        with self._condition:
+            log = self._logs.get(job_id)
+        if log is not None:
+            return log
+        if os.path.exists(self.log_path(job_id)):
+            return OutputLog.open(self.log_path(job_id))
+        return None
+    
+    @staticmethod
+    def _parse(number: int, line: str) -> Dict:
+        timestamp, level, message = (line.rstrip('\n').split('\t', 2) + ['', ''])[:3]
+        return {'line': number, 'timestamp': timestamp, 'log_level': level, 'message': message}
+    
+    def line_count(self, job_id: str) -> int:
+        log = self._reader(job_id)
+        return len(log) if log is not None else 0
+    
+    def read(self, job_id: str, start: int = 0, count: int = None) -> List[Dict]:
+        """Lines ``start`` to ``start + count`` of a running or finished job"""
+        log = self._reader(job_id)
+        if log is None:
+            return []
+        end = start + count if count is not None else None
+        return [self._parse(start + offset, line) for offset, line in enumerate(log.read_lines(start, end))]
+    
+    def follow(self, job_id: str, start: int = 0, idle_timeout: float = 30) -> Iterator[Dict]:
+        """Yield the job's lines from ``start`` as they arrive, until the job's log is closed"""
+        position = start
+        while True:
+            lines = self.read(job_id, position)
+            for entry in lines:
+                yield entry
+            position += len(lines)
+            with self._condition:
+                log = self._logs.get(job_id)
+                if log is None and not lines:
+                    # Finished (or never started) and nothing left to read
+                    return
+                if log is not None and len(log) == position:
+                    if not self._condition.wait(idle_timeout):
+                        return
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str):
+    """Compile a gitignore-style glob: ``*`` stays within a directory, ``**`` crosses them,
+    a pattern without ``/`` matches at any depth and a trailing ``/`` means everything below"""
+    pattern = pattern.strip()
+    anchored = '/' in pattern.rstrip('/')
+    if pattern.endswith('/'):
+        pattern += '**'
+    pattern = pattern.lstrip('/')
+    
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    # A directory pattern also matches the files below it
+    return re.compile(regex + '(?:/.*)?$')
+
+class PathFilter:
+    """``include``/``exclude`` glob lists evaluated against a commit's changed files"""
+    
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None):
+        # A single pattern may be written without the list (``changes: docs/``)
+        include = [include] if isinstance(include, str) else include
+        exclude = [exclude] if isinstance(exclude, str) else exclude
+        self.include = [compile_pattern(pattern) for pattern in include or []]
+        self.exclude = [compile_pattern(pattern) for pattern in exclude or []]
+    
+    @property
+    def empty(self) -> bool:
+        return not self.include and not self.exclude
+    
+    def matches(self, path: str) -> bool:
+        if any(pattern.match(path) for pattern in self.exclude):
+            return False
+        return not self.include or any(pattern.match(path) for pattern in self.include)
+    
+    def any_match(self, changed_files: Optional[Iterable[str]]) -> bool:
+        """Whether the change is relevant; an unknown change set (None) always is"""
+        if self.empty or changed_files is None:
+            return True
+        return any(self.matches(path) for path in changed_files)
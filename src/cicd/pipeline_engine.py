@@ -4,21 +4,47 @@ import os
 import json
 import yaml
 import time
+import signal
 import threading
 import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import uuid
 
+from .job_cache import JobCache
+from .job_log_sink import JobLogSink
+from .path_filter import PathFilter
+
 class PipelineEngine:
-    """In-house CI/CD Pipeline Engine with Git integration"""
+    """In-house CI/CD Pipeline Engine with Git integration
+    
+    A pipeline's jobs run as a DAG: a job starts once the jobs it ``needs``
+    have succeeded (by default, every job of the earlier stages), with up to
+    ``max_parallel`` jobs at a time. Steps run for real with optional
+    ``timeout`` and ``retries``, and a job's ``cache`` is restored before its
+    steps and saved after it succeeds. A job with ``changes`` globs only runs
+    when the triggering commits touched a matching file.
+    """
     
-    def __init__(self, db_manager, repo_manager):
+    def __init__(self, db_manager, repo_manager, max_parallel: int = None, cache_dir: str = None,
+                 log_dir: str = None, coordinator=None):
         self.db = db_manager
         self.repo_manager = repo_manager
         self.active_pipelines = {}
         self.pipeline_configs = {}
         self.triggers = {}
+        self.max_parallel = max_parallel or min(os.cpu_count() or 2, 8)
+        self.job_cache = JobCache(cache_dir)
+        self.log_sink = JobLogSink(db_manager, log_dir)
+        # Jobs with ``runs_on`` labels are dispatched to worker agents when set
+        self.coordinator = coordinator
+        # ``build`` steps start builds here when set
+        self.build_engine = None
+        self._build_outcomes = OrderedDict()
+        self._build_condition = threading.Condition()
+        self._build_callbacks_registered = False
         self.setup_database_tables()
         
     def setup_database_tables(self):
@@ -144,7 +170,7 @@ class PipelineEngine:
             """, (run_id, pipeline_id, trigger_type, branch, commit_hash, json.dumps(trigger_data or {})))
             
             # Start pipeline execution in background thread
-            thread = threading.Thread(target=self.execute_pipeline, args=(run_id, config))
+            thread = threading.Thread(target=self.execute_pipeline, args=(run_id, config, trigger_data))
             thread.daemon = True
             thread.start()
             
@@ -162,7 +188,7 @@ class PipelineEngine:
             print(f"❌ Error triggering pipeline: {e}")
             raise
     
-    def execute_pipeline(self, run_id: str, config: Dict):
+    def execute_pipeline(self, run_id: str, config: Dict, trigger_data: Dict = None):
         """Execute a complete pipeline run"""
         try:
             print(f"🔄 Starting pipeline run: {run_id}")
@@ -177,23 +203,9 @@ class PipelineEngine:
             if run_id in self.active_pipelines:
                 self.active_pipelines[run_id]['status'] = 'running'
             
-            # Execute stages in order
-            stages = config.get('stages', [])
-            overall_success = True
-            
-            for stage in stages:
-                stage_name = stage.get('name', 'unnamed')
-                print(f"📋 Executing stage: {stage_name}")
-                
-                stage_success = self.execute_stage(run_id, stage)
-                if not stage_success:
-                    overall_success = False
-                    if stage.get('allow_failure', False):
-                        print(f"⚠️ Stage {stage_name} failed but marked as allow_failure")
-                        continue
-                    else:
-                        print(f"❌ Stage {stage_name} failed, stopping pipeline")
-                        break
+            # Execute jobs as their dependencies complete
+            jobs = self.plan_jobs(config, (trigger_data or {}).get('changed_files'))
+            overall_success = self.execute_job_graph(run_id, jobs, config.get('max_parallel'))
             
             # Update final status
             final_status = 'success' if overall_success else 'failed'
@@ -229,6 +241,113 @@ class PipelineEngine:
                 WHERE id = %s
             """, (run_id,))
     
+    def plan_jobs(self, config: Dict, changed_files: List[str] = None) -> List[Dict]:
+        """Jobs of all stages with the names of the jobs each one waits for
+        
+        With ``changed_files``, jobs whose ``changes`` globs match none of them
+        are planned as ``filtered``: not run, but not blocking their dependents.
+        """
+        stages = list(config.get('stages', []))
+        if config.get('jobs'):
+            stages.append({'name': 'jobs', 'jobs': config['jobs']})
+        
+        jobs = []
+        names = set()
+        earlier = []
+        for stage in stages:
+            stage_name = stage.get('name', 'unnamed')
+            stage_jobs = []
+            for job_order, job_config in enumerate(stage.get('jobs', [])):
+                name = job_config.get('name', f'job-{job_order}')
+                if name in names:
+                    raise ValueError(f"Duplicate job name: {name}")
+                names.add(name)
+                needs = job_config.get('needs')
+                jobs.append({
+                    'name': name,
+                    'stage': stage_name,
+                    'order': job_order,
+                    'config': job_config,
+                    # Without needs: the stage order, i.e. every job of the earlier stages
+                    'needs': list(needs) if needs is not None else list(earlier),
+                    'allow_failure': job_config.get('allow_failure', False),
+                    'stage_allow_failure': stage.get('allow_failure', False),
+                    'status': 'pending' if PathFilter(job_config.get('changes')).any_match(changed_files) else 'filtered'
+                })
+                stage_jobs.append(name)
+            earlier.extend(stage_jobs)
+        
+        for job in jobs:
+            unknown = [need for need in job['needs'] if need not in names]
+            if unknown:
+                raise ValueError(f"Job {job['name']} needs unknown job(s): {', '.join(unknown)}")
+        
+        # Reject cycles up front instead of leaving jobs pending forever
+        resolved = set()
+        remaining = list(jobs)
+        while remaining:
+            ready = [job for job in remaining if all(need in resolved for need in job['needs'])]
+            if not ready:
+                raise ValueError(f"Job dependency cycle among: {', '.join(job['name'] for job in remaining)}")
+            resolved.update(job['name'] for job in ready)
+            remaining = [job for job in remaining if job['name'] not in resolved]
+        return jobs
+    
+    def execute_job_graph(self, run_id: str, jobs: List[Dict], max_parallel: int = None) -> bool:
+        """Run planned jobs on a bounded pool, each as soon as its needs are met"""
+        by_name = {job['name']: job for job in jobs}
+        
+        def satisfied(need: str) -> bool:
+            dependency = by_name[need]
+            return dependency['status'] in ('success', 'filtered') or (
+                dependency['status'] == 'failed' and (dependency['allow_failure'] or dependency['stage_allow_failure']))
+        
+        for job in jobs:
+            if job['status'] == 'filtered':
+                self.record_skipped_job(run_id, job, "no changed file matches its changes rules")
+        
+        running = {}
+        with ThreadPoolExecutor(max_workers=max(int(max_parallel or self.max_parallel), 1)) as pool:
+            while True:
+                for job in jobs:
+                    if job['status'] == 'pending' and any(
+                            by_name[need]['status'] in ('failed', 'skipped') and not satisfied(need)
+                            for need in job['needs']):
+                        job['status'] = 'skipped'
+                        self.record_skipped_job(run_id, job)
+                
+                for job in jobs:
+                    if job['status'] == 'pending' and all(satisfied(need) for need in job['needs']):
+                        job['status'] = 'running'
+                        print(f"📋 Starting job: {job['name']} ({job['stage']})")
+                        running[pool.submit(self.execute_job, run_id, job['stage'], job['config'], job['order'])] = job
+                
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    try:
+                        job['status'] = 'success' if future.result() else 'failed'
+                    except Exception as e:
+                        print(f"❌ Job {job['name']} crashed: {e}")
+                        job['status'] = 'failed'
+                    if job['status'] == 'failed' and job['stage_allow_failure']:
+                        print(f"⚠️ Job {job['name']} failed but stage {job['stage']} is marked as allow_failure")
+        
+        return all(job['status'] in ('success', 'filtered') or (job['status'] == 'failed' and job['allow_failure'])
+                   for job in jobs)
+    
+    def record_skipped_job(self, run_id: str, job: Dict, reason: str = "a job it needs failed"):
+        print(f"⛔ Skipping job {job['name']}: {reason}")
+        try:
+            self.db.execute_query("""
+                INSERT INTO cicd_jobs (id, run_id, name, stage, job_order, status)
+                VALUES (%s, %s, %s, %s, %s, 'skipped')
+            """, (str(uuid.uuid4()), run_id, job['name'], job['stage'], job['order']))
+        except Exception as e:
+            print(f"❌ Error recording skipped job: {e}")
+    
     def execute_stage(self, run_id: str, stage_config: Dict) -> bool:
         """Execute a pipeline stage"""
         stage_name = stage_config.get('name', 'unnamed')
@@ -238,12 +357,9 @@ class PipelineEngine:
             print(f"⚠️ No jobs defined for stage: {stage_name}")
             return True
         
-        # Execute jobs sequentially
-        for i, job_config in enumerate(jobs):
-            success = self.execute_job(run_id, stage_name, job_config, i)
-            if not success and not job_config.get('allow_failure', False):
-                return False
-        return True
+        # Jobs of one stage run in parallel unless they need each other
+        planned = self.plan_jobs({'stages': [dict(stage_config, allow_failure=False)]})
+        return self.execute_job_graph(run_id, planned)
     
     def execute_job(self, run_id: str, stage_name: str, job_config: Dict, job_order: int) -> bool:
         """Execute a single job"""
@@ -260,14 +376,21 @@ class PipelineEngine:
             self.log_job_message(job_id, 'info', f"Starting job: {job_name}")
             
             start_time = datetime.now()
+            deadline = time.time() + job_config['timeout'] if job_config.get('timeout') else None
+            workdir = getattr(self.repo_manager, 'repo_path', '.')
+            cache_key = self.restore_job_cache(job_id, job_name, job_config.get('cache'), workdir)
             
             # Execute job steps
             steps = job_config.get('steps', [])
             for step_i, step in enumerate(steps):
-                step_success = self.execute_step(job_id, step, step_i)
+                step_success = self.execute_step(job_id, step, step_i, job_config.get('runs_on'),
+                                                 deadline=deadline, retries=job_config.get('retries', 0))
                 if not step_success:
                     raise Exception(f"Step {step_i} failed")
             
+            if cache_key:
+                self.save_job_cache(job_id, cache_key, job_config['cache'], workdir)
+            
             # Job completed successfully
             end_time = datetime.now()
             duration = int((end_time - start_time).total_seconds())
@@ -293,29 +416,78 @@ class PipelineEngine:
             
             self.log_job_message(job_id, 'error', f"Job failed: {str(e)}")
             return False
+        
+        finally:
+            self.log_sink.close_job(job_id)
+    
+    def restore_job_cache(self, job_id: str, job_name: str, cache_config: Dict, workdir: str) -> Optional[str]:
+        """Restore the job's cache if its inputs match a saved one; returns the cache key"""
+        if not cache_config or not cache_config.get('paths'):
+            return None
+        try:
+            key = self.job_cache.key(job_name, cache_config, workdir)
+            if self.job_cache.restore(key, workdir):
+                self.log_job_message(job_id, 'info', f"Restored cache {key[:12]}")
+            else:
+                self.log_job_message(job_id, 'info', f"No cache for {key[:12]} yet")
+            return key
+        except Exception as e:
+            self.log_job_message(job_id, 'warning', f"Cache restore failed: {str(e)}")
+            return None
+    
+    def save_job_cache(self, job_id: str, key: str, cache_config: Dict, workdir: str):
+        try:
+            size = self.job_cache.save(key, workdir, cache_config['paths'])
+            if size is not None:
+                self.log_job_message(job_id, 'info', f"Saved cache {key[:12]} ({size / 1024 / 1024:.1f} MB)")
+        except Exception as e:
+            self.log_job_message(job_id, 'warning', f"Cache save failed: {str(e)}")
     
-    def execute_step(self, job_id: str, step_config: Dict, step_order: int) -> bool:
-        """Execute a single step within a job"""
+    def execute_step(self, job_id: str, step_config: Dict, step_order: int, runs_on: List[str] = None,
+                     deadline: float = None, retries: int = 0) -> bool:
+        """Execute a single step within a job, retrying it up to ``retries`` times"""
         step_name = step_config.get('name', f'step-{step_order}')
+        attempts = int(step_config.get('retries', retries)) + 1
         
-        try:
-            self.log_job_message(job_id, 'info', f"Executing step: {step_name}")
+        for attempt in range(1, attempts + 1):
+            timeout = step_config.get('timeout')
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.log_job_message(job_id, 'error', f"Job timed out before step {step_name}")
+                    return False
+                timeout = min(timeout, remaining) if timeout else remaining
+            
+            try:
+                if attempt == 1:
+                    self.log_job_message(job_id, 'info', f"Executing step: {step_name}")
+                else:
+                    self.log_job_message(job_id, 'warning', f"Retrying step {step_name} (attempt {attempt}/{attempts})")
+                
+                # Handle different step types
+                if 'run' in step_config and runs_on and self.coordinator:
+                    success = self.execute_remote_command(job_id, step_config['run'], runs_on, timeout)
+                elif 'run' in step_config:
+                    if runs_on:
+                        self.log_job_message(job_id, 'warning',
+                                             f"No work coordinator attached; running {step_name} on this host")
+                    success = self.execute_shell_command(job_id, step_config['run'], timeout, step_config.get('env'))
+                elif 'build' in step_config:
+                    success = self.execute_build_step(job_id, step_config['build'], timeout)
+                else:
+                    self.log_job_message(job_id, 'warning', f"Unknown step type in: {step_name}")
+                    return True
+                
+            except Exception as e:
+                self.log_job_message(job_id, 'error', f"Step {step_name} failed: {str(e)}")
+                success = False
             
-            # Handle different step types
-            if 'run' in step_config:
-                return self.execute_shell_command(job_id, step_config['run'])
-            elif 'build' in step_config:
-                return self.execute_build_step(job_id, step_config['build'])
-            else:
-                self.log_job_message(job_id, 'warning', f"Unknown step type in: {step_name}")
+            if success:
                 return True
-                
-        except Exception as e:
-            self.log_job_message(job_id, 'error', f"Step {step_name} failed: {str(e)}")
-            return False
+        return False
     
-    def execute_shell_command(self, job_id: str, command: str) -> bool:
-        """Execute a shell command"""
+    def execute_shell_command(self, job_id: str, command: str, timeout: float = None, env: Dict = None) -> bool:
+        """Execute a shell command, killing its process group after ``timeout`` seconds"""
         try:
             self.log_job_message(job_id, 'info', f"Running command: {command}")
             
@@ -325,16 +497,38 @@ class PipelineEngine:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
-                cwd=getattr(self.repo_manager, 'repo_path', '.')
+                cwd=getattr(self.repo_manager, 'repo_path', '.'),
+                env=dict(os.environ, **{key: str(value) for key, value in env.items()}) if env else None,
+                start_new_session=True
             )
             
-            # Stream output
-            for line in process.stdout:
-                self.log_job_message(job_id, 'info', line.strip())
+            timed_out = threading.Event()
             
-            process.wait()
+            def kill():
+                timed_out.set()
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
             
-            if process.returncode == 0:
+            timer = threading.Timer(timeout, kill) if timeout else None
+            if timer:
+                timer.daemon = True
+                timer.start()
+            
+            # Stream output
+            try:
+                for line in process.stdout:
+                    self.log_job_output(job_id, line.rstrip('\n'))
+                process.wait()
+            finally:
+                if timer:
+                    timer.cancel()
+            
+            if timed_out.is_set():
+                self.log_job_message(job_id, 'error', f"Command timed out after {timeout:.0f}s")
+                return False
+            elif process.returncode == 0:
                 self.log_job_message(job_id, 'info', f"Command completed successfully")
                 return True
             else:
@@ -345,20 +539,72 @@ class PipelineEngine:
             self.log_job_message(job_id, 'error', f"Command execution error: {str(e)}")
             return False
     
-    def execute_build_step(self, job_id: str, build_config: Dict) -> bool:
-        """Execute a build step (integrates with existing build system)"""
+    def execute_remote_command(self, job_id: str, command: str, labels: List[str], timeout: float = None) -> bool:
+        """Execute a shell command on a worker agent carrying the given labels"""
+        try:
+            self.log_job_message(job_id, 'info', f"Dispatching command to a worker ({', '.join(labels)}): {command}")
+            
+            # Retries are the step's; the coordinator only runs it once
+            remote_id = self.coordinator.submit(f"cicd-{job_id[:8]}", command, labels=labels,
+                                                timeout=timeout, max_attempts=1)
+            log_path = self.coordinator.job_log_path(remote_id)
+            offset = 0
+            
+            # Relay the streamed output as it arrives
+            while True:
+                statuses = self.coordinator.wait([remote_id], timeout=2)
+                if log_path.exists():
+                    with open(log_path, 'rb') as f:
+                        f.seek(offset)
+                        lines = f.readlines()
+                    # Keep a trailing partial line for the next round
+                    if lines and not lines[-1].endswith(b'\n') and statuses[remote_id] not in ('success', 'failed', 'cancelled'):
+                        lines.pop()
+                    for line in lines:
+                        offset += len(line)
+                        self.log_job_output(job_id, line.decode('utf-8', errors='replace').rstrip('\n'))
+                if statuses[remote_id] in ('success', 'failed', 'cancelled'):
+                    break
+            
+            job = self.coordinator.get_job(remote_id)
+            if job['status'] == 'success':
+                self.log_job_message(job_id, 'info', f"Command completed successfully on {job['worker_id']}")
+                return True
+            else:
+                self.log_job_message(job_id, 'error', f"Command failed on {job['worker_id']}: {job['error']}")
+                return False
+                
+        except Exception as e:
+            self.log_job_message(job_id, 'error', f"Remote command error: {str(e)}")
+            return False
+    
+    def execute_build_step(self, job_id: str, build_config: Dict, timeout: float = None) -> bool:
+        """Execute a build step on the attached BuildEngine and wait for its outcome"""
         try:
             build_type = build_config.get('type', 'lfs')
             
             if build_type == 'lfs':
                 config_name = build_config.get('config', 'default-lfs')
+                if self.build_engine is None:
+                    self.log_job_message(job_id, 'error', "No build engine attached to the pipeline engine")
+                    return False
                 self.log_job_message(job_id, 'info', f"Starting LFS build with config: {config_name}")
                 
-                # Simulate build - in real implementation this would integrate with BuildEngine
-                time.sleep(2)
+                self._register_build_callbacks()
+                build_id = self.build_engine.start_build(build_config.get('config_path', ''), config_name)
+                self.log_job_message(job_id, 'info', f"Build started: {build_id}")
                 
-                self.log_job_message(job_id, 'info', "LFS build completed successfully")
-                return True
+                outcome = self._wait_for_build(build_id, timeout)
+                if outcome is None:
+                    self.log_job_message(job_id, 'error', f"Build {build_id} timed out after {timeout:.0f}s; cancelling")
+                    self.build_engine.cancel_build(build_id)
+                    return False
+                if outcome.get('status') == 'success':
+                    self.log_job_message(job_id, 'info', "LFS build completed successfully")
+                    return True
+                detail = outcome.get('error') or outcome.get('stage') or outcome.get('status', 'failed')
+                self.log_job_message(job_id, 'error', f"LFS build {build_id} failed: {detail}")
+                return False
             else:
                 self.log_job_message(job_id, 'warning', f"Unknown build type: {build_type}")
                 return True
@@ -367,13 +613,35 @@ class PipelineEngine:
             self.log_job_message(job_id, 'error', f"Build step failed: {str(e)}")
             return False
     
+    def _register_build_callbacks(self):
+        with self._build_condition:
+            if not self._build_callbacks_registered:
+                self.build_engine.register_callback('build_complete', self._on_build_finished)
+                self.build_engine.register_callback('build_error', self._on_build_finished)
+                self._build_callbacks_registered = True
+    
+    def _on_build_finished(self, data: Dict):
+        with self._build_condition:
+            self._build_outcomes[data.get('build_id')] = dict(data, status=data.get('status', 'failed'))
+            # Outcomes of builds nobody waits for are dropped eventually
+            while len(self._build_outcomes) > 100:
+                self._build_outcomes.popitem(last=False)
+            self._build_condition.notify_all()
+    
+    def _wait_for_build(self, build_id: str, timeout: float = None) -> Optional[Dict]:
+        deadline = time.time() + timeout if timeout else None
+        with self._build_condition:
+            while build_id not in self._build_outcomes:
+                remaining = deadline - time.time() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._build_condition.wait(remaining)
+            return self._build_outcomes.pop(build_id)
+    
     def log_job_message(self, job_id: str, level: str, message: str):
         """Log a message for a job"""
         try:
-            self.db.execute_query("""
-                INSERT INTO cicd_job_logs (job_id, log_level, message)
-                VALUES (%s, %s, %s)
-            """, (job_id, level, message))
+            self.log_sink.append(job_id, level, message)
             
             # Also print to console for debugging
             level_emoji = {'info': '📋', 'warning': '⚠️', 'error': '❌', 'debug': '🔍'}
@@ -382,6 +650,10 @@ class PipelineEngine:
         except Exception as e:
             print(f"❌ Error logging job message: {e}")
     
+    def log_job_output(self, job_id: str, line: str):
+        """Record a line of command output (kept in the job log, not echoed to the console)"""
+        self.log_sink.append(job_id, 'info', line)
+    
     def get_pipeline_config(self, pipeline_id: str) -> Optional[Dict]:
         """Get pipeline configuration"""
         if pipeline_id in self.pipeline_configs:
@@ -437,15 +709,27 @@ class PipelineEngine:
             print(f"❌ Error getting pipeline runs: {e}")
             return []
     
-    def get_job_logs(self, job_id: str) -> List[Dict]:
-        """Get logs for a specific job"""
+    def get_job_logs(self, job_id: str, start: int = 0, limit: int = None) -> List[Dict]:
+        """Get logs for a specific job, optionally just lines ``start`` to ``start + limit``"""
         try:
-            return self.db.execute_query("""
+            logs = self.log_sink.read(job_id, start, limit)
+            if logs or start:
+                return logs
+            
+            # Jobs from before log segments only have database rows
+            query = """
                 SELECT * FROM cicd_job_logs 
                 WHERE job_id = %s 
-                ORDER BY timestamp ASC
-            """, (job_id,), fetch=True) or []
+                ORDER BY timestamp ASC, id ASC
+            """
+            if limit is not None:
+                query += " LIMIT %s"
+            return self.db.execute_query(query, (job_id, limit) if limit is not None else (job_id,), fetch=True) or []
             
         except Exception as e:
             print(f"❌ Error getting job logs: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def follow_job_logs(self, job_id: str, start: int = 0):
+        """Yield a job's log lines as they are written, until the job finishes"""
+        return self.log_sink.follow(job_id, start)
\ No newline at end of file
@@ -14,9 +14,12 @@ class SettingsManager:
         """Load settings from config file"""
         default_settings = {
             "repository_path": str(Path.home() / "lfs_repositories"),
+            "commit_flush_interval": 30,
+            "snapshot_retention_days": 90,
             "lfs_build_path": "/mnt/lfs",
             "auto_backup": True,
             "max_parallel_jobs": os.cpu_count(),
+            "distributed": {"enabled": False, "host": "127.0.0.1", "port": 8765, "local_workers": 0},
             "log_level": "INFO",
             "theme": "default"
         }
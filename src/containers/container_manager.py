@@ -139,9 +139,12 @@ CMD ["python3", "main.py", "--container-mode"]
                 "--name", container_name,
                 "--privileged",  # Required for LFS build
                 "-v", "/mnt/lfs:/mnt/lfs",  # Mount LFS directory
-                "-p", "5000:5000",  # Expose API port
             ]
             
+            # Only one container can publish the API port; worker nodes talk out to the coordinator
+            if container_config.get('publish_api', True):
+                run_cmd.extend(["-p", "5000:5000"])
+            
             # Add environment variables
             for key, value in container_config.get('environment', {}).items():
                 run_cmd.extend(["-e", f"{key}={value}"])
@@ -271,16 +274,31 @@ CMD ["python3", "main.py", "--container-mode"]
                 'created': datetime.now().isoformat()
             }
             
+            coordinator_url = cluster_config.get('coordinator_url')
+            
             for i in range(node_count):
                 node_config = cluster_config.copy()
                 node_config['name'] = f"{cluster_name}-node-{i+1}"
                 
+                if coordinator_url:
+                    # Every node runs a worker agent leasing jobs from the coordinator
+                    labels = ','.join(cluster_config.get('labels', ['container', 'lfs']))
+                    node_config['publish_api'] = False
+                    node_config['environment'] = dict(cluster_config.get('environment', {}))
+                    if cluster_config.get('worker_token'):
+                        node_config['environment']['LFS_WORKER_TOKEN'] = cluster_config['worker_token']
+                    node_config['command'] = (f"python3 src/orchestration/worker_agent.py --coordinator {coordinator_url} "
+                                              f"--labels {labels} --slots {cluster_config.get('slots', 1)} "
+                                              f"--worker-id {node_config['name']}")
+                else:
+                    node_config['publish_api'] = i == 0
+                
                 container_id = self.run_lfs_container(node_config)
                 
                 cluster_info['nodes'].append({
                     'name': node_config['name'],
                     'container_id': container_id,
-                    'role': 'worker' if i > 0 else 'master'
+                    'role': 'worker' if i > 0 or coordinator_url else 'master'
                 })
             
             return cluster_info
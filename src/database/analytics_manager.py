@@ -94,6 +94,9 @@ class AnalyticsManager:
                     MAX(sp.duration_seconds) as max_duration,
                     STDDEV(sp.duration_seconds) as duration_stddev,
                     AVG(sp.peak_memory_mb) as avg_memory,
+                    MAX(sp.peak_memory_mb) as max_memory,
+                    AVG(sp.cpu_time_seconds) as avg_cpu_time,
+                    AVG(sp.disk_read_mb + sp.disk_write_mb) as avg_io_mb,
                     SUM(CASE WHEN sp.exit_code = 0 THEN 1 ELSE 0 END) as successful_runs,
                     AVG(sp.warnings_count) as avg_warnings,
                     AVG(sp.errors_count) as avg_errors
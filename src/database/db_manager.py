@@ -13,6 +13,8 @@ import hashlib
 from datetime import datetime
 from pathlib import Path
 
+from .metrics_sampler import get_metrics_sampler
+
 class DatabaseManager:
     """Robust MySQL database manager with connection pooling"""
     
@@ -118,8 +120,12 @@ class DatabaseManager:
         
         return None
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute query with automatic retry and connection management"""
+    def execute_query(self, query, params=None, fetch=False, return_id=False):
+        """Execute query with automatic retry and connection management
+        
+        Returns the fetched rows with ``fetch``, the AUTO_INCREMENT id of an
+        INSERT with ``return_id``, otherwise the affected row count.
+        """
         max_retries = 3
         
         for attempt in range(max_retries):
@@ -140,6 +146,8 @@ class DatabaseManager:
                 
                 if fetch:
                     result = cursor.fetchall()
+                elif return_id:
+                    result = cursor.lastrowid
                 else:
                     result = cursor.rowcount
                 
@@ -459,40 +467,12 @@ class DatabaseManager:
     # Enhanced Data Collection Methods
     
     def record_system_metrics(self, build_id: str, stage_name: str = None):
-        """Record current system metrics"""
+        """Record current system metrics (queued from the shared sampler, written in batches)"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk_io = psutil.disk_io_counters()
-            network_io = psutil.net_io_counters()
-            load_avg = psutil.getloadavg()[0] if hasattr(psutil, 'getloadavg') else 0.0
-            
-            # Try to get temperature (may not be available on all systems)
-            temperature = None
-            try:
-                temps = psutil.sensors_temperatures()
-                if temps:
-                    for name, entries in temps.items():
-                        if entries:
-                            temperature = entries[0].current
-                            break
-            except:
-                pass
-            
-            self.execute_query("""
-                INSERT INTO system_metrics 
-                (build_id, stage_name, cpu_percent, memory_percent, memory_used_mb,
-                 disk_io_read_mb, disk_io_write_mb, network_bytes_sent, network_bytes_recv,
-                 load_average_1m, temperature_celsius)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                build_id, stage_name, cpu_percent, memory.percent, memory.used // (1024*1024),
-                disk_io.read_bytes // (1024*1024) if disk_io else 0,
-                disk_io.write_bytes // (1024*1024) if disk_io else 0,
-                network_io.bytes_sent if network_io else 0,
-                network_io.bytes_recv if network_io else 0,
-                load_avg, temperature
-            ))
+            sampler = get_metrics_sampler()
+            if sampler.db_manager is None:
+                sampler.attach_database(self)
+            sampler.record_now(build_id, stage_name)
             
         except Exception as e:
             print(f"Failed to record system metrics: {e}")
@@ -559,32 +539,179 @@ class DatabaseManager:
     
     def record_stage_performance(self, build_id: str, stage_name: str, stage_order: int,
                                start_time: datetime, end_time: datetime, exit_code: int,
-                               warnings_count: int = 0, errors_count: int = 0, lines_processed: int = 0):
+                               warnings_count: int = 0, errors_count: int = 0, lines_processed: int = 0,
+                               resource_usage: dict = None):
         """Record stage performance metrics"""
         try:
             duration_seconds = int((end_time - start_time).total_seconds())
             
-            # Get current resource usage as approximation
-            memory = psutil.virtual_memory()
-            disk_io = psutil.disk_io_counters()
+            if resource_usage:
+                # Measured for the stage's own process tree
+                cpu_time_seconds = resource_usage.get('cpu_seconds')
+                peak_memory_mb = resource_usage.get('peak_memory_bytes', 0) // (1024*1024)
+                disk_read_mb = round(resource_usage.get('read_bytes', 0) / (1024*1024), 2)
+                disk_write_mb = round(resource_usage.get('write_bytes', 0) / (1024*1024), 2)
+            else:
+                # Get current resource usage as approximation
+                memory = psutil.virtual_memory()
+                disk_io = psutil.disk_io_counters()
+                cpu_time_seconds = None
+                peak_memory_mb = memory.used // (1024*1024)
+                disk_read_mb = disk_io.read_bytes // (1024*1024) if disk_io else 0
+                disk_write_mb = disk_io.write_bytes // (1024*1024) if disk_io else 0
             
             self.execute_query("""
                 INSERT INTO stage_performance 
                 (build_id, stage_name, stage_order, start_time, end_time, duration_seconds,
-                 peak_memory_mb, disk_read_mb, disk_write_mb, exit_code, warnings_count,
-                 errors_count, lines_processed)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                 cpu_time_seconds, peak_memory_mb, disk_read_mb, disk_write_mb, exit_code,
+                 warnings_count, errors_count, lines_processed)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (
                 build_id, stage_name, stage_order, start_time, end_time, duration_seconds,
-                memory.used // (1024*1024),
-                disk_io.read_bytes // (1024*1024) if disk_io else 0,
-                disk_io.write_bytes // (1024*1024) if disk_io else 0,
+                cpu_time_seconds, peak_memory_mb, disk_read_mb, disk_write_mb,
                 exit_code, warnings_count, errors_count, lines_processed
             ))
             
         except Exception as e:
             print(f"Failed to record stage performance: {e}")
     
+    def record_stage_cache_stats(self, build_id: str, stage_name: str, stage_order: int,
+                                 cache_key: str, stats: dict):
+        """Record compiler cache hit/miss statistics for a stage"""
+        try:
+            self.execute_query("""
+                INSERT INTO stage_cache_stats 
+                (build_id, stage_name, stage_order, cache_key, hits, direct_hits,
+                 preprocessed_hits, misses, hit_rate, cache_size_mb)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                build_id, stage_name, stage_order, cache_key,
+                stats.get('hits', 0), stats.get('direct_hits', 0), stats.get('preprocessed_hits', 0),
+                stats.get('misses', 0), stats.get('hit_rate', 0.0), stats.get('cache_size_mb', 0)
+            ))
+            
+        except Exception as e:
+            print(f"Failed to record stage cache stats: {e}")
+    
+    def record_stage_resource_usage(self, build_id: str, stage_name: str, stage_order: int,
+                                    usage: dict, limits: dict = None):
+        """Record per-stage CPU, memory, I/O and pressure accounting"""
+        try:
+            limits = limits or {}
+            self.execute_query("""
+                INSERT INTO stage_resource_usage 
+                (build_id, stage_name, stage_order, accounting_method, cpu_seconds, user_seconds,
+                 system_seconds, cpu_throttled_seconds, peak_memory_mb, read_mb, write_mb,
+                 cpu_pressure_seconds, memory_pressure_seconds, io_pressure_seconds, oom_kills,
+                 memory_limit, cpu_limit)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                build_id, stage_name, stage_order, usage.get('method'),
+                usage.get('cpu_seconds', 0), usage.get('user_seconds', 0), usage.get('system_seconds', 0),
+                usage.get('cpu_throttled_seconds', 0), usage.get('peak_memory_bytes', 0) // (1024*1024),
+                round(usage.get('read_bytes', 0) / (1024*1024), 2), round(usage.get('write_bytes', 0) / (1024*1024), 2),
+                usage.get('cpu_pressure_seconds', 0), usage.get('memory_pressure_seconds', 0),
+                usage.get('io_pressure_seconds', 0), usage.get('oom_kills', 0),
+                limits.get('memory_max'), limits.get('cpu_max')
+            ))
+            
+        except Exception as e:
+            print(f"Failed to record stage resource usage: {e}")
+    
+    def record_build_checkpoint(self, build_id: str, stage_name: str, stage_order: int, checkpoint: dict):
+        """Record a stage boundary checkpoint a build can be resumed from"""
+        try:
+            self.execute_query("""
+                INSERT INTO build_checkpoints 
+                (build_id, checkpoint_name, stage_name, stage_order, strategy, completed_stages,
+                 paths_changed, size_bytes, duration_seconds)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                build_id, checkpoint['name'], stage_name, stage_order, checkpoint['strategy'],
+                json.dumps(checkpoint['completed_stages']), len(checkpoint['changed']),
+                checkpoint['size_bytes'], checkpoint['duration_seconds']
+            ))
+            
+        except Exception as e:
+            print(f"Failed to record build checkpoint: {e}")
+    
+    def record_build_resume(self, build_id: str, resumed_from: str, checkpoint_name: str, restore_result: dict):
+        """Link a resumed build to the build and checkpoint it restarted from"""
+        try:
+            self.execute_query("""
+                INSERT INTO build_resumes 
+                (build_id, resumed_from_build_id, checkpoint_name, paths_removed, paths_restored,
+                 restore_seconds)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (
+                build_id, resumed_from, checkpoint_name, restore_result.get('removed', 0),
+                restore_result.get('restored', 0), restore_result.get('duration_seconds', 0)
+            ))
+            
+        except Exception as e:
+            print(f"Failed to record build resume: {e}")
+    
+    def record_package_builds(self, build_id: str, stage_name: str, packages: list):
+        """Record the per-package outcome and timing of a package-granular stage"""
+        try:
+            for package in packages:
+                started_at = package.get('started_at')
+                finished_at = package.get('finished_at')
+                self.execute_query("""
+                    INSERT INTO package_builds
+                    (build_id, stage_name, package_name, package_order, status, attempts, make_jobs,
+                     duration_seconds, prepare_seconds, return_code, depends_on, log_path, started_at,
+                     finished_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    build_id, stage_name, package['name'], package['order'], package['status'],
+                    package.get('attempts', 0), package.get('make_jobs', 0), package.get('duration_seconds', 0),
+                    package.get('prepare_seconds', 0), package.get('return_code'), json.dumps(package.get('depends', [])), package.get('log_path'),
+                    datetime.fromtimestamp(started_at) if started_at else None,
+                    datetime.fromtimestamp(finished_at) if finished_at else None
+                ))
+            
+        except Exception as e:
+            print(f"Failed to record package builds: {e}")
+    
+    def record_stage_workspace(self, build_id: str, stage_name: str, stage_order: int, workspace: dict):
+        """Record which source workspace backend a stage ran on and how much of it it used"""
+        try:
+            self.execute_query("""
+                INSERT INTO stage_workspaces 
+                (build_id, stage_name, stage_order, backend, size_budget_mb, peak_mb, setup_seconds,
+                 teardown_seconds, spilled, synced_files, note)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                build_id, stage_name, stage_order, workspace['backend'],
+                workspace['size_budget_bytes'] // (1024*1024) if workspace.get('size_budget_bytes') else None,
+                workspace.get('peak_bytes', 0) // (1024*1024), workspace.get('setup_seconds', 0),
+                workspace.get('teardown_seconds', 0), workspace.get('spilled', False),
+                json.dumps(workspace.get('synced_files', [])), workspace.get('note')
+            ))
+            
+        except Exception as e:
+            print(f"Failed to record stage workspace: {e}")
+    
+    def record_distributed_job(self, job: dict):
+        """Record a job that ran on a distributed build worker"""
+        try:
+            self.execute_query("""
+                INSERT INTO distributed_jobs 
+                (job_id, name, status, worker_id, attempts, return_code, labels, artifacts,
+                 error_message, log_bytes, queued_seconds, duration_seconds)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                job['id'], job['name'], job['status'], job.get('worker_id'), job.get('attempts', 0),
+                job.get('return_code'), json.dumps(job.get('labels', [])), json.dumps(job.get('artifacts', {})),
+                (job.get('error') or '')[:1000] or None, job.get('log_bytes', 0),
+                round(job['started_at'] - job['submitted_at'], 2) if job.get('started_at') else None,
+                round(job['finished_at'] - job['started_at'], 2) if job.get('started_at') and job.get('finished_at') else None
+            ))
+            
+        except Exception as e:
+            print(f"Failed to record distributed job: {e}")
+    
     def record_mirror_performance(self, mirror_url: str, package_name: str, file_size_mb: float,
                                 download_speed_mbps: float, success: bool, error_message: str = None,
                                 response_time_ms: int = 0, http_status_code: int = 200, retry_count: int = 0):
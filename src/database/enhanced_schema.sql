@@ -64,6 +64,156 @@ CREATE TABLE IF NOT EXISTS stage_performance (
     INDEX idx_stage_order (stage_order)
 );
 
+-- Per-Stage Resource Accounting (cgroup v2 scope or process tree sampling)
+CREATE TABLE IF NOT EXISTS stage_resource_usage (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    build_id VARCHAR(255),
+    stage_name VARCHAR(100),
+    stage_order INT,
+    accounting_method ENUM('cgroup', 'process_tree', 'none'),
+    cpu_seconds DECIMAL(12,2),
+    user_seconds DECIMAL(12,2),
+    system_seconds DECIMAL(12,2),
+    cpu_throttled_seconds DECIMAL(12,2),
+    peak_memory_mb INT,
+    read_mb DECIMAL(12,2),
+    write_mb DECIMAL(12,2),
+    cpu_pressure_seconds DECIMAL(12,2),
+    memory_pressure_seconds DECIMAL(12,2),
+    io_pressure_seconds DECIMAL(12,2),
+    oom_kills INT DEFAULT 0,
+    memory_limit VARCHAR(20),
+    cpu_limit VARCHAR(20),
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_build_stage (build_id, stage_name)
+);
+
+-- Compiler Cache Statistics per Stage (recorded alongside stage_performance)
+CREATE TABLE IF NOT EXISTS stage_cache_stats (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    build_id VARCHAR(255),
+    stage_name VARCHAR(100),
+    stage_order INT,
+    cache_key VARCHAR(255),
+    hits INT DEFAULT 0,
+    direct_hits INT DEFAULT 0,
+    preprocessed_hits INT DEFAULT 0,
+    misses INT DEFAULT 0,
+    hit_rate DECIMAL(5,4) DEFAULT 0,
+    cache_size_mb DECIMAL(10,1) DEFAULT 0,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_build_stage (build_id, stage_name),
+    INDEX idx_cache_key (cache_key)
+);
+
+-- Stage Boundary Checkpoints for Resuming Builds
+CREATE TABLE IF NOT EXISTS build_checkpoints (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    build_id VARCHAR(255),
+    checkpoint_name VARCHAR(150),
+    stage_name VARCHAR(100),
+    stage_order INT,
+    strategy ENUM('reflink', 'tar'),
+    completed_stages JSON,
+    paths_changed INT DEFAULT 0,
+    size_bytes BIGINT DEFAULT 0,
+    duration_seconds DECIMAL(10,2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_build_checkpoint (build_id, stage_order)
+);
+
+-- Builds Resumed From a Checkpoint of an Earlier Build
+CREATE TABLE IF NOT EXISTS build_resumes (
+    build_id VARCHAR(255) PRIMARY KEY,
+    resumed_from_build_id VARCHAR(255),
+    checkpoint_name VARCHAR(150),
+    paths_removed INT DEFAULT 0,
+    paths_restored INT DEFAULT 0,
+    restore_seconds DECIMAL(10,2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_resumed_from (resumed_from_build_id)
+);
+
+-- Per-package results of package-granular stages (one row per package run)
+CREATE TABLE IF NOT EXISTS package_builds (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    build_id VARCHAR(255),
+    stage_name VARCHAR(100),
+    package_name VARCHAR(100),
+    package_order INT,
+    status ENUM('success', 'failed', 'blocked', 'skipped', 'cancelled', 'pending', 'running'),
+    attempts INT DEFAULT 0,
+    make_jobs INT DEFAULT 0,
+    duration_seconds DECIMAL(10,2),
+    prepare_seconds DECIMAL(10,2),
+    return_code INT,
+    depends_on JSON,
+    log_path VARCHAR(500),
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_build_stage (build_id, stage_name),
+    INDEX idx_package (package_name, status)
+);
+
+-- Source workspace backend (tmpfs, overlay or plain directory) used by each stage
+CREATE TABLE IF NOT EXISTS stage_workspaces (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    build_id VARCHAR(255),
+    stage_name VARCHAR(100),
+    stage_order INT,
+    backend ENUM('tmpfs', 'overlay', 'plain'),
+    size_budget_mb INT,
+    peak_mb INT,
+    setup_seconds DECIMAL(10,2),
+    teardown_seconds DECIMAL(10,2),
+    spilled BOOLEAN DEFAULT FALSE,
+    synced_files JSON,
+    note VARCHAR(500),
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_build_stage (build_id, stage_name)
+);
+
+-- Distributed Build Jobs
+CREATE TABLE IF NOT EXISTS distributed_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(64),
+    name VARCHAR(255),
+    status ENUM('success', 'failed', 'cancelled'),
+    worker_id VARCHAR(255),
+    attempts INT,
+    return_code INT,
+    labels JSON,
+    artifacts JSON,
+    error_message VARCHAR(1000),
+    log_bytes BIGINT,
+    queued_seconds DECIMAL(10,2),
+    duration_seconds DECIMAL(10,2),
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_job (job_id),
+    INDEX idx_worker (worker_id)
+);
+
+-- Scheduled Builds
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    job_id VARCHAR(64) PRIMARY KEY,
+    job_name VARCHAR(255),
+    cron_expression VARCHAR(255),
+    timezone VARCHAR(64),
+    priority INT DEFAULT 0,
+    misfire_policy ENUM('skip', 'run_once', 'run_all') DEFAULT 'run_once',
+    jitter_seconds INT DEFAULT 0,
+    build_config TEXT,
+    created_at TIMESTAMP NULL,
+    enabled BOOLEAN DEFAULT TRUE,
+    last_run TIMESTAMP NULL,
+    next_run VARCHAR(40),
+    last_status VARCHAR(20),
+    run_count INT DEFAULT 0,
+    success_count INT DEFAULT 0,
+    failure_count INT DEFAULT 0
+);
+
 -- Mirror Performance Tracking
 CREATE TABLE IF NOT EXISTS mirror_performance (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Shared System Metrics Sampler for LFS Build System
+One background thread takes delta based samples into a ring buffer that every
+monitor reads, and flushes aggregated rows to system_metrics in batches
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # Optional: without psutil only the load average is sampled
+    psutil = None
+
+class MetricsSampler:
+    """Background system sampler with an in-memory ring buffer.
+    
+    CPU usage is computed from ``cpu_times`` deltas between samples and disk
+    and network throughput from counter deltas, so sampling never sleeps in
+    the caller. Readers get the latest sample or a window of recent samples
+    without touching psutil themselves. When a database manager is attached,
+    samples are averaged per ``aggregate_seconds`` window and per build/stage
+    and written to ``system_metrics`` every ``flush_interval`` seconds.
+    """
+    
+    def __init__(self, interval: float = 2.0, buffer_seconds: float = 3600, aggregate_seconds: float = 15,
+                 flush_interval: float = 60, temperature_interval: float = 30):
+        self.interval = interval
+        self.aggregate_seconds = aggregate_seconds
+        self.flush_interval = flush_interval
+        self.temperature_interval = temperature_interval
+        self.samples = deque(maxlen=max(int(buffer_seconds / interval), 1))
+        
+        self.db_manager = None
+        self.context = {'build_id': None, 'stage_name': None}
+        self._pending_rows: List[tuple] = []
+        self._window: List[Dict] = []
+        self._window_context = None
+        self._last_flush = time.time()
+        
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._previous = None
+        self._temperature = None
+        self._temperature_at = 0.0
+        self.stats = {'samples': 0, 'sample_seconds': 0.0, 'rows_flushed': 0, 'flushes': 0, 'flush_errors': 0}
+    
+    def start(self):
+        """Start the sampler thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._previous = self._read_counters()
+            self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        self._close_window()
+        self.flush()
+    
+    def attach_database(self, db_manager):
+        """Write aggregated samples to this database's system_metrics table"""
+        self.db_manager = db_manager
+        self.start()
+    
+    def set_context(self, build_id: str = None, stage_name: str = None):
+        """Attribute following samples to a build stage (None clears it)"""
+        with self._lock:
+            self.context = {'build_id': build_id, 'stage_name': stage_name}
+    
+    def latest(self) -> Dict:
+        """Most recent sample; never blocks on a measurement"""
+        self.start()
+        with self._lock:
+            if self.samples:
+                return dict(self.samples[-1])
+        # Nothing sampled yet: counters without a delta give everything but CPU
+        return self._build_sample(None, self._read_counters(), time.time())
+    
+    def window(self, seconds: float = 60) -> List[Dict]:
+        """Samples of the last ``seconds`` seconds, oldest first"""
+        cutoff = time.time() - seconds
+        with self._lock:
+            return [dict(sample) for sample in self.samples if sample['time'] >= cutoff]
+    
+    def summary(self, seconds: float = 60) -> Dict:
+        """Average and peak of the main metrics over a recent window"""
+        samples = self.window(seconds)
+        if not samples:
+            return {}
+        summary = {'samples': len(samples)}
+        for key in ('cpu_percent', 'memory_percent', 'load_average_1m', 'disk_read_mb_s', 'disk_write_mb_s'):
+            values = [s[key] for s in samples if s.get(key) is not None]
+            if values:
+                summary[f"avg_{key}"] = round(sum(values) / len(values), 2)
+                summary[f"max_{key}"] = round(max(values), 2)
+        return summary
+    
+    def record_now(self, build_id: str, stage_name: str = None):
+        """Queue the latest sample as a row for the next batch flush"""
+        sample = self.latest()
+        with self._lock:
+            self._pending_rows.append(self._row(build_id, stage_name, [sample]))
+    
+    def flush(self):
+        """Write queued rows to system_metrics in one transaction"""
+        with self._lock:
+            rows, self._pending_rows = self._pending_rows, []
+            self._last_flush = time.time()
+        
+        if not rows or self.db_manager is None:
+            return
+        
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO system_metrics
+                    (build_id, stage_name, timestamp, cpu_percent, memory_percent, memory_used_mb,
+                     disk_io_read_mb, disk_io_write_mb, network_bytes_sent, network_bytes_recv,
+                     load_average_1m, temperature_celsius)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, rows)
+                conn.commit()
+            self.stats['rows_flushed'] += len(rows)
+            self.stats['flushes'] += 1
+        except Exception as e:
+            self.stats['flush_errors'] += 1
+            print(f"Failed to flush system metrics: {e}")
+            # Keep the rows for the next flush, bounded by the ring buffer size
+            with self._lock:
+                self._pending_rows = (rows + self._pending_rows)[-self.samples.maxlen:]
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'buffered_samples': len(self.samples),
+                'pending_rows': len(self._pending_rows),
+                'avg_sample_ms': round(self.stats['sample_seconds'] * 1000 / self.stats['samples'], 3)
+                if self.stats['samples'] else 0.0
+            }
+    
+    def _run(self):
+        next_sample = time.monotonic()
+        while True:
+            # Fixed-rate schedule so sampling cost does not skew the interval
+            next_sample += self.interval
+            if self._stop.wait(max(next_sample - time.monotonic(), 0)):
+                break
+            try:
+                self._sample_once()
+                if self.db_manager is not None and time.time() - self._last_flush >= self.flush_interval:
+                    self.flush()
+            except Exception as e:
+                print(f"Metrics sampler error: {e}")
+    
+    def _sample_once(self):
+        started = time.perf_counter()
+        now = time.time()
+        counters = self._read_counters()
+        sample = self._build_sample(self._previous, counters, now)
+        self._previous = counters
+        
+        with self._lock:
+            self.samples.append(sample)
+            context = (self.context['build_id'], self.context['stage_name'])
+            self.stats['samples'] += 1
+            self.stats['sample_seconds'] += time.perf_counter() - started
+        
+        if self.db_manager is not None:
+            if self._window and (context != self._window_context or now - self._window[0]['time'] >= self.aggregate_seconds):
+                self._close_window()
+            self._window_context = context
+            self._window.append(sample)
+    
+    def _close_window(self):
+        """Aggregate the samples of the current window into one pending row"""
+        if not self._window:
+            return
+        build_id, stage_name = self._window_context or (None, None)
+        row = self._row(build_id, stage_name, self._window)
+        self._window = []
+        with self._lock:
+            self._pending_rows.append(row)
+    
+    @staticmethod
+    def _row(build_id, stage_name, samples: List[Dict]) -> tuple:
+        def average(key):
+            values = [s[key] for s in samples if s.get(key) is not None]
+            return round(sum(values) / len(values), 2) if values else None
+        
+        span = max(samples[-1]['time'] - samples[0]['time'], 0) + samples[-1].get('elapsed', 0)
+        return (
+            build_id, stage_name, datetime.fromtimestamp(samples[-1]['time']),
+            average('cpu_percent'), average('memory_percent'),
+            max(s['memory_used_mb'] for s in samples),
+            round((average('disk_read_mb_s') or 0) * span, 2),
+            round((average('disk_write_mb_s') or 0) * span, 2),
+            sum(s.get('network_sent_bytes', 0) for s in samples),
+            sum(s.get('network_recv_bytes', 0) for s in samples),
+            average('load_average_1m'), samples[-1].get('temperature_celsius')
+        )
+    
+    def _read_counters(self) -> Dict:
+        counters = {'monotonic': time.monotonic()}
+        if psutil is None:
+            return counters
+        counters['cpu_times'] = psutil.cpu_times()
+        counters['disk_io'] = psutil.disk_io_counters()
+        counters['net_io'] = psutil.net_io_counters()
+        return counters
+    
+    def _build_sample(self, previous: Optional[Dict], current: Dict, now: float) -> Dict:
+        sample = {
+            'time': now,
+            'elapsed': 0.0,
+            'cpu_percent': None,
+            'memory_percent': None,
+            'memory_used_mb': 0,
+            'memory_available_mb': None,
+            'disk_read_mb_s': 0.0,
+            'disk_write_mb_s': 0.0,
+            'network_sent_bytes': 0,
+            'network_recv_bytes': 0,
+            'load_average_1m': os.getloadavg()[0] if hasattr(os, 'getloadavg') else None,
+            'temperature_celsius': self._read_temperature(now)
+        }
+        
+        if psutil is None:
+            return sample
+        
+        memory = psutil.virtual_memory()
+        sample['memory_percent'] = memory.percent
+        sample['memory_used_mb'] = memory.used // (1024 * 1024)
+        sample['memory_available_mb'] = memory.available // (1024 * 1024)
+        
+        if previous is None or 'cpu_times' not in previous:
+            return sample
+        
+        elapsed = max(current['monotonic'] - previous['monotonic'], 1e-6)
+        sample['elapsed'] = elapsed
+        
+        busy_before, total_before = self._cpu_busy_total(previous['cpu_times'])
+        busy_after, total_after = self._cpu_busy_total(current['cpu_times'])
+        if total_after > total_before:
+            sample['cpu_percent'] = round(100.0 * (busy_after - busy_before) / (total_after - total_before), 1)
+        
+        if current['disk_io'] and previous['disk_io']:
+            sample['disk_read_mb_s'] = round(
+                (current['disk_io'].read_bytes - previous['disk_io'].read_bytes) / elapsed / (1024 * 1024), 2)
+            sample['disk_write_mb_s'] = round(
+                (current['disk_io'].write_bytes - previous['disk_io'].write_bytes) / elapsed / (1024 * 1024), 2)
+        
+        if current['net_io'] and previous['net_io']:
+            sample['network_sent_bytes'] = max(current['net_io'].bytes_sent - previous['net_io'].bytes_sent, 0)
+            sample['network_recv_bytes'] = max(current['net_io'].bytes_recv - previous['net_io'].bytes_recv, 0)
+        
+        return sample
+    
+    @staticmethod
+    def _cpu_busy_total(cpu_times):
+        # Guest time is already included in user time on Linux
+        total = sum(cpu_times) - getattr(cpu_times, 'guest', 0) - getattr(cpu_times, 'guest_nice', 0)
+        idle = cpu_times.idle + getattr(cpu_times, 'iowait', 0)
+        return total - idle, total
+    
+    def _read_temperature(self, now: float) -> Optional[float]:
+        # Sensor enumeration is slow; refresh it on its own, longer interval
+        if psutil is None or now - self._temperature_at < self.temperature_interval:
+            return self._temperature
+        self._temperature_at = now
+        try:
+            temps = psutil.sensors_temperatures() if hasattr(psutil, 'sensors_temperatures') else {}
+            self._temperature = next((entries[0].current for entries in temps.values() if entries), None)
+        except Exception:
+            self._temperature = None
+        return self._temperature
+
+_metrics_sampler = None
+_metrics_sampler_lock = threading.Lock()
+
+def get_metrics_sampler() -> MetricsSampler:
+    """Return the process-wide metrics sampler shared by all monitors"""
+    global _metrics_sampler
+    if _metrics_sampler is None:
+        with _metrics_sampler_lock:
+            if _metrics_sampler is None:
+                _metrics_sampler = MetricsSampler()
+    return _metrics_sampler
@@ -59,6 +59,24 @@ class EnhancedMainWindow(QMainWindow):
                 self.error_correction = None
                 self.build_modifier = None
             
+            # Initialize CI/CD: pipelines run for the commits the Git hooks spool
+            try:
+                from ..cicd.pipeline_engine import PipelineEngine
+                from ..cicd.git_integration import GitIntegration
+                from ..orchestration.work_coordinator import WorkCoordinator
+                
+                # Jobs with ``runs_on`` labels go to worker agents when distributed builds are enabled
+                coordinator = WorkCoordinator.from_config(self.db, self.settings.get('distributed'))
+                self.cicd_engine = PipelineEngine(self.db, self.repo_manager, coordinator=coordinator)
+                self.cicd_engine.build_engine = self.build_engine
+                self.git_integration = GitIntegration(self.cicd_engine, self.repo_manager)
+                self.git_integration.start_trigger_watcher()
+                print("✅ CI/CD pipeline triggers initialized")
+            except Exception as e:
+                print(f"⚠️ CI/CD initialization failed: {e}")
+                self.cicd_engine = None
+                self.git_integration = None
+            
             # Create thread-safe signals
             self.build_signals = BuildSignals()
             self.build_signals.stage_started.connect(self.on_stage_start)
@@ -4369,9 +4387,10 @@ Size: {len(doc.get('content', ''))} characters"""
             
             import psutil
             import shutil
+            from ..database.metrics_sampler import get_metrics_sampler
             
-            # Get real system metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Get real system metrics (CPU from the shared sampler instead of blocking the GUI thread)
+            cpu_percent = get_metrics_sampler().latest().get('cpu_percent') or 0.0
             memory = psutil.virtual_memory()
             disk = shutil.disk_usage('/')
             
@@ -6455,8 +6474,9 @@ stages:
             try:
                 import psutil
                 import shutil
+                from ..database.metrics_sampler import get_metrics_sampler
                 
-                cpu_percent = psutil.cpu_percent(interval=0.1)
+                cpu_percent = get_metrics_sampler().latest().get('cpu_percent') or 0.0
                 memory = psutil.virtual_memory()
                 disk = shutil.disk_usage('/')
                 
@@ -246,10 +246,12 @@ class FeatureStatusBar(QStatusBar):
         """Update status bar information"""
         try:
             import psutil
+            from ..database.metrics_sampler import get_metrics_sampler
             
-            # Update system metrics
-            cpu_percent = psutil.cpu_percent()
-            memory_percent = psutil.virtual_memory().percent
+            # Update system metrics from the shared sampler
+            sample = get_metrics_sampler().latest()
+            cpu_percent = sample.get('cpu_percent') or 0.0
+            memory_percent = sample.get('memory_percent') or psutil.virtual_memory().percent
             disk_percent = psutil.disk_usage('/').percent
             
             self.cpu_label.setText(f"🖥️ CPU: {cpu_percent:.1f}%")
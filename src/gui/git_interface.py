@@ -477,11 +477,23 @@ class GitTagWidget(QWidget):
 class GitMainInterface(QWidget):
     """Main Git interface combining all components"""
     
+    # Changed repository status keys, delivered from the status watcher thread
+    status_changed = pyqtSignal(dict)
+    
     def __init__(self, repo_manager, parent=None):
         super().__init__(parent)
         self.repo_manager = repo_manager
         self.setup_ui()
         self.refresh_all()
+        
+        # The status service pushes changes; nothing here polls the repository
+        status_service = getattr(repo_manager, 'status_service', None)
+        if status_service:
+            self.status_changed.connect(self.apply_status_changes)
+            # Every attribute access makes a new bound signal, so keep the one subscribed
+            self._status_subscriber = self.status_changed.emit
+            status_service.subscribe(self._status_subscriber)
+            self.destroyed.connect(lambda: status_service.unsubscribe(self._status_subscriber))
     
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -636,6 +648,26 @@ class GitMainInterface(QWidget):
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to refresh git data: {e}")
     
+    def apply_status_changes(self, changes: Dict):
+        """Update only the views whose repository status changed"""
+        try:
+            if any(key.endswith('_files') for key in changes):
+                self.status_widget.update_status(self.repo_manager.get_detailed_status())
+            if 'branches' in changes or 'current_branch' in changes:
+                repo_status = self.repo_manager.get_repository_status()
+                self.branch_widget.update_branches(
+                    repo_status.get('branches', []),
+                    repo_status.get('current_branch', 'main')
+                )
+            if 'last_commit' in changes or 'branches' in changes:
+                self.commit_graph.set_commits(self.repo_manager.get_commit_graph(50))
+            if 'stashes' in changes:
+                self.stash_widget.update_stashes(self.repo_manager.list_stashes())
+            if 'tags' in changes:
+                self.tag_widget.update_tags(self.repo_manager.list_tags())
+        except Exception as e:
+            print(f"Error applying repository status changes: {e}")
+    
     def stage_file(self, file_path: str):
         if self.repo_manager.stage_file(file_path):
             self.refresh_all()
@@ -320,9 +320,10 @@ class MLStatusTab(QWidget):
             output += "\n"
             
             # Get real system metrics
+            from ..database.metrics_sampler import get_metrics_sampler
             memory = psutil.virtual_memory()
             metrics = {
-                'cpu_usage': psutil.cpu_percent(interval=1),
+                'cpu_usage': get_metrics_sampler().latest().get('cpu_percent') or 0.0,
                 'memory_usage': memory.percent,
                 'available_memory': memory.available
             }
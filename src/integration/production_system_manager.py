@@ -4,12 +4,26 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
+def _get_metrics_sampler():
+    """The process-wide sampler, imported under the same package as the rest of the system
+    
+    Importing it as both ``src.database.metrics_sampler`` and
+    ``database.metrics_sampler`` would load the module twice and start a
+    second sampler thread writing duplicate system_metrics rows.
+    """
+    try:
+        from ..database.metrics_sampler import get_metrics_sampler
+    except ImportError:
+        # Loaded as the top-level ``integration`` package with src on sys.path
+        from database.metrics_sampler import get_metrics_sampler
+    return get_metrics_sampler()
+
 class ProductionSystemManager:
     """Production-ready system manager integrating all LFS build system components"""
     
-    def __init__(self, db_manager=None):
+    def __init__(self, db_manager=None, build_engine=None):
         self.db = db_manager
-        self.components = {}
+        self.components = {'build_engine': build_engine} if build_engine else {}
         self.services = {}
         self.system_status = "initializing"
         self.monitoring_active = False
@@ -65,7 +79,8 @@ class ProductionSystemManager:
                 from notifications.notification_system import NotificationSystem
                 
                 self.components['api_server'] = APIServer()
-                self.components['scheduler'] = BuildScheduler(self.db, None)  # Build engine will be set later
+                # Without an engine the scheduler is not started until attach_build_engine()
+                self.components['scheduler'] = BuildScheduler(self.db, self.components.get('build_engine'))
                 self.components['notifications'] = NotificationSystem()
             except ImportError as e:
                 print(f"Warning: Could not import infrastructure services: {e}")
@@ -114,11 +129,15 @@ class ProductionSystemManager:
             except Exception as e:
                 service_results['api_server'] = {'status': 'failed', 'error': str(e)}
             
-            # Start build scheduler
+            # Start build scheduler; scheduled builds would wait forever without an engine
             try:
-                self.components['scheduler'].start_scheduler()
-                service_results['scheduler'] = {'status': 'running'}
-                self.services['scheduler'] = {'status': 'running'}
+                if self.components['scheduler'].build_engine is None:
+                    print("⚠️ Build scheduler waits for a build engine (attach_build_engine)")
+                    self.services['scheduler'] = {'status': 'waiting'}
+                else:
+                    self.components['scheduler'].start_scheduler()
+                    self.services['scheduler'] = {'status': 'running'}
+                service_results['scheduler'] = dict(self.services['scheduler'])
             except Exception as e:
                 service_results['scheduler'] = {'status': 'failed', 'error': str(e)}
             
@@ -141,6 +160,17 @@ class ProductionSystemManager:
             print(f"❌ Failed to start services: {e}")
             return {'error': str(e)}
     
+    def attach_build_engine(self, build_engine):
+        """Use a build engine for workflows and scheduled builds, starting a waiting scheduler"""
+        self.components['build_engine'] = build_engine
+        scheduler = self.components.get('scheduler')
+        if scheduler is None:
+            return
+        scheduler.build_engine = build_engine
+        if self.services.get('scheduler', {}).get('status') == 'waiting':
+            scheduler.start_scheduler()
+            self.services['scheduler'] = {'status': 'running'}
+    
     def start_system_monitoring(self):
         """Start comprehensive system monitoring"""
         if not self.monitoring_active:
@@ -182,9 +212,11 @@ class ProductionSystemManager:
         try:
             import psutil
             
-            # System resources
-            metrics['cpu_percent'] = psutil.cpu_percent(interval=1)
-            metrics['memory_percent'] = psutil.virtual_memory().percent
+            # System resources from the shared sampler (never blocks)
+            sample = _get_metrics_sampler().latest()
+            metrics['cpu_percent'] = sample.get('cpu_percent') or 0
+            metrics['memory_percent'] = sample.get('memory_percent') or 0
+            metrics['load_average_1m'] = sample.get('load_average_1m')
             metrics['disk_percent'] = psutil.disk_usage('/').percent
             
             # Service status
@@ -208,26 +240,10 @@ class ProductionSystemManager:
         """Store system metrics in database"""
         try:
             if self.db:
-                conn = self.db.connect()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    INSERT INTO system_metrics 
-                    (timestamp, cpu_percent, memory_percent, disk_percent, 
-                     service_count, component_count, raw_data)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    metrics['timestamp'],
-                    metrics.get('cpu_percent', 0),
-                    metrics.get('memory_percent', 0),
-                    metrics.get('disk_percent', 0),
-                    len(metrics.get('services', {})),
-                    len(metrics.get('components', {})),
-                    str(metrics)
-                ))
-                
-                conn.commit()
-                cursor.close()
+                # system_metrics rows are aggregated and batch written by the shared sampler
+                sampler = _get_metrics_sampler()
+                if sampler.db_manager is None:
+                    sampler.attach_database(self.db)
                 
         except Exception as e:
             print(f"Error storing system metrics: {e}")
@@ -150,8 +150,10 @@ class SystemCoordinator:
         try:
             # Get system resource metrics
             import psutil
-            health_data['cpu_percent'] = psutil.cpu_percent()
-            health_data['memory_percent'] = psutil.virtual_memory().percent
+            from ..database.metrics_sampler import get_metrics_sampler
+            sample = get_metrics_sampler().latest()
+            health_data['cpu_percent'] = sample.get('cpu_percent') or 0
+            health_data['memory_percent'] = sample.get('memory_percent') or 0
             health_data['disk_percent'] = psutil.disk_usage('/').percent
             
         except Exception as e:
@@ -40,7 +40,8 @@ class AnomalyDetector:
         """Collect current system metrics"""
         try:
             # CPU metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Compare against the previous call rather than blocking for a second
+            cpu_percent = psutil.cpu_percent(interval=None)
             cpu_count = psutil.cpu_count()
             load_avg = psutil.getloadavg() if hasattr(psutil, 'getloadavg') else (0, 0, 0)
             
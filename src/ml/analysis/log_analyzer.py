@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import numpy as np
 from collections import defaultdict, Counter
 
+from ...analysis.pattern_engine import get_pattern_engine
+
 class LogAnalyzer:
     """Advanced log analysis for root cause detection"""
     
@@ -16,6 +18,19 @@ class LogAnalyzer:
         self.error_patterns = self._load_error_patterns()
         self.root_cause_rules = self._load_root_cause_rules()
         
+        # Compile both rule sets once into the shared engine
+        self.pattern_engine = get_pattern_engine()
+        self.pattern_engine.register('log_analyzer.errors', [
+            ((category, pattern), pattern)
+            for category, patterns in self.error_patterns.items()
+            for pattern in patterns
+        ])
+        self.pattern_engine.register('log_analyzer.root_causes', [
+            ((cause_name, pattern), pattern)
+            for cause_name, rule in self.root_cause_rules.items()
+            for pattern in rule['patterns']
+        ])
+        
     def _load_error_patterns(self) -> Dict:
         """Load common error patterns for LFS builds"""
         return {
@@ -133,21 +148,19 @@ class LogAnalyzer:
         
         for log in logs:
             content = log.get('content', '')
-            lines = content.split('\n')
             
-            for line_num, line in enumerate(lines):
-                for category, patterns in self.error_patterns.items():
-                    for pattern in patterns:
-                        matches = re.findall(pattern, line, re.IGNORECASE)
-                        if matches:
-                            error_counts[category] += len(matches)
-                            error_details.append({
-                                'category': category,
-                                'line': line.strip(),
-                                'match': matches[0] if matches else '',
-                                'timestamp': log.get('created_at'),
-                                'line_number': line_num + 1
-                            })
+            # Only lines the prefilter flags are re-matched with their full regexes
+            for hit in self.pattern_engine.scan(content, ('log_analyzer.errors',)):
+                category, _ = hit.key
+                matches = hit.pattern.regex.findall(hit.line)
+                error_counts[category] += len(matches)
+                error_details.append({
+                    'category': category,
+                    'line': hit.line.strip(),
+                    'match': matches[0] if matches else '',
+                    'timestamp': log.get('created_at'),
+                    'line_number': hit.line_number
+                })
         
         return {
             'error_counts': dict(error_counts),
@@ -160,12 +173,16 @@ class LogAnalyzer:
         root_causes = []
         all_content = '\n'.join([log.get('content', '') for log in logs])
         
+        pattern_hits = defaultdict(list)
+        for hit in self.pattern_engine.scan(all_content, ('log_analyzer.root_causes',)):
+            pattern_hits[hit.key].extend(hit.pattern.regex.findall(hit.line))
+        
         for cause_name, rule in self.root_cause_rules.items():
             pattern_matches = 0
             matched_patterns = []
             
             for pattern in rule['patterns']:
-                matches = re.findall(pattern, all_content, re.IGNORECASE)
+                matches = pattern_hits.get((cause_name, pattern))
                 if matches:
                     pattern_matches += len(matches)
                     matched_patterns.extend(matches[:3])
@@ -1,27 +1,63 @@
 """
 Real-time ML Inference Engine
 Production inference system for live build monitoring and prediction
+
+Predictions are driven by build events (stage transitions, error lines seen
+in the log) rather than wall-clock polling. Events mark a build as pending
+and wake the inference thread, which collects every pending build into a
+single micro-batch: features for the whole batch are fetched with one query
+per table, each model in the ensemble is invoked once over the batch, and
+the resulting predictions are written back with one multi-row INSERT.
 """
 
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import logging
 import json
 
 class RealTimeInferenceEngine:
     """Real-time inference engine for live ML predictions"""
     
-    def __init__(self, ml_engine, db_manager):
+    # Events from the build engine / log monitor that invalidate a prediction
+    TRIGGER_EVENTS = ('stage_start', 'stage_complete', 'stage_output_error', 'build_error', 'log_error')
+    
+    def __init__(self, ml_engine, db_manager, batch_window: float = 2.0,
+                 idle_interval: float = 300.0, cache_size: int = 512):
         self.ml_engine = ml_engine
         self.db = db_manager
         self.logger = logging.getLogger(__name__)
         
         self.inference_active = False
         self.inference_thread = None
-        self.prediction_cache = {}
+        
+        # Bounded LRU cache keyed on (build_id, stage, feature_version)
+        self.prediction_cache = OrderedDict()
+        self.cache_size = cache_size
+        
+        # build_id -> {'stage': str, 'feature_version': int, 'last_event': str}
         self.active_builds = {}
+        self.pending_builds = set()
+        
+        # Events arriving within batch_window are coalesced into one batch;
+        # idle_interval is a safety net for builds that emit no events
+        self.batch_window = batch_window
+        self.idle_interval = idle_interval
+        
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._attached_engines = set()
+        
+        self.stats = {
+            'events_received': 0,
+            'batches_run': 0,
+            'predictions_made': 0,
+            'cache_hits': 0,
+            'queries_issued': 0,
+            'alerts_raised': 0
+        }
         
     def start_inference_monitoring(self):
         """Start real-time inference monitoring"""
@@ -36,107 +72,240 @@ class RealTimeInferenceEngine:
     def stop_inference_monitoring(self):
         """Stop real-time inference monitoring"""
         self.inference_active = False
+        self._wakeup.set()
         if self.inference_thread:
             self.inference_thread.join(timeout=5)
         self.logger.info("Real-time inference monitoring stopped")
     
+    def attach_to_build_engine(self, build_engine):
+        """Subscribe to stage and log events emitted by a BuildEngine"""
+        if id(build_engine) in self._attached_engines:
+            return
+        
+        for event in self.TRIGGER_EVENTS:
+            build_engine.register_callback(
+                event, lambda data, event=event: self._on_build_engine_event(event, data)
+            )
+        build_engine.register_callback('build_finished', self._on_build_finished)
+        self._attached_engines.add(id(build_engine))
+    
+    def _on_build_engine_event(self, event: str, data: Dict):
+        """Translate a BuildEngine callback payload into a trigger"""
+        if isinstance(data, dict) and data.get('build_id'):
+            self.notify_build_event(data['build_id'], data.get('stage'), event)
+    
+    def _on_build_finished(self, data: Dict):
+        """Forget a build once it has ended, whatever its outcome"""
+        if not isinstance(data, dict) or not data.get('build_id'):
+            return
+        
+        with self._lock:
+            self.active_builds.pop(data['build_id'], None)
+            self.pending_builds.discard(data['build_id'])
+    
+    def notify_build_event(self, build_id: str, stage_name: str = None, event_type: str = 'stage_start'):
+        """Record a build event and schedule the build for the next inference batch"""
+        with self._lock:
+            build = self.active_builds.setdefault(build_id, {
+                'stage': None,
+                'feature_version': 0,
+                'last_event': None
+            })
+            if stage_name and event_type != 'stage_complete':
+                build['stage'] = stage_name
+            build['feature_version'] += 1
+            build['last_event'] = event_type
+            self.pending_builds.add(build_id)
+            self.stats['events_received'] += 1
+        
+        self._wakeup.set()
+    
     def predict_build_outcome(self, build_id: str, current_stage: str = None) -> Dict:
         """Predict build outcome in real-time"""
         try:
-            # Check cache first
-            cache_key = f"{build_id}_{current_stage}"
-            if cache_key in self.prediction_cache:
-                cached = self.prediction_cache[cache_key]
-                if (datetime.now() - cached['timestamp']).seconds < 300:  # 5 min cache
-                    return cached['prediction']
-            
-            # Extract real-time features
-            features = self._extract_realtime_features(build_id, current_stage)
-            
-            # Get predictions from all models
-            predictions = {}
-            
-            # Failure prediction
-            if hasattr(self.ml_engine, 'failure_predictor'):
-                failure_risk = self.ml_engine.failure_predictor.predict_failure_risk(features)
-                predictions['failure_risk'] = failure_risk
-            
-            # Performance prediction
-            if hasattr(self.ml_engine, 'performance_optimizer'):
-                perf_recommendations = self.ml_engine.performance_optimizer.get_recommendations(features)
-                predictions['performance_recommendations'] = perf_recommendations
-            
-            # Anomaly detection
-            if hasattr(self.ml_engine, 'anomaly_detector'):
-                anomaly_score = self.ml_engine.anomaly_detector.check_realtime_anomaly(features)
-                predictions['anomaly_detected'] = anomaly_score
-            
-            # Advanced prediction if available
-            if hasattr(self.ml_engine, 'advanced_predictor'):
-                advanced_pred = self.ml_engine.advanced_predictor.predict_with_confidence(features)
-                predictions['advanced_prediction'] = advanced_pred
-            
-            # Combine predictions
-            combined_prediction = self._combine_predictions(predictions)
-            
-            # Cache result
-            self.prediction_cache[cache_key] = {
-                'timestamp': datetime.now(),
-                'prediction': combined_prediction
-            }
-            
-            # Store prediction in database
-            self._store_prediction(build_id, current_stage, combined_prediction)
+            with self._lock:
+                build = self.active_builds.get(build_id)
+                feature_version = build['feature_version'] if build else 0
+                if current_stage is None and build:
+                    current_stage = build['stage']
             
-            return combined_prediction
+            results = self._run_batch([(build_id, current_stage, feature_version)])
+            return results.get(build_id, {'error': 'No prediction available', 'failure_risk': 0.5})
             
         except Exception as e:
             self.logger.error(f"Real-time prediction failed for {build_id}: {e}")
             return {'error': str(e), 'failure_risk': 0.5}
     
+    def predict_build_batch(self, builds: List[Tuple[str, Optional[str]]]) -> Dict[str, Dict]:
+        """Predict outcomes for several builds at once, keyed by build_id"""
+        with self._lock:
+            requests = [
+                (build_id, stage, self.active_builds.get(build_id, {}).get('feature_version', 0))
+                for build_id, stage in builds
+            ]
+        
+        try:
+            return self._run_batch(requests)
+        except Exception as e:
+            self.logger.error(f"Batch prediction failed: {e}")
+            return {}
+    
+    def _run_batch(self, requests: List[Tuple[str, Optional[str], int]]) -> Dict[str, Dict]:
+        """Serve cached predictions and run the ensemble once over the rest"""
+        results = {}
+        misses = []
+        
+        with self._lock:
+            for build_id, stage, feature_version in requests:
+                cache_key = (build_id, stage, feature_version)
+                cached = self.prediction_cache.get(cache_key)
+                if cached is not None:
+                    self.prediction_cache.move_to_end(cache_key)
+                    self.stats['cache_hits'] += 1
+                    results[build_id] = cached
+                else:
+                    misses.append((build_id, stage, feature_version))
+        
+        if not misses:
+            return results
+        
+        features_batch = self._extract_realtime_features_batch(
+            [(build_id, stage) for build_id, stage, _ in misses]
+        )
+        
+        scored = [(request, features_batch[request[0]]) for request in misses if request[0] in features_batch]
+        if not scored:
+            return results
+        
+        predictions = self._predict_ensemble_batch([features for _, features in scored])
+        
+        to_store = []
+        with self._lock:
+            for ((build_id, stage, feature_version), _), model_predictions in zip(scored, predictions):
+                combined = self._combine_predictions(model_predictions)
+                results[build_id] = combined
+                to_store.append((build_id, stage, combined))
+                
+                self.prediction_cache[(build_id, stage, feature_version)] = combined
+                while len(self.prediction_cache) > self.cache_size:
+                    self.prediction_cache.popitem(last=False)
+            
+            self.stats['batches_run'] += 1
+            self.stats['predictions_made'] += len(to_store)
+        
+        self._store_predictions(to_store)
+        
+        return results
+    
+    def _predict_ensemble_batch(self, features_batch: List[Dict]) -> List[Dict]:
+        """Run every model in the ensemble once across the whole batch"""
+        predictions = [{} for _ in features_batch]
+        
+        # Failure prediction
+        failure_predictor = getattr(self.ml_engine, 'failure_predictor', None)
+        if failure_predictor:
+            try:
+                if hasattr(failure_predictor, 'predict_batch'):
+                    batch = failure_predictor.predict_batch(features_batch)
+                    risks = [p['risk_score'] * 100 if p and 'risk_score' in p else 0.0 for p in batch]
+                else:
+                    risks = [failure_predictor.predict_failure_risk(f) for f in features_batch]
+                for prediction, risk in zip(predictions, risks):
+                    prediction['failure_risk'] = risk
+            except Exception as e:
+                self.logger.warning(f"Failure predictor batch error: {e}")
+        
+        # Performance prediction
+        performance_optimizer = getattr(self.ml_engine, 'performance_optimizer', None)
+        if performance_optimizer:
+            try:
+                for prediction, features in zip(predictions, features_batch):
+                    prediction['performance_recommendations'] = performance_optimizer.get_recommendations(features)
+            except Exception as e:
+                self.logger.warning(f"Performance optimizer batch error: {e}")
+        
+        # Anomaly detection
+        anomaly_detector = getattr(self.ml_engine, 'anomaly_detector', None)
+        if anomaly_detector:
+            try:
+                for prediction, features in zip(predictions, features_batch):
+                    prediction['anomaly_detected'] = anomaly_detector.check_realtime_anomaly(features)
+            except Exception as e:
+                self.logger.warning(f"Anomaly detector batch error: {e}")
+        
+        # Advanced prediction if available
+        advanced_predictor = getattr(self.ml_engine, 'advanced_predictor', None)
+        if advanced_predictor:
+            try:
+                for prediction, features in zip(predictions, features_batch):
+                    prediction['advanced_prediction'] = advanced_predictor.predict_with_confidence(features)
+            except Exception as e:
+                self.logger.warning(f"Advanced predictor batch error: {e}")
+        
+        return predictions
+    
     def _extract_realtime_features(self, build_id: str, current_stage: str = None) -> Dict:
         """Extract features for real-time prediction"""
+        return self._extract_realtime_features_batch([(build_id, current_stage)]).get(build_id, {})
+    
+    def _extract_realtime_features_batch(self, builds: List[Tuple[str, Optional[str]]]) -> Dict[str, Dict]:
+        """Extract features for a batch of builds with one query per table"""
+        if not builds:
+            return {}
+        
         try:
+            build_ids = [build_id for build_id, _ in builds]
+            placeholders = ', '.join(['%s'] * len(build_ids))
+            
             # Get current build data
-            build_data = self.db.execute_query("""
+            build_rows = self.db.execute_query(f"""
                 SELECT b.*, COUNT(bs.stage_name) as completed_stages,
                        AVG(bs.duration_seconds) as avg_stage_duration
                 FROM builds b
                 LEFT JOIN build_stages bs ON b.build_id = bs.build_id AND bs.status = 'completed'
-                WHERE b.build_id = %s
+                WHERE b.build_id IN ({placeholders})
                 GROUP BY b.build_id
-            """, (build_id,), fetch=True)
-            
-            if not build_data:
-                return {}
+            """, tuple(build_ids), fetch=True) or []
+            self.stats['queries_issued'] += 1
             
-            build = build_data[0]
-            
-            # Calculate elapsed time
-            start_time = build.get('start_time')
-            if start_time:
-                elapsed_seconds = (datetime.now() - start_time).total_seconds()
-            else:
-                elapsed_seconds = 0
-            
-            features = {
-                'build_id': build_id,
-                'elapsed_time': elapsed_seconds,
-                'completed_stages': build.get('completed_stages', 0),
-                'avg_stage_duration': build.get('avg_stage_duration', 0) or 0,
-                'current_stage': current_stage or 'unknown'
-            }
+            rows_by_id = {row['build_id']: row for row in build_rows}
             
-            # Add stage-specific features
-            if current_stage:
-                stage_features = self._get_stage_specific_features(build_id, current_stage)
-                features.update(stage_features)
+            stage_features = self._get_stage_specific_features_batch(
+                {stage for _, stage in builds if stage}
+            )
             
-            # Add system resource features
+            # System resources are sampled once for the whole batch
             resource_features = self._get_system_resource_features()
-            features.update(resource_features)
             
-            return features
+            features_batch = {}
+            for build_id, current_stage in builds:
+                build = rows_by_id.get(build_id)
+                if not build:
+                    continue
+                
+                # Calculate elapsed time
+                start_time = build.get('start_time')
+                if start_time:
+                    elapsed_seconds = (datetime.now() - start_time).total_seconds()
+                else:
+                    elapsed_seconds = 0
+                
+                features = {
+                    'build_id': build_id,
+                    'elapsed_time': elapsed_seconds,
+                    'completed_stages': build.get('completed_stages', 0),
+                    'avg_stage_duration': build.get('avg_stage_duration', 0) or 0,
+                    'current_stage': current_stage or 'unknown'
+                }
+                
+                # Add stage-specific features
+                if current_stage:
+                    features.update(stage_features.get(current_stage, {}))
+                
+                features.update(resource_features)
+                features_batch[build_id] = features
+            
+            return features_batch
             
         except Exception as e:
             self.logger.error(f"Feature extraction failed: {e}")
@@ -144,28 +313,42 @@ class RealTimeInferenceEngine:
     
     def _get_stage_specific_features(self, build_id: str, stage_name: str) -> Dict:
         """Get features specific to current stage"""
+        return self._get_stage_specific_features_batch({stage_name}).get(stage_name, {})
+    
+    def _get_stage_specific_features_batch(self, stage_names) -> Dict[str, Dict]:
+        """Get historical features for several stages in one grouped query"""
+        stage_names = sorted(stage_names)
+        if not stage_names:
+            return {}
+        
         try:
-            # Get historical data for this stage
-            stage_history = self.db.execute_query("""
-                SELECT AVG(duration_seconds) as avg_duration,
+            placeholders = ', '.join(['%s'] * len(stage_names))
+            
+            # Get historical data for these stages
+            stage_history = self.db.execute_query(f"""
+                SELECT stage_name,
+                       AVG(duration_seconds) as avg_duration,
                        COUNT(*) as total_runs,
                        SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failures
                 FROM build_stages
-                WHERE stage_name = %s
+                WHERE stage_name IN ({placeholders})
                   AND start_time >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            """, (stage_name,), fetch=True)
+                GROUP BY stage_name
+            """, tuple(stage_names), fetch=True) or []
+            self.stats['queries_issued'] += 1
             
-            if stage_history:
-                hist = stage_history[0]
+            features = {}
+            for hist in stage_history:
+                stage_name = hist['stage_name']
                 failure_rate = (hist['failures'] / max(hist['total_runs'], 1)) if hist['total_runs'] else 0
                 
-                return {
+                features[stage_name] = {
                     f'{stage_name}_avg_duration': hist['avg_duration'] or 0,
                     f'{stage_name}_failure_rate': failure_rate,
                     f'{stage_name}_historical_runs': hist['total_runs'] or 0
                 }
             
-            return {}
+            return features
             
         except Exception as e:
             return {}
@@ -175,8 +358,10 @@ class RealTimeInferenceEngine:
         try:
             import psutil
             
+            # interval=None compares against the previous call instead of
+            # blocking the inference thread for a second
             return {
-                'cpu_percent': psutil.cpu_percent(interval=1),
+                'cpu_percent': psutil.cpu_percent(interval=None),
                 'memory_percent': psutil.virtual_memory().percent,
                 'disk_percent': psutil.disk_usage('/').percent,
                 'load_average': psutil.getloadavg()[0] if hasattr(psutil, 'getloadavg') else 0
@@ -239,56 +424,118 @@ class RealTimeInferenceEngine:
     
     def _store_prediction(self, build_id: str, stage: str, prediction: Dict):
         """Store prediction result in database"""
+        self._store_predictions([(build_id, stage, prediction)])
+    
+    def _store_predictions(self, predictions: List[Tuple[str, Optional[str], Dict]]):
+        """Store a batch of prediction results with a single multi-row INSERT"""
+        if not predictions:
+            return
+        
         try:
-            self.db.execute_query("""
+            values = []
+            params = []
+            for build_id, stage, prediction in predictions:
+                values.append("(%s, 'ml_prediction', %s, %s, NOW())")
+                params.extend([
+                    build_id,
+                    f'Real-time Prediction - {stage or "General"}',
+                    json.dumps(prediction, default=str)
+                ])
+            
+            self.db.execute_query(f"""
                 INSERT INTO build_documents (build_id, document_type, title, content, created_at)
-                VALUES (%s, 'ml_prediction', %s, %s, NOW())
-            """, (
-                build_id,
-                f'Real-time Prediction - {stage or "General"}',
-                json.dumps(prediction, default=str)
-            ))
+                VALUES {', '.join(values)}
+            """, tuple(params))
+            self.stats['queries_issued'] += 1
             
         except Exception as e:
-            self.logger.error(f"Failed to store prediction: {e}")
+            self.logger.error(f"Failed to store predictions: {e}")
     
     def _inference_loop(self):
-        """Main inference monitoring loop"""
+        """Main inference loop, woken by build events"""
         while self.inference_active:
             try:
-                # Get active builds
-                active_builds = self.db.execute_query("""
-                    SELECT build_id, status FROM builds
-                    WHERE status = 'running'
-                      AND start_time >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
-                """, fetch=True)
+                triggered = self._wakeup.wait(timeout=self.idle_interval)
+                if not self.inference_active:
+                    break
                 
-                # Run predictions for active builds
-                for build in active_builds:
-                    build_id = build['build_id']
-                    
-                    # Get current stage
-                    current_stage = self._get_current_stage(build_id)
-                    
-                    # Run prediction
-                    prediction = self.predict_build_outcome(build_id, current_stage)
-                    
-                    # Check for alerts
-                    if prediction.get('overall_risk', 0) > 0.8:
-                        self._trigger_alert(build_id, prediction)
+                if triggered:
+                    # Let a burst of events (stage_complete + stage_start,
+                    # several error lines) collapse into one batch
+                    time.sleep(self.batch_window)
+                self._wakeup.clear()
+                
+                with self._lock:
+                    pending = self.pending_builds
+                    self.pending_builds = set()
+                    batch = [
+                        (build_id, self.active_builds[build_id]['stage'])
+                        for build_id in pending if build_id in self.active_builds
+                    ]
                 
-                # Clean old cache entries
-                self._cleanup_cache()
+                if not triggered:
+                    # Idle safety net: pick up builds that emitted no events
+                    batch = self._discover_running_builds()
                 
-                # Sleep before next iteration
-                time.sleep(60)  # Check every minute
+                if not batch:
+                    continue
+                
+                results = self.predict_build_batch(batch)
+                
+                # Check for alerts
+                alerts = [
+                    (build_id, prediction) for build_id, prediction in results.items()
+                    if prediction.get('overall_risk', 0) > 0.8
+                ]
+                if alerts:
+                    self._trigger_alerts(alerts)
                 
             except Exception as e:
                 self.logger.error(f"Inference loop error: {e}")
-                time.sleep(30)
+                time.sleep(5)
+    
+    def _discover_running_builds(self) -> List[Tuple[str, Optional[str]]]:
+        """Find running builds and their current stage with a single query"""
+        try:
+            active_builds = self.db.execute_query("""
+                SELECT b.build_id,
+                       (SELECT bs.stage_name FROM build_stages bs
+                        WHERE bs.build_id = b.build_id AND bs.status = 'running'
+                        ORDER BY bs.stage_order DESC
+                        LIMIT 1) AS current_stage
+                FROM builds b
+                WHERE b.status = 'running'
+                  AND b.start_time >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+            """, fetch=True) or []
+            self.stats['queries_issued'] += 1
+            
+            batch = []
+            with self._lock:
+                for build in active_builds:
+                    build_id = build['build_id']
+                    known = self.active_builds.setdefault(build_id, {
+                        'stage': None,
+                        'feature_version': 0,
+                        'last_event': None
+                    })
+                    # Time-derived features have moved on since the last batch
+                    known['stage'] = build.get('current_stage') or known['stage']
+                    known['feature_version'] += 1
+                    batch.append((build_id, known['stage']))
+            
+            return batch
+            
+        except Exception as e:
+            self.logger.error(f"Failed to discover running builds: {e}")
+            return []
     
     def _get_current_stage(self, build_id: str) -> Optional[str]:
         """Get current stage for active build"""
+        with self._lock:
+            build = self.active_builds.get(build_id)
+            if build and build['stage']:
+                return build['stage']
+        
         try:
             current_stage = self.db.execute_query("""
                 SELECT stage_name FROM build_stages
@@ -304,43 +551,53 @@ class RealTimeInferenceEngine:
     
     def _trigger_alert(self, build_id: str, prediction: Dict):
         """Trigger alert for high-risk build"""
+        self._trigger_alerts([(build_id, prediction)])
+    
+    def _trigger_alerts(self, alerts: List[Tuple[str, Dict]]):
+        """Trigger alerts for a batch of high-risk builds"""
         try:
-            alert_data = {
-                'build_id': build_id,
-                'risk_level': prediction.get('risk_level', 'unknown'),
-                'overall_risk': prediction.get('overall_risk', 0),
-                'timestamp': datetime.now().isoformat(),
-                'recommendations': prediction.get('recommendations', [])
-            }
+            values = []
+            params = []
+            for build_id, prediction in alerts:
+                alert_data = {
+                    'build_id': build_id,
+                    'risk_level': prediction.get('risk_level', 'unknown'),
+                    'overall_risk': prediction.get('overall_risk', 0),
+                    'timestamp': datetime.now().isoformat(),
+                    'recommendations': prediction.get('recommendations', [])
+                }
+                values.append("(%s, 'ml_alert', 'High Risk Alert', %s, NOW())")
+                params.extend([build_id, json.dumps(alert_data)])
             
-            # Store alert
-            self.db.execute_query("""
+            # Store alerts
+            self.db.execute_query(f"""
                 INSERT INTO build_documents (build_id, document_type, title, content, created_at)
-                VALUES (%s, 'ml_alert', 'High Risk Alert', %s, NOW())
-            """, (build_id, json.dumps(alert_data)))
+                VALUES {', '.join(values)}
+            """, tuple(params))
+            self.stats['queries_issued'] += 1
+            self.stats['alerts_raised'] += len(alerts)
             
-            self.logger.warning(f"High risk alert for build {build_id}: {prediction.get('overall_risk', 0):.2f}")
+            for build_id, prediction in alerts:
+                self.logger.warning(f"High risk alert for build {build_id}: {prediction.get('overall_risk', 0):.2f}")
             
         except Exception as e:
             self.logger.error(f"Failed to trigger alert: {e}")
     
     def _cleanup_cache(self):
-        """Clean up old cache entries"""
-        cutoff = datetime.now() - timedelta(hours=1)
-        
-        keys_to_remove = [
-            key for key, value in self.prediction_cache.items()
-            if value['timestamp'] < cutoff
-        ]
-        
-        for key in keys_to_remove:
-            del self.prediction_cache[key]
+        """Trim the prediction cache to its configured size"""
+        with self._lock:
+            while len(self.prediction_cache) > self.cache_size:
+                self.prediction_cache.popitem(last=False)
     
     def get_inference_stats(self) -> Dict:
         """Get inference engine statistics"""
-        return {
-            'inference_active': self.inference_active,
-            'cache_size': len(self.prediction_cache),
-            'active_builds': len(self.active_builds),
-            'last_update': datetime.now().isoformat()
-        }
\ No newline at end of file
+        with self._lock:
+            return {
+                'inference_active': self.inference_active,
+                'cache_size': len(self.prediction_cache),
+                'cache_capacity': self.cache_size,
+                'active_builds': len(self.active_builds),
+                'pending_builds': len(self.pending_builds),
+                **self.stats,
+                'last_update': datetime.now().isoformat()
+            }
@@ -30,6 +30,7 @@ class MLEngine:
         self.feature_extractor = FeatureExtractor(db_manager)
         self.model_manager = ModelManager()
         self.models = {}
+        self.models_lock = threading.Lock()
         self.enabled = True
         
         # Setup logging
@@ -41,6 +42,18 @@ class MLEngine:
         # Initialize models
         self._initialize_models()
         
+        # Out-of-process training keeps retraining off the GUI's GIL
+        from .training.worker_pool import TrainingWorkerPool
+        pool_config = self.config["training_pool"]
+        self.training_pool = TrainingWorkerPool(
+            self,
+            max_concurrent=pool_config["max_concurrent"],
+            nice=pool_config["nice"],
+            ionice_idle=pool_config["ionice_idle"],
+            memory_limit_mb=pool_config["memory_limit_mb"],
+            job_timeout=pool_config["job_timeout_seconds"]
+        )
+        
         # Initialize training scheduler
         self.training_scheduler = TrainingScheduler(self, db_manager)
         self.training_scheduler.start_scheduler()
@@ -110,6 +123,13 @@ class MLEngine:
             "prediction": {
                 "confidence_threshold": 0.7,
                 "cache_predictions": True
+            },
+            "training_pool": {
+                "max_concurrent": 1,
+                "nice": 10,
+                "ionice_idle": True,
+                "memory_limit_mb": 2048,
+                "job_timeout_seconds": 3600
             }
         }
         
@@ -295,35 +315,53 @@ class MLEngine:
         if not self.data_pipeline:
             self._init_data_pipeline()
         
-        for model_name, model in self.models.items():
+        from .training.worker_pool import PRIORITY_MANUAL
+        
+        # Dispatch every model that needs training, then collect the results
+        jobs = {}
+        for model_name, model in list(self.models.items()):
             try:
                 if hasattr(model, 'needs_training') and (model.needs_training() or force_retrain):
                     self.logger.info(f"Training model: {model_name} with real database data only")
-                    training_result = model.train()
-                    
-                    if training_result.get("success"):
-                        model_result = {
-                            "model": model_name,
-                            "accuracy": training_result.get("accuracy"),
-                            "training_time": training_result.get("training_time"),
-                            "samples_used": training_result.get("samples_used"),
-                            "training_method": training_result.get("training_method", "unknown"),
-                            "data_source": "real_database_only"
-                        }
-                        
-                        if training_result.get("note"):
-                            model_result["note"] = training_result["note"]
-                        
-                        results["trained_models"].append(model_result)
-                    else:
-                        results["errors"].append(f"{model_name}: {training_result.get('error')}")
-                        
+                    jobs[model_name] = self.training_pool.submit(model_name, priority=PRIORITY_MANUAL)
             except Exception as e:
                 results["errors"].append(f"{model_name}: {str(e)}")
                 self.logger.error(f"Training failed for {model_name}: {e}")
         
+        for model_name, job in jobs.items():
+            job.wait(self.training_pool.job_timeout)
+            training_result = job.result
+            
+            if training_result is None:
+                results["errors"].append(f"{model_name}: {job.error or 'training job ' + job.status.value}")
+            elif training_result.get("success"):
+                model_result = {
+                    "model": model_name,
+                    "accuracy": training_result.get("accuracy"),
+                    "training_time": training_result.get("training_time"),
+                    "samples_used": training_result.get("samples_used"),
+                    "training_method": training_result.get("training_method", "unknown"),
+                    "data_source": "real_database_only"
+                }
+                
+                if training_result.get("note"):
+                    model_result["note"] = training_result["note"]
+                
+                results["trained_models"].append(model_result)
+            else:
+                results["errors"].append(f"{model_name}: {training_result.get('error')}")
+        
         return results
     
+    def swap_model(self, model_name: str, model):
+        """Atomically replace a live model with a newly trained instance"""
+        with self.models_lock:
+            previous = self.models.get(model_name)
+            self.models[model_name] = model
+        
+        self.logger.info(f"Hot-swapped model {model_name}")
+        return previous
+    
     def get_model_status(self) -> Dict:
         """Get status of all ML models"""
         status = {
@@ -595,6 +633,7 @@ class MLEngine:
                 'real_time_inference': self.real_time_inference.get_inference_stats() if hasattr(self, 'real_time_inference') else {},
                 'ensemble_predictor': self.ensemble_predictor.get_ensemble_stats() if hasattr(self, 'ensemble_predictor') else {},
                 'adaptive_trainer': self.adaptive_trainer.get_training_status() if hasattr(self, 'adaptive_trainer') else {},
+                'training_pool': self.training_pool.get_status() if hasattr(self, 'training_pool') else {},
                 'real_time_learner': self.real_time_learner.get_learning_stats() if hasattr(self, 'real_time_learner') else {}
             }
             
@@ -1250,6 +1289,10 @@ class MLEngine:
                 self.real_time_inference.stop_inference_monitoring()
             if hasattr(self, 'adaptive_trainer'):
                 self.adaptive_trainer.stop_adaptive_training()
+            if hasattr(self, 'training_pool'):
+                self.training_pool.stop()
+            if hasattr(self, 'solution_finder'):
+                self.solution_finder.shutdown()
             self.logger.info("ML Engine shutdown completed")
         except Exception as e:
             self.logger.error(f"Error during ML engine shutdown: {e}")
\ No newline at end of file
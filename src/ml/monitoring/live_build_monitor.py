@@ -2,11 +2,13 @@
 
 import threading
 import time
-import re
 import logging
+from collections import deque
 from typing import Dict, List, Optional, Callable
 from datetime import datetime
 
+from ...analysis.pattern_engine import get_pattern_engine
+
 class LiveBuildMonitor:
     """Real-time build monitoring with ML-driven corrections and internet searches"""
     
@@ -27,6 +29,20 @@ class LiveBuildMonitor:
             r'compilation terminated'
         ]
         
+        self.pattern_engine = get_pattern_engine()
+        self.pattern_engine.register('live_monitor.errors', self.error_patterns)
+        self.pattern_engine.register('live_monitor.packages', [
+            r'Building\s+(\w+)',
+            r'Configuring\s+(\w+)',
+            r'Making\s+(\w+)',
+            r'/([^/\s]+)\.tar\.',
+            r'cd\s+([^/\s]+)-[\d\.]+'
+        ], flags=0)
+        
+        # Stage output streamed through the engine by the build engine is matched
+        # once there, while at least one build is monitored
+        self._subscription_lock = threading.Lock()
+        
         self.correction_callbacks = []
     
     def start_monitoring(self, build_id: str, stage_name: str = None):
@@ -40,28 +56,41 @@ class LiveBuildMonitor:
             daemon=True
         )
         
-        self.active_monitors[build_id] = {
-            'thread': monitor_thread,
-            'active': True,
-            'last_position': 0,
-            'errors_detected': [],
-            'corrections_attempted': []
-        }
+        with self._subscription_lock:
+            if not self.active_monitors:
+                self.pattern_engine.subscribe('live_monitor.errors', self._on_streamed_error)
+            self.active_monitors[build_id] = {
+                'thread': monitor_thread,
+                'active': True,
+                'last_position': 0,
+                'errors_detected': [],
+                'streamed_errors': deque(),
+                'corrections_attempted': []
+            }
         
         monitor_thread.start()
         self.logger.info(f"Started live monitoring for build {build_id}")
     
     def stop_monitoring(self, build_id: str):
         """Stop monitoring for a build"""
-        if build_id in self.active_monitors:
-            self.active_monitors[build_id]['active'] = False
-            del self.active_monitors[build_id]
+        with self._subscription_lock:
+            monitor = self.active_monitors.pop(build_id, None)
+            if monitor is not None and not self.active_monitors:
+                self.pattern_engine.unsubscribe('live_monitor.errors', self._on_streamed_error)
+        if monitor is not None:
+            monitor['active'] = False
             self.logger.info(f"Stopped monitoring for build {build_id}")
     
     def _monitor_build_logs(self, build_id: str, stage_name: str):
         """Monitor build logs in real-time"""
         while self.active_monitors.get(build_id, {}).get('active', False):
             try:
+                # Handle errors already matched in streamed stage output
+                streamed = self.active_monitors.get(build_id, {}).get('streamed_errors')
+                while streamed:
+                    hit = streamed.popleft()
+                    self._handle_detected_error(build_id, stage_name, self._error_from_hit(hit), [hit.line])
+                
                 # Get latest log entries
                 new_logs = self._get_new_log_entries(build_id)
                 
@@ -109,23 +138,33 @@ class LiveBuildMonitor:
     def _detect_errors(self, log_lines: List[str]) -> List[Dict]:
         """Detect errors in log lines"""
         errors = []
+        last_line = None
         
-        for line in log_lines:
-            for pattern in self.error_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    error = {
-                        'line': line.strip(),
-                        'pattern': pattern,
-                        'match': match.group(1) if match.groups() else match.group(0),
-                        'timestamp': datetime.now().isoformat(),
-                        'severity': self._assess_error_severity(line)
-                    }
-                    errors.append(error)
-                    break
+        # Hits arrive in line order with the first listed pattern first
+        for hit in self.pattern_engine.scan('\n'.join(log_lines), ('live_monitor.errors',)):
+            if hit.line_number == last_line:
+                continue
+            last_line = hit.line_number
+            errors.append(self._error_from_hit(hit))
         
         return errors
     
+    def _error_from_hit(self, hit) -> Dict:
+        """Convert a pattern engine hit into a detected error"""
+        return {
+            'line': hit.line.strip(),
+            'pattern': hit.key,
+            'match': hit.value,
+            'timestamp': datetime.now().isoformat(),
+            'severity': self._assess_error_severity(hit.line)
+        }
+    
+    def _on_streamed_error(self, hit, context: Optional[Dict]):
+        """Queue an error matched in streamed stage output for its build's monitor thread"""
+        monitor = self.active_monitors.get((context or {}).get('build_id'))
+        if monitor is not None:
+            monitor['streamed_errors'].append(hit)
+    
     def _assess_error_severity(self, error_line: str) -> str:
         """Assess error severity"""
         if any(word in error_line.lower() for word in ['fatal', 'critical', 'abort']):
@@ -150,6 +189,10 @@ class LiveBuildMonitor:
             
             self.logger.warning(f"Detected {error['severity']} error in build {build_id}: {error['match']}")
             
+            # Ask the inference engine to re-score this build in the next batch
+            if hasattr(self.ml_engine, 'real_time_inference'):
+                self.ml_engine.real_time_inference.notify_build_event(build_id, stage_name, 'log_error')
+            
             # Only attempt corrections for high/critical errors
             if error['severity'] in ['high', 'critical']:
                 self._attempt_error_correction(build_id, stage_name, error, context_logs)
@@ -196,22 +239,9 @@ class LiveBuildMonitor:
     
     def _extract_package_name(self, context_logs: List[str]) -> Optional[str]:
         """Extract package name from context logs"""
-        for line in context_logs[-10:]:  # Check last 10 lines
-            # Look for common package patterns
-            patterns = [
-                r'Building\s+(\w+)',
-                r'Configuring\s+(\w+)',
-                r'Making\s+(\w+)',
-                r'/([^/\s]+)\.tar\.',
-                r'cd\s+([^/\s]+)-[\d\.]+'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    return match.group(1)
-        
-        return None
+        # Check last 10 lines for common package patterns
+        hits = self.pattern_engine.scan('\n'.join(context_logs[-10:]), ('live_monitor.packages',))
+        return hits[0].value if hits else None
     
     def _store_live_correction(self, build_id: str, correction: Dict):
         """Store live correction attempt in database"""
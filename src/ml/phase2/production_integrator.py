@@ -71,7 +71,8 @@ class ProductionSystemMonitor:
             import psutil
             
             # CPU metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Compare against the previous call rather than blocking for a second
+            cpu_percent = psutil.cpu_percent(interval=None)
             cpu_count = psutil.cpu_count()
             load_avg = os.getloadavg()[0] if hasattr(os, 'getloadavg') else 0
             
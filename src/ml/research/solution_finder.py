@@ -4,27 +4,72 @@ import requests
 import json
 import re
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List, Optional
 from urllib.parse import quote_plus
 import logging
 import hashlib
 
+from .solution_index import OfflineSolutionIndex
+
+class CircuitBreaker:
+    """Stops calling a failing source until a cool-off has passed, then lets one probe through"""
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_timeout:
+                # Half-open: restart the timer so only this caller probes
+                self.opened_at = time.time()
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.time() - self.opened_at >= self.reset_timeout else 'open'
+
 class SolutionFinder:
     """Internet-based solution finder for build failures"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, search_sources: List[Dict] = None, cache_size: int = 1024,
+                 usage_flush_interval: float = 30.0, usage_flush_batch: int = 50, domain_cooldown: float = 30.0):
         self.db_manager = db_manager
         self.logger = logging.getLogger(__name__)
         self.domain_last_used = {}  # Track last use time per domain
         self.active_research = set()  # Track active research to prevent duplicates
-        import threading
         self._lock = threading.Lock()
+        self.domain_cooldown = domain_cooldown
         
         # Search sources prioritized by reliability (trusted regions only)
-        self.search_sources = [
+        self.search_sources = search_sources or [
             {
                 'name': 'Stack Overflow',
+                'type': 'stackexchange',
                 'base_url': 'https://api.stackexchange.com/2.3/search/advanced',
+                'timeout': 8,
                 'params': {
                     'site': 'stackoverflow',
                     'sort': 'votes',
@@ -34,7 +79,9 @@ class SolutionFinder:
             },
             {
                 'name': 'Unix StackExchange',
+                'type': 'stackexchange',
                 'base_url': 'https://api.stackexchange.com/2.3/search/advanced',
+                'timeout': 8,
                 'params': {
                     'site': 'unix',
                     'sort': 'votes',
@@ -44,7 +91,9 @@ class SolutionFinder:
             },
             {
                 'name': 'Server Fault',
+                'type': 'stackexchange',
                 'base_url': 'https://api.stackexchange.com/2.3/search/advanced',
+                'timeout': 8,
                 'params': {
                     'site': 'serverfault',
                     'sort': 'votes',
@@ -54,7 +103,9 @@ class SolutionFinder:
             },
             {
                 'name': 'GitHub Issues',
+                'type': 'github',
                 'base_url': 'https://api.github.com/search/issues',
+                'timeout': 8,
                 'params': {
                     'sort': 'updated',
                     'order': 'desc',
@@ -63,7 +114,9 @@ class SolutionFinder:
             },
             {
                 'name': 'Red Hat Bugzilla',
+                'type': 'bugzilla',
                 'base_url': 'https://bugzilla.redhat.com/rest/bug',
+                'timeout': 10,
                 'params': {
                     'limit': 3,
                     'status': 'CLOSED'
@@ -76,46 +129,48 @@ class SolutionFinder:
             '.ru', '.cn', '.af', '.ir', '.kp', '.sy',
             'yandex', 'baidu', 'weibo', 'vk.com'
         ]
+        
+        # Sources are searched concurrently, each behind its own circuit breaker
+        self.session = requests.Session()
+        self.circuit_breakers = {source['name']: CircuitBreaker() for source in self.search_sources}
+        self._executor = ThreadPoolExecutor(max_workers=len(self.search_sources),
+                                            thread_name_prefix='solution-search')
+        
+        # Known errors are answered locally before the cache and the internet
+        self.offline_index = OfflineSolutionIndex(db_manager)
+        
+        # In-memory LRU in front of ml_solutions; usage counters are flushed in batches
+        self.cache_size = cache_size
+        self._solution_cache = OrderedDict()
+        self._pending_usage = {}
+        self._last_usage_flush = time.time()
+        self.usage_flush_interval = usage_flush_interval
+        self.usage_flush_batch = usage_flush_batch
+        self.stats = {'offline_hits': 0, 'memory_hits': 0, 'db_hits': 0, 'searches': 0}
+    
+    @staticmethod
+    def _error_hash(error_message: str) -> str:
+        return hashlib.sha256(error_message.encode()).hexdigest()[:16]
     
     def find_solutions(self, error_message: str, build_stage: str, package_name: str = None) -> List[Dict]:
         """Find solutions for a specific build error"""
-        solutions = []
+        # Solutions that fixed this error before answer without any I/O
+        offline = self.offline_index.lookup(error_message)
+        if offline['known']:
+            self.stats['offline_hits'] += 1
+            return (offline['known'] + offline['guidance'])[:10]
         
-        # Check cache first
+        # Check cache next
         cached = self.get_cached_solutions(error_message)
         if cached:
-            return cached
+            return (offline['guidance'] + cached)[:10]
         
         # Extract key error information
         error_keywords = self._extract_error_keywords(error_message)
         
-        # Search each source with domain cooldown
-        for i, source in enumerate(self.search_sources):
-            try:
-                domain = source['base_url'].split('/')[2]  # Extract domain
-                
-                # Check 30-second cooldown
-                if domain in self.domain_last_used:
-                    time_since_last = time.time() - self.domain_last_used[domain]
-                    if time_since_last < 30:
-                        self.logger.info(f"Skipping {source['name']} - cooldown ({30-time_since_last:.0f}s remaining)")
-                        continue
-                
-                source_solutions = self._search_source(source, error_keywords, build_stage, package_name)
-                solutions.extend(source_solutions)
-                
-                # Update last used time
-                self.domain_last_used[domain] = time.time()
-                
-                # Progressive rate limiting
-                time.sleep(2 + i)
-            except Exception as e:
-                self.logger.warning(f"Failed to search {source['name']}: {e}")
-                if "429" in str(e) or "Too Many Requests" in str(e):
-                    # Mark domain as recently used to enforce longer cooldown
-                    domain = source['base_url'].split('/')[2]
-                    self.domain_last_used[domain] = time.time() + 60  # Extra 60s penalty
-                    time.sleep(10)
+        # Fan out to every available source at once
+        self.stats['searches'] += 1
+        solutions = self._search_all_sources(error_keywords, build_stage, package_name)
         
         # Rank and filter solutions
         ranked_solutions = self._rank_solutions(solutions, error_keywords)
@@ -123,7 +178,63 @@ class SolutionFinder:
         # Store solutions in database
         self._store_solutions(error_message, build_stage, package_name, ranked_solutions)
         
-        return ranked_solutions[:10]
+        return (offline['guidance'] + ranked_solutions)[:10]
+    
+    def _search_all_sources(self, error_keywords: List[str], build_stage: str, package_name: str) -> List[Dict]:
+        """Search all sources concurrently within their timeouts"""
+        futures = {}
+        for source in self.search_sources:
+            if not self.circuit_breakers[source['name']].allow():
+                self.logger.info(f"Skipping {source['name']} - circuit open")
+                continue
+            if not self._reserve_domain(source):
+                continue
+            future = self._executor.submit(self._search_source_guarded, source, error_keywords, build_stage, package_name)
+            futures[future] = source
+        
+        if not futures:
+            return []
+        
+        deadline = max(source.get('timeout', 10) for source in futures.values()) + 2
+        done, not_done = wait(futures, timeout=deadline)
+        
+        solutions = []
+        for future in done:
+            solutions.extend(future.result())
+        for future in not_done:
+            self.logger.warning(f"Search of {futures[future]['name']} did not finish within {deadline}s")
+        
+        return solutions
+    
+    def _reserve_domain(self, source: Dict) -> bool:
+        """Apply the per-domain cooldown; returns False if the domain was used too recently"""
+        domain = source['base_url'].split('/')[2]  # Extract domain
+        
+        with self._lock:
+            if domain in self.domain_last_used:
+                time_since_last = time.time() - self.domain_last_used[domain]
+                if time_since_last < self.domain_cooldown:
+                    self.logger.info(f"Skipping {source['name']} - cooldown ({self.domain_cooldown-time_since_last:.0f}s remaining)")
+                    return False
+            self.domain_last_used[domain] = time.time()
+            return True
+    
+    def _search_source_guarded(self, source: Dict, error_keywords: List[str], build_stage: str, package_name: str) -> List[Dict]:
+        """Search one source, feeding the outcome into its circuit breaker"""
+        breaker = self.circuit_breakers[source['name']]
+        try:
+            solutions = self._search_source(source, error_keywords, build_stage, package_name)
+            breaker.record_success()
+            return solutions
+        except Exception as e:
+            breaker.record_failure()
+            self.logger.warning(f"Failed to search {source['name']}: {e}")
+            if "429" in str(e) or "Too Many Requests" in str(e):
+                # Mark domain as recently used to enforce longer cooldown
+                domain = source['base_url'].split('/')[2]
+                with self._lock:
+                    self.domain_last_used[domain] = time.time() + 60  # Extra 60s penalty
+            return []
     
     def _extract_error_keywords(self, error_message: str) -> List[str]:
         """Extract key terms from error message, filtering out build headers and echo commands"""
@@ -182,11 +293,12 @@ class SolutionFinder:
         
         query = ' '.join(query_parts[:6])
         
-        if 'stackexchange.com' in source['base_url']:
+        source_type = source.get('type')
+        if source_type == 'stackexchange' or 'stackexchange.com' in source['base_url']:
             solutions = self._search_stackexchange(source, query)
-        elif source['name'] == 'GitHub Issues':
+        elif source_type == 'github' or source['name'] == 'GitHub Issues':
             solutions = self._search_github(source, query)
-        elif source['name'] == 'Red Hat Bugzilla':
+        elif source_type == 'bugzilla' or source['name'] == 'Red Hat Bugzilla':
             solutions = self._search_redhat_bugzilla(source, query)
         
         return solutions
@@ -195,65 +307,57 @@ class SolutionFinder:
         """Search Stack Overflow for solutions"""
         solutions = []
         
-        try:
-            params = source['params'].copy()
-            params['q'] = query
-            
-            response = requests.get(source['base_url'], params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            for item in data.get('items', []):
-                if item.get('is_answered', False):
-                    url = item.get('link', '')
-                    # Filter blocked domains
-                    if self._is_blocked_domain(url):
-                        continue
-                        
-                    solution = {
-                        'source': source['name'],
-                        'title': item.get('title', ''),
-                        'url': url,
-                        'score': item.get('score', 0),
-                        'answer_count': item.get('answer_count', 0),
-                        'tags': item.get('tags', []),
-                        'relevance_score': 0
-                    }
-                    solutions.append(solution)
+        params = source['params'].copy()
+        params['q'] = query
         
-        except Exception as e:
-            self.logger.warning(f"Stack Overflow search failed: {e}")
+        response = self.session.get(source['base_url'], params=params, timeout=source.get('timeout', 10))
+        response.raise_for_status()
         
-        return solutions
-    
-    def _search_github(self, source: Dict, query: str) -> List[Dict]:
-        """Search GitHub issues for solutions"""
-        solutions = []
+        data = response.json()
         
-        try:
-            params = source['params'].copy()
-            params['q'] = f"{query} is:issue state:closed"
-            
-            response = requests.get(source['base_url'], params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            for item in data.get('items', []):
+        for item in data.get('items', []):
+            if item.get('is_answered', False):
+                url = item.get('link', '')
+                # Filter blocked domains
+                if self._is_blocked_domain(url):
+                    continue
+                    
                 solution = {
-                    'source': 'GitHub Issues',
+                    'source': source['name'],
                     'title': item.get('title', ''),
-                    'url': item.get('html_url', ''),
+                    'url': url,
                     'score': item.get('score', 0),
-                    'comments': item.get('comments', 0),
-                    'labels': [label['name'] for label in item.get('labels', [])],
+                    'answer_count': item.get('answer_count', 0),
+                    'tags': item.get('tags', []),
                     'relevance_score': 0
                 }
                 solutions.append(solution)
         
-        except Exception as e:
-            self.logger.warning(f"GitHub search failed: {e}")
+        return solutions
+    
+    def _search_github(self, source: Dict, query: str) -> List[Dict]:
+        """Search GitHub issues for solutions"""
+        solutions = []
+        
+        params = source['params'].copy()
+        params['q'] = f"{query} is:issue state:closed"
+        
+        response = self.session.get(source['base_url'], params=params, timeout=source.get('timeout', 10))
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        for item in data.get('items', []):
+            solution = {
+                'source': 'GitHub Issues',
+                'title': item.get('title', ''),
+                'url': item.get('html_url', ''),
+                'score': item.get('score', 0),
+                'comments': item.get('comments', 0),
+                'labels': [label['name'] for label in item.get('labels', [])],
+                'relevance_score': 0
+            }
+            solutions.append(solution)
         
         return solutions
     
@@ -261,31 +365,27 @@ class SolutionFinder:
         """Search Red Hat Bugzilla for solutions"""
         solutions = []
         
-        try:
-            key_terms = query.split()[:3]
-            search_query = ' '.join(key_terms)
-            
-            params = source['params'].copy()
-            params['summary'] = search_query
-            
-            response = requests.get(source['base_url'], params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            for bug in data.get('bugs', [])[:3]:
-                solution = {
-                    'source': 'Red Hat Bugzilla',
-                    'title': bug.get('summary', ''),
-                    'url': f"https://bugzilla.redhat.com/show_bug.cgi?id={bug.get('id', '')}",
-                    'score': 5,
-                    'status': bug.get('status', ''),
-                    'relevance_score': 0
-                }
-                solutions.append(solution)
+        key_terms = query.split()[:3]
+        search_query = ' '.join(key_terms)
         
-        except Exception as e:
-            self.logger.warning(f"Red Hat Bugzilla search failed: {e}")
+        params = source['params'].copy()
+        params['summary'] = search_query
+        
+        response = self.session.get(source['base_url'], params=params, timeout=source.get('timeout', 10))
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        for bug in data.get('bugs', [])[:3]:
+            solution = {
+                'source': 'Red Hat Bugzilla',
+                'title': bug.get('summary', ''),
+                'url': f"https://bugzilla.redhat.com/show_bug.cgi?id={bug.get('id', '')}",
+                'score': 5,
+                'status': bug.get('status', ''),
+                'relevance_score': 0
+            }
+            solutions.append(solution)
         
         return solutions
     
@@ -357,7 +457,7 @@ class SolutionFinder:
                 """)
                 
                 # Generate error hash and extract keywords
-                error_hash = hashlib.sha256(error_message.encode()).hexdigest()[:16]
+                error_hash = self._error_hash(error_message)
                 error_keywords = self._extract_error_keywords(error_message)
                 
                 # Calculate metadata
@@ -392,6 +492,8 @@ class SolutionFinder:
                     self.logger.info(f"Stored {solution_count} new solutions for error in {build_stage}")
                 
                 conn.commit()
+            
+            self._cache_put(error_hash, solutions)
         
         except Exception as e:
             self.logger.error(f"Failed to store solutions: {e}")
@@ -399,41 +501,107 @@ class SolutionFinder:
     def get_cached_solutions(self, error_message: str) -> Optional[List[Dict]]:
         """Get previously found solutions from cache and update usage tracking"""
         try:
-            error_hash = hashlib.sha256(error_message.encode()).hexdigest()[:16]
+            error_hash = self._error_hash(error_message)
             
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id, solutions, solution_count FROM ml_solutions WHERE error_hash = %s",
-                    (error_hash,)
-                )
+            with self._lock:
+                solutions = self._solution_cache.get(error_hash)
+                if solutions is not None:
+                    self._solution_cache.move_to_end(error_hash)
+            
+            if solutions is not None:
+                self.stats['memory_hits'] += 1
+            else:
+                with self.db_manager.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "SELECT solutions, solution_count FROM ml_solutions WHERE error_hash = %s",
+                        (error_hash,)
+                    )
+                    result = cursor.fetchone()
                 
-                result = cursor.fetchone()
-                if result:
-                    solution_id, solutions_json, solution_count = result
-                    
-                    # Update usage tracking
-                    cursor.execute("""
-                        UPDATE ml_solutions SET 
-                            last_used = CURRENT_TIMESTAMP,
-                            usage_count = usage_count + 1
-                        WHERE id = %s
-                    """, (solution_id,))
-                    
-                    conn.commit()
-                    self.logger.info(f"Retrieved {solution_count} cached solutions (usage updated)")
-                    
-                    return json.loads(solutions_json)
+                if not result:
+                    return None
+                
+                solutions_json, solution_count = result
+                solutions = json.loads(solutions_json)
+                self._cache_put(error_hash, solutions)
+                self.stats['db_hits'] += 1
+                self.logger.info(f"Retrieved {solution_count} cached solutions")
+            
+            self._record_usage(error_hash)
+            return [dict(solution) for solution in solutions]
         
         except Exception as e:
             self.logger.error(f"Failed to get cached solutions: {e}")
         
         return None
     
+    def _cache_put(self, error_hash: str, solutions: List[Dict]):
+        with self._lock:
+            self._solution_cache[error_hash] = [dict(solution) for solution in solutions]
+            self._solution_cache.move_to_end(error_hash)
+            while len(self._solution_cache) > self.cache_size:
+                self._solution_cache.popitem(last=False)
+    
+    def _record_usage(self, error_hash: str):
+        """Count a cache hit; counters are written to ml_solutions in batches"""
+        with self._lock:
+            self._pending_usage[error_hash] = self._pending_usage.get(error_hash, 0) + 1
+            due = (len(self._pending_usage) >= self.usage_flush_batch or
+                   time.time() - self._last_usage_flush >= self.usage_flush_interval)
+        
+        if due:
+            self.flush_usage_counters()
+    
+    def flush_usage_counters(self):
+        """Write pending usage counts to ml_solutions in one transaction"""
+        with self._lock:
+            pending, self._pending_usage = self._pending_usage, {}
+            self._last_usage_flush = time.time()
+        
+        if not pending:
+            return
+        
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    UPDATE ml_solutions SET 
+                        last_used = CURRENT_TIMESTAMP,
+                        usage_count = usage_count + %s
+                    WHERE error_hash = %s
+                """, [(count, error_hash) for error_hash, count in pending.items()])
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Failed to flush solution usage counters: {e}")
+            # Keep the counts for the next flush
+            with self._lock:
+                for error_hash, count in pending.items():
+                    self._pending_usage[error_hash] = self._pending_usage.get(error_hash, 0) + count
+    
+    def get_cache_stats(self) -> Dict:
+        """Get cache, offline index and circuit breaker statistics"""
+        with self._lock:
+            cache_entries = len(self._solution_cache)
+            pending_usage = sum(self._pending_usage.values())
+        
+        return {
+            **self.stats,
+            'cache_entries': cache_entries,
+            'pending_usage_updates': pending_usage,
+            'offline_index': self.offline_index.get_stats(),
+            'circuit_breakers': {name: breaker.state for name, breaker in self.circuit_breakers.items()}
+        }
+    
+    def shutdown(self):
+        """Flush pending usage counters and stop the search workers"""
+        self.flush_usage_counters()
+        self._executor.shutdown(wait=False)
+    
     def mark_solution_effective(self, error_message: str, effectiveness_rating: float):
         """Mark a solution as effective for future reference"""
         try:
-            error_hash = hashlib.sha256(error_message.encode()).hexdigest()[:16]
+            error_hash = self._error_hash(error_message)
             with self.db_manager.get_connection() as conn:
                 cursor = conn.cursor()
                 
@@ -445,6 +613,13 @@ class SolutionFinder:
                 """, (effectiveness_rating, error_hash))
                 
                 conn.commit()
+            
+            # Effective solutions answer this error locally from now on
+            with self._lock:
+                solutions = self._solution_cache.get(error_hash)
+            if solutions:
+                self.offline_index.add_solutions(error_message, solutions, effectiveness_rating)
+            
             self.logger.info(f"Updated solution effectiveness rating to {effectiveness_rating}")
         
         except Exception as e:
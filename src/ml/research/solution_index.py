@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import re
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from ...analysis.fault_analyzer import FaultAnalyzer
+from ...analysis.pattern_engine import get_pattern_engine
+
+class OfflineSolutionIndex:
+    """Local index of known solutions, answering before any internet search.
+    
+    Built from solutions recorded as effective in ``solution_effectiveness`` and
+    from the curated fault analyzer patterns, so known errors resolve in memory.
+    """
+    
+    def __init__(self, db_manager, min_effectiveness: float = 0.6, min_similarity: float = 0.6,
+                 refresh_interval: float = 600.0, max_entries: int = 5000):
+        self.db_manager = db_manager
+        self.logger = logging.getLogger(__name__)
+        self.min_effectiveness = min_effectiveness
+        self.min_similarity = min_similarity
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        
+        self._lock = threading.RLock()
+        self._signatures: Dict[str, List[Dict]] = {}
+        self._signature_tokens: Dict[str, frozenset] = {}
+        self._token_index: Dict[str, set] = defaultdict(set)
+        self.built_at = None
+        
+        # Curated fault patterns share the fault analyzer's compiled set
+        fault_patterns = FaultAnalyzer.default_patterns()
+        self.pattern_engine = get_pattern_engine()
+        self.pattern_engine.register('fault_analyzer', [(p.name, p.pattern) for p in fault_patterns])
+        self._fault_solutions = {p.name: self._fault_solution(p) for p in fault_patterns}
+        
+        self.stats = {'lookups': 0, 'exact_hits': 0, 'similar_hits': 0, 'fault_hits': 0}
+    
+    @staticmethod
+    def normalize_error(error_message: str) -> str:
+        """Reduce an error message to a signature stable across builds"""
+        text = (error_message or '').lower()
+        text = re.sub(r'\d{4}-\d{2}-\d{2}|\d{2}:\d{2}:\d{2}', ' ', text)
+        text = re.sub(r'/[^\s]*/', '/<path>/', text)
+        text = re.sub(r'0x[0-9a-f]+|\d+', '<n>', text)
+        return ' '.join(text.split())[:500]
+    
+    @staticmethod
+    def _tokens(signature: str) -> frozenset:
+        return frozenset(re.findall(r'[a-z_][a-z0-9_\-\+\.]{2,}', signature))
+    
+    @staticmethod
+    def _fault_solution(pattern) -> Dict:
+        severity_scores = {'Critical': 40, 'High': 30, 'Medium': 20, 'Low': 10}
+        return {
+            'source': 'LFS Fault Patterns',
+            'title': f"{pattern.name}: {pattern.description}",
+            'url': '',
+            'content': pattern.solution,
+            'auto_fix_command': pattern.auto_fix_command,
+            'severity': pattern.severity,
+            'score': severity_scores.get(pattern.severity, 0),
+            'relevance_score': 0
+        }
+    
+    def rebuild(self):
+        """Reload effective solutions from the database"""
+        signatures = defaultdict(list)
+        
+        try:
+            rows = self.db_manager.execute_query("""
+                SELECT error_message, solution_data, effectiveness_rating
+                FROM solution_effectiveness
+                WHERE success = TRUE OR effectiveness_rating >= %s
+                ORDER BY effectiveness_rating DESC
+                LIMIT %s
+            """, (self.min_effectiveness, self.max_entries), fetch=True) or []
+        except Exception as e:
+            self.logger.error(f"Failed to load solution effectiveness data: {e}")
+            rows = None
+        
+        if rows is None:
+            # Keep serving the previous index; retry after the next interval
+            with self._lock:
+                self.built_at = time.time()
+            return
+        
+        for row in rows:
+            solution = self._solution_from_record(row.get('solution_data'), row.get('effectiveness_rating'))
+            if solution:
+                signatures[self.normalize_error(row.get('error_message'))].append(solution)
+        
+        with self._lock:
+            self._signatures = {}
+            self._signature_tokens = {}
+            self._token_index = defaultdict(set)
+            for signature, solutions in signatures.items():
+                self._add_signature(signature, solutions)
+            self.built_at = time.time()
+        
+        self.logger.info(f"Offline solution index built with {len(signatures)} known errors")
+    
+    def add_solutions(self, error_message: str, solutions: List[Dict], effectiveness: float):
+        """Index solutions just confirmed as effective without waiting for a rebuild"""
+        if effectiveness < self.min_effectiveness or not solutions:
+            return
+        
+        indexed = []
+        for solution in solutions:
+            entry = dict(solution)
+            entry['source'] = 'Local Knowledge Base'
+            entry['effectiveness'] = float(effectiveness)
+            entry['score'] = round(float(effectiveness) * 100)
+            indexed.append(entry)
+        
+        with self._lock:
+            self._add_signature(self.normalize_error(error_message), indexed)
+    
+    def lookup(self, error_message: str) -> Dict:
+        """Find known solutions for an error.
+        
+        Returns ``{'known': [...], 'guidance': [...]}``: ``known`` holds solutions
+        that fixed this (or a very similar) error before, ``guidance`` the
+        curated fault pattern advice matching it.
+        """
+        self._ensure_fresh()
+        self.stats['lookups'] += 1
+        
+        signature = self.normalize_error(error_message)
+        with self._lock:
+            known = [dict(s) for s in self._signatures.get(signature, [])]
+            if known:
+                self.stats['exact_hits'] += 1
+            else:
+                known = self._similar_solutions(signature)
+                if known:
+                    self.stats['similar_hits'] += 1
+        
+        guidance = [
+            dict(self._fault_solutions[key])
+            for key in self.pattern_engine.matched_keys(error_message or '', 'fault_analyzer')
+            if key in self._fault_solutions
+        ]
+        guidance.sort(key=lambda s: s['score'], reverse=True)
+        if guidance:
+            self.stats['fault_hits'] += 1
+        
+        return {'known': known, 'guidance': guidance}
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'known_errors': len(self._signatures),
+                'fault_patterns': len(self._fault_solutions),
+                'built_at': self.built_at
+            }
+    
+    def _ensure_fresh(self):
+        if self.built_at is None or time.time() - self.built_at >= self.refresh_interval:
+            self.rebuild()
+    
+    def _add_signature(self, signature: str, solutions: List[Dict]):
+        existing = self._signatures.setdefault(signature, [])
+        seen = {(s.get('title'), s.get('url')) for s in existing}
+        for solution in solutions:
+            if (solution.get('title'), solution.get('url')) not in seen:
+                existing.append(solution)
+                seen.add((solution.get('title'), solution.get('url')))
+        existing.sort(key=lambda s: s.get('effectiveness', 0), reverse=True)
+        
+        tokens = self._tokens(signature)
+        self._signature_tokens[signature] = tokens
+        for token in tokens:
+            self._token_index[token].add(signature)
+    
+    def _similar_solutions(self, signature: str) -> List[Dict]:
+        """Solutions of the most similar known error by token overlap"""
+        tokens = self._tokens(signature)
+        if not tokens:
+            return []
+        
+        overlaps = defaultdict(int)
+        for token in tokens:
+            for candidate in self._token_index.get(token, ()):
+                overlaps[candidate] += 1
+        
+        best_signature, best_similarity = None, 0.0
+        for candidate, shared in overlaps.items():
+            similarity = shared / len(tokens | self._signature_tokens[candidate])
+            if similarity > best_similarity:
+                best_signature, best_similarity = candidate, similarity
+        
+        if best_signature is None or best_similarity < self.min_similarity:
+            return []
+        
+        solutions = []
+        for solution in self._signatures[best_signature]:
+            entry = dict(solution)
+            entry['similarity'] = round(best_similarity, 2)
+            solutions.append(entry)
+        return solutions
+    
+    @staticmethod
+    def _solution_from_record(solution_data, effectiveness) -> Optional[Dict]:
+        if isinstance(solution_data, (str, bytes)):
+            try:
+                solution_data = json.loads(solution_data)
+            except ValueError:
+                return None
+        if not isinstance(solution_data, dict):
+            return None
+        
+        title = solution_data.get('solution_title') or solution_data.get('title')
+        if not title:
+            return None
+        
+        effectiveness = float(effectiveness) if effectiveness is not None else 1.0
+        return {
+            'source': 'Local Knowledge Base',
+            'title': title,
+            'url': solution_data.get('source_url') or solution_data.get('url', ''),
+            'content': solution_data.get('solution_content', ''),
+            'effectiveness': effectiveness,
+            'score': round(effectiveness * 100),
+            'relevance_score': 0
+        }
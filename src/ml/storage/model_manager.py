@@ -2,172 +2,494 @@
 Model Manager for ML Engine
 
 Handles model storage, versioning, and lifecycle management.
+
+Artifacts are stored one directory per version::
+
+    <storage>/<model>/<version>/meta.json      small JSON metadata + model structure
+    <storage>/<model>/<version>/arrays/*.npy   numeric arrays, loaded memory-mapped
+    <storage>/<model>/<version>/payload.pkl    only for values JSON cannot express
+
+The version is derived from a SHA-256 over the serialised bytes plus a
+per-model sequence number, loaded models are kept in a process-wide LRU
+cache bounded by a memory budget, and registry changes are appended to a
+journal that is compacted periodically. Versions written by the previous
+pickle-only format are still readable.
 """
 
 import os
+import io
 import json
 import pickle
+import shutil
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import hashlib
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+ARRAY_REF_KEY = "__array__"
+PICKLE_REF_KEY = "__pickle__"
+TUPLE_REF_KEY = "__tuple__"
+
+
+class _ModelCache:
+    """Process-wide LRU of decoded artifacts, bounded by approximate bytes"""
+    
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: Tuple, entry: Dict):
+        with self.lock:
+            if key in self.entries:
+                self.used_bytes -= self.entries.pop(key)["size"]
+            self.entries[key] = entry
+            self.used_bytes += entry["size"]
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.used_bytes -= evicted["size"]
+    
+    def invalidate(self, storage_path: str, model_name: str, version: Optional[str] = None):
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == storage_path and k[1] == model_name
+                        and (version is None or k[2] == version)]:
+                self.used_bytes -= self.entries.pop(key)["size"]
+    
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "used_bytes": self.used_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+_model_cache = _ModelCache(budget_bytes=256 * 1024 * 1024)
+
 
 class ModelManager:
     """Manages ML model storage and versioning"""
     
-    def __init__(self, storage_path: str = "ml_models"):
+    # Rewrite the registry snapshot once this many journal records accumulate
+    JOURNAL_COMPACT_THRESHOLD = 200
+    
+    def __init__(self, storage_path: str = "ml_models", cache_budget_mb: Optional[int] = None):
         """Initialize model manager with storage path"""
         self.storage_path = storage_path
         self.logger = logging.getLogger(__name__)
+        self._cache_root = os.path.abspath(storage_path)
+        self._lock = threading.Lock()
+        
+        if cache_budget_mb is not None:
+            _model_cache.budget_bytes = cache_budget_mb * 1024 * 1024
         
         # Create storage directory if it doesn't exist
         os.makedirs(self.storage_path, exist_ok=True)
         
-        # Model registry file
+        # Registry snapshot plus append-only journal of changes since then
         self.registry_file = os.path.join(self.storage_path, "model_registry.json")
+        self.journal_file = os.path.join(self.storage_path, "model_registry.journal")
+        self._journal_offset = 0
+        self._journal_records = 0
         self.registry = self._load_registry()
     
     def _load_registry(self) -> Dict:
-        """Load model registry from disk"""
+        """Load model registry snapshot and replay the journal"""
+        registry = {"models": {}, "last_updated": datetime.now().isoformat()}
+        
         if os.path.exists(self.registry_file):
             try:
                 with open(self.registry_file, 'r') as f:
-                    return json.load(f)
+                    registry = json.load(f)
             except Exception as e:
                 self.logger.warning(f"Failed to load model registry: {e}")
         
-        return {"models": {}, "last_updated": datetime.now().isoformat()}
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._replay_journal(registry)
+        return registry
+    
+    def _replay_journal(self, registry: Dict):
+        """Apply journal records written since the last replay"""
+        if not os.path.exists(self.journal_file):
+            return
+        
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(self._journal_offset)
+                for line in f:
+                    # Ignore a torn final line from an interrupted append
+                    if not line.endswith(b'\n'):
+                        break
+                    self._journal_offset += len(line)
+                    try:
+                        self._apply_record(registry, json.loads(line))
+                        self._journal_records += 1
+                    except (json.JSONDecodeError, KeyError) as e:
+                        self.logger.warning(f"Skipping bad registry journal record: {e}")
+        except Exception as e:
+            self.logger.warning(f"Failed to replay model registry journal: {e}")
+    
+    def _apply_record(self, registry: Dict, record: Dict):
+        """Apply one journal record to an in-memory registry"""
+        models = registry["models"]
+        op = record["op"]
+        
+        if op == "add":
+            models.setdefault(record["model"], {"versions": []})["versions"].append(record["entry"])
+        elif op == "remove":
+            if record["model"] in models:
+                models[record["model"]]["versions"] = [
+                    v for v in models[record["model"]]["versions"]
+                    if v["version"] not in record["versions"]
+                ]
+        elif op == "delete_model":
+            models.pop(record["model"], None)
+        
+        registry["last_updated"] = record.get("at", registry.get("last_updated"))
+    
+    def _refresh_registry(self):
+        """Pick up journal records appended by other ModelManager instances"""
+        try:
+            size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        except OSError:
+            return
+        
+        if size < self._journal_offset:
+            # Another instance compacted the journal into a new snapshot
+            self.registry = self._load_registry()
+        elif size > self._journal_offset:
+            self._replay_journal(self.registry)
+    
+    def _append_journal(self, record: Dict):
+        """Append a registry change and apply it locally"""
+        record["at"] = datetime.now().isoformat()
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        
+        with open(self.journal_file, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self._replay_journal(self.registry)
+        
+        if self._journal_records >= self.JOURNAL_COMPACT_THRESHOLD:
+            self._save_registry()
     
     def _save_registry(self):
-        """Save model registry to disk"""
+        """Write a compact registry snapshot and truncate the journal"""
         try:
             self.registry["last_updated"] = datetime.now().isoformat()
-            with open(self.registry_file, 'w') as f:
-                json.dump(self.registry, f, indent=2)
+            tmp_file = self.registry_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.registry, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.registry_file)
+            
+            with open(self.journal_file, 'w'):
+                pass
+            self._journal_offset = 0
+            self._journal_records = 0
         except Exception as e:
             self.logger.error(f"Failed to save model registry: {e}")
     
+    def _serialize(self, model_data: Any) -> Tuple[Any, bytes, Dict[str, bytes], Optional[bytes]]:
+        """Split model data into a JSON structure (and its canonical bytes), .npy array blobs and a pickle fallback"""
+        arrays = {}
+        pickled = []
+        
+        def encode(value):
+            if NUMPY_AVAILABLE and isinstance(value, np.ndarray) and value.dtype != object:
+                name = f"a{len(arrays)}"
+                buffer = io.BytesIO()
+                np.save(buffer, np.ascontiguousarray(value), allow_pickle=False)
+                arrays[name] = buffer.getvalue()
+                return {ARRAY_REF_KEY: name}
+            if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+                return {k: encode(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [encode(v) for v in value]
+            if type(value) is tuple:
+                # Tagged so the value loads as a tuple again; namedtuples fall through to pickle
+                return {TUPLE_REF_KEY: [encode(v) for v in value]}
+            if value is None or isinstance(value, (str, bool, int, float)):
+                return value
+            if NUMPY_AVAILABLE and isinstance(value, np.generic):
+                return value.item()
+            pickled.append(value)
+            return {PICKLE_REF_KEY: len(pickled) - 1}
+        
+        encoded = encode(model_data)
+        structure = json.dumps(encoded, separators=(',', ':'), sort_keys=True).encode()
+        payload = pickle.dumps(pickled, protocol=pickle.HIGHEST_PROTOCOL) if pickled else None
+        return encoded, structure, arrays, payload
+    
+    def _content_hash(self, structure: bytes, arrays: Dict[str, bytes], payload: Optional[bytes]) -> str:
+        """SHA-256 over exactly the bytes that will be written"""
+        digest = hashlib.sha256(structure)
+        for name in sorted(arrays):
+            digest.update(name.encode())
+            digest.update(arrays[name])
+        if payload:
+            digest.update(payload)
+        return digest.hexdigest()
+    
     def save_model(self, model_name: str, model_data: Any, metadata: Dict = None) -> bool:
         """Save model with metadata"""
         try:
-            # Generate model version based on content hash
-            model_hash = hashlib.md5(str(model_data).encode()).hexdigest()[:8]
-            version = f"v{datetime.now().strftime('%Y%m%d')}_{model_hash}"
-            
-            # Create model directory
-            model_dir = os.path.join(self.storage_path, model_name)
-            os.makedirs(model_dir, exist_ok=True)
-            
-            # Save model file
-            model_file = os.path.join(model_dir, f"{version}.pkl")
-            with open(model_file, 'wb') as f:
-                pickle.dump(model_data, f)
-            
-            # Save metadata
-            metadata_file = os.path.join(model_dir, f"{version}_metadata.json")
-            full_metadata = {
-                "model_name": model_name,
-                "version": version,
-                "created_at": datetime.now().isoformat(),
-                "file_path": model_file,
-                **(metadata or {})
-            }
-            
-            with open(metadata_file, 'w') as f:
-                json.dump(full_metadata, f, indent=2)
-            
-            # Update registry
-            if model_name not in self.registry["models"]:
-                self.registry["models"][model_name] = {"versions": []}
-            
-            self.registry["models"][model_name]["versions"].append({
-                "version": version,
-                "created_at": full_metadata["created_at"],
-                "metadata": full_metadata
-            })
-            
-            # Keep only last 5 versions in registry
-            versions = self.registry["models"][model_name]["versions"]
-            if len(versions) > 5:
-                # Remove old model files
-                for old_version in versions[:-5]:
-                    try:
-                        old_model_file = old_version["metadata"]["file_path"]
-                        if os.path.exists(old_model_file):
-                            os.remove(old_model_file)
-                        
-                        old_metadata_file = old_model_file.replace(".pkl", "_metadata.json")
-                        if os.path.exists(old_metadata_file):
-                            os.remove(old_metadata_file)
-                    except Exception as e:
-                        self.logger.warning(f"Failed to cleanup old model version: {e}")
-                
-                self.registry["models"][model_name]["versions"] = versions[-5:]
-            
-            self._save_registry()
-            self.logger.info(f"Saved model {model_name} version {version}")
-            return True
-            
+            with self._lock:
+                self._refresh_registry()
+                
+                encoded, structure, arrays, payload = self._serialize(model_data)
+                content_hash = self._content_hash(structure, arrays, payload)
+                
+                # Unchanged model: nothing to write
+                versions = self.registry["models"].get(model_name, {}).get("versions", [])
+                if versions and versions[-1]["metadata"].get("content_hash") == content_hash:
+                    self.logger.info(f"Model {model_name} unchanged, keeping version {versions[-1]['version']}")
+                    return True
+                
+                # Version from date, content hash and a per-model sequence number; the sequence
+                # keeps a model that changes back to earlier content on the same day distinct
+                sequence = max((v["metadata"].get("sequence", 0) for v in versions), default=0) + 1
+                version = f"v{datetime.now().strftime('%Y%m%d')}_{content_hash[:8]}_{sequence}"
+                
+                # Write into a temporary directory and rename it into place
+                model_dir = os.path.join(self.storage_path, model_name)
+                artifact_dir = os.path.join(model_dir, version)
+                tmp_dir = artifact_dir + ".tmp"
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                os.makedirs(os.path.join(tmp_dir, "arrays"))
+                
+                for name, data in arrays.items():
+                    with open(os.path.join(tmp_dir, "arrays", f"{name}.npy"), 'wb') as f:
+                        f.write(data)
+                
+                if payload:
+                    with open(os.path.join(tmp_dir, "payload.pkl"), 'wb') as f:
+                        f.write(payload)
+                
+                full_metadata = {
+                    "model_name": model_name,
+                    "version": version,
+                    "created_at": datetime.now().isoformat(),
+                    "file_path": artifact_dir,
+                    "format": "artifact-v1",
+                    "content_hash": content_hash,
+                    "sequence": sequence,
+                    "size_bytes": len(structure) + sum(len(a) for a in arrays.values()) + len(payload or b""),
+                    **(metadata or {})
+                }
+                
+                with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+                    json.dump({"metadata": full_metadata, "structure": encoded}, f,
+                              separators=(',', ':'), default=str)
+                
+                shutil.rmtree(artifact_dir, ignore_errors=True)
+                os.rename(tmp_dir, artifact_dir)
+                
+                # Update registry
+                self._append_journal({
+                    "op": "add",
+                    "model": model_name,
+                    "entry": {
+                        "version": version,
+                        "created_at": full_metadata["created_at"],
+                        "metadata": full_metadata
+                    }
+                })
+                
+                # Keep only last 5 versions in registry
+                versions = self.registry["models"][model_name]["versions"]
+                if len(versions) > 5:
+                    stale = versions[:-5]
+                    for old_version in stale:
+                        self._remove_artifact(model_name, old_version)
+                    
+                    self._append_journal({
+                        "op": "remove",
+                        "model": model_name,
+                        "versions": [v["version"] for v in stale]
+                    })
+                
+                self.logger.info(f"Saved model {model_name} version {version}")
+                return True
+        
         except Exception as e:
             self.logger.error(f"Failed to save model {model_name}: {e}")
             return False
     
+    def _remove_artifact(self, model_name: str, version_entry: Dict):
+        """Delete the files for one stored version"""
+        try:
+            path = version_entry["metadata"]["file_path"]
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+                
+                old_metadata_file = path.replace(".pkl", "_metadata.json")
+                if os.path.exists(old_metadata_file):
+                    os.remove(old_metadata_file)
+            
+            _model_cache.invalidate(self._cache_root, model_name, version_entry["version"])
+        except Exception as e:
+            self.logger.warning(f"Failed to cleanup old model version: {e}")
+    
     def load_model(self, model_name: str, version: Optional[str] = None) -> Optional[Any]:
         """Load model by name and optional version"""
         try:
-            if model_name not in self.registry["models"]:
-                return None
-            
-            versions = self.registry["models"][model_name]["versions"]
-            if not versions:
-                return None
-            
-            # Use latest version if not specified
-            if version is None:
-                target_version = versions[-1]
-            else:
-                target_version = next((v for v in versions if v["version"] == version), None)
-                if not target_version:
+            # Replaying the journal mutates the registry; reading the artifact needs no lock
+            with self._lock:
+                self._refresh_registry()
+                
+                if model_name not in self.registry["models"]:
                     return None
+                
+                versions = self.registry["models"][model_name]["versions"]
+                if not versions:
+                    return None
+                
+                # Use latest version if not specified
+                if version is None:
+                    target_version = versions[-1]
+                else:
+                    target_version = next((v for v in versions if v["version"] == version), None)
+                    if not target_version:
+                        return None
             
-            model_file = target_version["metadata"]["file_path"]
-            if not os.path.exists(model_file):
-                self.logger.warning(f"Model file not found: {model_file}")
-                return None
-            
-            with open(model_file, 'rb') as f:
-                model_data = pickle.load(f)
+            cache_key = (self._cache_root, model_name, target_version["version"])
+            entry = _model_cache.get(cache_key)
             
-            self.logger.info(f"Loaded model {model_name} version {target_version['version']}")
-            return model_data
+            if entry is None:
+                model_file = target_version["metadata"]["file_path"]
+                if not os.path.exists(model_file):
+                    self.logger.warning(f"Model file not found: {model_file}")
+                    return None
+                
+                entry = self._read_artifact(model_file)
+                _model_cache.put(cache_key, entry)
+                self.logger.info(f"Loaded model {model_name} version {target_version['version']}")
             
+            return self._materialize(entry)
+        
         except Exception as e:
             self.logger.error(f"Failed to load model {model_name}: {e}")
             return None
     
+    def _read_artifact(self, path: str) -> Dict:
+        """Read an artifact (or legacy pickle) into a cache entry"""
+        if not os.path.isdir(path):
+            # Legacy single-file pickle from the previous storage format
+            with open(path, 'rb') as f:
+                data = f.read()
+            return {"legacy": data, "size": len(data)}
+        
+        with open(os.path.join(path, "meta.json"), 'rb') as f:
+            meta = json.loads(f.read())
+        structure = json.dumps(meta["structure"], separators=(',', ':'))
+        
+        arrays = {}
+        arrays_dir = os.path.join(path, "arrays")
+        if os.path.isdir(arrays_dir):
+            for filename in os.listdir(arrays_dir):
+                if filename.endswith(".npy"):
+                    if not NUMPY_AVAILABLE:
+                        raise RuntimeError("numpy is required to load array-backed models")
+                    arrays[filename[:-4]] = np.load(os.path.join(arrays_dir, filename),
+                                                    mmap_mode='r', allow_pickle=False)
+        
+        payload = None
+        payload_file = os.path.join(path, "payload.pkl")
+        if os.path.exists(payload_file):
+            with open(payload_file, 'rb') as f:
+                payload = f.read()
+        
+        size = len(structure) + sum(a.nbytes for a in arrays.values()) + len(payload or b"")
+        return {"structure": structure, "arrays": arrays, "payload": payload, "size": size}
+    
+    def _materialize(self, entry: Dict) -> Any:
+        """Rebuild a fresh model object from a cache entry; arrays stay shared and read-only"""
+        if "legacy" in entry:
+            return pickle.loads(entry["legacy"])
+        
+        pickled = pickle.loads(entry["payload"]) if entry["payload"] else []
+        arrays = entry["arrays"]
+        
+        def resolve(value):
+            if isinstance(value, dict):
+                if len(value) == 1 and ARRAY_REF_KEY in value:
+                    return arrays[value[ARRAY_REF_KEY]]
+                if len(value) == 1 and PICKLE_REF_KEY in value:
+                    return pickled[value[PICKLE_REF_KEY]]
+                if len(value) == 1 and TUPLE_REF_KEY in value:
+                    return tuple(resolve(v) for v in value[TUPLE_REF_KEY])
+                return {k: resolve(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [resolve(v) for v in value]
+            return value
+        
+        return resolve(json.loads(entry["structure"]))
+    
+    def get_cache_stats(self) -> Dict:
+        """Get loaded-model cache statistics"""
+        return _model_cache.stats()
+    
     def get_model_info(self, model_name: str) -> Optional[Dict]:
         """Get model information and metadata"""
-        if model_name not in self.registry["models"]:
-            return None
-        
-        model_info = self.registry["models"][model_name]
-        if not model_info["versions"]:
-            return None
+        with self._lock:
+            self._refresh_registry()
+            
+            if model_name not in self.registry["models"]:
+                return None
+            
+            model_info = self.registry["models"][model_name]
+            if not model_info["versions"]:
+                return None
+            total_versions = len(model_info["versions"])
+            latest_version = model_info["versions"][-1]
         
-        latest_version = model_info["versions"][-1]
         return {
             "model_name": model_name,
             "latest_version": latest_version["version"],
             "created_at": latest_version["created_at"],
-            "total_versions": len(model_info["versions"]),
+            "total_versions": total_versions,
             "metadata": latest_version["metadata"]
         }
     
     def list_models(self) -> List[Dict]:
         """List all available models"""
         models = []
-        for model_name in self.registry["models"]:
+        with self._lock:
+            model_names = list(self.registry["models"])
+        for model_name in model_names:
             model_info = self.get_model_info(model_name)
             if model_info:
                 models.append(model_info)
@@ -176,22 +498,25 @@ class ModelManager:
     def delete_model(self, model_name: str) -> bool:
         """Delete model and all its versions"""
         try:
-            if model_name not in self.registry["models"]:
-                return False
-            
-            # Delete all model files
-            model_dir = os.path.join(self.storage_path, model_name)
-            if os.path.exists(model_dir):
-                import shutil
-                shutil.rmtree(model_dir)
-            
-            # Remove from registry
-            del self.registry["models"][model_name]
-            self._save_registry()
+            with self._lock:
+                self._refresh_registry()
+                
+                if model_name not in self.registry["models"]:
+                    return False
+                
+                # Delete all model files
+                model_dir = os.path.join(self.storage_path, model_name)
+                if os.path.exists(model_dir):
+                    shutil.rmtree(model_dir)
+                
+                _model_cache.invalidate(self._cache_root, model_name)
+                
+                # Remove from registry
+                self._append_journal({"op": "delete_model", "model": model_name})
             
             self.logger.info(f"Deleted model {model_name}")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to delete model {model_name}: {e}")
             return False
@@ -221,27 +546,30 @@ class ModelManager:
                 "updated_models": updated_count,
                 "total_models": len(models)
             }
-            
+        
         except Exception as e:
             return {"success": False, "error": str(e)}
     
     def get_model_versions(self, model_name: Optional[str] = None) -> List[str]:
         """Get model versions - interface method for ML engine"""
         try:
-            if model_name:
-                # Return versions for specific model
-                if model_name in self.registry["models"]:
-                    model_versions = self.registry["models"][model_name]["versions"]
-                    return [v["version"] for v in model_versions]
-                return []
-            else:
-                # Return all versions for all models
-                all_versions = []
-                for model_name in self.registry["models"]:
-                    model_versions = self.registry["models"][model_name]["versions"]
-                    all_versions.extend([v["version"] for v in model_versions])
-                return all_versions
-            
+            with self._lock:
+                self._refresh_registry()
+                
+                if model_name:
+                    # Return versions for specific model
+                    if model_name in self.registry["models"]:
+                        model_versions = self.registry["models"][model_name]["versions"]
+                        return [v["version"] for v in model_versions]
+                    return []
+                else:
+                    # Return all versions for all models
+                    all_versions = []
+                    for model_name in self.registry["models"]:
+                        model_versions = self.registry["models"][model_name]["versions"]
+                        all_versions.extend([v["version"] for v in model_versions])
+                    return all_versions
+        
         except Exception as e:
             self.logger.error(f"Failed to get model versions: {e}")
-            return []
\ No newline at end of file
+            return []
@@ -222,63 +222,72 @@ class AdaptiveTrainer:
             if not hasattr(self.ml_engine, 'data_pipeline'):
                 return {'success': False, 'error': 'Data pipeline not available'}
             
-            data_pipeline = self.ml_engine.data_pipeline
+            if not hasattr(self.ml_engine, model_name):
+                return {'success': False, 'error': f'{model_name} not available'}
+            
+            # Data preparation is the expensive part: run it in a worker
+            # process when the engine has a training pool
+            training_pool = getattr(self.ml_engine, 'training_pool', None)
+            if training_pool:
+                from .worker_pool import PRIORITY_SCHEDULED
+                job = training_pool.run(model_name, kind='adaptive', priority=PRIORITY_SCHEDULED)
+                if job.result is None:
+                    return {'success': False, 'error': job.error or f'Training job {job.status.value}'}
+                training_result = job.result
+            else:
+                training_result = self.run_training_step(model_name, self.ml_engine.data_pipeline)
+            
+            # Store training results
+            self._store_training_results(model_name, training_result)
+            
+            # Update performance baseline
+            if training_result.get('success'):
+                self._update_performance_baseline(model_name, training_result)
+            
+            return training_result
             
+        except Exception as e:
+            self.logger.error(f"Model training failed for {model_name}: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def run_training_step(model_name: str, data_pipeline) -> Dict:
+        """Prepare data and train one model; safe to run in a worker process"""
+        try:
             # Prepare training data based on model type
             if model_name == 'failure_predictor':
                 features, labels = data_pipeline.prepare_failure_prediction_data()
                 if not data_pipeline.validate_training_data(features, labels):
                     return {'success': False, 'error': 'Insufficient training data'}
                 
-                # Train failure predictor
-                if hasattr(self.ml_engine, 'failure_predictor'):
-                    training_result = self._train_failure_predictor(features, labels)
-                else:
-                    return {'success': False, 'error': 'Failure predictor not available'}
+                return AdaptiveTrainer._train_failure_predictor(features, labels)
             
             elif model_name == 'performance_optimizer':
                 features, scores = data_pipeline.prepare_performance_optimization_data()
                 if not data_pipeline.validate_training_data(features, scores):
                     return {'success': False, 'error': 'Insufficient training data'}
                 
-                # Train performance optimizer
-                if hasattr(self.ml_engine, 'performance_optimizer'):
-                    training_result = self._train_performance_optimizer(features, scores)
-                else:
-                    return {'success': False, 'error': 'Performance optimizer not available'}
+                return AdaptiveTrainer._train_performance_optimizer(features, scores)
             
             elif model_name == 'anomaly_detector':
                 baseline_data = data_pipeline.prepare_anomaly_detection_data()
                 if len(baseline_data) < 10:
                     return {'success': False, 'error': 'Insufficient baseline data'}
                 
-                # Train anomaly detector
-                if hasattr(self.ml_engine, 'anomaly_detector'):
-                    training_result = self._train_anomaly_detector(baseline_data)
-                else:
-                    return {'success': False, 'error': 'Anomaly detector not available'}
+                return AdaptiveTrainer._train_anomaly_detector(baseline_data)
             
             else:
                 return {'success': False, 'error': f'Unknown model: {model_name}'}
             
-            # Store training results
-            self._store_training_results(model_name, training_result)
-            
-            # Update performance baseline
-            if training_result.get('success'):
-                self._update_performance_baseline(model_name, training_result)
-            
-            return training_result
-            
         except Exception as e:
-            self.logger.error(f"Model training failed for {model_name}: {e}")
             return {'success': False, 'error': str(e)}
     
-    def _train_failure_predictor(self, features: List[Dict], labels: List[int]) -> Dict:
+    @staticmethod
+    def _train_failure_predictor(features: List[Dict], labels: List[int]) -> Dict:
         """Train failure prediction model"""
         try:
             # Simple training simulation (would use actual ML library in production)
-            training_accuracy = self._simulate_training_accuracy(features, labels)
+            training_accuracy = AdaptiveTrainer._simulate_training_accuracy(features, labels)
             
             return {
                 'success': True,
@@ -291,10 +300,11 @@ class AdaptiveTrainer:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _train_performance_optimizer(self, features: List[Dict], scores: List[float]) -> Dict:
+    @staticmethod
+    def _train_performance_optimizer(features: List[Dict], scores: List[float]) -> Dict:
         """Train performance optimization model"""
         try:
-            training_accuracy = self._simulate_training_accuracy(features, scores)
+            training_accuracy = AdaptiveTrainer._simulate_training_accuracy(features, scores)
             
             return {
                 'success': True,
@@ -307,7 +317,8 @@ class AdaptiveTrainer:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _train_anomaly_detector(self, baseline_data: List[Dict]) -> Dict:
+    @staticmethod
+    def _train_anomaly_detector(baseline_data: List[Dict]) -> Dict:
         """Train anomaly detection model"""
         try:
             # Calculate baseline statistics
@@ -325,7 +336,8 @@ class AdaptiveTrainer:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _simulate_training_accuracy(self, features: List, labels: List) -> float:
+    @staticmethod
+    def _simulate_training_accuracy(features: List, labels: List) -> float:
         """Simulate training accuracy (replace with actual ML training)"""
         if not features or not labels:
             return 0.0
@@ -0,0 +1,460 @@
+"""
+Out-of-process ML Training Worker Pool
+
+Runs model training in separate worker processes so that pattern analysis and
+data preparation do not compete with the GUI and build log handling for the
+GIL. Jobs wait in a priority queue, at most ``max_concurrent`` run at once,
+each worker lowers its CPU/IO priority and caps its address space, and
+progress is streamed back to the parent over a pipe. Finished models are
+returned as plain state and hot-swapped into the running MLEngine.
+"""
+
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+
+class TrainingJobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# Lower value runs first
+PRIORITY_MANUAL = 0
+PRIORITY_TRIGGERED = 5
+PRIORITY_SCHEDULED = 10
+
+# model name -> (module relative to the ml package, class name)
+MODEL_CLASSES = {
+    'failure_predictor': ('models.failure_predictor', 'FailurePredictor'),
+    'performance_optimizer': ('models.performance_optimizer', 'PerformanceOptimizer'),
+    'anomaly_detector': ('models.anomaly_detector', 'AnomalyDetector'),
+}
+
+# Attributes bound to the owning process that must never cross the pipe
+_PROCESS_LOCAL_ATTRS = ('db', 'logger')
+
+# Finished jobs kept for get_job/get_status; older ones are forgotten
+FINISHED_JOBS_KEPT = 50
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    kind: str
+    model_name: str
+    priority: int = PRIORITY_SCHEDULED
+    status: TrainingJobStatus = TrainingJobStatus.QUEUED
+    progress: float = 0.0
+    message: str = ""
+    result: Optional[Dict] = None
+    error: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pid: Optional[int] = None
+    
+    def __post_init__(self):
+        self._done = threading.Event()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; returns False on timeout"""
+        return self._done.wait(timeout)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'model_name': self.model_name,
+            'priority': self.priority,
+            'status': self.status.value,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'pid': self.pid,
+            'submitted_at': datetime.fromtimestamp(self.submitted_at).isoformat(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            'finished_at': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None
+        }
+
+
+def export_model_state(model) -> Dict:
+    """Return the learned state of a model without process-bound handles"""
+    return {
+        name: value for name, value in vars(model).items()
+        if name not in _PROCESS_LOCAL_ATTRS
+    }
+
+
+def restore_model(model_name: str, state: Dict, db_manager):
+    """Build a live model instance from state produced by a worker"""
+    import importlib
+    
+    module_name, class_name = MODEL_CLASSES[model_name]
+    module = importlib.import_module(f"{__package__.rsplit('.', 1)[0]}.{module_name}")
+    model_class = getattr(module, class_name)
+    
+    # Bypass __init__: it would re-run the database analysis the worker just did
+    model = model_class.__new__(model_class)
+    model.__dict__.update(state)
+    model.db = db_manager
+    model.logger = logging.getLogger(module.__name__)
+    return model
+
+
+def _apply_resource_limits(nice: int, ionice_idle: bool, memory_limit_mb: Optional[int]):
+    """Lower scheduling priority and cap memory for the current worker process"""
+    try:
+        if nice:
+            os.nice(nice)
+    except OSError:
+        pass
+    
+    if ionice_idle:
+        try:
+            import psutil
+            psutil.Process().ionice(psutil.IOPRIO_CLASS_IDLE)
+        except Exception:
+            pass
+    
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def _train_model_job(model_name: str, progress: Callable[[float, str], None]) -> Dict:
+    """Worker side: instantiate a model against a fresh DB pool and train it"""
+    import importlib
+    from ...database.db_manager import DatabaseManager
+    
+    progress(0.05, "Connecting to database")
+    db = DatabaseManager()
+    
+    module_name, class_name = MODEL_CLASSES[model_name]
+    module = importlib.import_module(f"{__package__.rsplit('.', 1)[0]}.{module_name}")
+    
+    progress(0.2, f"Loading {model_name}")
+    model = getattr(module, class_name)(db)
+    
+    progress(0.4, f"Training {model_name}")
+    result = model.train()
+    
+    progress(0.9, "Exporting trained state")
+    return {'result': result, 'state': export_model_state(model)}
+
+
+def _adaptive_training_job(model_name: str, progress: Callable[[float, str], None]) -> Dict:
+    """Worker side: prepare training data and evaluate one adaptive training step"""
+    from ...database.db_manager import DatabaseManager
+    from .data_pipeline import DataPipeline
+    from .adaptive_trainer import AdaptiveTrainer
+    
+    progress(0.05, "Connecting to database")
+    db = DatabaseManager()
+    
+    progress(0.2, "Preparing training data")
+    result = AdaptiveTrainer.run_training_step(model_name, DataPipeline(db))
+    
+    progress(0.9, "Training step finished")
+    return {'result': result}
+
+
+JOB_KINDS = {
+    'train_model': _train_model_job,
+    'adaptive': _adaptive_training_job,
+}
+
+
+def _worker_main(kind: str, model_name: str, conn, limits: Dict):
+    """Entry point of a training worker process"""
+    _apply_resource_limits(limits.get('nice', 0), limits.get('ionice_idle', False),
+                           limits.get('memory_limit_mb'))
+    
+    def progress(fraction: float, message: str = ""):
+        try:
+            conn.send(('progress', fraction, message))
+        except (OSError, ValueError):
+            pass
+    
+    try:
+        payload = JOB_KINDS[kind](model_name, progress)
+        conn.send(('done', payload))
+    except MemoryError:
+        conn.send(('error', f"Training exceeded memory limit of {limits.get('memory_limit_mb')} MB"))
+    except Exception as e:
+        conn.send(('error', f"{e}\n{traceback.format_exc()}"))
+    finally:
+        conn.close()
+
+
+class TrainingWorkerPool:
+    """Priority queue of training jobs executed in resource-capped worker processes"""
+    
+    def __init__(self, ml_engine, max_concurrent: int = 1, nice: int = 10,
+                 ionice_idle: bool = True, memory_limit_mb: Optional[int] = 2048,
+                 job_timeout: int = 3600):
+        self.ml_engine = ml_engine
+        self.logger = logging.getLogger(__name__)
+        
+        self.max_concurrent = max(1, max_concurrent)
+        self.limits = {
+            'nice': nice,
+            'ionice_idle': ionice_idle,
+            'memory_limit_mb': memory_limit_mb
+        }
+        self.job_timeout = job_timeout
+        
+        # spawn keeps the GUI's threads, Qt state and MySQL sockets out of workers
+        self._mp = multiprocessing.get_context('spawn')
+        
+        self._queue = []
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._running: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        
+        self.progress_callbacks: List[Callable[[TrainingJob], None]] = []
+        self.completion_callbacks: List[Callable[[TrainingJob], None]] = []
+        
+        self.active = False
+        self.dispatcher_thread = None
+    
+    def start(self):
+        """Start the dispatcher thread"""
+        if self.active:
+            return
+        
+        self.active = True
+        self.dispatcher_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatcher_thread.start()
+        self.logger.info(f"Training worker pool started (max {self.max_concurrent} concurrent jobs)")
+    
+    def stop(self, timeout: float = 10):
+        """Stop dispatching and terminate running workers"""
+        self.active = False
+        self._wakeup.set()
+        
+        with self._lock:
+            running = list(self._running.values())
+        for process, _conn, _job in running:
+            if process.is_alive():
+                process.terminate()
+        
+        if self.dispatcher_thread:
+            self.dispatcher_thread.join(timeout=timeout)
+        self.logger.info("Training worker pool stopped")
+    
+    def submit(self, model_name: str, kind: str = 'train_model',
+               priority: int = PRIORITY_SCHEDULED) -> TrainingJob:
+        """Queue a training job; an identical queued or running job is reused"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown training job kind: {kind}")
+        
+        with self._lock:
+            for job in self._jobs.values():
+                if (job.kind == kind and job.model_name == model_name and
+                        job.status in (TrainingJobStatus.QUEUED, TrainingJobStatus.RUNNING)):
+                    if priority < job.priority and job.status == TrainingJobStatus.QUEUED:
+                        job.priority = priority
+                        heapq.heappush(self._queue, (priority, next(self._sequence), job.job_id))
+                    return job
+            
+            job = TrainingJob(
+                job_id=f"train-{uuid.uuid4().hex[:8]}",
+                kind=kind,
+                model_name=model_name,
+                priority=priority
+            )
+            self._jobs[job.job_id] = job
+            heapq.heappush(self._queue, (priority, next(self._sequence), job.job_id))
+        
+        if not self.active:
+            self.start()
+        self._wakeup.set()
+        return job
+    
+    def run(self, model_name: str, kind: str = 'train_model',
+            priority: int = PRIORITY_MANUAL, timeout: Optional[float] = None) -> TrainingJob:
+        """Submit a job and wait for it; the caller sleeps while the worker trains"""
+        job = self.submit(model_name, kind, priority)
+        job.wait(timeout if timeout is not None else self.job_timeout)
+        return job
+    
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job or terminate a running one"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job._done.is_set():
+                return False
+            
+            running = self._running.get(job_id)
+            if running:
+                # The dispatcher finishes the job once it sees the worker exit
+                running[0].terminate()
+                return True
+            # No longer QUEUED, so the dispatcher will not start it
+            job.status = TrainingJobStatus.CANCELLED
+        
+        # Completion callbacks may call back into the pool, so run them unlocked
+        self._finish(job, TrainingJobStatus.CANCELLED, error="Cancelled before start")
+        return True
+    
+    def get_job(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+    
+    def get_status(self) -> Dict:
+        """Get pool status for the ML status views"""
+        with self._lock:
+            return {
+                'active': self.active,
+                'max_concurrent': self.max_concurrent,
+                'limits': dict(self.limits),
+                'queued': sum(1 for j in self._jobs.values() if j.status == TrainingJobStatus.QUEUED),
+                'running': len(self._running),
+                'jobs': [job.to_dict() for job in sorted(
+                    self._jobs.values(), key=lambda j: j.submitted_at, reverse=True
+                )[:20]]
+            }
+    
+    def _dispatch_loop(self):
+        """Start queued jobs when a slot is free and collect worker messages"""
+        while self.active:
+            try:
+                self._start_ready_jobs()
+                self._poll_workers()
+                
+                with self._lock:
+                    busy = bool(self._running)
+                # Poll pipes quickly while workers run, otherwise sleep until submit()
+                self._wakeup.wait(timeout=0.2 if busy else 5)
+                self._wakeup.clear()
+            
+            except Exception as e:
+                self.logger.error(f"Training dispatcher error: {e}")
+                time.sleep(1)
+    
+    def _start_ready_jobs(self):
+        with self._lock:
+            while self._queue and len(self._running) < self.max_concurrent:
+                priority, _, job_id = heapq.heappop(self._queue)
+                job = self._jobs.get(job_id)
+                # Skip stale heap entries left behind by a priority bump
+                if not job or job.status != TrainingJobStatus.QUEUED or job.priority != priority:
+                    continue
+                
+                parent_conn, child_conn = self._mp.Pipe(duplex=False)
+                process = self._mp.Process(
+                    target=_worker_main,
+                    args=(job.kind, job.model_name, child_conn, self.limits),
+                    name=f"lfs-training-{job.model_name}",
+                    daemon=True
+                )
+                process.start()
+                child_conn.close()
+                
+                job.status = TrainingJobStatus.RUNNING
+                job.started_at = time.time()
+                job.pid = process.pid
+                self._running[job.job_id] = (process, parent_conn, job)
+                self.logger.info(f"Started training job {job.job_id} ({job.kind}:{job.model_name}) in PID {process.pid}")
+    
+    def _poll_workers(self):
+        with self._lock:
+            running = list(self._running.items())
+        
+        for job_id, (process, conn, job) in running:
+            finished = False
+            try:
+                while conn.poll():
+                    message = conn.recv()
+                    if message[0] == 'progress':
+                        job.progress, job.message = message[1], message[2]
+                        self._notify(self.progress_callbacks, job)
+                    elif message[0] == 'done':
+                        self._complete(job, message[1])
+                        finished = True
+                    elif message[0] == 'error':
+                        self._finish(job, TrainingJobStatus.FAILED, error=message[1])
+                        finished = True
+            except (EOFError, OSError):
+                pass
+            
+            if not finished and not process.is_alive():
+                status = TrainingJobStatus.CANCELLED if process.exitcode == -15 else TrainingJobStatus.FAILED
+                self._finish(job, status, error=f"Worker exited with code {process.exitcode}")
+                finished = True
+            
+            if not finished and job.started_at and time.time() - job.started_at > self.job_timeout:
+                process.terminate()
+                self._finish(job, TrainingJobStatus.FAILED, error=f"Timed out after {self.job_timeout} seconds")
+                finished = True
+            
+            if finished:
+                process.join(timeout=1)
+                conn.close()
+                with self._lock:
+                    self._running.pop(job_id, None)
+    
+    def _complete(self, job: TrainingJob, payload: Dict):
+        """Hot-swap a trained model into the engine and finish the job"""
+        result = payload.get('result') or {}
+        state = payload.get('state')
+        
+        if state is not None and result.get('success', True):
+            try:
+                model = restore_model(job.model_name, state, self.ml_engine.db)
+                self.ml_engine.swap_model(job.model_name, model)
+            except Exception as e:
+                self._finish(job, TrainingJobStatus.FAILED, error=f"Model swap failed: {e}")
+                return
+        
+        job.result = result
+        job.progress = 1.0
+        self._finish(job, TrainingJobStatus.COMPLETED)
+    
+    def _finish(self, job: TrainingJob, status: TrainingJobStatus, error: str = ""):
+        if job._done.is_set():
+            return
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if error:
+            self.logger.error(f"Training job {job.job_id} ({job.model_name}) {status.value}: {error.splitlines()[0]}")
+        job._done.set()
+        self._prune_finished()
+        self._notify(self.completion_callbacks, job)
+    
+    def _prune_finished(self):
+        """Drop the oldest finished jobs beyond FINISHED_JOBS_KEPT"""
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job._done.is_set()]
+            if len(finished) <= FINISHED_JOBS_KEPT:
+                return
+            finished.sort(key=lambda job: job.finished_at or job.submitted_at)
+            for job in finished[:len(finished) - FINISHED_JOBS_KEPT]:
+                self._jobs.pop(job.job_id, None)
+    
+    def _notify(self, callbacks: List[Callable], job: TrainingJob):
+        for callback in callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                self.logger.error(f"Training pool callback error: {e}")
@@ -7,6 +7,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable
 import json
 
+from .training.worker_pool import PRIORITY_MANUAL, PRIORITY_TRIGGERED, PRIORITY_SCHEDULED
+
 class TrainingScheduler:
     """Automated ML model training scheduler with configurable intervals and triggers"""
     
@@ -70,7 +72,7 @@ class TrainingScheduler:
                 return {'success': False, 'message': "Training conditions not met"}
                 
             self.logger.info("Starting manual ML training")
-            success = self._perform_training()
+            success = self._perform_training(priority=PRIORITY_MANUAL)
             
             if success:
                 self._notify_callbacks("manual_training_completed")
@@ -93,7 +95,7 @@ class TrainingScheduler:
             
         # Check if we should trigger training
         if self._should_trigger_training():
-            threading.Thread(target=self._perform_training, daemon=True).start()
+            threading.Thread(target=self._perform_training, kwargs={'priority': PRIORITY_TRIGGERED}, daemon=True).start()
             
     def get_training_status(self) -> Dict:
         """Get current training scheduler status"""
@@ -222,37 +224,40 @@ class TrainingScheduler:
             self.logger.error(f"Error getting build count: {e}")
             return 0
             
-    def _perform_training(self) -> bool:
-        """Perform the actual ML model training"""
+    def _perform_training(self, priority: int = PRIORITY_SCHEDULED) -> bool:
+        """Perform the actual ML model training (lower priority value runs first)"""
         try:
             self.logger.info("Starting automated ML model training")
             
-            # Train all models
+            # Train all models out of process; the pool hot-swaps each
+            # trained model into the engine as its job completes
             training_results = {}
+            training_pool = getattr(self.ml_engine, 'training_pool', None)
             
-            # Train failure predictor
-            if hasattr(self.ml_engine, 'failure_predictor'):
-                try:
-                    self.ml_engine.failure_predictor.train_model()
-                    training_results['failure_predictor'] = 'success'
-                except Exception as e:
-                    training_results['failure_predictor'] = f'failed: {e}'
-                    
-            # Train performance optimizer
-            if hasattr(self.ml_engine, 'performance_optimizer'):
-                try:
-                    self.ml_engine.performance_optimizer.train_model()
-                    training_results['performance_optimizer'] = 'success'
-                except Exception as e:
-                    training_results['performance_optimizer'] = f'failed: {e}'
-                    
-            # Train anomaly detector
-            if hasattr(self.ml_engine, 'anomaly_detector'):
-                try:
-                    self.ml_engine.anomaly_detector.train_model()
-                    training_results['anomaly_detector'] = 'success'
-                except Exception as e:
-                    training_results['anomaly_detector'] = f'failed: {e}'
+            if training_pool:
+                jobs = {
+                    model_name: training_pool.submit(model_name, priority=priority)
+                    for model_name in ('failure_predictor', 'performance_optimizer', 'anomaly_detector')
+                    if getattr(self.ml_engine, model_name, None) is not None
+                }
+                
+                for model_name, job in jobs.items():
+                    job.wait(training_pool.job_timeout)
+                    if job.result is not None and job.result.get('success', True):
+                        training_results[model_name] = 'success'
+                    else:
+                        error = job.error or (job.result or {}).get('error') or job.status.value
+                        training_results[model_name] = f'failed: {error}'
+            else:
+                for model_name in ('failure_predictor', 'performance_optimizer', 'anomaly_detector'):
+                    model = getattr(self.ml_engine, model_name, None)
+                    if model is None:
+                        continue
+                    try:
+                        model.train_model()
+                        training_results[model_name] = 'success'
+                    except Exception as e:
+                        training_results[model_name] = f'failed: {e}'
                     
             # Update training state
             self.last_training_time = datetime.now()
@@ -3,11 +3,17 @@ import multiprocessing
 import queue
 import time
 import os
+import yaml
 from typing import Dict, List, Set, Optional
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
+try:
+    from ..build.output_capture import OutputLog
+except ImportError:
+    from build.output_capture import OutputLog
+
 class TaskStatus(Enum):
     PENDING = "pending"
     RUNNING = "running"
@@ -27,12 +33,21 @@ class BuildTask:
     end_time: Optional[float] = None
     output: str = ""
     error: str = ""
+    output_log: Optional[str] = None
+    labels: List[str] = field(default_factory=list)
+    inputs: Dict[str, str] = field(default_factory=dict)
+    outputs: List[str] = field(default_factory=list)
+    artifacts: Dict[str, str] = field(default_factory=dict)
 
 class ParallelBuildEngine:
-    def __init__(self, max_workers: int = None, max_memory_mb: int = 8192, fault_analyzer=None):
+    def __init__(self, max_workers: int = None, max_memory_mb: int = 8192, fault_analyzer=None, coordinator=None,
+                 build_id: str = None):
         self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.build_id = build_id or f"parallel-{os.getpid()}"
         self.max_memory_mb = max_memory_mb
         self.fault_analyzer = fault_analyzer
+        # With a WorkCoordinator, tasks run on worker agents instead of this host
+        self.coordinator = coordinator
         self.tasks: Dict[str, BuildTask] = {}
         self.completed_tasks: Set[str] = set()
         self.failed_tasks: Set[str] = set()
@@ -44,14 +59,36 @@ class ParallelBuildEngine:
     def add_task(self, task: BuildTask):
         self.tasks[task.id] = task
     
+    def load_tasks(self, config_path: str) -> int:
+        """Add a task for each stage of a build configuration; returns the number added"""
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f) or {}
+        
+        stages = sorted(config.get('stages', []), key=lambda stage: stage.get('order', 0))
+        for stage in stages:
+            self.add_task(BuildTask(
+                id=stage['name'],
+                name=stage.get('description', stage['name']),
+                command=stage['command'],
+                dependencies=stage.get('dependencies', []),
+                cpu_cores=stage.get('cpu_cores', 1),
+                memory_mb=stage.get('memory_mb', 1024),
+                labels=stage.get('runs_on', []),
+                inputs=stage.get('inputs', {}),
+                outputs=stage.get('outputs', [])
+            ))
+        return len(stages)
+    
     def can_run_task(self, task: BuildTask) -> bool:
         for dep in task.dependencies:
             if dep not in self.completed_tasks:
                 return False
         
         with self.resource_lock:
-            if (len(self.running_tasks) >= self.max_workers or
-                self.current_memory_usage + task.memory_mb > self.max_memory_mb):
+            if len(self.running_tasks) >= self.max_workers:
+                return False
+            # Remote tasks use the workers' memory, not ours
+            if not self.coordinator and self.current_memory_usage + task.memory_mb > self.max_memory_mb:
                 return False
         return True
     
@@ -61,6 +98,9 @@ class ParallelBuildEngine:
         task.status = TaskStatus.RUNNING
         task.start_time = time.time()
         
+        if self.coordinator:
+            return self.execute_remote_task(task)
+        
         with self.resource_lock:
             self.current_memory_usage += task.memory_mb
         
@@ -73,9 +113,21 @@ class ParallelBuildEngine:
             process = subprocess.Popen(task.command, shell=True, stdout=subprocess.PIPE, 
                                      stderr=subprocess.PIPE, text=True, env=env)
             
-            stdout, stderr = process.communicate()
-            task.output = stdout
-            task.error = stderr
+            # Stream both pipes to disk; only their tails are kept on the task
+            stdout_log = OutputLog.for_stage(self.build_id, task.id, 'stdout')
+            stderr_log = OutputLog.for_stage(self.build_id, task.id, 'stderr')
+            stderr_reader = threading.Thread(target=lambda: [stderr_log.append(line) for line in process.stderr],
+                                             daemon=True)
+            stderr_reader.start()
+            for line in process.stdout:
+                stdout_log.append(line)
+            stderr_reader.join()
+            process.wait()
+            stdout_log.close()
+            stderr_log.close()
+            task.output = stdout_log.tail()
+            task.error = stderr_log.tail()
+            task.output_log = str(stdout_log.path)
             
             if process.returncode == 0:
                 task.status = TaskStatus.COMPLETED
@@ -96,6 +148,38 @@ class ParallelBuildEngine:
                 if task.id in self.running_tasks:
                     del self.running_tasks[task.id]
     
+    def execute_remote_task(self, task: BuildTask):
+        """Run a task on a worker agent through the work coordinator"""
+        try:
+            env = {'MAKEFLAGS': f'-j{task.cpu_cores}'} if task.cpu_cores > 1 else {}
+            job_id = self.coordinator.submit(task.name, task.command, labels=task.labels, env=env,
+                                             inputs=task.inputs, outputs=task.outputs)
+            self.coordinator.wait([job_id])
+            job = self.coordinator.get_job(job_id)
+            log_path = self.coordinator.job_log_path(job_id)
+            task.output = OutputLog.read_tail(log_path) if log_path.exists() else ''
+            task.output_log = str(log_path)
+            task.error = job['error']
+            task.artifacts = job['artifacts']
+            
+            if job['status'] == 'success':
+                task.status = TaskStatus.COMPLETED
+                self.completed_tasks.add(task.id)
+            else:
+                task.status = TaskStatus.FAILED
+                self.failed_tasks.add(task.id)
+        
+        except Exception as e:
+            task.status = TaskStatus.FAILED
+            task.error = str(e)
+            self.failed_tasks.add(task.id)
+        
+        finally:
+            task.end_time = time.time()
+            with self.resource_lock:
+                if task.id in self.running_tasks:
+                    del self.running_tasks[task.id]
+    
     def start_parallel_build(self):
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             while True:
@@ -169,12 +253,18 @@ class ParallelBuildOrchestrator:
             
             db = DatabaseManager()
             analyzer = IntegratedAnalyzer(db)
+            coordinator = self._start_coordinator(build_config.get('distributed') or {}, db)
+            max_workers = build_config.get('max_parallel_jobs', 4)
+            if coordinator:
+                max_workers = build_config['distributed'].get('max_inflight', max_workers)
             
             # Create parallel engine
             self.engine = ParallelBuildEngine(
-                max_workers=build_config.get('max_parallel_jobs', 4),
+                max_workers=max_workers,
                 max_memory_mb=build_config.get('memory_limit_gb', 8) * 1024,
-                fault_analyzer=analyzer
+                fault_analyzer=analyzer,
+                coordinator=coordinator,
+                build_id=build_id
             )
             
             # Store build record
@@ -182,7 +272,7 @@ class ParallelBuildOrchestrator:
             
             # Start build in background thread
             import threading
-            build_thread = threading.Thread(target=self._run_parallel_build, args=(build_id, config_path))
+            build_thread = threading.Thread(target=self._run_parallel_build, args=(build_id, config_path, self.engine))
             build_thread.daemon = True
             build_thread.start()
             
@@ -197,34 +287,33 @@ class ParallelBuildOrchestrator:
         except Exception as e:
             raise Exception(f"Failed to start parallel build: {str(e)}")
     
-    def _run_parallel_build(self, build_id: str, config_path: str):
+    def _start_coordinator(self, distributed: dict, db):
+        """Start a work coordinator (and local worker agents) when the build is distributed"""
+        from orchestration.work_coordinator import WorkCoordinator
+        
+        return WorkCoordinator.from_config(db, distributed)
+    
+    def _run_parallel_build(self, build_id: str, config_path: str, engine: ParallelBuildEngine = None):
         """Run the actual parallel build"""
+        engine = engine or self.engine
         try:
-            # Load build configuration and create tasks
-            # This would parse the YAML config and create BuildTask objects
-            # For now, create sample tasks
-            
-            sample_tasks = [
-                BuildTask("prepare", "Prepare Host", "echo 'Preparing host system'", [], 1, 512),
-                BuildTask("download", "Download Sources", "echo 'Downloading sources'", ["prepare"], 2, 1024),
-                BuildTask("toolchain", "Build Toolchain", "echo 'Building toolchain'", ["download"], 4, 2048),
-                BuildTask("system", "Build System", "echo 'Building system'", ["toolchain"], 4, 4096)
-            ]
-            
-            for task in sample_tasks:
-                self.engine.add_task(task)
+            # Each stage of the build configuration becomes a task; with a
+            # coordinator they are submitted to the worker agents
+            task_count = engine.load_tasks(config_path)
+            if task_count == 0:
+                raise ValueError(f"No stages defined in {config_path}")
             
             # Start the parallel build
-            self.engine.start_parallel_build()
+            engine.start_parallel_build()
             
             # Update build status
             from database.db_manager import DatabaseManager
             db = DatabaseManager()
             
-            if len(self.engine.failed_tasks) == 0:
-                db.update_build_status(build_id, 'success', len(sample_tasks))
+            if len(engine.failed_tasks) == 0:
+                db.update_build_status(build_id, 'success', task_count)
             else:
-                db.update_build_status(build_id, 'failed', len(self.engine.completed_tasks))
+                db.update_build_status(build_id, 'failed', len(engine.completed_tasks))
             
         except Exception as e:
             print(f"Parallel build error: {e}")
@@ -234,4 +323,7 @@ class ParallelBuildOrchestrator:
                 db = DatabaseManager()
                 db.update_build_status(build_id, 'failed', 0)
             except:
-                pass
\ No newline at end of file
+                pass
+        finally:
+            if engine.coordinator:
+                engine.coordinator.stop()
\ No newline at end of file
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Distributed Build Work Coordinator
+Leases build jobs to worker agents (see worker_agent.py) over HTTP, tracks
+them with heartbeats, collects their streamed logs and exchanges files
+through a content-addressed artifact store.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import ipaddress
+import threading
+import subprocess
+import http.server
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+@dataclass
+class WorkJob:
+    id: str
+    name: str
+    command: str
+    labels: List[str] = field(default_factory=list)
+    env: Dict[str, str] = field(default_factory=dict)
+    inputs: Dict[str, str] = field(default_factory=dict)
+    outputs: List[str] = field(default_factory=list)
+    depends_on: List[str] = field(default_factory=list)
+    timeout: Optional[float] = None
+    max_attempts: int = 2
+    priority: int = 0
+    status: str = 'queued'
+    attempts: int = 0
+    worker_id: Optional[str] = None
+    lease_id: Optional[str] = None
+    lease_expires: float = 0.0
+    cancel_requested: bool = False
+    return_code: Optional[int] = None
+    artifacts: Dict[str, str] = field(default_factory=dict)
+    error: str = ''
+    log_bytes: int = 0
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class ArtifactStore:
+    """Content-addressed blob store: files are stored once under their sha256"""
+    
+    DEFAULT_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'artifacts')
+    
+    def __init__(self, root_dir: str = None):
+        self.root_dir = Path(root_dir or os.environ.get('LFS_ARTIFACT_ROOT', self.DEFAULT_ROOT))
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+    
+    def path(self, digest: str) -> Path:
+        return self.root_dir / digest[:2] / digest
+    
+    def has(self, digest: str) -> bool:
+        return len(digest) == 64 and self.path(digest).exists()
+    
+    def put_file(self, file_path: str) -> str:
+        """Add a local file; returns its digest"""
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        if not self.has(digest):
+            with open(file_path, 'rb') as f:
+                self._write(digest, f, os.path.getsize(file_path))
+        return digest
+    
+    def put_stream(self, digest: str, stream, length: int) -> bool:
+        """Add a blob read from a stream; rejected if its content does not match the digest"""
+        if self.has(digest):
+            # Drain the body so the connection stays usable
+            while length > 0:
+                chunk = stream.read(min(length, 1024 * 1024))
+                if not chunk:
+                    break
+                length -= len(chunk)
+            return True
+        return self._write(digest, stream, length)
+    
+    def _write(self, digest: str, stream, length: int) -> bool:
+        target = self.path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.parent / f".{digest}.{uuid.uuid4().hex[:8]}"
+        sha256 = hashlib.sha256()
+        with open(temp_path, 'wb') as f:
+            remaining = length
+            while remaining > 0:
+                chunk = stream.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                f.write(chunk)
+                remaining -= len(chunk)
+        if sha256.hexdigest() != digest:
+            temp_path.unlink()
+            return False
+        os.replace(temp_path, target)
+        return True
+    
+    def get_to(self, digest: str, destination: str):
+        """Materialize a blob at a path (hardlinked when on the same filesystem)"""
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        try:
+            os.link(self.path(digest), destination)
+        except OSError:
+            shutil.copyfile(self.path(digest), destination)
+
+class CoordinatorHandler(http.server.BaseHTTPRequestHandler):
+    """JSON-over-HTTP endpoints of the worker protocol"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def __init__(self, coordinator, *args, **kwargs):
+        self.coordinator = coordinator
+        super().__init__(*args, **kwargs)
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if not self._authorized():
+            return
+        if path.startswith('/artifacts/'):
+            digest = path.rsplit('/', 1)[-1]
+            if not self.coordinator.artifacts.has(digest):
+                return self._send_json({'error': 'unknown artifact'}, 404)
+            blob = self.coordinator.artifacts.path(digest)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(blob.stat().st_size))
+            self.end_headers()
+            with open(blob, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+        elif path == '/status':
+            self._send_json(self.coordinator.get_status())
+        else:
+            self._send_json({'error': 'Endpoint not found'}, 404)
+    
+    def do_HEAD(self):
+        path = urlparse(self.path).path
+        if not self._authorized():
+            return
+        exists = path.startswith('/artifacts/') and self.coordinator.artifacts.has(path.rsplit('/', 1)[-1])
+        self.send_response(200 if exists else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def do_PUT(self):
+        path = urlparse(self.path).path
+        if not self._authorized():
+            return
+        if not path.startswith('/artifacts/'):
+            return self._send_json({'error': 'Endpoint not found'}, 404)
+        digest = path.rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length', 0))
+        if self.coordinator.artifacts.put_stream(digest, self.rfile, length):
+            self._send_json({'digest': digest})
+        else:
+            self._send_json({'error': 'content does not match digest'}, 400)
+    
+    def do_POST(self):
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            coordinator = self.coordinator
+            
+            if parts == ['workers', 'register']:
+                response = coordinator.register_worker(body.get('worker_id'), body.get('labels', []),
+                                                       body.get('slots', 1), body.get('hostname'))
+            elif parts == ['leases', 'acquire']:
+                response = {'job': coordinator.acquire(body['worker_id'], float(body.get('wait', 0)))}
+            elif len(parts) == 3 and parts[0] == 'leases' and parts[2] == 'heartbeat':
+                response = coordinator.heartbeat(parts[1], body['worker_id'])
+            elif len(parts) == 3 and parts[0] == 'leases' and parts[2] == 'log':
+                response = coordinator.append_log(parts[1], body['worker_id'], body.get('data', ''))
+            elif len(parts) == 3 and parts[0] == 'leases' and parts[2] == 'complete':
+                response = coordinator.complete(parts[1], body['worker_id'], body.get('return_code'),
+                                                body.get('artifacts', {}), body.get('error', ''))
+            else:
+                return self._send_json({'error': 'Endpoint not found'}, 404)
+            
+            self._send_json(response, 200 if 'error' not in response else 409)
+        except (KeyError, ValueError) as e:
+            self._send_json({'error': f"bad request: {e}"}, 400)
+    
+    def _authorized(self) -> bool:
+        token = self.coordinator.token
+        if token and self.headers.get('X-LFS-Worker-Token') != token:
+            self._send_json({'error': 'unauthorized'}, 401)
+            return False
+        return True
+    
+    def _send_json(self, data, status: int = 200):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The worker went away while its long-poll was pending
+            pass
+    
+    def log_message(self, format, *args):
+        """Suppress default logging"""
+        pass
+
+class WorkCoordinator:
+    """Queue of build jobs leased to remote worker agents
+    
+    Workers register with capability labels and long-poll for work; a job is
+    only leased to a worker carrying all of its labels, once the jobs it
+    depends on succeeded. A lease lives for ``lease_seconds`` and is extended
+    by heartbeats; an expired lease puts the job back in the queue (up to
+    ``max_attempts``), so a crashed or partitioned worker only costs a retry.
+    Job inputs and outputs are sha256 digests in the artifact store.
+    """
+    
+    def __init__(self, db_manager=None, artifact_root: str = None, log_dir: str = None,
+                 lease_seconds: float = 30.0, heartbeat_interval: float = 5.0, token: str = None):
+        self.db = db_manager
+        self.artifacts = ArtifactStore(artifact_root)
+        self.log_dir = Path(log_dir or os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'worker-logs'))
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.token = token or os.environ.get('LFS_WORKER_TOKEN')
+        self.jobs: Dict[str, WorkJob] = {}
+        self.workers: Dict[str, Dict] = {}
+        self.callbacks = {'job_log': [], 'job_complete': [], 'worker_joined': [], 'worker_lost': []}
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+        self._local_workers: List[subprocess.Popen] = []
+    
+    def register_callback(self, event: str, callback: Callable):
+        if event in self.callbacks:
+            self.callbacks[event].append(callback)
+    
+    def _emit(self, event: str, data):
+        for callback in self.callbacks.get(event, []):
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"Coordinator callback error: {e}")
+    
+    def start(self, host: str = '127.0.0.1', port: int = 8765) -> int:
+        """Serve the worker protocol; returns the bound port (0 picks a free one)"""
+        if not self.token and not self._is_loopback(host):
+            # Leased jobs are shell commands: an open coordinator runs anyone's code on the workers
+            raise ValueError(f"Refusing to serve workers on {host} without a token "
+                             f"(set distributed.token or LFS_WORKER_TOKEN)")
+        handler = lambda *args, **kwargs: CoordinatorHandler(self, *args, **kwargs)
+        self._server = http.server.ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name='coordinator-http', daemon=True),
+            threading.Thread(target=self._reap_leases, name='coordinator-reaper', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        port = self._server.server_address[1]
+        print(f"🛰️ Work coordinator listening on {host}:{port}")
+        return port
+    
+    @classmethod
+    def from_config(cls, db_manager, distributed: Dict) -> Optional['WorkCoordinator']:
+        """Start a coordinator (and local workers) from a ``distributed`` config section, if enabled"""
+        distributed = distributed or {}
+        if not distributed.get('enabled'):
+            return None
+        coordinator = cls(db_manager, artifact_root=distributed.get('artifact_dir'),
+                          log_dir=distributed.get('log_dir'),
+                          lease_seconds=distributed.get('lease_seconds', 30), token=distributed.get('token'))
+        port = coordinator.start(distributed.get('host', '127.0.0.1'), distributed.get('port', 8765))
+        if distributed.get('local_workers'):
+            coordinator.spawn_local_workers(distributed['local_workers'], port, distributed.get('labels'))
+        return coordinator
+    
+    @staticmethod
+    def _is_loopback(host: str) -> bool:
+        if host == 'localhost':
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+    
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        self.stop_local_workers()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def spawn_local_workers(self, count: int, port: int, labels: List[str] = None, work_root: str = None) -> List[int]:
+        """Start worker agent processes on this host (for tests and single-machine scaling)"""
+        agent = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker_agent.py')
+        env = dict(os.environ)
+        if self.token:
+            env['LFS_WORKER_TOKEN'] = self.token
+        pids = []
+        for index in range(count):
+            command = [sys.executable, agent, '--coordinator', f"http://127.0.0.1:{port}",
+                       '--worker-id', f"local-{os.getpid()}-{index + 1}"]
+            if labels:
+                command += ['--labels', ','.join(labels)]
+            if work_root:
+                command += ['--work-root', os.path.join(work_root, f"worker-{index + 1}")]
+            process = subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL)
+            self._local_workers.append(process)
+            pids.append(process.pid)
+        return pids
+    
+    def stop_local_workers(self):
+        for process in self._local_workers:
+            process.terminate()
+        for process in self._local_workers:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._local_workers = []
+    
+    # Coordinator-side API
+    
+    def submit(self, name: str, command: str, labels: List[str] = None, env: Dict = None,
+               inputs: Dict[str, str] = None, outputs: List[str] = None, depends_on: List[str] = None,
+               timeout: float = None, max_attempts: int = 2, priority: int = 0) -> str:
+        """Queue a job; ``inputs`` maps workdir-relative paths to artifact digests"""
+        job = WorkJob(id=f"job-{uuid.uuid4().hex[:12]}", name=name, command=command, labels=list(labels or []),
+                      env=dict(env or {}), inputs=dict(inputs or {}), outputs=list(outputs or []),
+                      depends_on=list(depends_on or []), timeout=timeout, max_attempts=max_attempts,
+                      priority=priority)
+        with self._condition:
+            self.jobs[job.id] = job
+            self._condition.notify_all()
+        return job.id
+    
+    def cancel(self, job_id: str):
+        """Cancel a queued job, or ask the worker running it to stop"""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if not job or job.status in ('success', 'failed', 'cancelled'):
+                return
+            if job.status == 'queued':
+                self._finish(job, 'cancelled', error='cancelled before it started')
+            else:
+                job.cancel_requested = True
+    
+    def wait(self, job_ids: List[str], timeout: float = None) -> Dict[str, str]:
+        """Block until the jobs finished (or the timeout passed); returns their statuses"""
+        deadline = time.time() + timeout if timeout else None
+        with self._condition:
+            while True:
+                statuses = {job_id: self.jobs[job_id].status for job_id in job_ids}
+                if all(status in ('success', 'failed', 'cancelled') for status in statuses.values()):
+                    return statuses
+                remaining = deadline - time.time() if deadline else 1.0
+                if remaining <= 0 or self._stop.is_set():
+                    return statuses
+                self._condition.wait(min(remaining, 1.0))
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._condition:
+            job = self.jobs.get(job_id)
+            return asdict(job) if job else None
+    
+    def job_log_path(self, job_id: str) -> Path:
+        return self.log_dir / f"{job_id}.log"
+    
+    def get_status(self) -> Dict:
+        with self._condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'jobs': counts,
+                'workers': {worker_id: {key: value for key, value in worker.items() if key != 'leases'}
+                            for worker_id, worker in self.workers.items()}
+            }
+    
+    # Worker protocol
+    
+    def register_worker(self, worker_id: Optional[str], labels: List[str], slots: int, hostname: str = None) -> Dict:
+        worker_id = worker_id or f"worker-{uuid.uuid4().hex[:8]}"
+        with self._condition:
+            known = worker_id in self.workers
+            self.workers[worker_id] = {
+                'labels': sorted(set(labels)),
+                'slots': slots,
+                'hostname': hostname,
+                'status': 'online',
+                'last_seen': time.time(),
+                'jobs_completed': self.workers.get(worker_id, {}).get('jobs_completed', 0)
+            }
+        if not known:
+            print(f"🤝 Worker {worker_id} joined ({hostname}, labels: {', '.join(labels) or 'none'}, {slots} slots)")
+            self._emit('worker_joined', {'worker_id': worker_id, 'labels': labels})
+        return {'worker_id': worker_id, 'heartbeat_interval': self.heartbeat_interval,
+                'lease_seconds': self.lease_seconds}
+    
+    def acquire(self, worker_id: str, wait: float = 0) -> Optional[Dict]:
+        """Lease the best runnable job this worker can take, long-polling up to ``wait`` seconds"""
+        deadline = time.time() + min(wait, 60)
+        with self._condition:
+            while True:
+                worker = self.workers.get(worker_id)
+                if worker is None:
+                    return None
+                worker['last_seen'] = time.time()
+                worker['status'] = 'online'
+                job = self._next_job(set(worker['labels']))
+                if job:
+                    job.status = 'leased'
+                    job.attempts += 1
+                    job.worker_id = worker_id
+                    job.lease_id = uuid.uuid4().hex
+                    job.lease_expires = time.time() + self.lease_seconds
+                    job.started_at = job.started_at or time.time()
+                    return {key: getattr(job, key) for key in
+                            ('id', 'name', 'command', 'env', 'inputs', 'outputs', 'timeout', 'attempts', 'lease_id')}
+                remaining = deadline - time.time()
+                if remaining <= 0 or self._stop.is_set():
+                    return None
+                self._condition.wait(remaining)
+    
+    def _next_job(self, labels: set) -> Optional[WorkJob]:
+        candidates = []
+        for job in self.jobs.values():
+            if job.status != 'queued' or not set(job.labels) <= labels:
+                continue
+            dependencies = [self.jobs.get(dep) for dep in job.depends_on]
+            if any(dep is None or dep.status in ('failed', 'cancelled') for dep in dependencies):
+                self._finish(job, 'failed', error='a dependency failed')
+                continue
+            if all(dep.status == 'success' for dep in dependencies):
+                candidates.append(job)
+        return min(candidates, key=lambda job: (-job.priority, job.submitted_at), default=None)
+    
+    def _leased_job(self, lease_id: str, worker_id: str) -> Optional[WorkJob]:
+        job = next((job for job in self.jobs.values() if job.lease_id == lease_id), None)
+        if job is None or job.worker_id != worker_id or job.status != 'leased':
+            return None
+        return job
+    
+    def heartbeat(self, lease_id: str, worker_id: str) -> Dict:
+        with self._condition:
+            if worker_id in self.workers:
+                self.workers[worker_id]['last_seen'] = time.time()
+            job = self._leased_job(lease_id, worker_id)
+            if job is None:
+                # The lease expired and the job went to someone else; the worker must stop
+                return {'error': 'lease lost', 'cancel': True}
+            self._extend_lease(job)
+            return {'ok': True, 'cancel': job.cancel_requested}
+    
+    def append_log(self, lease_id: str, worker_id: str, data: str) -> Dict:
+        with self._condition:
+            job = self._leased_job(lease_id, worker_id)
+            if job is None:
+                return {'error': 'lease lost', 'cancel': True}
+            self._extend_lease(job)
+            job.log_bytes += len(data)
+            cancel = job.cancel_requested
+        with open(self.job_log_path(job.id), 'a') as f:
+            f.write(data)
+        self._emit('job_log', {'job_id': job.id, 'name': job.name, 'worker_id': worker_id, 'data': data})
+        return {'ok': True, 'cancel': cancel}
+    
+    def _extend_lease(self, job: WorkJob):
+        job.lease_expires = time.time() + self.lease_seconds
+        if job.timeout and time.time() - job.started_at > job.timeout and not job.cancel_requested:
+            job.cancel_requested = True
+            job.error = f"timed out after {job.timeout} seconds"
+    
+    def complete(self, lease_id: str, worker_id: str, return_code: Optional[int], artifacts: Dict[str, str],
+                 error: str = '') -> Dict:
+        with self._condition:
+            job = self._leased_job(lease_id, worker_id)
+            if job is None:
+                return {'error': 'lease lost'}
+            missing = [path for path, digest in artifacts.items() if not self.artifacts.has(digest)]
+            if missing:
+                return {'error': f"artifacts not uploaded: {', '.join(missing)}"}
+            job.artifacts = dict(artifacts)
+            job.return_code = return_code
+            if worker_id in self.workers:
+                self.workers[worker_id]['jobs_completed'] += 1
+            if job.cancel_requested:
+                self._finish(job, 'cancelled' if not job.error else 'failed', error=job.error or 'cancelled')
+            elif return_code == 0 and not error:
+                self._finish(job, 'success')
+            elif job.attempts < job.max_attempts and not error:
+                self._requeue(job, f"attempt {job.attempts} failed with return code {return_code}")
+            else:
+                self._finish(job, 'failed', error=error or f"return code {return_code}")
+        return {'ok': True}
+    
+    def _requeue(self, job: WorkJob, reason: str):
+        print(f"🔁 Requeuing job {job.name} ({reason})")
+        job.status = 'queued'
+        job.lease_id = None
+        job.worker_id = None
+        self._condition.notify_all()
+    
+    def _finish(self, job: WorkJob, status: str, error: str = ''):
+        """Mark a job finished; called with the condition held"""
+        job.status = status
+        job.error = error or job.error
+        job.lease_id = None
+        job.finished_at = time.time()
+        self._condition.notify_all()
+        # Callbacks and the database write run outside the lock
+        threading.Thread(target=self._on_finished, args=(asdict(job),), daemon=True).start()
+    
+    def _on_finished(self, job: Dict):
+        if self.db:
+            self.db.record_distributed_job(job)
+        self._emit('job_complete', job)
+    
+    def _reap_leases(self):
+        """Requeue jobs whose worker stopped heartbeating and mark silent workers lost"""
+        while not self._stop.wait(1.0):
+            now = time.time()
+            lost = []
+            with self._condition:
+                for job in self.jobs.values():
+                    if job.status == 'leased' and job.lease_expires < now:
+                        print(f"⌛ Lease of job {job.name} on {job.worker_id} expired")
+                        if job.attempts < job.max_attempts and not job.cancel_requested:
+                            self._requeue(job, 'lease expired')
+                        else:
+                            self._finish(job, 'failed', error='lease expired on the last attempt')
+                for worker_id, worker in self.workers.items():
+                    if worker['status'] == 'online' and now - worker['last_seen'] > 3 * max(self.heartbeat_interval, 20):
+                        worker['status'] = 'lost'
+                        lost.append(worker_id)
+            for worker_id in lost:
+                self._emit('worker_lost', {'worker_id': worker_id})
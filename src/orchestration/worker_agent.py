@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+LFS Build Worker Agent
+Leases jobs from a work coordinator (work_coordinator.py), runs them in a
+scratch directory and reports logs, artifacts and results back. Uses only
+the standard library so it can run inside a bare build container:
+    
+    python3 worker_agent.py --coordinator http://coordinator:8765 --labels x86_64,lfs --slots 2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import hashlib
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Deliveries of a finished job's last output before it is given up
+LOG_SHIP_ATTEMPTS = 5
+
+class WorkerAgent:
+    """Runs leased build jobs; one thread per slot"""
+    
+    def __init__(self, coordinator_url: str, labels: List[str] = None, slots: int = 1,
+                 work_root: str = None, worker_id: str = None, token: str = None):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.labels = list(labels or [])
+        self.slots = max(slots, 1)
+        self.work_root = Path(work_root or os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'worker'))
+        self.worker_id = worker_id
+        self.token = token or os.environ.get('LFS_WORKER_TOKEN')
+        self.heartbeat_interval = 5.0
+        self.blob_cache = self.work_root / 'blobs'
+        self._stop = threading.Event()
+        self._running: Dict[str, subprocess.Popen] = {}
+    
+    def _request(self, method: str, path: str, payload: Dict = None, data: bytes = None,
+                 timeout: float = 30) -> Optional[Dict]:
+        headers = {}
+        if self.token:
+            headers['X-LFS-Worker-Token'] = self.token
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.coordinator_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body = response.read()
+                return json.loads(body) if body else {}
+        except urllib.error.HTTPError as e:
+            if e.code == 404 and method == 'HEAD':
+                return None
+            try:
+                return json.loads(e.read() or b'{}')
+            except ValueError:
+                return {'error': f"HTTP {e.code}"}
+    
+    def register(self):
+        """Register with the coordinator, retrying until it is reachable"""
+        while not self._stop.is_set():
+            try:
+                response = self._request('POST', '/workers/register', {
+                    'worker_id': self.worker_id, 'labels': self.labels,
+                    'slots': self.slots, 'hostname': socket.gethostname()
+                })
+                self.worker_id = response['worker_id']
+                self.heartbeat_interval = float(response.get('heartbeat_interval', self.heartbeat_interval))
+                print(f"🤝 Registered as {self.worker_id} with {self.coordinator_url}")
+                return
+            except (OSError, KeyError) as e:
+                print(f"⚠️ Coordinator not reachable ({e}), retrying")
+                self._stop.wait(5)
+    
+    def run(self):
+        self.register()
+        threads = [threading.Thread(target=self._slot_loop, name=f"slot-{index + 1}", daemon=True)
+                   for index in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        while not self._stop.wait(1) and any(thread.is_alive() for thread in threads):
+            pass
+        for process in list(self._running.values()):
+            self._kill(process)
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _slot_loop(self):
+        while not self._stop.is_set():
+            try:
+                response = self._request('POST', '/leases/acquire', {'worker_id': self.worker_id, 'wait': 20},
+                                         timeout=40)
+            except OSError as e:
+                print(f"⚠️ Could not reach coordinator: {e}")
+                self._stop.wait(5)
+                continue
+            if response is None or response.get('error'):
+                # The coordinator restarted and forgot us
+                self.register()
+                continue
+            if response.get('job'):
+                job = response['job']
+                try:
+                    self._run_job(job)
+                except Exception as e:
+                    # One bad job must not take the slot down with it
+                    print(f"❌ {job.get('name')} failed on this worker: {e}")
+                    self._complete(job['lease_id'], None, {}, f"worker error: {e}")
+    
+    def _run_job(self, job: Dict):
+        lease_id = job['lease_id']
+        workdir = self.work_root / 'jobs' / f"{job['id']}-{job['attempts']}"
+        shutil.rmtree(workdir, ignore_errors=True)
+        workdir.mkdir(parents=True)
+        print(f"🔨 {job['name']} (attempt {job['attempts']})")
+        
+        try:
+            for relative_path, digest in job.get('inputs', {}).items():
+                self._fetch(digest, workdir / relative_path)
+        except (OSError, ValueError) as e:
+            self._complete(lease_id, None, {}, f"could not fetch inputs: {e}")
+            shutil.rmtree(workdir, ignore_errors=True)
+            return
+        
+        env = dict(os.environ)
+        env.update({key: str(value) for key, value in job.get('env', {}).items()})
+        env['LFS_JOB_ID'] = job['id']
+        env['LFS_JOB_WORKDIR'] = str(workdir)
+        process = subprocess.Popen(['bash', '-c', job['command']], cwd=workdir, env=env, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True)
+        self._running[job['id']] = process
+        
+        buffer = []
+        buffer_lock = threading.Lock()
+        finished = threading.Event()
+        cancelled = threading.Event()
+        shipper = threading.Thread(target=self._ship_logs,
+                                   args=(lease_id, buffer, buffer_lock, finished, cancelled, process), daemon=True)
+        shipper.start()
+        for line in iter(process.stdout.readline, b''):
+            with buffer_lock:
+                buffer.append(line.decode('utf-8', errors='replace'))
+        return_code = process.wait()
+        self._running.pop(job['id'], None)
+        finished.set()
+        shipper.join()
+        
+        if cancelled.is_set():
+            self._complete(lease_id, return_code, {}, 'cancelled by coordinator')
+        else:
+            artifacts, error = self._upload_outputs(workdir, job.get('outputs', []))
+            # The coordinator fails a job whose outputs could not be delivered, even on return code 0
+            self._complete(lease_id, return_code, artifacts, error if return_code == 0 else '')
+        shutil.rmtree(workdir, ignore_errors=True)
+        print(f"{'✅' if return_code == 0 else '❌'} {job['name']} finished with return code {return_code}")
+    
+    def _ship_logs(self, lease_id: str, buffer: List[str], buffer_lock: threading.Lock,
+                   finished: threading.Event, cancelled: threading.Event, process: subprocess.Popen):
+        """Send buffered output every second and heartbeat the lease, killing the job when told to"""
+        last_heartbeat = time.time()
+        failures = 0
+        while True:
+            done = finished.wait(1.0)
+            with buffer_lock:
+                chunk = ''.join(buffer)
+                buffer.clear()
+            try:
+                if chunk:
+                    response = self._request('POST', f"/leases/{lease_id}/log",
+                                             {'worker_id': self.worker_id, 'data': chunk})
+                    failures = 0
+                    last_heartbeat = time.time()
+                elif time.time() - last_heartbeat >= self.heartbeat_interval:
+                    response = self._request('POST', f"/leases/{lease_id}/heartbeat", {'worker_id': self.worker_id})
+                    last_heartbeat = time.time()
+                else:
+                    response = {}
+                # Log posts extend the lease like heartbeats and carry the same cancel flag
+                if not done and response and response.get('cancel') and not cancelled.is_set():
+                    cancelled.set()
+                    self._kill(process)
+            except OSError as e:
+                print(f"⚠️ Could not reach coordinator: {e}")
+                # Keep the unsent output ahead of anything logged since
+                if chunk:
+                    with buffer_lock:
+                        buffer.insert(0, chunk)
+                failures += 1
+                if done and failures < LOG_SHIP_ATTEMPTS:
+                    time.sleep(1.0)
+                    continue
+            if done:
+                return
+    
+    @staticmethod
+    def _kill(process: subprocess.Popen):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=10)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+    
+    def _fetch(self, digest: str, destination: Path):
+        """Materialize an input artifact, downloading it into the local blob cache once"""
+        cached = self.blob_cache / digest
+        if not cached.exists():
+            self.blob_cache.mkdir(parents=True, exist_ok=True)
+            temp_path = self.blob_cache / f".{digest}.{threading.get_ident()}"
+            headers = {'X-LFS-Worker-Token': self.token} if self.token else {}
+            request = urllib.request.Request(f"{self.coordinator_url}/artifacts/{digest}", headers=headers)
+            sha256 = hashlib.sha256()
+            with urllib.request.urlopen(request, timeout=60) as response, open(temp_path, 'wb') as f:
+                for chunk in iter(lambda: response.read(1024 * 1024), b''):
+                    sha256.update(chunk)
+                    f.write(chunk)
+            if sha256.hexdigest() != digest:
+                temp_path.unlink()
+                raise ValueError(f"artifact {digest[:12]} is corrupt")
+            os.replace(temp_path, cached)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(cached, destination)
+        except OSError:
+            shutil.copyfile(cached, destination)
+    
+    def _upload_outputs(self, workdir: Path, outputs: List[str]):
+        """Hash declared outputs and upload the ones the store does not have yet"""
+        artifacts = {}
+        for relative_path in outputs:
+            path = workdir / relative_path
+            if not path.is_file():
+                return artifacts, f"declared output {relative_path} was not produced"
+            sha256 = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+            try:
+                if self._request('HEAD', f"/artifacts/{digest}") is None:
+                    headers = {'Content-Length': str(path.stat().st_size)}
+                    if self.token:
+                        headers['X-LFS-Worker-Token'] = self.token
+                    with open(path, 'rb') as f:
+                        request = urllib.request.Request(f"{self.coordinator_url}/artifacts/{digest}", data=f,
+                                                         method='PUT', headers=headers)
+                        urllib.request.urlopen(request, timeout=300).close()
+            except OSError as e:
+                # URLError and HTTPError included
+                print(f"⚠️ Could not upload {relative_path}: {e}")
+                return artifacts, f"could not upload output {relative_path}: {e}"
+            artifacts[relative_path] = digest
+        return artifacts, ''
+    
+    def _complete(self, lease_id: str, return_code: Optional[int], artifacts: Dict, error: str):
+        for _ in range(3):
+            try:
+                self._request('POST', f"/leases/{lease_id}/complete", {
+                    'worker_id': self.worker_id, 'return_code': return_code,
+                    'artifacts': artifacts, 'error': error
+                })
+                return
+            except OSError as e:
+                print(f"⚠️ Could not report completion: {e}")
+                time.sleep(2)
+        print(f"❌ Gave up reporting lease {lease_id}; the coordinator will requeue it when the lease expires")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='LFS build worker agent')
+    parser.add_argument('--coordinator', default=os.environ.get('LFS_COORDINATOR_URL', 'http://127.0.0.1:8765'))
+    parser.add_argument('--labels', default=os.environ.get('LFS_WORKER_LABELS', ''),
+                        help='comma-separated capability labels')
+    parser.add_argument('--slots', type=int, default=1, help='jobs to run at once')
+    parser.add_argument('--work-root', default=None)
+    parser.add_argument('--worker-id', default=None)
+    args = parser.parse_args(argv)
+    
+    agent = WorkerAgent(args.coordinator, [label for label in args.labels.split(',') if label],
+                        args.slots, args.work_root, args.worker_id)
+    signal.signal(signal.SIGTERM, lambda signum, frame: agent.stop())
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
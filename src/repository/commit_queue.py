@@ -0,0 +1,195 @@
+import time
+import atexit
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+class _Batch:
+    """Changes recorded for one branch and build, committed together"""
+    
+    def __init__(self, branch: Optional[str], build_id: Optional[str], stage_all: bool,
+                 work_tree: Optional[str] = None):
+        self.branch = branch
+        self.build_id = build_id
+        self.stage_all = stage_all
+        self.work_tree = work_tree
+        self.notes = []
+        self.paths = []
+        self.callbacks = []
+        self.opened_at = time.time()
+
+class CommitQueue:
+    """Single writer for a repository's build-time commits.
+    
+    Build stages and source downloads ``record`` what they changed instead of
+    committing on the calling thread. Records for the same branch and build
+    are coalesced into one commit, written by a worker thread when the build
+    flushes, when the batch is ``flush_interval`` seconds old or when it holds
+    ``max_pending`` records. Batches, tags and branch operations are applied
+    strictly in the order they were queued, so a build's commits land on its
+    branch in stage order and its tag points at its final commit. Batches are
+    committed straight onto their branch; HEAD is never switched.
+    """
+    
+    def __init__(self, repo_manager, flush_interval: float = 30.0, max_pending: int = 50):
+        self.repo = repo_manager
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._open = OrderedDict()  # (branch, build_id, stage_all, work_tree) -> _Batch
+        self._ready = deque()  # (kind, payload) in commit order
+        self._condition = threading.Condition()
+        self._queued = 0
+        self._done = 0
+        self._stopping = False
+        self.stats = {'records': 0, 'commits': 0, 'tags': 0, 'errors': 0}
+        self._last_commits = {}  # build_id -> its newest commit, for its tag
+        self._worker = threading.Thread(target=self._run, name='repo-commit-queue', daemon=True)
+        self._worker.start()
+        atexit.register(self.stop)
+    
+    def record(self, message: str, build_id: str = None, branch: str = None, paths: List[str] = None,
+               on_commit: Callable[[str], None] = None, work_tree: str = None):
+        """Queue a change for the next commit on ``branch``
+        
+        ``paths`` limits staging to those files; without it the whole working
+        tree is staged. ``work_tree`` takes the files from another directory
+        than the repository's working tree. ``on_commit`` is called with the
+        commit hash once the change is in the repository.
+        """
+        key = (branch, build_id, paths is None, work_tree)
+        with self._condition:
+            batch = self._open.get(key)
+            if batch is None:
+                batch = self._open[key] = _Batch(branch, build_id, paths is None, work_tree)
+            batch.notes.append(message.strip())
+            batch.paths.extend(paths or [])
+            if on_commit:
+                batch.callbacks.append(on_commit)
+            self.stats['records'] += 1
+            if len(batch.notes) >= self.max_pending:
+                self._seal(key)
+            self._condition.notify_all()
+    
+    def flush(self, build_id: str = None, wait: bool = False, timeout: float = None) -> bool:
+        """Commit the open batches of ``build_id`` (all of them without one)"""
+        with self._condition:
+            for key in [key for key in self._open if build_id is None or key[1] == build_id]:
+                self._seal(key)
+            target = self._queued
+            self._condition.notify_all()
+        return self._wait_for(target, timeout) if wait else True
+    
+    def tag(self, tag_name: str, message: str = "", build_id: str = None):
+        """Tag the commit that ends ``build_id``'s queued changes"""
+        self.submit(lambda: self.repo.create_tag(tag_name, message, commit=self._last_commits.pop(build_id, None)),
+                    build_id=build_id, kind='tag')
+    
+    def submit(self, operation: Callable[[], object], build_id: str = None, kind: str = 'call'):
+        """Run another repository write in order after the changes queued so far"""
+        with self._condition:
+            for key in [key for key in self._open if build_id is None or key[1] == build_id]:
+                self._seal(key)
+            self._enqueue(kind, operation)
+            self._condition.notify_all()
+    
+    def drain(self, timeout: float = None) -> bool:
+        """Commit everything recorded so far and wait until it is written"""
+        return self.flush(wait=True, timeout=timeout)
+    
+    def pending(self) -> Dict:
+        with self._condition:
+            return {
+                'open_batches': len(self._open),
+                'open_records': sum(len(batch.notes) for batch in self._open.values()),
+                'queued_operations': self._queued - self._done
+            }
+    
+    def stop(self, timeout: float = 60.0):
+        """Write out what is pending and stop the worker"""
+        if not self._worker.is_alive():
+            return
+        self.drain(timeout)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._worker.join(timeout)
+    
+    def _seal(self, key):
+        batch = self._open.pop(key, None)
+        if batch is not None:
+            self._enqueue('commit', batch)
+    
+    def _enqueue(self, kind: str, payload):
+        self._ready.append((kind, payload))
+        self._queued += 1
+    
+    def _wait_for(self, target: int, timeout: float = None) -> bool:
+        if threading.current_thread() is self._worker:
+            return False
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._done < target:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._ready:
+                    if self._stopping:
+                        return
+                    now = time.time()
+                    for key, batch in list(self._open.items()):
+                        if now - batch.opened_at >= self.flush_interval:
+                            self._seal(key)
+                    if self._ready:
+                        break
+                    oldest = min((batch.opened_at for batch in self._open.values()), default=None)
+                    self._condition.wait(self.flush_interval if oldest is None
+                                         else max(oldest + self.flush_interval - now, 0.05))
+                kind, payload = self._ready.popleft()
+            try:
+                if kind == 'commit':
+                    self._commit(payload)
+                else:
+                    payload()
+                    if kind == 'tag':
+                        self.stats['tags'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Queued repository {kind} failed: {e}")
+            finally:
+                with self._condition:
+                    self._done += 1
+                    self._condition.notify_all()
+    
+    def _commit(self, batch: _Batch):
+        paths = None if batch.stage_all else list(dict.fromkeys(batch.paths))
+        commit_hash = self.repo.commit_to_branch(batch.branch, self._message(batch), paths, batch.work_tree)
+        if not commit_hash:
+            self.stats['errors'] += 1
+            return
+        self.stats['commits'] += 1
+        if batch.build_id:
+            self._last_commits[batch.build_id] = commit_hash
+        for callback in batch.callbacks:
+            try:
+                callback(commit_hash)
+            except Exception as e:
+                print(f"Commit callback error: {e}")
+    
+    @staticmethod
+    def _message(batch: _Batch) -> str:
+        if len(batch.notes) == 1:
+            message = batch.notes[0]
+        else:
+            subject = batch.notes[-1].splitlines()[0]
+            message = f"{subject} (+{len(batch.notes) - 1} earlier updates)\n\n"
+            message += "\n\n".join(f"* {note}".replace("\n", "\n  ") for note in batch.notes)
+        trailers = [f"Batched-Updates: {len(batch.notes)}"] if len(batch.notes) > 1 else []
+        if batch.build_id:
+            trailers.append(f"Build-ID: {batch.build_id}")
+        return message + ("\n\n" + "\n".join(trailers) if trailers else "")
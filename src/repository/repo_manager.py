@@ -1,9 +1,9 @@
 import os
 import json
 import hashlib
+import uuid
 import shutil
-import tarfile
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import git
@@ -11,6 +11,15 @@ from git.exc import GitCommandError
 
 from ..database.db_manager import DatabaseManager
 from ..config.settings_manager import SettingsManager
+from .commit_queue import CommitQueue
+from .search_index import (MIN_INDEXED_QUERY, COMMIT_FORMAT, RepositorySearchIndex, commit_result,
+                           make_snippet, parse_log)
+from .status_service import RepositoryStatusService
+
+SNAPSHOT_REF_PREFIX = 'refs/snapshots'
+SNAPSHOT_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+# Columns added to repo_snapshots when snapshots became refs, for databases created before
+SNAPSHOT_COLUMNS = [('snapshot_ref', 'VARCHAR(255)'), ('base_commit', 'VARCHAR(40)')]
 
 class RepositoryManager:
     def __init__(self, db_manager: DatabaseManager, repo_path: str = None):
@@ -22,8 +31,15 @@ class RepositoryManager:
         
         self.repo_path = Path(repo_path)
         self.repo_path.mkdir(parents=True, exist_ok=True)
+        # Restored snapshots are checked out next to the repository, never inside it
+        self.snapshot_root = self.repo_path.parent / f".{self.repo_path.name}-snapshots"
         self.git_repo = None
         self._init_repository()
+        self._migrate_snapshot_table()
+        self.search_index = self._open_search_index()
+        self.status_service = RepositoryStatusService(self.git_repo)
+        # Build stages and downloads commit through this queue, off their own threads
+        self.commit_queue = CommitQueue(self, flush_interval=self.settings.get('commit_flush_interval', 30))
     
     def _init_repository(self):
         git_dir = self.repo_path / ".git"
@@ -62,6 +78,33 @@ This repository contains build configurations, scripts, and patches for Linux Fr
         else:
             self.git_repo = git.Repo(self.repo_path)
     
+    def _migrate_snapshot_table(self):
+        """Add the snapshot ref columns to a repo_snapshots table that predates them"""
+        try:
+            rows = self.db.execute_query("""
+                SELECT COLUMN_NAME AS column_name FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'repo_snapshots'
+            """, fetch=True)
+            if not rows:
+                return
+            existing = {row['column_name'] for row in rows}
+            for column, definition in SNAPSHOT_COLUMNS:
+                if column not in existing:
+                    self.db.execute_query(f"ALTER TABLE repo_snapshots ADD COLUMN {column} {definition}")
+                    print(f"🔧 Added repo_snapshots.{column}")
+            if 'snapshot_ref' not in existing:
+                self.db.execute_query("ALTER TABLE repo_snapshots ADD INDEX idx_snapshot_ref (snapshot_ref)")
+        except Exception as e:
+            print(f"⚠️ Could not migrate repo_snapshots: {e}")
+    
+    def _open_search_index(self) -> Optional[RepositorySearchIndex]:
+        try:
+            return RepositorySearchIndex(self.git_repo)
+        except Exception as e:
+            # e.g. an SQLite without FTS5 trigram support; searches then use git grep and git log
+            print(f"⚠️ Repository search index unavailable: {e}")
+            return None
+    
     def create_branch(self, branch_name: str, from_branch: str = None, checkout: bool = True) -> bool:
         """Enhanced branch creation with flexible source"""
         try:
@@ -131,86 +174,201 @@ This repository contains build configurations, scripts, and patches for Linux Fr
             if build_id:
                 self._store_snapshot(build_id, commit_hash)
             
+            # Keep an index that has been searched before current, one commit's worth at a time
+            if self.search_index and self.search_index.built:
+                self.search_index.update()
+            
             return commit_hash
         except Exception as e:
             print(f"Error committing changes: {e}")
             return ""
     
     def _store_snapshot(self, build_id: str, commit_hash: str):
+        """Record the working tree as a commit under refs/snapshots and reference it in the database
+        
+        Only files that differ from ``commit_hash`` add objects to the repository,
+        so a snapshot costs as much as the build changed rather than a full copy.
+        """
         try:
-            # Create tarball of current state
-            snapshot_path = f"/tmp/snapshot_{build_id}.tar.gz"
-            with tarfile.open(snapshot_path, "w:gz") as tar:
-                tar.add(self.repo_path, arcname=".")
-            
-            # Read snapshot data
-            with open(snapshot_path, "rb") as f:
-                snapshot_data = f.read()
-            
-            # Store in database
-            conn = self.db.connect()
-            cursor = conn.cursor()
+            snapshot_commit = self._snapshot_commit(build_id, commit_hash)
+            snapshot_ref = f"{SNAPSHOT_REF_PREFIX}/{build_id}/{datetime.now().strftime(SNAPSHOT_TIME_FORMAT)}"
+            self.git_repo.git.update_ref(snapshot_ref, snapshot_commit)
             
-            cursor.execute("""
-                INSERT INTO repo_snapshots (build_id, commit_hash, branch_name, snapshot_data)
-                VALUES (%s, %s, %s, %s)
-            """, (build_id, commit_hash, self.git_repo.active_branch.name, snapshot_data))
+            self.db.execute_query("""
+                INSERT INTO repo_snapshots (build_id, git_commit_hash, git_branch, snapshot_ref, base_commit)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (build_id, snapshot_commit, self.get_current_branch(), snapshot_ref, commit_hash))
             
-            conn.commit()
-            cursor.close()
-            
-            # Cleanup temp file
-            os.remove(snapshot_path)
+            self.prune_snapshots()
             
         except Exception as e:
             print(f"Error storing snapshot: {e}")
     
-    def restore_snapshot(self, build_id: str) -> bool:
+    def _snapshot_commit(self, build_id: str, commit_hash: str) -> str:
+        """A commit of the whole working tree, untracked files included, on top of ``commit_hash``"""
+        git_dir = Path(self.git_repo.git_dir)
+        index_path = git_dir / f"snapshot-index-{uuid.uuid4().hex[:8]}"
+        try:
+            # Start from the real index so only files changed since it was written are hashed
+            if (git_dir / "index").exists():
+                shutil.copy2(git_dir / "index", index_path)
+            env = {'GIT_INDEX_FILE': str(index_path)}
+            self.git_repo.git.add('-A', env=env)
+            tree = self.git_repo.git.write_tree(env=env)
+        finally:
+            if index_path.exists():
+                index_path.unlink()
+        
+        base = self.git_repo.commit(commit_hash)
+        if base.tree.hexsha == tree:
+            return commit_hash
+        snapshot = git.Commit.create_from_tree(self.git_repo, tree, f"Snapshot for build {build_id}",
+                                               parent_commits=[base], head=False)
+        return snapshot.hexsha
+    
+    def commit_to_branch(self, branch: Optional[str], message: str, paths: List[str] = None,
+                         work_tree: str = None) -> str:
+        """Commit the working tree (or only ``paths``) onto ``branch`` without checking it out
+        
+        The tree is written from a temporary index and the branch moved with a
+        compare-and-swap ``update-ref``, so HEAD stays where it is and a build
+        running in the working tree is never switched under its feet. With
+        ``work_tree`` the ``paths`` are taken from that directory instead, so
+        files meant for another branch never appear in the main working tree.
+        """
         try:
-            conn = self.db.connect()
-            cursor = conn.cursor()
+            current = None if self.git_repo.head.is_detached else self.git_repo.active_branch.name
+            branch = branch or current
+            if not branch:
+                return self.commit_changes(message)
+            ref = f"refs/heads/{branch}"
+            try:
+                parent = self.git_repo.git.rev_parse('--verify', '-q', f"{ref}^{{commit}}")
+            except GitCommandError:
+                parent = None
+            base = parent or self.git_repo.head.commit.hexsha
             
-            cursor.execute("""
-                SELECT commit_hash, branch_name, snapshot_data 
-                FROM repo_snapshots 
-                WHERE build_id = %s
-            """, (build_id,))
+            git_dir = Path(self.git_repo.git_dir)
+            index_path = git_dir / f"queue-index-{uuid.uuid4().hex[:8]}"
+            try:
+                env = {'GIT_INDEX_FILE': str(index_path)}
+                if work_tree:
+                    # Stat data of the main working tree means nothing for another directory
+                    self.git_repo.git.read_tree(base, env=env)
+                    self.git_repo.git.execute(['git', f"--work-tree={work_tree}", 'add', '-A', '-f', '--',
+                                               *(paths or ['.'])], env=env)
+                else:
+                    if (git_dir / "index").exists():
+                        shutil.copy2(git_dir / "index", index_path)
+                    try:
+                        # Entries that match the branch keep their stat data, so unchanged files are not rehashed
+                        self.git_repo.git.read_tree('-m', base, env=env)
+                    except GitCommandError:
+                        self.git_repo.git.read_tree(base, env=env)
+                    if paths is None:
+                        self.git_repo.git.add('-A', env=env)
+                    else:
+                        self.git_repo.git.add('-A', '--', *paths, env=env)
+                tree = self.git_repo.git.write_tree(env=env)
+            finally:
+                if index_path.exists():
+                    index_path.unlink()
             
-            result = cursor.fetchone()
-            cursor.close()
+            base_commit = self.git_repo.commit(base)
+            if parent and base_commit.tree.hexsha == tree:
+                return parent
+            commit = git.Commit.create_from_tree(self.git_repo, tree, message, parent_commits=[base_commit], head=False)
+            self.git_repo.git.update_ref(ref, commit.hexsha, parent or '0' * 40)
             
+            if branch == current and not work_tree:
+                # HEAD moved with the branch: bring the committed paths of the index along
+                if paths is None:
+                    self.git_repo.git.reset('-q')
+                else:
+                    self.git_repo.git.reset('-q', '--', *paths)
+            if self.search_index and self.search_index.built:
+                self.search_index.update()
+            return commit.hexsha
+        except Exception as e:
+            print(f"Error committing to {branch}: {e}")
+            return ""
+    
+    def restore_snapshot(self, build_id: str, target_path: str = None) -> Optional[str]:
+        """Check out a build's latest snapshot into its own worktree and return the worktree path
+        
+        The main working tree and its branch are left alone.
+        """
+        try:
+            result = self.db.execute_query("""
+                SELECT git_commit_hash, snapshot_ref FROM repo_snapshots
+                WHERE build_id = %s AND snapshot_ref IS NOT NULL
+                ORDER BY created_at DESC, id DESC LIMIT 1
+            """, (build_id,), fetch=True)
             if not result:
-                return False
-            
-            commit_hash, branch_name, snapshot_data = result
-            
-            # Backup current state
-            backup_path = f"/tmp/repo_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            shutil.copytree(self.repo_path, backup_path)
-            
-            # Clear current repository
-            shutil.rmtree(self.repo_path)
-            self.repo_path.mkdir(parents=True)
-            
-            # Extract snapshot
-            snapshot_path = f"/tmp/restore_{build_id}.tar.gz"
-            with open(snapshot_path, "wb") as f:
-                f.write(snapshot_data)
+                return None
             
-            with tarfile.open(snapshot_path, "r:gz") as tar:
-                tar.extractall(self.repo_path)
+            target = Path(target_path) if target_path else self.snapshot_root / build_id
+            if target.exists():
+                self._remove_worktree(target)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self.git_repo.git.worktree('add', '--detach', str(target), result[0]['git_commit_hash'])
+            return str(target)
             
-            # Reinitialize git repo
-            self.git_repo = git.Repo(self.repo_path)
+        except Exception as e:
+            print(f"Error restoring snapshot: {e}")
+            return None
+    
+    def list_snapshots(self, build_id: str = None) -> List[Dict]:
+        """Snapshot refs in the repository, newest first"""
+        snapshots = []
+        prefix = f"{SNAPSHOT_REF_PREFIX}/{build_id}" if build_id else SNAPSHOT_REF_PREFIX
+        output = self.git_repo.git.for_each_ref('--format=%(refname) %(objectname)', prefix)
+        for line in output.splitlines():
+            ref, commit_hash = line.split()
+            ref_build_id, _, stamp = ref[len(SNAPSHOT_REF_PREFIX) + 1:].rpartition('/')
+            try:
+                created = datetime.strptime(stamp, SNAPSHOT_TIME_FORMAT)
+            except ValueError:
+                continue
+            snapshots.append({'ref': ref, 'build_id': ref_build_id, 'commit_hash': commit_hash, 'created': created})
+        return sorted(snapshots, key=lambda snapshot: snapshot['created'], reverse=True)
+    
+    def prune_snapshots(self, days_to_keep: int = None) -> int:
+        """Drop snapshots older than the retention period, with their worktrees and rows
+        
+        Objects only those snapshots referenced become unreachable and are
+        removed by Git's garbage collection.
+        """
+        days_to_keep = days_to_keep or self.settings.get('snapshot_retention_days', 90)
+        cutoff = datetime.now() - timedelta(days=days_to_keep)
+        try:
+            expired = [snapshot for snapshot in self.list_snapshots() if snapshot['created'] < cutoff]
+            if not expired:
+                return 0
             
-            # Cleanup
-            os.remove(snapshot_path)
+            for snapshot in expired:
+                self.git_repo.git.update_ref('-d', snapshot['ref'])
+                self.db.execute_query("DELETE FROM repo_snapshots WHERE snapshot_ref = %s", (snapshot['ref'],))
+            remaining = {snapshot['build_id'] for snapshot in self.list_snapshots()}
+            for build_id in {snapshot['build_id'] for snapshot in expired} - remaining:
+                worktree = self.snapshot_root / build_id
+                if worktree.exists():
+                    self._remove_worktree(worktree)
             
-            return True
+            self.git_repo.git.worktree('prune')
+            self.git_repo.git.gc('--auto', '--quiet')
+            return len(expired)
             
         except Exception as e:
-            print(f"Error restoring snapshot: {e}")
-            return False
+            print(f"Error pruning snapshots: {e}")
+            return 0
+    
+    def _remove_worktree(self, path: Path):
+        try:
+            self.git_repo.git.worktree('remove', '--force', str(path))
+        except GitCommandError:
+            # Not a registered worktree (or already gone from Git's list)
+            shutil.rmtree(path, ignore_errors=True)
     
     def get_file_history(self, file_path: str, max_count: int = 50) -> List[Dict]:
         """Enhanced file history with diff information"""
@@ -296,81 +454,55 @@ This repository contains build configurations, scripts, and patches for Linux Fr
         return configs
     
     def get_repository_status(self) -> Dict:
-        """Enhanced repository status with detailed information"""
-        try:
-            detailed_status = self.get_detailed_status()
-            
-            status = {
-                'current_branch': self.git_repo.active_branch.name,
-                'branches': [branch.name for branch in self.git_repo.branches],
-                'remotes': [remote.name for remote in self.git_repo.remotes],
-                'tags': [tag.name for tag in self.git_repo.tags],
-                'staged_files': detailed_status['staged'],
-                'modified_files': detailed_status['modified'],
-                'untracked_files': detailed_status['untracked'],
-                'deleted_files': detailed_status['deleted'],
-                'renamed_files': detailed_status['renamed'],
-                'conflicted_files': detailed_status['conflicted'],
-                'stashes': len(self.list_stashes()),
-                'last_commit': {
-                    'hash': self.git_repo.head.commit.hexsha,
-                    'short_hash': self.git_repo.head.commit.hexsha[:8],
-                    'message': self.git_repo.head.commit.message.strip(),
-                    'author': str(self.git_repo.head.commit.author),
-                    'date': datetime.fromtimestamp(self.git_repo.head.commit.committed_date)
-                },
-                'is_dirty': self.git_repo.is_dirty(),
-                'head_is_detached': self.git_repo.head.is_detached
-            }
-            
-            # Check for ongoing operations
-            git_dir = self.repo_path / ".git"
-            status['ongoing_merge'] = (git_dir / "MERGE_HEAD").exists()
-            status['ongoing_rebase'] = (git_dir / "rebase-merge").exists() or (git_dir / "rebase-apply").exists()
-            status['ongoing_cherry_pick'] = (git_dir / "CHERRY_PICK_HEAD").exists()
-            
-            return status
+        """Enhanced repository status with detailed information
+        
+        Served from the status service's cache; it recomputes only what changed
+        on disk since the last call.
+        """
+        try:
+            return self.status_service.repository_status()
         except Exception as e:
             print(f"Error getting repository status: {e}")
             return {}
     
-    def search_repository(self, query: str, search_type: str = 'all') -> List[Dict]:
-        """Enhanced repository search with type filtering"""
+    def search_repository(self, query: str, search_type: str = 'all', limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Ranked search of tracked files, commit messages, branches and tags, one page at a time
+        
+        File and commit results come from the persistent search index (updated
+        incrementally first), or from git grep and git log for queries too short
+        for it. Each file and commit result has a ``snippet`` around the first match.
+        """
+        if not query:
+            return []
+        indexed = self.search_index is not None and len(query) >= MIN_INDEXED_QUERY
+        if indexed:
+            try:
+                self.search_index.update()
+            except Exception as e:
+                print(f"Error updating search index: {e}")
+                indexed = False
+        
+        # Enough of every type to fill the requested page of the combined list
+        wanted = offset + limit
         results = []
         
         if search_type in ['all', 'files']:
-            # Search in files
-            for file_path in self.repo_path.rglob("*"):
-                if file_path.is_file() and not file_path.name.startswith('.'):
-                    try:
-                        content = file_path.read_text()
-                        if query.lower() in content.lower():
-                            results.append({
-                                'type': 'file',
-                                'path': str(file_path.relative_to(self.repo_path)),
-                                'matches': content.lower().count(query.lower()),
-                                'size': file_path.stat().st_size,
-                                'modified': datetime.fromtimestamp(file_path.stat().st_mtime)
-                            })
-                    except:
-                        pass  # Skip binary files
+            try:
+                if indexed:
+                    results.extend(self.search_index.search_files(query, wanted))
+                else:
+                    results.extend(self._grep_files(query, wanted))
+            except Exception as e:
+                print(f"Error searching files: {e}")
         
         if search_type in ['all', 'commits']:
-            # Search in commit messages
             try:
-                commits = list(self.git_repo.iter_commits())
-                for commit in commits:
-                    if query.lower() in commit.message.lower():
-                        results.append({
-                            'type': 'commit',
-                            'hash': commit.hexsha,
-                            'short_hash': commit.hexsha[:8],
-                            'message': commit.message.strip(),
-                            'author': str(commit.author),
-                            'date': datetime.fromtimestamp(commit.committed_date)
-                        })
-            except:
-                pass
+                if indexed:
+                    results.extend(self.search_index.search_commits(query, wanted))
+                else:
+                    results.extend(self._grep_commits(query, wanted))
+            except Exception as e:
+                print(f"Error searching commits: {e}")
         
         if search_type in ['all', 'branches']:
             # Search in branch names
@@ -398,8 +530,47 @@ This repository contains build configurations, scripts, and patches for Linux Fr
                         tag_info['message'] = tag.tag.message.strip()
                     results.append(tag_info)
         
+        return results[offset:offset + limit]
+    
+    def _grep_files(self, query: str, limit: int) -> List[Dict]:
+        """Tracked files containing ``query`` in the working tree, most matches first"""
+        try:
+            output = self.git_repo.git.grep('-I', '-i', '-F', '-n', '--full-name', '-e', query)
+        except GitCommandError:
+            # git grep exits with 1 when nothing matches
+            return []
+        
+        hits = {}
+        for line in output.splitlines():
+            path, line_number, text = line.split(':', 2)
+            hits.setdefault(path, []).append((int(line_number), text))
+        
+        results = []
+        for path, lines in sorted(hits.items(), key=lambda item: -len(item[1]))[:limit]:
+            file_path = self.repo_path / path
+            stat = file_path.stat() if file_path.exists() else None
+            results.append({
+                'type': 'file',
+                'path': path,
+                'matches': len(lines),
+                'size': stat.st_size if stat else 0,
+                'modified': datetime.fromtimestamp(stat.st_mtime) if stat else None,
+                'line': lines[0][0],
+                'snippet': make_snippet(lines[0][1], query)[1],
+                'score': float(len(lines))
+            })
         return results
     
+    def _grep_commits(self, query: str, limit: int) -> List[Dict]:
+        """Newest commits whose message contains ``query``"""
+        try:
+            log = self.git_repo.git.log('--branches', '--tags', '-i', '-F', f'--grep={query}',
+                                        f'--max-count={limit}', COMMIT_FORMAT)
+        except GitCommandError:
+            return []
+        return [commit_result(commit_hash, author, committed, message, query, 0.0)
+                for commit_hash, author, committed, message in parse_log(log)]
+    
     # === STAGING AREA OPERATIONS ===
     
     def stage_file(self, file_path: str) -> bool:
@@ -411,6 +582,16 @@ This repository contains build configurations, scripts, and patches for Linux Fr
             print(f"Error staging file: {e}")
             return False
     
+    def stage_files(self, file_paths: List[str]) -> bool:
+        """Add several files to the staging area with one index write"""
+        try:
+            if file_paths:
+                self.git_repo.index.add(file_paths)
+            return True
+        except Exception as e:
+            print(f"Error staging files: {e}")
+            return False
+    
     def unstage_file(self, file_path: str) -> bool:
         """Remove file from staging area"""
         try:
@@ -430,35 +611,7 @@ This repository contains build configurations, scripts, and patches for Linux Fr
     def get_detailed_status(self) -> Dict:
         """Git status equivalent with staged/unstaged/untracked"""
         try:
-            status = {
-                'staged': [],
-                'modified': [],
-                'untracked': [],
-                'deleted': [],
-                'renamed': [],
-                'conflicted': []
-            }
-            
-            # Staged files (index vs HEAD)
-            for item in self.git_repo.index.diff("HEAD"):
-                if item.change_type == 'D':
-                    status['deleted'].append(item.a_path)
-                elif item.change_type == 'R':
-                    status['renamed'].append(f"{item.a_path} -> {item.b_path}")
-                else:
-                    status['staged'].append(item.a_path)
-            
-            # Modified files (working tree vs index)
-            for item in self.git_repo.index.diff(None):
-                if item.change_type == 'D':
-                    status['deleted'].append(item.a_path)
-                else:
-                    status['modified'].append(item.a_path)
-            
-            # Untracked files
-            status['untracked'] = self.git_repo.untracked_files
-            
-            return status
+            return self.status_service.detailed_status()
         except Exception as e:
             print(f"Error getting detailed status: {e}")
             return {'staged': [], 'modified': [], 'untracked': [], 'deleted': [], 'renamed': [], 'conflicted': []}
@@ -0,0 +1,222 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from git.exc import GitCommandError
+
+# Trigram matching needs at least three characters; shorter queries go to git grep and git log
+MIN_INDEXED_QUERY = 3
+MAX_INDEXED_BYTES = 1024 * 1024
+RECORD_SEPARATOR = '\x1e'
+FIELD_SEPARATOR = '\x1f'
+COMMIT_FORMAT = '--format=%H%x1f%an%x1f%ct%x1f%B%x1e'
+
+class RepositorySearchIndex:
+    """Persistent full-text index over a repository's tracked files and commit messages.
+    
+    The index is an SQLite FTS5 database with the trigram tokenizer, kept in
+    the repository's Git directory, so substring queries of three or more
+    characters are answered from the index instead of reading every file.
+    ``update`` is incremental: files are compared by blob id against the
+    tree at HEAD and only changed blobs are read, and only commits not
+    reachable from the previously indexed branch and tag tips are added.
+    Large and binary files are indexed by path only.
+    """
+    
+    def __init__(self, git_repo, index_path: str = None):
+        self.git_repo = git_repo
+        self.path = Path(index_path or os.path.join(git_repo.git_dir, 'lfs-search.sqlite'))
+        self._lock = threading.Lock()
+        with self._database() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, blob TEXT, size INTEGER);
+                CREATE TABLE IF NOT EXISTS commits (hash TEXT PRIMARY KEY, author TEXT, committed INTEGER);
+                CREATE VIRTUAL TABLE IF NOT EXISTS file_text USING fts5(path, content, tokenize='trigram');
+                CREATE VIRTUAL TABLE IF NOT EXISTS commit_text USING fts5(message, tokenize='trigram');
+            """)
+    
+    @contextmanager
+    def _database(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            yield db
+            db.commit()
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _get_meta(db, key: str) -> Optional[str]:
+        row = db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _set_meta(db, key: str, value: str):
+        db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+    
+    @property
+    def built(self) -> bool:
+        with self._database() as db:
+            return self._get_meta(db, 'files_head') is not None
+    
+    def update(self) -> Dict:
+        """Bring the index up to date with HEAD and the branch and tag tips"""
+        with self._lock, self._database() as db:
+            with db:
+                files = self._update_files(db)
+            with db:
+                commits = self._update_commits(db)
+            return {'files': files, 'commits': commits}
+    
+    def _update_files(self, db) -> int:
+        try:
+            head = self.git_repo.git.rev_parse('HEAD')
+        except GitCommandError:
+            return 0
+        if self._get_meta(db, 'files_head') == head:
+            return 0
+        
+        tree = {}
+        for entry in self.git_repo.git.ls_tree('-r', '-l', '-z', 'HEAD').split('\0'):
+            if not entry:
+                continue
+            info, path = entry.split('\t', 1)
+            mode, kind, blob, size = info.split()
+            if kind == 'blob':
+                tree[path] = (blob, int(size) if size.isdigit() else 0)
+        
+        indexed = {path: (rowid, blob) for rowid, path, blob in db.execute('SELECT rowid, path, blob FROM files')}
+        changed = 0
+        for path, (rowid, blob) in indexed.items():
+            if path not in tree or tree[path][0] != blob:
+                db.execute('DELETE FROM files WHERE rowid = ?', (rowid,))
+                db.execute('DELETE FROM file_text WHERE rowid = ?', (rowid,))
+                changed += path not in tree
+        for path, (blob, size) in tree.items():
+            if path in indexed and indexed[path][1] == blob:
+                continue
+            rowid = db.execute('INSERT INTO files (path, blob, size) VALUES (?, ?, ?)', (path, blob, size)).lastrowid
+            db.execute('INSERT INTO file_text (rowid, path, content) VALUES (?, ?, ?)',
+                       (rowid, path, self._blob_text(blob, size)))
+            changed += 1
+        self._set_meta(db, 'files_head', head)
+        return changed
+    
+    def _blob_text(self, blob: str, size: int) -> str:
+        if size > MAX_INDEXED_BYTES:
+            return ''
+        data = self.git_repo.odb.stream(bytes.fromhex(blob)).read()
+        if b'\0' in data[:8192]:
+            return ''
+        return data.decode('utf-8', errors='replace')
+    
+    def _update_commits(self, db) -> int:
+        try:
+            tips = sorted(set(self.git_repo.git.rev_parse('--branches', '--tags').split()))
+        except GitCommandError:
+            return 0
+        previous = (self._get_meta(db, 'commit_tips') or '').split()
+        if tips == previous:
+            return 0
+        try:
+            log = self.git_repo.git.log('--branches', '--tags', COMMIT_FORMAT, *[f"^{tip}" for tip in previous])
+        except GitCommandError:
+            # An earlier tip no longer exists (deleted branch, rewritten history): start over
+            db.execute('DELETE FROM commits')
+            db.execute('DELETE FROM commit_text')
+            log = self.git_repo.git.log('--branches', '--tags', COMMIT_FORMAT)
+        
+        added = 0
+        for commit_hash, author, committed, message in parse_log(log):
+            cursor = db.execute('INSERT OR IGNORE INTO commits (hash, author, committed) VALUES (?, ?, ?)',
+                                (commit_hash, author, committed))
+            if cursor.rowcount:
+                db.execute('INSERT INTO commit_text (rowid, message) VALUES (?, ?)', (cursor.lastrowid, message))
+                added += 1
+        self._set_meta(db, 'commit_tips', ' '.join(tips))
+        return added
+    
+    @staticmethod
+    def _phrase(query: str) -> str:
+        return '"' + query.replace('"', '""') + '"'
+    
+    def search_files(self, query: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Files whose path or content contains ``query``, best matches first"""
+        with self._database() as db:
+            rows = db.execute("""
+                SELECT files.path, files.size, file_text.content, bm25(file_text) AS score
+                FROM file_text JOIN files ON files.rowid = file_text.rowid
+                WHERE file_text MATCH ? ORDER BY score LIMIT ? OFFSET ?
+            """, (self._phrase(query), limit, offset)).fetchall()
+        
+        results = []
+        for path, size, content, score in rows:
+            line, snippet = make_snippet(content, query)
+            results.append({
+                'type': 'file',
+                'path': path,
+                'matches': content.lower().count(query.lower()),
+                'size': size,
+                'modified': self._modified(path),
+                'line': line,
+                'snippet': snippet,
+                'score': -score
+            })
+        return results
+    
+    def search_commits(self, query: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Commits whose message contains ``query``, best matches first"""
+        with self._database() as db:
+            rows = db.execute("""
+                SELECT commits.hash, commits.author, commits.committed, commit_text.message,
+                       bm25(commit_text) AS score
+                FROM commit_text JOIN commits ON commits.rowid = commit_text.rowid
+                WHERE commit_text MATCH ? ORDER BY score, commits.committed DESC LIMIT ? OFFSET ?
+            """, (self._phrase(query), limit, offset)).fetchall()
+        return [commit_result(commit_hash, author, committed, message, query, -score)
+                for commit_hash, author, committed, message, score in rows]
+    
+    def _modified(self, path: str) -> Optional[datetime]:
+        try:
+            return datetime.fromtimestamp((Path(self.git_repo.working_tree_dir) / path).stat().st_mtime)
+        except OSError:
+            return None
+
+def parse_log(log: str):
+    """(hash, author, commit time, message) of each commit in ``git log`` output in COMMIT_FORMAT"""
+    for record in log.split(RECORD_SEPARATOR):
+        fields = record.strip('\n').split(FIELD_SEPARATOR, 3)
+        if len(fields) == 4:
+            commit_hash, author, committed, message = fields
+            yield commit_hash, author, int(committed), message.strip()
+
+def make_snippet(text: str, query: str, width: int = 120):
+    """(line number, text around the first match) of ``query`` in ``text``"""
+    position = text.lower().find(query.lower())
+    if position < 0:
+        return None, text[:width].split('\n', 1)[0]
+    line_start = text.rfind('\n', 0, position) + 1
+    line_end = text.find('\n', position)
+    line = text[line_start:line_end if line_end >= 0 else len(text)]
+    column = position - line_start
+    start = max(0, min(column - width // 3, len(line) - width))
+    snippet = line[start:start + width].strip()
+    return text.count('\n', 0, position) + 1, ('…' if start else '') + snippet
+
+def commit_result(commit_hash: str, author: str, committed: int, message: str, query: str, score: float) -> Dict:
+    return {
+        'type': 'commit',
+        'hash': commit_hash,
+        'short_hash': commit_hash[:8],
+        'message': message,
+        'author': author,
+        'date': datetime.fromtimestamp(committed),
+        'snippet': make_snippet(message, query)[1],
+        'score': score
+    }
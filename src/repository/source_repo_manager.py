@@ -1,17 +1,41 @@
 import os
-import hashlib
-import shutil
+import time
 from datetime import datetime
 from pathlib import Path
 
+from .source_store import MAX_POINTER_SIZE, SourceObjectStore
+
+# Tarballs the downloader caches directly in sources/ stay out of Git, and so
+# do per-version directories older releases wrote into the working tree
+DOWNLOAD_CACHE_EXCLUDES = ['/sources/*.tar', '/sources/*.tar.*', '/sources/*.tgz', '/sources/*.zip', '/sources/*/']
+
 class SourceRepositoryManager:
     """Manages LFS source package repositories with Git integration"""
     
     def __init__(self, db_manager, repo_manager):
         self.db = db_manager
         self.repo = repo_manager
+        # Tarball content lives outside the history; Git tracks pointer files
+        self.store = SourceObjectStore(os.path.join(self.repo.git_repo.git_dir, 'source-objects'))
+        # Sources branches are committed from here, never from the main working tree,
+        # so their files cannot end up in a build branch that stages everything
+        self.work_tree = Path(self.repo.git_repo.git_dir) / 'source-tree'
+        self._exclude_download_cache()
         self.setup_database()
     
+    def _exclude_download_cache(self):
+        """Keep cached tarballs out of build commits, which stage the whole tree"""
+        try:
+            exclude_path = Path(self.repo.git_repo.git_dir) / 'info' / 'exclude'
+            existing = exclude_path.read_text().splitlines() if exclude_path.exists() else []
+            missing = [pattern for pattern in DOWNLOAD_CACHE_EXCLUDES if pattern not in existing]
+            if missing:
+                exclude_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(exclude_path, 'a') as f:
+                    f.write('\n'.join(missing) + '\n')
+        except OSError as e:
+            print(f"Error excluding download cache from Git: {e}")
+    
     def setup_database(self):
         """Setup download tracking tables"""
         try:
@@ -31,14 +55,12 @@ class SourceRepositoryManager:
             # Create sources branch
             branch_name = f"sources-{lfs_version}"
             
-            if not self.repo.create_branch(branch_name):
-                print(f"Branch {branch_name} already exists")
-            
-            # Switch to sources branch
-            self.repo.switch_branch(branch_name)
+            # Committed to without checking it out, so a running build keeps its branch
+            if not self.repo.create_branch(branch_name, checkout=False):
+                print(f"Branch {branch_name} could not be created")
             
             # Create sources directory structure
-            sources_dir = os.path.join(self.repo.repo_path, "sources", lfs_version)
+            sources_dir = os.path.join(self.work_tree, "sources", lfs_version)
             os.makedirs(sources_dir, exist_ok=True)
             
             # Create README for sources
@@ -60,9 +82,8 @@ All packages are verified with checksums and tracked in the database.
             with open(readme_path, 'w') as f:
                 f.write(readme_content)
             
-            # Stage and commit
-            self.repo.stage_all_changes()
-            self.repo.commit_changes(f"Initialize LFS {lfs_version} source repository")
+            self.repo.commit_to_branch(branch_name, f"Initialize LFS {lfs_version} source repository", [readme_path],
+                                       work_tree=str(self.work_tree))
             
             # Record in database
             self.db.execute_query("""
@@ -85,37 +106,28 @@ All packages are verified with checksums and tracked in the database.
                 print(f"Package {package_name} already exists in repository")
                 return True
             
-            sources_dir = os.path.join(self.repo.repo_path, "sources", lfs_version)
+            sources_dir = os.path.join(self.work_tree, "sources", lfs_version)
             if not os.path.exists(sources_dir):
+                self.repo.commit_queue.drain()
                 sources_dir = self.create_source_repository(lfs_version)
             
-            # Switch to sources branch
+            # The commit queue commits onto the sources branch without checking it out
             branch_name = f"sources-{lfs_version}"
-            self.repo.switch_branch(branch_name)
             
-            # Copy package to repository
+            # Store the tarball once, checksummed in the same pass, and track a pointer to it
+            stored = self.store.put(file_path)
             dest_path = os.path.join(sources_dir, os.path.basename(file_path))
-            if not os.path.exists(dest_path):
-                shutil.copy2(file_path, dest_path)
-            
-            # Calculate checksums
-            md5_hash = self._calculate_checksum(dest_path, 'md5')
-            sha256_hash = self._calculate_checksum(dest_path, 'sha256')
-            file_size = os.path.getsize(dest_path)
+            self.store.write_pointer(dest_path, stored['oid'], stored['size'])
+            md5_hash, sha256_hash, file_size = stored['md5'], stored['sha256'], stored['size']
             
             # Extract package version from filename if possible
             package_version = self._extract_package_version(package_name)
             
-            # Stage and commit package
-            self.repo.stage_file(dest_path)
             commit_msg = f"Add {package_name} to LFS {lfs_version} sources\n\nPackage: {package_name}\nVersion: {package_version}\nFile: {os.path.basename(file_path)}\nSize: {file_size} bytes\nMD5: {md5_hash}\nSHA256: {sha256_hash}\nSource: {download_info.get('mirror_url', 'Unknown')}\nDownload time: {download_info.get('duration_ms', 0)}ms"
-            self.repo.commit_changes(commit_msg)
-            
-            # Get commit hash
-            commit_hash = self.repo.get_latest_commit_hash()
             
-            # Record download in database with enhanced metadata
-            self.db.execute_query("""
+            # Record download in database with enhanced metadata; the commit hash
+            # is filled in when the queued commit holding the package is written
+            download_id = self.db.execute_query("""
                 INSERT INTO package_downloads 
                 (lfs_version, package_name, package_version, file_name, download_url, mirror_url, 
                  file_size, checksum_md5, checksum_sha256, download_date, 
@@ -133,9 +145,15 @@ All packages are verified with checksums and tracked in the database.
                 sha256_hash,
                 datetime.now(),
                 download_info.get('duration_ms', 0),
-                commit_hash,
+                None,
                 True
-            ))
+            ), return_id=True)
+            
+            # Packages downloaded together are committed together
+            self.repo.commit_queue.record(
+                commit_msg, branch=branch_name, paths=[dest_path], work_tree=str(self.work_tree),
+                on_commit=lambda commit_hash: self._record_package_commit(download_id, commit_hash)
+            )
             
             print(f"Successfully added {package_name} to LFS {lfs_version} repository")
             return True
@@ -164,6 +182,158 @@ All packages are verified with checksums and tracked in the database.
             print(f"Error adding package to repository: {e}")
             return False
     
+    def materialize_packages(self, lfs_version, destination, packages=None):
+        """Put the tarballs of an LFS version (or only ``packages``) into ``destination``
+        
+        Files are copies (reflinks where the filesystem allows) of the store's
+        objects, so a build gets just the sources it needs. Returns the paths
+        written; packages whose content is missing locally are reported.
+        """
+        written = []
+        try:
+            self.migrate_raw_tarballs(lfs_version)
+        except Exception as e:
+            print(f"⚠️ Could not migrate raw tarballs of LFS {lfs_version}: {e}")
+        for file_name, (oid, size) in sorted(self._version_pointers(lfs_version).items()):
+            if packages and not any(file_name == package or file_name.startswith(f"{package}-")
+                                    for package in packages):
+                continue
+            try:
+                written.append(str(self.store.materialize(oid, os.path.join(destination, file_name))))
+            except FileNotFoundError as e:
+                print(f"⚠️ Cannot materialize {file_name}: {e}")
+        return written
+    
+    def migrate_raw_tarballs(self, lfs_version):
+        """Move tarballs older releases committed raw to a sources branch into the store
+        
+        Each one is stored and replaced by its pointer in a single commit on
+        the branch, after which builds materialize it like any other package.
+        Older commits still hold the raw blobs; only rewriting the branch
+        history would free that space. Returns the number of tarballs moved.
+        """
+        branch_name = f"sources-{lfs_version}"
+        try:
+            tree = self.repo.git_repo.commit(branch_name).tree / "sources" / lfs_version
+        except Exception:
+            return 0
+        # Anything bigger than a pointer is content; README.md and pointers stay as they are
+        raw = [blob for blob in tree.blobs if blob.size > MAX_POINTER_SIZE]
+        if not raw:
+            return 0
+        
+        sources_dir = self.work_tree / "sources" / lfs_version
+        sources_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for blob in raw:
+            stored = self.store.put_stream(blob.data_stream)
+            if stored['size'] != blob.size:
+                raise IOError(f"Short read migrating {blob.name}: {stored['size']} of {blob.size} bytes")
+            dest_path = str(sources_dir / blob.name)
+            self.store.write_pointer(dest_path, stored['oid'], stored['size'])
+            paths.append(dest_path)
+        
+        self.repo.commit_queue.record(
+            f"Move {len(paths)} LFS {lfs_version} source tarballs to the source store\n\n"
+            + '\n'.join(os.path.basename(path) for path in paths),
+            branch=branch_name, paths=paths, work_tree=str(self.work_tree))
+        self.repo.commit_queue.drain()
+        print(f"📦 Moved {len(paths)} raw tarballs of {branch_name} to the source store")
+        return len(paths)
+    
+    def _version_pointers(self, lfs_version):
+        """{file name: (oid, size)} for the pointers of an LFS version
+        
+        Read from the sources branch, plus pointers in the source work tree
+        whose commit is still queued.
+        """
+        pointers = {}
+        try:
+            tree = self.repo.git_repo.commit(f"sources-{lfs_version}").tree / "sources" / lfs_version
+            for blob in tree.blobs:
+                if blob.size <= MAX_POINTER_SIZE:
+                    pointer = self.store.parse_pointer(blob.data_stream.read())
+                    if pointer:
+                        pointers[blob.name] = pointer
+        except Exception:
+            # No sources branch yet, or nothing committed under sources/<version>
+            pass
+        
+        sources_dir = self.work_tree / "sources" / lfs_version
+        if sources_dir.exists():
+            for path in sources_dir.iterdir():
+                if path.name not in pointers and path.is_file() and path.stat().st_size <= MAX_POINTER_SIZE:
+                    pointer = self.store.parse_pointer(path.read_bytes())
+                    if pointer:
+                        pointers[path.name] = pointer
+        return pointers
+    
+    def collect_garbage(self, grace_seconds=86400):
+        """Remove stored tarballs that no ref points to any more
+        
+        Every ref counts: branches, tags, build snapshots under refs/snapshots
+        and the stash, so restoring a snapshot always finds its tarballs.
+        """
+        referenced = set()
+        git_repo = self.repo.git_repo
+        seen_trees = set()
+        for object_name in git_repo.git.for_each_ref('--format=%(objectname)').split():
+            try:
+                sources = git_repo.commit(object_name).tree / "sources"
+            except Exception:
+                # Not a commit, or no sources/ in it
+                continue
+            # Snapshots mostly share their sources tree; read each one once
+            if sources.hexsha in seen_trees:
+                continue
+            seen_trees.add(sources.hexsha)
+            for item in sources.traverse():
+                if item.type == 'blob' and item.size <= MAX_POINTER_SIZE:
+                    pointer = self.store.parse_pointer(item.data_stream.read())
+                    if pointer:
+                        referenced.add(pointer[0])
+        
+        # Pointers waiting in the source work tree for their commit count too
+        for path in (self.work_tree / "sources").rglob("*"):
+            if path.is_file() and path.stat().st_size <= MAX_POINTER_SIZE:
+                pointer = self.store.parse_pointer(path.read_bytes())
+                if pointer:
+                    referenced.add(pointer[0])
+        
+        result = self.store.gc(referenced, grace_seconds)
+        print(f"🧹 Source store: removed {result['removed']} unreferenced tarballs "
+              f"({result['freed_bytes'] / 1024 ** 2:.1f} MB), kept {result['kept']}")
+        return result
+    
+    def run_maintenance(self, min_interval=86400, grace_seconds=86400):
+        """Prune expired build snapshots, then collect the tarballs nothing refers to
+        
+        Does nothing if it ran less than ``min_interval`` seconds ago; returns
+        the garbage collection result otherwise.
+        """
+        stamp_path = self.store.root / 'last-maintenance'
+        if stamp_path.exists() and time.time() - stamp_path.stat().st_mtime < min_interval:
+            return None
+        self.repo.prune_snapshots()
+        for branch in self.repo.git_repo.branches:
+            if branch.name.startswith('sources-'):
+                try:
+                    self.migrate_raw_tarballs(branch.name[len('sources-'):])
+                except Exception as e:
+                    print(f"⚠️ Could not migrate raw tarballs of {branch.name}: {e}")
+        result = self.collect_garbage(grace_seconds)
+        stamp_path.parent.mkdir(parents=True, exist_ok=True)
+        stamp_path.touch()
+        return result
+    
+    def _record_package_commit(self, download_id, commit_hash):
+        """Store the hash of the commit that added a downloaded package on its download row"""
+        if not download_id:
+            return
+        self.db.execute_query("""
+            UPDATE package_downloads SET git_commit_hash = %s WHERE id = %s
+        """, (commit_hash, download_id))
+    
     def get_source_repository_path(self, lfs_version="12.4"):
         """Get the path to the source repository for a specific LFS version"""
         try:
@@ -227,16 +397,6 @@ All packages are verified with checksums and tracked in the database.
             print(f"Error getting repository stats: {e}")
             return []
     
-    def _calculate_checksum(self, file_path, algorithm='md5'):
-        """Calculate checksum for a file"""
-        hash_obj = hashlib.md5() if algorithm == 'md5' else hashlib.sha256()
-        
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_obj.update(chunk)
-        
-        return hash_obj.hexdigest()
-    
     def _extract_package_version(self, package_name):
         """Extract version from package filename"""
         import re
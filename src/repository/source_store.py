@@ -0,0 +1,149 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# Same layout as Git LFS pointers, so the repository could later move to git-lfs unchanged
+POINTER_VERSION = 'version https://git-lfs.github.com/spec/v1'
+MAX_POINTER_SIZE = 1024
+CHUNK_SIZE = 1024 * 1024
+# ioctl(2) request that clones a file's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+class SourceObjectStore:
+    """Content-addressed local store for source tarballs.
+    
+    Git tracks a small pointer file (oid and size) in place of each tarball;
+    the content lives once in ``objects/<aa>/<sha256>`` however many LFS
+    versions or branches refer to it. Objects are read-only; builds get
+    their own copies, reflinked where the filesystem shares extents, so
+    nothing a build does to its sources directory can reach the store.
+    """
+    
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.tmp = self.root / 'tmp'
+    
+    def object_path(self, oid: str) -> Path:
+        return self.objects / oid[:2] / oid
+    
+    def has(self, oid: str) -> bool:
+        return self.object_path(oid).exists()
+    
+    def put(self, file_path: str) -> Dict:
+        """Store a file; md5, sha256 and the copy come from one read of it"""
+        with open(file_path, 'rb') as source:
+            return self.put_stream(source)
+    
+    def put_stream(self, source) -> Dict:
+        """Store what a binary stream (an open file, a Git blob's data stream) yields"""
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        temp_path = self.tmp / f"{uuid.uuid4().hex}.part"
+        md5, sha256, size = hashlib.md5(), hashlib.sha256(), 0
+        try:
+            with open(temp_path, 'wb') as target:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    md5.update(chunk)
+                    sha256.update(chunk)
+                    target.write(chunk)
+                    size += len(chunk)
+            oid = sha256.hexdigest()
+            object_path = self.object_path(oid)
+            if object_path.exists():
+                temp_path.unlink()
+                # Fresh again, so garbage collection spares it until its pointer is committed
+                os.utime(object_path)
+            else:
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                os.chmod(temp_path, 0o444)
+                os.replace(temp_path, object_path)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        return {'oid': oid, 'sha256': oid, 'md5': md5.hexdigest(), 'size': size}
+    
+    @staticmethod
+    def pointer_text(oid: str, size: int) -> str:
+        return f"{POINTER_VERSION}\noid sha256:{oid}\nsize {size}\n"
+    
+    @staticmethod
+    def parse_pointer(data) -> Optional[Tuple[str, int]]:
+        """(oid, size) if ``data`` is a pointer file's content"""
+        if isinstance(data, bytes):
+            if len(data) > MAX_POINTER_SIZE:
+                return None
+            data = data.decode('utf-8', errors='replace')
+        lines = data.strip().splitlines()
+        if len(lines) < 3 or lines[0] != POINTER_VERSION:
+            return None
+        fields = dict(line.split(' ', 1) for line in lines[1:] if ' ' in line)
+        oid, size = fields.get('oid', ''), fields.get('size', '')
+        if not oid.startswith('sha256:') or not size.isdigit():
+            return None
+        return oid[len('sha256:'):], int(size)
+    
+    def write_pointer(self, path: str, oid: str, size: int):
+        with open(path, 'w') as f:
+            f.write(self.pointer_text(oid, size))
+    
+    def materialize(self, oid: str, destination: str) -> Path:
+        """Put a writable copy of an object at ``destination``, reflinked when the filesystem allows"""
+        source = self.object_path(oid)
+        if not source.exists():
+            raise FileNotFoundError(f"Source object {oid} is not in {self.root}")
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            with open(source, 'rb') as source_file, open(temp_path, 'wb') as target_file:
+                cloned = self._reflink(source_file, target_file)
+            if not cloned:
+                shutil.copyfile(source, temp_path)
+            # Replaces the file, and any hard link to the object an older store made
+            os.replace(temp_path, destination)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        return destination
+    
+    @staticmethod
+    def _reflink(source_file, target_file) -> bool:
+        try:
+            import fcntl
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+            return True
+        except (ImportError, OSError):
+            return False
+    
+    def gc(self, referenced: Iterable[str], grace_seconds: float = 86400) -> Dict:
+        """Remove objects no pointer refers to, sparing ones younger than ``grace_seconds``
+        
+        The grace period covers packages whose pointer commit is still queued.
+        """
+        referenced = set(referenced)
+        cutoff = time.time() - grace_seconds
+        removed, freed, kept = 0, 0, 0
+        if self.objects.exists():
+            for object_path in self.objects.glob('*/*'):
+                stat = object_path.stat()
+                if object_path.name in referenced or stat.st_mtime > cutoff:
+                    kept += 1
+                    continue
+                object_path.unlink()
+                removed += 1
+                freed += stat.st_size
+        if self.tmp.exists():
+            for partial in self.tmp.glob('*.part'):
+                if partial.stat().st_mtime < cutoff:
+                    partial.unlink()
+        return {'removed': removed, 'freed_bytes': freed, 'kept': kept}
+    
+    def stats(self) -> Dict:
+        sizes = [path.stat().st_size for path in self.objects.glob('*/*')] if self.objects.exists() else []
+        return {'objects': len(sizes), 'bytes': sum(sizes), 'path': str(self.root)}
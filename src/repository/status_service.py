@@ -0,0 +1,366 @@
+import os
+import time
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from git.exc import GitCommandError
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+# Files in the Git directory whose change means HEAD, refs or an ongoing operation changed
+REF_FILES = {'HEAD', 'packed-refs', 'MERGE_HEAD', 'CHERRY_PICK_HEAD', 'REBASE_HEAD', 'ORIG_HEAD',
+             'rebase-merge', 'rebase-apply'}
+CONFLICT_CODES = {'DD', 'AU', 'UD', 'UA', 'DU', 'AA', 'UU'}
+
+class InotifyWatcher:
+    """Recursive inotify watches through libc; raises OSError where inotify is unavailable"""
+    
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}  # watch descriptor -> (directory, area)
+    
+    def add(self, directory: Path, area: str, recursive: bool = False, skip: Callable[[Path], bool] = None):
+        for root, dirs, _ in (os.walk(directory) if recursive else [(str(directory), [], [])]):
+            if skip:
+                dirs[:] = [name for name in dirs if not skip(Path(root) / name)]
+            wd = self._add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"inotify_add_watch {root}: {os.strerror(errno)}")
+            self.watches[wd] = (Path(root), area)
+    
+    def read(self, timeout: float) -> List[tuple]:
+        """(directory, area, name, mask) of the events that arrive within ``timeout`` seconds"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            directory, area = self.watches.get(wd, (None, None))
+            events.append((directory, area, os.fsdecode(name), mask))
+        return events
+    
+    def close(self):
+        os.close(self.fd)
+
+class RepositoryStatusService:
+    """Cached repository status, invalidated by filesystem changes and pushed to subscribers.
+    
+    Status is split into the working tree part (one ``git status`` call, which
+    uses Git's untracked cache and fsmonitor when enabled) and the refs part
+    (branches, remotes, tags, stashes, HEAD). Each part is recomputed only
+    after something it depends on changed. On Linux inotify watches on the
+    working tree and the Git directory say when; elsewhere the Git index,
+    HEAD and refs are compared by mtime and the working tree part also
+    expires after ``worktree_ttl`` seconds. Subscribers receive only the
+    status keys whose values changed.
+    """
+    
+    def __init__(self, git_repo, worktree_ttl: float = 5.0, poll_interval: float = 2.0, debounce: float = 0.25):
+        self.git_repo = git_repo
+        self.repo_path = Path(git_repo.working_tree_dir)
+        self.git_dir = Path(git_repo.git_dir)
+        self.worktree_ttl = worktree_ttl
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._lock = threading.RLock()
+        self._cache = {}  # part -> (stamp, computed_at, value)
+        self._stale = {'worktree': True, 'refs': True}
+        self._index_stamp = None
+        self._subscribers = []
+        self._last_pushed = None
+        self._stop = threading.Event()
+        self.stats = {'worktree_computed': 0, 'refs_computed': 0, 'served_from_cache': 0}
+        self._status_options = self._git_acceleration_options()
+        
+        try:
+            self.watcher = InotifyWatcher()
+            self.watcher.add(self.repo_path, 'worktree', recursive=True, skip=self._skip_directory)
+            self.watcher.add(self.git_dir, 'git')
+            self.watcher.add(self.git_dir / 'refs', 'refs', recursive=True)
+        except (OSError, AttributeError) as e:
+            if getattr(self, 'watcher', None):
+                self.watcher.close()
+            # inotify missing or out of watches: fall back to mtime checks
+            print(f"⚠️ Repository status falls back to polling: {e}")
+            self.watcher = None
+        self._thread = threading.Thread(target=self._run, name='repo-status-watch', daemon=True)
+        self._thread.start()
+    
+    def _skip_directory(self, path: Path) -> bool:
+        return path == self.git_dir or path.name == '.git'
+    
+    def _git_acceleration_options(self) -> List[str]:
+        """``-c`` options turning on the untracked cache and, where Git has it, the builtin fsmonitor
+        
+        They are passed to each status run; the repository configuration is
+        never written, and settings already in it win.
+        """
+        options = []
+        git = self.git_repo.git
+        try:
+            if not self._config_set('core.untrackedCache'):
+                options += ['-c', 'core.untrackedCache=true']
+            # Git before 2.36 has no fsmonitor--daemon and also exits with 1 for an unknown command
+            if not self._config_set('core.fsmonitor') and git.version_info >= (2, 36):
+                # "not supported on this platform" exits with 128; a stopped daemon exits with 1
+                status, _, _ = git.execute(['git', 'fsmonitor--daemon', 'status'], with_extended_output=True,
+                                           with_exceptions=False)
+                if status in (0, 1):
+                    options += ['-c', 'core.fsmonitor=true']
+        except GitCommandError as e:
+            print(f"⚠️ Could not check Git status acceleration: {e}")
+        return options
+    
+    def _config_set(self, key: str) -> bool:
+        try:
+            self.git_repo.git.config('--get', key)
+            return True
+        except GitCommandError:
+            return False
+    
+    # === Cached parts ===
+    
+    def detailed_status(self) -> Dict:
+        """staged/modified/untracked/deleted/renamed/conflicted file lists"""
+        return {key: list(value) for key, value in self._part('worktree', self._compute_worktree).items()}
+    
+    def repository_status(self) -> Dict:
+        worktree = self._part('worktree', self._compute_worktree)
+        status = dict(self._part('refs', self._compute_refs))
+        for key in ('staged', 'modified', 'untracked', 'deleted', 'renamed', 'conflicted'):
+            status[f'{key}_files'] = list(worktree[key])
+        status['is_dirty'] = any(worktree[key] for key in ('staged', 'modified', 'deleted', 'renamed', 'conflicted'))
+        status['branches'] = list(status['branches'])
+        status['remotes'] = list(status['remotes'])
+        status['tags'] = list(status['tags'])
+        status['last_commit'] = dict(status['last_commit']) if status['last_commit'] else None
+        return status
+    
+    def invalidate(self, part: str = None):
+        with self._lock:
+            for name in ([part] if part else list(self._stale)):
+                self._stale[name] = True
+    
+    def _part(self, part: str, compute: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            stamp = None if self.watcher else self._stamp(part)
+            cached = self._cache.get(part)
+            if cached and not self._stale[part]:
+                cached_stamp, computed_at, value = cached
+                expired = (self.watcher is None and part == 'worktree'
+                           and time.time() - computed_at > self.worktree_ttl)
+                if cached_stamp == stamp and not expired:
+                    self.stats['served_from_cache'] += 1
+                    return value
+            self._stale[part] = False
+            value = compute()
+            self.stats[f'{part}_computed'] += 1
+            # Taken after computing: git status may have refreshed the index itself
+            self._cache[part] = (None if self.watcher else self._stamp(part), time.time(), value)
+            return value
+    
+    def _stamp(self, part: str) -> tuple:
+        names = ['index', 'HEAD'] if part == 'worktree' else sorted(REF_FILES)
+        stamp = [self._file_stamp(self.git_dir / name) for name in names]
+        if part == 'refs':
+            for root, dirs, files in os.walk(self.git_dir / 'refs'):
+                stamp.extend(self._file_stamp(Path(root) / name) for name in sorted(dirs + files))
+            stamp.append(self._file_stamp(self.git_dir / 'logs' / 'refs' / 'stash'))
+        return tuple(stamp)
+    
+    @staticmethod
+    def _file_stamp(path: Path):
+        try:
+            stat = path.stat()
+            return (str(path), stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (str(path), None, None)
+    
+    def _compute_worktree(self) -> Dict:
+        status = {'staged': [], 'modified': [], 'untracked': [], 'deleted': [], 'renamed': [], 'conflicted': []}
+        entries = self.git_repo.git.execute(['git', *self._status_options, 'status', '--porcelain=v1', '-z',
+                                             '--untracked-files=all']).split('\0')
+        index = 0
+        while index < len(entries):
+            entry = entries[index]
+            index += 1
+            if len(entry) < 4:
+                continue
+            code, path = entry[:2], entry[3:]
+            if code == '??':
+                status['untracked'].append(path)
+                continue
+            if code in CONFLICT_CODES:
+                status['conflicted'].append(path)
+                continue
+            staged, unstaged = code
+            if staged in 'RC':
+                # -z lists the new path first, then the original one
+                original = entries[index]
+                index += 1
+                if staged == 'R':
+                    status['renamed'].append(f"{original} -> {path}")
+                else:
+                    status['staged'].append(path)
+            elif staged == 'D':
+                status['deleted'].append(path)
+            elif staged in 'MAT':
+                status['staged'].append(path)
+            if unstaged == 'D':
+                status['deleted'].append(path)
+            elif unstaged in 'MT':
+                status['modified'].append(path)
+        self._index_stamp = self._file_stamp(self.git_dir / 'index')
+        return status
+    
+    def _compute_refs(self) -> Dict:
+        repo = self.git_repo
+        head = repo.head
+        try:
+            commit = head.commit
+            last_commit = {
+                'hash': commit.hexsha,
+                'short_hash': commit.hexsha[:8],
+                'message': commit.message.strip(),
+                'author': str(commit.author),
+                'date': datetime.fromtimestamp(commit.committed_date)
+            }
+        except ValueError:
+            # No commits yet
+            commit, last_commit = None, None
+        try:
+            stashes = int(repo.git.rev_list('--walk-reflogs', '--count', 'refs/stash'))
+        except GitCommandError:
+            stashes = 0
+        
+        return {
+            'current_branch': commit.hexsha[:8] if head.is_detached and commit else repo.active_branch.name,
+            'branches': [branch.name for branch in repo.branches],
+            'remotes': [remote.name for remote in repo.remotes],
+            'tags': [tag.name for tag in repo.tags],
+            'stashes': stashes,
+            'last_commit': last_commit,
+            'head_is_detached': head.is_detached,
+            'ongoing_merge': (self.git_dir / "MERGE_HEAD").exists(),
+            'ongoing_rebase': (self.git_dir / "rebase-merge").exists() or (self.git_dir / "rebase-apply").exists(),
+            'ongoing_cherry_pick': (self.git_dir / "CHERRY_PICK_HEAD").exists()
+        }
+    
+    # === Change notification ===
+    
+    def subscribe(self, callback: Callable[[Dict], None]):
+        """Call ``callback`` with the changed status keys whenever the status changes"""
+        with self._lock:
+            if not self._subscribers:
+                self._last_pushed = self.repository_status()
+            self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            if self.watcher:
+                events = self.watcher.read(self.poll_interval)
+                if not events:
+                    continue
+                # Let a burst of writes settle before recomputing
+                deadline = time.time() + 8 * self.debounce
+                while time.time() < deadline:
+                    more = self.watcher.read(self.debounce)
+                    if not more:
+                        break
+                    events.extend(more)
+                self._apply_events(events)
+            else:
+                self._stop.wait(self.poll_interval)
+            if self._subscribers:
+                self._push()
+    
+    def _apply_events(self, events: List[tuple]):
+        stale = set()
+        for directory, area, name, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                stale.update(('worktree', 'refs'))
+            elif area == 'worktree':
+                stale.add('worktree')
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and name != '.git':
+                    try:
+                        self.watcher.add(directory / name, 'worktree', recursive=True, skip=self._skip_directory)
+                    except OSError as e:
+                        print(f"⚠️ Cannot watch {directory / name}: {e}")
+            elif area == 'refs':
+                stale.update(('worktree', 'refs'))
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self.watcher.add(directory / name, 'refs', recursive=True)
+                    except OSError as e:
+                        print(f"⚠️ Cannot watch {directory / name}: {e}")
+            elif area == 'git' and not name.endswith('.lock'):
+                if name in REF_FILES:
+                    stale.update(('worktree', 'refs'))
+                elif name == 'index' and self._file_stamp(self.git_dir / 'index') != self._index_stamp:
+                    # Ignore the index refresh written by our own git status
+                    stale.add('worktree')
+        with self._lock:
+            for part in stale:
+                self._stale[part] = True
+    
+    def _push(self):
+        try:
+            with self._lock:
+                status = self.repository_status()
+                delta = {key: value for key, value in status.items()
+                         if self._last_pushed is None or self._last_pushed.get(key) != value}
+                self._last_pushed = status
+                subscribers = list(self._subscribers)
+        except Exception as e:
+            print(f"Error refreshing repository status: {e}")
+            return
+        if not delta:
+            return
+        for callback in subscribers:
+            try:
+                callback(delta)
+            except Exception as e:
+                print(f"Status subscriber error: {e}")
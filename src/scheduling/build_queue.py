@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .schedule_store import SCHEDULER_DIR, file_lock, write_json_atomic
+
+@dataclass
+class QueuedBuild:
+    id: str
+    name: str
+    build_config: Dict
+    priority: int = 0
+    job_id: Optional[str] = None
+    requirements: Dict = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.time)
+    due_at: Optional[float] = None
+    deferrals: int = 0
+    last_deferral: str = ''
+
+class BuildQueue:
+    """Priority queue of builds waiting to start, persisted across restarts
+    
+    Higher ``priority`` goes first, then older entries. Every operation is a
+    locked read-modify-write of ``queue.json`` (written to a temporary file,
+    then renamed), so builds queued by another scheduler instance are seen and
+    builds that were waiting when the application stopped are still waiting
+    when it comes back.
+    """
+    
+    DEFAULT_PATH = os.path.join(SCHEDULER_DIR, 'queue.json')
+    
+    def __init__(self, path: str = None):
+        self.path = Path(path or self.DEFAULT_PATH)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+    
+    def _read(self) -> Dict[str, QueuedBuild]:
+        entries = {}
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return entries
+        for entry in data.get('entries', []):
+            try:
+                queued = QueuedBuild(**entry)
+            except TypeError:
+                continue
+            entries[queued.id] = queued
+        return entries
+    
+    def _write(self, entries: Dict[str, QueuedBuild]):
+        write_json_atomic(self.path, {'entries': [asdict(entry) for entry in self._ordered(entries)]})
+    
+    @staticmethod
+    def _ordered(entries: Dict[str, QueuedBuild]) -> List[QueuedBuild]:
+        return sorted(entries.values(), key=lambda entry: (-entry.priority, entry.enqueued_at))
+    
+    def push(self, name: str, build_config: Dict, priority: int = 0, job_id: str = None,
+             requirements: Dict = None, due_at: float = None) -> QueuedBuild:
+        entry = QueuedBuild(id=f"queued-{uuid.uuid4().hex[:8]}", name=name, build_config=build_config,
+                            priority=priority, job_id=job_id, requirements=dict(requirements or {}), due_at=due_at)
+        with file_lock(self.lock_path):
+            entries = self._read()
+            entries[entry.id] = entry
+            self._write(entries)
+        return entry
+    
+    def pending(self) -> List[QueuedBuild]:
+        """Waiting builds in the order they should start"""
+        with file_lock(self.lock_path, exclusive=False):
+            return self._ordered(self._read())
+    
+    def peek(self) -> Optional[QueuedBuild]:
+        pending = self.pending()
+        return pending[0] if pending else None
+    
+    def remove(self, entry_id: str) -> Optional[QueuedBuild]:
+        with file_lock(self.lock_path):
+            entries = self._read()
+            entry = entries.pop(entry_id, None)
+            if entry:
+                self._write(entries)
+            return entry
+    
+    def defer(self, entry_id: str, reason: str):
+        """Note why the head of the queue could not start yet"""
+        with file_lock(self.lock_path):
+            entries = self._read()
+            entry = entries.get(entry_id)
+            if entry and entry.last_deferral != reason:
+                entry.deferrals += 1
+                entry.last_deferral = reason
+                self._write(entries)
+    
+    def contains_job(self, job_id: str) -> bool:
+        return any(entry.job_id == job_id for entry in self.pending())
+    
+    def entries(self) -> List[Dict]:
+        return [asdict(entry) for entry in self.pending()]
+    
+    def __len__(self) -> int:
+        return len(self.pending())
+
+class AdmissionController:
+    """Decides whether the host has room for another build right now
+    
+    A build states what it needs (``cores``, ``memory_gb``, ``disk_gb``; the
+    defaults assume a full LFS build using every core). It is admitted only if
+    the builds already started by the scheduler leave that much unreserved,
+    the live load average and available memory agree (they also see builds
+    started by hand), the LFS filesystem has the free space, and fewer than
+    ``max_concurrent_builds`` are running. Load beyond the reserved cores is
+    work the scheduler did not start; it may take up to ``max_load_fraction``
+    of the unreserved cores.
+    """
+    
+    def __init__(self, options: Dict = None):
+        options = options or {}
+        self.cpu_count = os.cpu_count() or 1
+        self.max_concurrent_builds = int(options.get('max_concurrent_builds', 1))
+        self.memory_reserve_gb = float(options.get('memory_reserve_gb', 2))
+        self.max_load_fraction = float(options.get('max_load_fraction', 0.75))
+        self.disk_path = options.get('disk_path') or os.environ.get('LFS', '/mnt/lfs')
+        self.defaults = {
+            'cores': options.get('default_cores', self.cpu_count),
+            'memory_gb': options.get('default_memory_gb', 4),
+            'disk_gb': options.get('default_disk_gb', 30)
+        }
+    
+    def requirements(self, requested: Dict = None) -> Dict:
+        needs = dict(self.defaults)
+        needs.update({key: value for key, value in (requested or {}).items() if key in needs})
+        needs['cores'] = min(float(needs['cores']), self.cpu_count)
+        return needs
+    
+    def check(self, requested: Dict, running: List[Dict]) -> Tuple[bool, str]:
+        """(admitted, reason) for a build with these requirements next to the running ones"""
+        needs = self.requirements(requested)
+        if len(running) >= self.max_concurrent_builds:
+            return False, f"{len(running)} of {self.max_concurrent_builds} builds already running"
+        
+        reserved_cores = sum(self.requirements(build).get('cores', 0) for build in running)
+        if reserved_cores + needs['cores'] > self.cpu_count:
+            return False, f"needs {needs['cores']:g} cores, {self.cpu_count - reserved_cores:g} unreserved"
+        try:
+            load = os.getloadavg()[0]
+            # The running builds account for up to their reserved cores of the load
+            foreign_load = max(load - reserved_cores, 0.0)
+            if foreign_load > (self.cpu_count - reserved_cores) * self.max_load_fraction:
+                return False, f"load average {load:.1f} on {self.cpu_count} cores, {reserved_cores:g} reserved"
+        except OSError:
+            pass
+        
+        total_gb, available_gb = self._memory_gb()
+        if total_gb is not None:
+            reserved_memory = sum(self.requirements(build)['memory_gb'] for build in running)
+            if total_gb - reserved_memory - self.memory_reserve_gb < needs['memory_gb'] or \
+                    available_gb - self.memory_reserve_gb < needs['memory_gb']:
+                return False, f"needs {needs['memory_gb']:g} GB memory, {available_gb:.1f} GB available"
+        
+        disk_path = self.disk_path if os.path.exists(self.disk_path) else '/'
+        free_gb = shutil.disk_usage(disk_path).free / 1024 ** 3
+        reserved_disk = sum(self.requirements(build)['disk_gb'] for build in running)
+        if free_gb - reserved_disk < needs['disk_gb']:
+            return False, f"needs {needs['disk_gb']:g} GB on {disk_path}, {free_gb:.0f} GB free"
+        return True, 'resources available'
+    
+    @staticmethod
+    def _memory_gb():
+        info = {}
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    key, value = line.split(':', 1)
+                    info[key] = int(value.split()[0]) * 1024
+        except (OSError, ValueError):
+            return None, None
+        if 'MemTotal' not in info or 'MemAvailable' not in info:
+            return None, None
+        return info['MemTotal'] / 1024 ** 3, info['MemAvailable'] / 1024 ** 3
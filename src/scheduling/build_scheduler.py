@@ -1,55 +1,121 @@
+import heapq
+import random
 import subprocess
 import threading
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
 from pathlib import Path
 
+from .cron import CronExpression
+from .build_queue import BuildQueue, AdmissionController
+from .schedule_store import ScheduleStore
+
+MISFIRE_POLICIES = ('skip', 'run_once', 'run_all')
+
 class BuildScheduler:
-    def __init__(self, db_manager=None, build_engine=None):
+    """Starts builds from cron schedules and a priority queue
+    
+    Due schedules put a build into the persistent queue; the queue head starts
+    once the admission controller finds room for it and a build engine is
+    free (``engine_factory`` can supply more engines when
+    ``max_concurrent_builds`` allows several builds at once). The scheduler
+    thread sleeps until the next schedule is due or a build finishes, and
+    schedule statistics are updated from the engines' completion events.
+    
+    Schedules live in a ScheduleStore, so they survive restarts. Runs missed
+    while no scheduler was running (or while it overslept) are handled by the
+    job's ``misfire_policy``: ``skip`` them, ``run_once`` for all of them, or
+    ``run_all``. ``jitter_seconds`` delays each run by a random amount to
+    spread load, and a job never has two builds running at the same time.
+    """
+    
+    # Longest sleep, so wall-clock jumps (NTP, suspend) are noticed
+    MAX_SLEEP_SECONDS = 60
+    # How often a deferred queue head re-checks free resources
+    ADMISSION_RETRY_SECONDS = 30
+    # Most missed runs a run_all job catches up on
+    MAX_CATCH_UP = 100
+    
+    def __init__(self, db_manager=None, build_engine=None, options: Dict = None,
+                 engine_factory: Callable = None):
         self.db = db_manager
         self.build_engine = build_engine
-        self.scheduled_jobs = {}
+        self.options = options or {}
+        self.store = ScheduleStore(self.options.get('state_path'))
+        self.scheduled_jobs = self.store.load()
         self.scheduler_thread = None
         self.running = False
         self.job_counter = 0
+        self.queue = BuildQueue(self.options.get('queue_path'))
+        self.admission = AdmissionController(self.options)
+        self.engine_factory = engine_factory
+        self.engines = []
+        self.running_builds = {}
+        self.execution_history = deque(maxlen=200)
+        self._crons = {}
+        self._due = {}
+        self._timers = []
+        self._unclaimed_outcomes = {}
+        self._condition = threading.Condition()
+        if build_engine:
+            self._add_engine(build_engine)
     
-    def schedule_build(self, cron_expression: str, build_config: Dict, job_name: str = None) -> str:
+    def schedule_build(self, cron_expression: str, build_config: Dict, job_name: str = None,
+                       timezone_name: str = None, priority: int = 0, requirements: Dict = None,
+                       misfire_policy: str = 'run_once', jitter_seconds: int = 0, enabled: bool = True,
+                       start: bool = True) -> str:
         """Schedule a recurring build using cron expression"""
         import uuid
         job_id = f"job-{uuid.uuid4().hex[:8]}"
         
         if not job_name:
-            job_name = f"Scheduled Build {self.job_counter + 1}"
+            job_name = f"Scheduled Build {len(self.scheduled_jobs) + 1}"
             self.job_counter += 1
         
         try:
             # Validate cron expression
-            self._validate_cron_expression(cron_expression)
+            self._validate_cron_expression(cron_expression, timezone_name)
+            if misfire_policy not in MISFIRE_POLICIES:
+                raise ValueError(f"Misfire policy must be one of {', '.join(MISFIRE_POLICIES)}")
             
             # Create job record
             job = {
                 'id': job_id,
                 'name': job_name,
                 'cron_expression': cron_expression,
+                'timezone': timezone_name,
+                'priority': priority,
+                'requirements': dict(requirements or build_config.get('requirements', {})),
                 'build_config': build_config,
+                'misfire_policy': misfire_policy,
+                'jitter_seconds': max(int(jitter_seconds), 0),
                 'created_at': datetime.now().isoformat(),
-                'enabled': True,
+                'enabled': enabled,
+                # Nominal time of the last run handled; nothing before creation is missed
+                'last_due': time.time(),
                 'last_run': None,
-                'next_run': self._calculate_next_run(cron_expression),
+                'last_status': None,
+                'next_run': self._calculate_next_run(cron_expression, timezone_name),
                 'run_count': 0,
                 'success_count': 0,
                 'failure_count': 0
             }
             
-            self.scheduled_jobs[job_id] = job
+            with self._condition:
+                self.scheduled_jobs[job_id] = job
+                if enabled:
+                    self._arm(job)
+                self.store.save_job(job)
+                self._condition.notify_all()
             
             # Store in database
             if self.db:
                 self._store_scheduled_job(job)
             
             # Start scheduler if not running
-            if not self.running:
+            if start and not self.running:
                 self.start_scheduler()
             
             return job_id
@@ -57,50 +123,121 @@ class BuildScheduler:
         except Exception as e:
             raise Exception(f"Failed to schedule build: {str(e)}")
     
-    def _validate_cron_expression(self, cron_expr: str):
+    def enqueue_build(self, build_config: Dict, name: str = None, priority: int = 0,
+                      requirements: Dict = None) -> str:
+        """Queue a one-off build; it starts when admission control lets it"""
+        entry = self.queue.push(name or build_config.get('config_name', 'Queued Build'), build_config,
+                                priority=priority, requirements=requirements or build_config.get('requirements'))
+        with self._condition:
+            self._condition.notify_all()
+        if not self.running:
+            self.start_scheduler()
+        return entry.id
+    
+    def _validate_cron_expression(self, cron_expr: str, timezone_name: str = None):
         """Validate cron expression format"""
-        parts = cron_expr.split()
-        if len(parts) != 5:
-            raise ValueError("Cron expression must have 5 parts: minute hour day month weekday")
-        
-        # Basic validation for each part
-        ranges = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
-        for i, (part, (min_val, max_val)) in enumerate(zip(parts, ranges)):
-            if part != '*' and not part.isdigit():
-                if '/' not in part and ',' not in part and '-' not in part:
-                    raise ValueError(f"Invalid cron expression part: {part}")
-        
+        self._crons[(cron_expr, timezone_name)] = CronExpression(cron_expr, timezone_name)
         print(f"✅ Cron expression validated: {cron_expr}")
     
-    def _calculate_next_run(self, cron_expr: str) -> str:
+    def _cron(self, cron_expr: str, timezone_name: str = None) -> CronExpression:
+        key = (cron_expr, timezone_name)
+        if key not in self._crons:
+            self._crons[key] = CronExpression(cron_expr, timezone_name)
+        return self._crons[key]
+    
+    def _calculate_next_run(self, cron_expr: str, timezone_name: str = None, after: datetime = None) -> Optional[str]:
         """Calculate next run time from cron expression"""
-        try:
-            # Simple next run calculation (would use croniter in production)
-            now = datetime.now()
-            
-            # For demo, calculate based on common patterns
-            if cron_expr == "0 2 * * *":  # Daily at 2 AM
-                next_run = now.replace(hour=2, minute=0, second=0, microsecond=0)
-                if next_run <= now:
-                    next_run += timedelta(days=1)
-            elif cron_expr == "0 0 * * 0":  # Weekly on Sunday
-                days_ahead = 6 - now.weekday()  # Sunday is 6
-                if days_ahead <= 0:
-                    days_ahead += 7
-                next_run = (now + timedelta(days=days_ahead)).replace(hour=0, minute=0, second=0, microsecond=0)
+        next_run = self._cron(cron_expr, timezone_name).next_after(after)
+        return next_run.isoformat() if next_run else None
+    
+    def _arm(self, job: Dict, after: datetime = None):
+        """Set the timer of a job to its next firing time; called with the condition held"""
+        next_run = self._calculate_next_run(job['cron_expression'], job.get('timezone'), after)
+        job['next_run'] = next_run
+        if next_run is None:
+            self._due.pop(job['id'], None)
+            return
+        # The timer is jittered; next_run stays the nominal cron time
+        due = datetime.fromisoformat(next_run).timestamp() + random.uniform(0, job.get('jitter_seconds', 0))
+        self._due[job['id']] = due
+        heapq.heappush(self._timers, (due, job['id']))
+    
+    def _missed_runs(self, job: Dict, now: float):
+        """Nominal run times after the job's last_due up to now (the last MAX_CATCH_UP of them) and their count"""
+        cron = self._cron(job['cron_expression'], job.get('timezone'))
+        runs = deque(maxlen=self.MAX_CATCH_UP)
+        count = 0
+        moment = datetime.fromtimestamp(job.get('last_due') or now, timezone.utc)
+        # A bounded scan: a minutely job down for a year is ~500k steps
+        while count < 1000000:
+            moment = cron.next_after(moment)
+            if moment is None or moment.timestamp() > now:
+                break
+            runs.append(moment.timestamp())
+            count += 1
+        return list(runs), count
+    
+    def _run_due(self, job: Dict, now: float):
+        """Queue the runs a job owes, applying its misfire policy, and re-arm it; called with the condition held"""
+        runs, count = self._missed_runs(job, now)
+        grace = self.options.get('misfire_grace_seconds', 60) + job.get('jitter_seconds', 0)
+        on_time = [due for due in runs if now - due <= grace]
+        missed = [due for due in runs if now - due > grace]
+        missed_count = count - len(on_time)
+        policy = job.get('misfire_policy', 'run_once')
+        
+        if missed_count and policy == 'skip':
+            print(f"⏭️ Skipping {missed_count} missed run(s) of {job['name']}")
+            self.execution_history.append({
+                'schedule_name': job['name'], 'job_id': job['id'], 'execution_time': datetime.now().isoformat(),
+                'build_id': 'N/A', 'status': 'Skipped', 'missed_runs': missed_count
+            })
+            to_run = on_time
+        elif missed_count and policy == 'run_once':
+            print(f"⏪ {job['name']} missed {missed_count} run(s); running it once")
+            to_run = on_time or missed[-1:]
+        else:
+            if missed_count:
+                print(f"⏪ {job['name']} missed {missed_count} run(s); catching up on {len(missed)}")
+            to_run = missed + on_time
+        
+        for due in to_run:
+            self._execute_scheduled_job(job, due, coalesce=policy != 'run_all')
+        if runs:
+            job['last_due'] = runs[-1]
+        self._arm(job, datetime.fromtimestamp(max(now, job.get('last_due') or now), timezone.utc))
+        self.store.update_job(job['id'], last_due=job.get('last_due'), next_run=job['next_run'])
+    
+    def _reload_jobs(self):
+        """Pick up schedules changed by another BuildScheduler (e.g. the GUI); called with the condition held"""
+        jobs = self.store.load()
+        for job_id in list(self.scheduled_jobs):
+            if job_id not in jobs:
+                del self.scheduled_jobs[job_id]
+                self._due.pop(job_id, None)
+        for job_id, job in jobs.items():
+            old = self.scheduled_jobs.get(job_id)
+            self.scheduled_jobs[job_id] = job
+            timing = ('enabled', 'cron_expression', 'timezone', 'jitter_seconds')
+            if old is not None and all(old.get(key) == job.get(key) for key in timing):
+                continue
+            if job['enabled']:
+                self._run_due(job, time.time())
             else:
-                # Default to next hour for other expressions
-                next_run = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-            
-            return next_run.isoformat()
-            
-        except Exception:
-            # Fallback to next hour
-            return (datetime.now() + timedelta(hours=1)).isoformat()
+                self._due.pop(job_id, None)
     
     def start_scheduler(self):
         """Start the build scheduler"""
         if not self.running:
+            if not self.store.acquire_leader():
+                print("⚠️ Another build scheduler is already running on this host")
+                return
+            with self._condition:
+                # Restore durable schedules and settle the runs missed while stopped
+                self.scheduled_jobs = self.store.load()
+                for job in self.scheduled_jobs.values():
+                    if job['enabled']:
+                        self._run_due(job, time.time())
             self.running = True
             self.scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
             self.scheduler_thread.start()
@@ -109,65 +246,209 @@ class BuildScheduler:
     def stop_scheduler(self):
         """Stop the build scheduler"""
         self.running = False
+        with self._condition:
+            self._condition.notify_all()
         if self.scheduler_thread:
             self.scheduler_thread.join(timeout=5)
+        self.store.release_leader()
         print("⏹️ Build scheduler stopped")
     
     def _scheduler_loop(self):
-        """Main scheduler loop"""
+        """Main scheduler loop: sleep until something is due, then queue and admit builds"""
         while self.running:
             try:
-                current_time = datetime.now()
+                with self._condition:
+                    if self.store.changed():
+                        self._reload_jobs()
+                    self._fire_due_jobs()
+                    launches = self._admit_queued()
+                    if not launches:
+                        self._condition.wait(self._sleep_seconds())
                 
-                for job_id, job in self.scheduled_jobs.items():
-                    if not job['enabled']:
-                        continue
-                    
-                    next_run = datetime.fromisoformat(job['next_run'])
-                    
-                    if current_time >= next_run:
-                        self._execute_scheduled_job(job)
-                
-                # Check every minute
-                time.sleep(60)
+                for entry_id in launches:
+                    self._launch(entry_id)
                 
             except Exception as e:
                 print(f"Scheduler error: {e}")
                 time.sleep(30)
     
-    def _execute_scheduled_job(self, job: Dict):
-        """Execute a scheduled job"""
+    def _sleep_seconds(self) -> float:
+        sleep = self.MAX_SLEEP_SECONDS
+        # Drop timers of deleted, disabled or rescheduled jobs
+        while self._timers and self._due.get(self._timers[0][1]) != self._timers[0][0]:
+            heapq.heappop(self._timers)
+        if self._timers:
+            sleep = min(sleep, self._timers[0][0] - time.time())
+        if len(self.queue):
+            sleep = min(sleep, self.ADMISSION_RETRY_SECONDS)
+        return max(sleep, 0)
+    
+    def _fire_due_jobs(self):
+        """Queue a build for every job whose time has come; called with the condition held"""
+        now = time.time()
+        while self._timers and self._timers[0][0] <= now:
+            due, job_id = heapq.heappop(self._timers)
+            job = self.scheduled_jobs.get(job_id)
+            if not job or not job['enabled'] or self._due.get(job_id) != due:
+                continue
+            # Normally the one run just due; more if the host was suspended or the clock jumped
+            self._run_due(job, now)
+    
+    def _execute_scheduled_job(self, job: Dict, due: float = None, coalesce: bool = True):
+        """Queue the build of a due scheduled job"""
+        if coalesce and self.queue.contains_job(job['id']):
+            # Still waiting from an earlier trigger: one queued run serves both
+            print(f"🔁 {job['name']} is already queued; merging this run into it")
+            return
+        print(f"⏰ Scheduled job due: {job['name']}")
+        self.queue.push(job['name'], job['build_config'], priority=job.get('priority', 0), job_id=job['id'],
+                        requirements=job.get('requirements'), due_at=due or time.time())
+    
+    def _admit_queued(self) -> List[str]:
+        """Move queue heads into running builds while there is room; called with the condition held"""
+        launches = []
+        while True:
+            # Single flight: a job's next run waits until its current one has finished
+            running_jobs = {build['entry'].job_id for build in self.running_builds.values()}
+            entry = next((entry for entry in self.queue.pending()
+                          if entry.job_id is None or entry.job_id not in running_jobs), None)
+            if entry is None:
+                break
+            
+            # Strict priority order: a big build waiting at the head is not overtaken
+            engine = self._idle_engine()
+            if engine is None:
+                admitted, reason = False, 'no build engine free'
+            else:
+                admitted, reason = self.admission.check(
+                    entry.requirements, [build['requirements'] for build in self.running_builds.values()])
+            if not admitted:
+                if entry.last_deferral != reason:
+                    print(f"⏳ Holding queued build {entry.name}: {reason}")
+                self.queue.defer(entry.id, reason)
+                break
+            
+            self.queue.remove(entry.id)
+            self.running_builds[entry.id] = {
+                'entry': entry,
+                'engine': engine,
+                'requirements': entry.requirements,
+                'build_id': None,
+                'started_at': time.time()
+            }
+            launches.append(entry.id)
+        return launches
+    
+    def _idle_engine(self):
+        if self.build_engine is not None and self.build_engine not in self.engines:
+            # Attached after construction
+            self._add_engine(self.build_engine)
+        claimed = [build['engine'] for build in self.running_builds.values()]
+        for engine in self.engines:
+            busy = engine.build_thread is not None and engine.build_thread.is_alive()
+            if not busy and engine not in claimed:
+                return engine
+        if self.engine_factory and len(self.engines) < self.admission.max_concurrent_builds:
+            return self._add_engine(self.engine_factory())
+        return None
+    
+    def _add_engine(self, engine):
+        engine.register_callback('build_complete', self._on_build_finished)
+        engine.register_callback('build_error', self._on_build_finished)
+        self.engines.append(engine)
+        return engine
+    
+    def _launch(self, entry_id: str):
+        """Start an admitted build"""
+        record = self.running_builds[entry_id]
+        entry = record['entry']
+        job = self.scheduled_jobs.get(entry.job_id)
         try:
-            print(f"🚀 Executing scheduled job: {job['name']}")
+            print(f"🚀 Executing scheduled job: {entry.name}")
+            if job:
+                job['last_run'] = datetime.now().isoformat()
+                job['run_count'] += 1
+                self.store.update_job(job['id'], last_run=job['last_run'], run_count=job['run_count'])
             
-            # Update job status
-            job['last_run'] = datetime.now().isoformat()
-            job['run_count'] += 1
-            job['next_run'] = self._calculate_next_run(job['cron_expression'])
+            build_id = record['engine'].start_build(
+                entry.build_config.get('config_path', ''),
+                entry.build_config.get('config_name', f"scheduled-{entry.job_id or entry.id}")
+            )
+            print(f"✅ Scheduled build started: {build_id}")
             
-            # Start the build
-            if self.build_engine:
-                build_id = self.build_engine.start_build(
-                    job['build_config'].get('config_path', ''),
-                    job['build_config'].get('config_name', f"scheduled-{job['id']}")
-                )
-                
-                # Track build result (simplified)
-                job['success_count'] += 1
-                print(f"✅ Scheduled build started: {build_id}")
-            else:
-                print("⚠️ No build engine available for scheduled job")
+            history = self._record_execution(entry, build_id, 'Running')
+            with self._condition:
+                record['build_id'] = build_id
+                record['history'] = history
+                outcome = self._unclaimed_outcomes.pop(build_id, None)
+                if all(build['build_id'] for build in self.running_builds.values()):
+                    self._unclaimed_outcomes.clear()
+            if outcome:
+                # The build finished before we got its ID back
+                self._on_build_finished(outcome)
             
-            # Update database
-            if self.db:
-                self._update_scheduled_job(job)
-                
         except Exception as e:
-            job['failure_count'] += 1
             print(f"❌ Scheduled job failed: {e}")
+            with self._condition:
+                self.running_builds.pop(entry_id, None)
+            self._finish_execution(entry, self._record_execution(entry, None, 'Running'), 'failed', str(e))
+    
+    def _on_build_finished(self, data: Dict):
+        """Build engine callback: record the real outcome of a scheduled build"""
+        build_id = data.get('build_id')
+        status = data.get('status', 'failed')
+        with self._condition:
+            entry_id = next((key for key, build in self.running_builds.items() if build['build_id'] == build_id), None)
+            if entry_id is None:
+                if any(build['build_id'] is None for build in self.running_builds.values()):
+                    self._unclaimed_outcomes[build_id] = data
+                return
+            record = self.running_builds.pop(entry_id)
+        self._finish_execution(record['entry'], record['history'], status, data.get('error', ''))
+        # Events fire from the build thread; the engine takes new work once it has exited
+        threading.Thread(target=self._wake_after, args=(record['engine'].build_thread,), daemon=True).start()
+    
+    def _wake_after(self, build_thread):
+        if build_thread is not None and build_thread is not threading.current_thread():
+            build_thread.join()
+        with self._condition:
+            self._condition.notify_all()
+    
+    def _record_execution(self, entry, build_id: Optional[str], status: str) -> Dict:
+        execution = {
+            'schedule_name': entry.name,
+            'job_id': entry.job_id,
+            'execution_time': datetime.now().isoformat(),
+            'build_id': build_id or 'N/A',
+            'status': status,
+            'queued_seconds': round(time.time() - entry.enqueued_at, 1),
+            'late_seconds': round(time.time() - entry.due_at, 1) if entry.due_at else None,
+            'duration_seconds': None
+        }
+        self.execution_history.append(execution)
+        return execution
+    
+    def _finish_execution(self, entry, execution: Dict, status: str, error: str = ''):
+        execution['status'] = {'success': 'Success', 'cancelled': 'Cancelled'}.get(status, 'Failed')
+        execution['duration_seconds'] = round(
+            (datetime.now() - datetime.fromisoformat(execution['execution_time'])).total_seconds(), 1)
+        if error:
+            execution['error'] = error
+        
+        job = self.scheduled_jobs.get(entry.job_id)
+        if job:
+            job['last_status'] = status
+            if status == 'success':
+                job['success_count'] += 1
+            else:
+                job['failure_count'] += 1
+            self.store.update_job(job['id'], last_status=status, success_count=job['success_count'],
+                                  failure_count=job['failure_count'])
             
+            # Update database
             if self.db:
                 self._update_scheduled_job(job)
+        print(f"{'✅' if status == 'success' else '❌'} Scheduled build {execution['build_id']} finished: {status}")
     
     def _store_scheduled_job(self, job: Dict):
         """Store scheduled job in database"""
@@ -177,10 +458,12 @@ class BuildScheduler:
             
             cursor.execute("""
                 INSERT INTO scheduled_jobs 
-                (job_id, job_name, cron_expression, build_config, created_at, enabled, next_run)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                (job_id, job_name, cron_expression, timezone, priority, misfire_policy, jitter_seconds,
+                 build_config, created_at, enabled, next_run)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (
-                job['id'], job['name'], job['cron_expression'],
+                job['id'], job['name'], job['cron_expression'], job.get('timezone'), job.get('priority', 0),
+                job.get('misfire_policy', 'run_once'), job.get('jitter_seconds', 0),
                 str(job['build_config']), job['created_at'], 
                 job['enabled'], job['next_run']
             ))
@@ -200,11 +483,11 @@ class BuildScheduler:
             cursor.execute("""
                 UPDATE scheduled_jobs 
                 SET last_run = %s, next_run = %s, run_count = %s, 
-                    success_count = %s, failure_count = %s
+                    success_count = %s, failure_count = %s, last_status = %s
                 WHERE job_id = %s
             """, (
                 job['last_run'], job['next_run'], job['run_count'],
-                job['success_count'], job['failure_count'], job['id']
+                job['success_count'], job['failure_count'], job.get('last_status'), job['id']
             ))
             
             conn.commit()
@@ -217,20 +500,87 @@ class BuildScheduler:
         """Get all scheduled jobs"""
         return list(self.scheduled_jobs.values())
     
+    def get_queue(self) -> List[Dict]:
+        """Builds waiting for admission, in the order they will start"""
+        return self.queue.entries()
+    
+    def get_running_builds(self) -> List[Dict]:
+        with self._condition:
+            return [{'name': build['entry'].name, 'build_id': build['build_id'], 'job_id': build['entry'].job_id,
+                     'requirements': self.admission.requirements(build['requirements']),
+                     'started_at': datetime.fromtimestamp(build['started_at']).isoformat()}
+                    for build in self.running_builds.values()]
+    
+    def get_execution_history(self, limit: int = 50) -> List[Dict]:
+        """Most recent scheduled executions first"""
+        return list(reversed(self.execution_history))[:limit]
+    
+    def list_schedules(self) -> List[Dict]:
+        """Scheduled jobs for display, with the build configuration as its name"""
+        schedules = []
+        for job in self.get_scheduled_jobs():
+            schedule = dict(job)
+            config = job.get('build_config')
+            schedule['build_config'] = config.get('config_name', '') if isinstance(config, dict) else str(config or '')
+            schedules.append(schedule)
+        return schedules
+    
+    def add_schedule(self, schedule_data: Dict) -> str:
+        """Create a schedule from the GUI's schedule form; the running scheduler picks it up"""
+        build_config = schedule_data.get('build_config', {})
+        if not isinstance(build_config, dict):
+            build_config = {'config_name': build_config}
+        return self.schedule_build(
+            schedule_data['cron_expression'], build_config, schedule_data.get('name'),
+            timezone_name=schedule_data.get('timezone'), priority=schedule_data.get('priority', 0),
+            misfire_policy=schedule_data.get('misfire_policy', 'run_once'),
+            jitter_seconds=schedule_data.get('jitter_seconds', 0),
+            enabled=schedule_data.get('enabled', True), start=False
+        )
+    
+    def toggle_schedule(self, job_id: str, enabled: bool):
+        if enabled:
+            self.enable_job(job_id)
+        else:
+            self.disable_job(job_id)
+    
+    def toggle_all_schedules(self, enabled: bool) -> int:
+        """Enable or disable every schedule; returns how many changed"""
+        changed = [job_id for job_id, job in self.scheduled_jobs.items() if job['enabled'] != enabled]
+        for job_id in changed:
+            self.toggle_schedule(job_id, enabled)
+        return len(changed)
+    
+    def delete_schedule(self, job_id: str):
+        self.delete_job(job_id)
+    
     def enable_job(self, job_id: str):
         """Enable a scheduled job"""
-        if job_id in self.scheduled_jobs:
-            self.scheduled_jobs[job_id]['enabled'] = True
+        with self._condition:
+            if job_id in self.scheduled_jobs:
+                job = self.scheduled_jobs[job_id]
+                job['enabled'] = True
+                # Runs that fell while it was disabled are not missed
+                job['last_due'] = time.time()
+                self._arm(job)
+                self.store.update_job(job_id, enabled=True, last_due=job['last_due'], next_run=job['next_run'])
+                self._condition.notify_all()
     
     def disable_job(self, job_id: str):
         """Disable a scheduled job"""
-        if job_id in self.scheduled_jobs:
-            self.scheduled_jobs[job_id]['enabled'] = False
+        with self._condition:
+            if job_id in self.scheduled_jobs:
+                self.scheduled_jobs[job_id]['enabled'] = False
+                self._due.pop(job_id, None)
+                self.store.update_job(job_id, enabled=False)
     
     def delete_job(self, job_id: str):
         """Delete a scheduled job"""
         if job_id in self.scheduled_jobs:
-            del self.scheduled_jobs[job_id]
+            with self._condition:
+                del self.scheduled_jobs[job_id]
+                self._due.pop(job_id, None)
+                self.store.delete_job(job_id)
             
             if self.db:
                 try:
@@ -248,7 +598,11 @@ class BuildScheduler:
             job_id = self.schedule_build(
                 schedule_config['cron_expression'],
                 schedule_config['build_config'],
-                schedule_config.get('job_name')
+                schedule_config.get('job_name'),
+                timezone_name=schedule_config.get('timezone'),
+                priority=schedule_config.get('priority', 0),
+                misfire_policy=schedule_config.get('misfire_policy', 'run_once'),
+                jitter_seconds=schedule_config.get('jitter_seconds', 0)
             )
             
             return job_id
@@ -0,0 +1,208 @@
+import os
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Optional, Set
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+MONTH_NAMES = {name: index + 1 for index, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+WEEKDAY_NAMES = {name: index for index, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+def local_timezone() -> tzinfo:
+    """The host's time zone with its DST rules (not just today's UTC offset)"""
+    if ZoneInfo is not None:
+        name = os.environ.get('TZ', '').lstrip(':')
+        try:
+            if name:
+                return ZoneInfo(name)
+            with open('/etc/localtime', 'rb') as f:
+                return ZoneInfo.from_file(f, key='localtime')
+        except (OSError, ValueError, ZoneInfoNotFoundError):
+            pass
+    return datetime.now().astimezone().tzinfo
+
+def get_timezone(name: Optional[str]) -> tzinfo:
+    if not name or name == 'local':
+        return local_timezone()
+    if name.upper() == 'UTC':
+        return timezone.utc
+    if ZoneInfo is None:
+        raise ValueError(f"Time zone {name} needs Python 3.9+ (zoneinfo)")
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+class CronExpression:
+    """A five-field cron expression evaluated in a time zone.
+    
+    Supports ``*``, lists, ranges, steps (``*/15``, ``1-30/5``), month and
+    weekday names, 7 as Sunday and the @daily style macros. As in Vixie cron,
+    a job restricting both day of month and day of week runs when either
+    matches. Around DST changes a job at a fixed hour whose time is skipped
+    runs as soon as the clock has jumped, and one whose time occurs twice runs
+    only the first time; jobs with a wildcard hour follow the wall clock
+    (skipped minutes do not fire, repeated ones fire again).
+    """
+    
+    def __init__(self, expression: str, tz: str = None):
+        self.expression = expression.strip()
+        self.timezone_name = tz
+        self.tz = get_timezone(tz)
+        fields = MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError("Cron expression must have 5 parts: minute hour day month weekday")
+        
+        self.minutes = self._parse_field(fields[0], 0, 59)
+        self.hours = self._parse_field(fields[1], 0, 23)
+        self.days = self._parse_field(fields[2], 1, 31)
+        self.months = self._parse_field(fields[3], 1, 12, MONTH_NAMES)
+        weekdays = self._parse_field(fields[4], 0, 7, WEEKDAY_NAMES)
+        self.weekdays = {day % 7 for day in weekdays}
+        self.day_wildcard = fields[2].startswith('*')
+        self.weekday_wildcard = fields[4].startswith('*')
+        self.hour_wildcard = fields[1].startswith('*')
+        
+        if not any(self._month_has_day(month, day) for month in self.months for day in self.days) \
+                and self.weekday_wildcard:
+            raise ValueError(f"Cron expression never matches: {expression}")
+    
+    @staticmethod
+    def _month_has_day(month: int, day: int) -> bool:
+        return day <= (29 if month == 2 else 30 if month in (4, 6, 9, 11) else 31)
+    
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int, names: dict = None) -> Set[int]:
+        values = set()
+        for part in field.lower().split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                if not step_text.isdigit() or int(step_text) == 0:
+                    raise ValueError(f"Invalid cron step: {field}")
+                step = int(step_text)
+            
+            if part in ('*', '?'):
+                start, end = low, high
+            elif '-' in part:
+                start_text, end_text = part.split('-', 1)
+                start, end = CronExpression._value(start_text, names), CronExpression._value(end_text, names)
+            else:
+                start = CronExpression._value(part, names)
+                # "5/15" means from 5 to the end of the range
+                end = high if step > 1 else start
+            
+            if not (low <= start <= high and low <= end <= high) or start > end:
+                raise ValueError(f"Cron value out of range {low}-{high}: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+    
+    @staticmethod
+    def _value(text: str, names: dict = None) -> int:
+        if names and text in names:
+            return names[text]
+        if not text.isdigit():
+            raise ValueError(f"Invalid cron expression part: {text}")
+        return int(text)
+    
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_wildcard or self.weekday_wildcard:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+    
+    def _next_wall_time(self, start: datetime) -> Optional[datetime]:
+        """First naive wall-clock minute at or after ``start`` matching every field"""
+        moment = start.replace(second=0, microsecond=0)
+        limit = start + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                later = [minute for minute in self.minutes if minute > moment.minute]
+                if later:
+                    moment = moment.replace(minute=min(later))
+                else:
+                    moment = (moment + timedelta(hours=1)).replace(minute=0)
+            else:
+                return moment
+        return None
+    
+    def next_after(self, after: datetime = None) -> Optional[datetime]:
+        """The next firing instant strictly after ``after`` (aware, in this expression's zone)"""
+        after = (after or datetime.now(timezone.utc))
+        if after.tzinfo is None:
+            after = after.replace(tzinfo=self.tz)
+        after = after.astimezone(self.tz)
+        wall = after.replace(tzinfo=None, second=0, microsecond=0)
+        # Aware datetimes sharing a tzinfo compare by wall time, ignoring fold; compare in UTC
+        after_utc = after.astimezone(timezone.utc)
+        
+        upcoming = self._scan(after_utc, wall + timedelta(minutes=1))
+        if self.hour_wildcard and after.fold == 0 and self._ambiguous(wall):
+            # The clock is about to fall back: the repeated wall times come around again
+            transition = wall
+            while self._ambiguous(transition):
+                transition += timedelta(minutes=1)
+            shift = after.replace(fold=0).utcoffset() - after.replace(fold=1).utcoffset()
+            repeated = self._next_wall_time(transition - shift)
+            if repeated is not None and repeated < transition:
+                second_pass = repeated.replace(tzinfo=self.tz, fold=1)
+                if upcoming is None or second_pass.astimezone(timezone.utc) < upcoming.astimezone(timezone.utc):
+                    return second_pass
+        return upcoming
+    
+    def _ambiguous(self, wall: datetime) -> bool:
+        return wall.replace(tzinfo=self.tz, fold=0).utcoffset() != wall.replace(tzinfo=self.tz, fold=1).utcoffset()
+    
+    def _scan(self, after_utc: datetime, start: datetime) -> Optional[datetime]:
+        candidate = self._next_wall_time(start)
+        while candidate is not None:
+            first = candidate.replace(tzinfo=self.tz, fold=0)
+            
+            if first.astimezone(timezone.utc).astimezone(self.tz).replace(tzinfo=None) != candidate:
+                # Skipped by a spring-forward jump; fixed-hour jobs run once the clock has jumped
+                if not self.hour_wildcard:
+                    return self._end_of_gap(candidate)
+            elif self._ambiguous(candidate):
+                # Repeated by a fall-back change: the first pass always fires, the
+                # second one only for wildcard hours
+                if first.astimezone(timezone.utc) > after_utc:
+                    return first
+                second = candidate.replace(tzinfo=self.tz, fold=1)
+                if self.hour_wildcard and second.astimezone(timezone.utc) > after_utc:
+                    return second
+            elif first.astimezone(timezone.utc) > after_utc:
+                return first
+            candidate = self._next_wall_time(candidate + timedelta(minutes=1))
+        return None
+    
+    def _end_of_gap(self, wall: datetime) -> datetime:
+        moment = wall
+        while True:
+            moment = (moment + timedelta(minutes=1)).replace(second=0)
+            aware = moment.replace(tzinfo=self.tz)
+            if aware.astimezone(timezone.utc).astimezone(self.tz).replace(tzinfo=None) == moment:
+                return aware
+    
+    def describe(self) -> str:
+        return f"{self.expression} ({self.timezone_name or 'local time'})"
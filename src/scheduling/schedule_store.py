@@ -0,0 +1,121 @@
+import os
+import json
+import fcntl
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+SCHEDULER_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lfs-build', 'scheduler')
+
+@contextmanager
+def file_lock(path: Path, exclusive: bool = True):
+    """Hold an flock on ``path`` (created if needed) for the duration of the block"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def write_json_atomic(path: Path, data):
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    temp_path.write_text(json.dumps(data, indent=2, default=str))
+    os.replace(temp_path, path)
+
+class ScheduleStore:
+    """Scheduled jobs on disk, shared by every BuildScheduler on the host
+    
+    The GUI creates short-lived schedulers to list and edit schedules while a
+    long-running one fires them, so every change is a locked read-modify-write
+    of ``schedules.json`` and the running scheduler reloads the file when
+    someone else has written it. Only one scheduler per host fires jobs: the
+    one holding the leader lock.
+    """
+    
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.path.join(SCHEDULER_DIR, 'schedules.json'))
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.leader_path = self.path.with_name(self.path.name + '.leader')
+        self._seen = None
+        self._stale = False
+        self._leader_file = None
+    
+    def _stamp(self):
+        try:
+            stat = self.path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            return json.loads(self.path.read_text()).get('jobs', {})
+        except (OSError, ValueError):
+            return {}
+    
+    def _write(self, jobs: Dict[str, Dict]):
+        if self._stamp() != self._seen:
+            # Someone else wrote since we last loaded; make sure we reload too
+            self._stale = True
+        write_json_atomic(self.path, {'jobs': jobs})
+        self._seen = self._stamp()
+    
+    def load(self) -> Dict[str, Dict]:
+        with file_lock(self.lock_path, exclusive=False):
+            jobs = self._read()
+            self._seen = self._stamp()
+            self._stale = False
+        return jobs
+    
+    def changed(self) -> bool:
+        """Whether another scheduler has written the file since our last load"""
+        return self._stale or self._stamp() != self._seen
+    
+    def save_job(self, job: Dict):
+        with file_lock(self.lock_path):
+            jobs = self._read()
+            jobs[job['id']] = job
+            self._write(jobs)
+    
+    def update_job(self, job_id: str, **fields) -> Optional[Dict]:
+        """Change some fields of a job; returns the stored job, or None if it is gone"""
+        with file_lock(self.lock_path):
+            jobs = self._read()
+            if job_id not in jobs:
+                return None
+            jobs[job_id].update(fields)
+            self._write(jobs)
+            return jobs[job_id]
+    
+    def delete_job(self, job_id: str) -> bool:
+        with file_lock(self.lock_path):
+            jobs = self._read()
+            if jobs.pop(job_id, None) is None:
+                return False
+            self._write(jobs)
+            return True
+    
+    def acquire_leader(self) -> bool:
+        """Become the scheduler that fires jobs on this host"""
+        if self._leader_file is not None:
+            return True
+        self.leader_path.parent.mkdir(parents=True, exist_ok=True)
+        leader_file = open(self.leader_path, 'a+')
+        try:
+            fcntl.flock(leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            leader_file.close()
+            return False
+        leader_file.seek(0)
+        leader_file.truncate()
+        leader_file.write(f"{os.getpid()}\n")
+        leader_file.flush()
+        self._leader_file = leader_file
+        return True
+    
+    def release_leader(self):
+        if self._leader_file is not None:
+            fcntl.flock(self._leader_file, fcntl.LOCK_UN)
+            self._leader_file.close()
+            self._leader_file = None
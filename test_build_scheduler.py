@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify cron evaluation, the build queue and admission control
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from scheduling.cron import CronExpression
+from scheduling.build_scheduler import BuildScheduler
+
+class FakeEngine:
+    """Stands in for BuildEngine: runs a 'build' for a moment and emits its outcome"""
+    
+    def __init__(self, status='success', duration=0.3):
+        self.build_thread = None
+        self.callbacks = {'build_complete': [], 'build_error': []}
+        self.status = status
+        self.duration = duration
+        self.started = []
+    
+    def register_callback(self, event, callback):
+        self.callbacks[event].append(callback)
+    
+    def start_build(self, config_path, config_name):
+        build_id = f"build-{len(self.started) + 1}"
+        self.started.append(config_name)
+        
+        def run():
+            time.sleep(self.duration)
+            event = 'build_complete' if self.status != 'failed' else 'build_error'
+            for callback in self.callbacks[event]:
+                callback({'build_id': build_id, 'status': self.status})
+        
+        self.build_thread = threading.Thread(target=run, daemon=True)
+        self.build_thread.start()
+        return build_id
+
+def make_scheduler(work_dir, engine, **options):
+    options.setdefault('default_cores', 1)
+    options.setdefault('default_memory_gb', 0.1)
+    options.setdefault('default_disk_gb', 0.1)
+    options.setdefault('memory_reserve_gb', 0)
+    options.setdefault('state_path', os.path.join(work_dir, 'schedules.json'))
+    return BuildScheduler(None, engine, dict(options, queue_path=os.path.join(work_dir, 'queue.json')))
+
+def test_cron_across_dst():
+    """Test next-run times around daylight saving changes"""
+    print("🧪 Testing cron evaluation across DST changes...")
+    
+    try:
+        utc = timezone.utc
+        nightly = CronExpression('30 2 * * *', 'America/New_York')
+        # 2:30 does not exist on 2024-03-10: runs when the clock jumps to 3:00
+        spring = nightly.next_after(datetime(2024, 3, 10, 6, 0, tzinfo=utc))
+        # 1:30 happens twice on 2024-11-03: a fixed-hour job runs only the first time
+        once = CronExpression('30 1 * * *', 'America/New_York')
+        first = once.next_after(datetime(2024, 11, 3, 5, 0, tzinfo=utc))
+        after_first = once.next_after(first)
+        # Wildcard hours follow the wall clock and fire in both passes
+        half_hourly = CronExpression('30 * * * *', 'America/New_York')
+        second_pass = half_hourly.next_after(first)
+        # Every step of a wildcard-hour job fires in both passes, 01:30 EST included
+        every_half_hour = CronExpression('*/30 * * * *', 'America/New_York')
+        fall_back = [datetime(2024, 11, 3, 4, 45, tzinfo=utc)]
+        for _ in range(5):
+            fall_back.append(every_half_hour.next_after(fall_back[-1]))
+        fall_back_utc = [moment.astimezone(utc).strftime('%H:%M') for moment in fall_back[1:]]
+        
+        if (spring.astimezone(utc) == datetime(2024, 3, 10, 7, 0, tzinfo=utc)
+                and first.astimezone(utc) == datetime(2024, 11, 3, 5, 30, tzinfo=utc)
+                and after_first.astimezone(utc) == datetime(2024, 11, 4, 6, 30, tzinfo=utc)
+                and second_pass.astimezone(utc) == datetime(2024, 11, 3, 6, 30, tzinfo=utc)
+                and fall_back_utc == ['05:00', '05:30', '06:00', '06:30', '07:00']):
+            print("✅ Skipped time runs after the jump, repeated time runs once for fixed hours")
+            return True
+        else:
+            print(f"❌ Unexpected DST times: {spring}, {first}, {after_first}, {second_pass}, {fall_back_utc}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing cron: {e}")
+        return False
+
+def test_priority_and_admission():
+    """Test that queued builds start by priority once resources allow"""
+    print("\n🧪 Testing priority queue and admission control...")
+    
+    work_dir = tempfile.mkdtemp()
+    engine = FakeEngine()
+    scheduler = make_scheduler(work_dir, engine, default_disk_gb=10 ** 6)
+    try:
+        scheduler.enqueue_build({'config_name': 'low'}, priority=0)
+        scheduler.enqueue_build({'config_name': 'high'}, priority=5)
+        time.sleep(1)
+        held = scheduler.get_queue()
+        
+        # Make room: the builds no longer need an impossible amount of disk
+        scheduler.admission.defaults['disk_gb'] = 0.1
+        with scheduler._condition:
+            scheduler._condition.notify_all()
+        deadline = time.time() + 10
+        while len(engine.started) < 2 and time.time() < deadline:
+            time.sleep(0.1)
+        
+        if (len(held) == 2 and 'GB' in held[0]['last_deferral'] and engine.started == ['high', 'low']):
+            print("✅ Builds held for disk space, then started highest priority first")
+            return True
+        else:
+            print(f"❌ Unexpected admission order: {engine.started}, {held}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing admission: {e}")
+        return False
+    finally:
+        scheduler.stop_scheduler()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_outcome_tracking():
+    """Test that schedule statistics follow the build's real result"""
+    print("\n🧪 Testing scheduled build outcome tracking...")
+    
+    work_dir = tempfile.mkdtemp()
+    engine = FakeEngine(status='failed')
+    scheduler = make_scheduler(work_dir, engine)
+    try:
+        job_id = scheduler.schedule_build('0 3 * * *', {'config_name': 'nightly'}, 'Nightly', timezone_name='UTC')
+        # Pretend the timer expired after a day
+        with scheduler._condition:
+            job = scheduler.scheduled_jobs[job_id]
+            job['last_due'] = time.time() - 86400
+            scheduler._due[job_id] = time.time()
+            scheduler._timers.append((scheduler._due[job_id], job_id))
+            scheduler._condition.notify_all()
+        deadline = time.time() + 10
+        while job['failure_count'] == 0 and time.time() < deadline:
+            time.sleep(0.1)
+        
+        history = scheduler.get_execution_history()
+        if (job['run_count'] == 1 and job['success_count'] == 0 and job['failure_count'] == 1
+                and history and history[0]['status'] == 'Failed' and job['next_run'].endswith('+00:00')):
+            print("✅ Failed build counted as a failure, next run re-armed")
+            return True
+        else:
+            print(f"❌ Unexpected job statistics: {job}, {history}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing outcome tracking: {e}")
+        return False
+    finally:
+        scheduler.stop_scheduler()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_misfire_policies_after_restart():
+    """Test that schedules survive a restart and missed runs follow the job's policy"""
+    print("\n🧪 Testing durable schedules and misfire policies...")
+    
+    work_dir = tempfile.mkdtemp()
+    schedulers = []
+    try:
+        started = {}
+        for policy in ('skip', 'run_once', 'run_all'):
+            state_dir = os.path.join(work_dir, policy)
+            # No grace period, so a run that just fell due counts as missed too
+            options = {'state_path': os.path.join(state_dir, 'schedules.json'), 'misfire_grace_seconds': 0}
+            # Created by a short-lived scheduler (as the GUI does), then "down" for 20 minutes
+            editor = make_scheduler(state_dir, None, **options)
+            job_id = editor.add_schedule({'name': policy, 'cron_expression': '*/2 * * * *',
+                                          'build_config': 'nightly', 'timezone': 'UTC', 'misfire_policy': policy})
+            editor.store.update_job(job_id, last_due=time.time() - 1200)
+            
+            engine = FakeEngine(duration=0.05)
+            scheduler = make_scheduler(state_dir, engine, **options)
+            schedulers.append(scheduler)
+            scheduler.start_scheduler()
+            # A second scheduler on the same state must not fire the jobs again
+            duplicate = make_scheduler(state_dir, FakeEngine(), **options)
+            duplicate.start_scheduler()
+            started[policy] = engine
+        
+        deadline = time.time() + 15
+        while len(started['run_all'].started) < 10 and time.time() < deadline:
+            time.sleep(0.1)
+        time.sleep(0.5)
+        counts = {policy: len(engine.started) for policy, engine in started.items()}
+        
+        if counts == {'skip': 0, 'run_once': 1, 'run_all': 10} and not any(s.running for s in [duplicate]):
+            print("✅ Missed runs skipped, run once and caught up; duplicate scheduler stayed idle")
+            return True
+        else:
+            print(f"❌ Unexpected catch-up runs: {counts}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing misfire policies: {e}")
+        return False
+    finally:
+        for scheduler in schedulers:
+            scheduler.stop_scheduler()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all build scheduler tests"""
+    print("🕐 Testing LFS Build System Scheduler\n")
+    
+    tests = [
+        test_cron_across_dst,
+        test_priority_and_admission,
+        test_outcome_tracking,
+        test_misfire_policies_after_restart
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All scheduler tests passed!")
+        return 0
+    else:
+        print("⚠️ Some scheduler tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify DAG execution, step timeouts/retries and job caches in the CI/CD pipeline engine
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cicd.pipeline_engine import PipelineEngine
+from cicd.git_integration import GitIntegration, spool_file_name
+
+class FakeDatabase:
+    """Accepts every query and counts the log inserts; the engine only needs execute_query"""
+    
+    def __init__(self):
+        self.log_inserts = 0
+        self.log_rows = 0
+        self.pipelines = []
+    
+    def execute_query(self, query, params=None, fetch=False):
+        if 'FROM cicd_pipelines' in query and fetch:
+            return self.pipelines
+        if 'INSERT INTO cicd_job_logs' in query:
+            self.log_inserts += 1
+            self.log_rows += len(params) // 4
+        return [] if fetch else 1
+
+class FakeRepository:
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+
+def make_engine(work_dir):
+    return PipelineEngine(FakeDatabase(), FakeRepository(work_dir), max_parallel=4,
+                          cache_dir=os.path.join(work_dir, '.cache'), log_dir=os.path.join(work_dir, '.logs'))
+
+def test_independent_jobs_run_in_parallel():
+    """Test that independent jobs take as long as the longest one"""
+    print("🧪 Testing DAG-parallel job execution...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        engine = make_engine(work_dir)
+        config = {'stages': [
+            {'name': 'check', 'jobs': [
+                {'name': 'lint', 'steps': [{'run': 'sleep 1 && echo lint >> order.txt'}]},
+                {'name': 'unit-test', 'steps': [{'run': 'sleep 1.5 && echo test >> order.txt'}]}
+            ]},
+            {'name': 'release', 'jobs': [
+                # Needs nothing: starts with the check stage instead of after it
+                {'name': 'package', 'needs': [], 'steps': [{'run': 'sleep 1 && echo package >> order.txt'}]},
+                {'name': 'publish', 'needs': ['unit-test', 'package'], 'steps': [{'run': 'echo publish >> order.txt'}]}
+            ]}
+        ]}
+        
+        started = time.time()
+        jobs = engine.plan_jobs(config)
+        success = engine.execute_job_graph('run-1', jobs)
+        elapsed = time.time() - started
+        with open(os.path.join(work_dir, 'order.txt')) as f:
+            order = f.read().split()
+        
+        if success and elapsed < 2.5 and order[-1] == 'publish' and len(order) == 4:
+            print(f"✅ Four jobs finished in {elapsed:.1f}s, publish after its needs")
+            return True
+        else:
+            print(f"❌ Unexpected DAG run: success={success}, {elapsed:.1f}s, order={order}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing DAG execution: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_timeouts_retries_and_skips():
+    """Test step timeouts, retries and skipping the dependents of a failed job"""
+    print("\n🧪 Testing step timeouts, retries and failure propagation...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        engine = make_engine(work_dir)
+        config = {'jobs': [
+            # Fails the first time, passes on the retry
+            {'name': 'flaky', 'needs': [], 'steps': [{'run': 'test -f tried || { touch tried; exit 1; }', 'retries': 1}]},
+            {'name': 'hangs', 'needs': [], 'steps': [{'run': 'sleep 30', 'timeout': 1}]},
+            {'name': 'after-hang', 'needs': ['hangs'], 'steps': [{'run': 'true'}]}
+        ]}
+        
+        started = time.time()
+        jobs = engine.plan_jobs(config)
+        success = engine.execute_job_graph('run-2', jobs)
+        statuses = {job['name']: job['status'] for job in jobs}
+        
+        if (not success and time.time() - started < 10 and
+                statuses == {'flaky': 'success', 'hangs': 'failed', 'after-hang': 'skipped'}):
+            print("✅ Flaky step passed on retry, hung step killed, its dependent skipped")
+            return True
+        else:
+            print(f"❌ Unexpected job states: {statuses}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing timeouts: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_job_cache_restored_between_runs():
+    """Test that a job cache keyed by its inputs is restored in the next run"""
+    print("\n🧪 Testing job-level caches...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        engine = make_engine(work_dir)
+        with open(os.path.join(work_dir, 'deps.lock'), 'w') as f:
+            f.write("toolchain==1\n")
+        job = {'name': 'deps', 'needs': [],
+               'cache': {'inputs': ['deps.lock'], 'paths': ['vendor']},
+               'steps': [{'run': 'test -d vendor && echo hit > result.txt || '
+                                 '{ mkdir vendor && echo built > vendor/pkg && echo miss > result.txt; }'}]}
+        
+        results = []
+        for _ in range(2):
+            engine.execute_job_graph('run', engine.plan_jobs({'jobs': [job]}))
+            with open(os.path.join(work_dir, 'result.txt')) as f:
+                results.append(f.read().strip())
+            shutil.rmtree(os.path.join(work_dir, 'vendor'))
+        
+        # A changed input starts from an empty cache
+        with open(os.path.join(work_dir, 'deps.lock'), 'w') as f:
+            f.write("toolchain==2\n")
+        engine.execute_job_graph('run', engine.plan_jobs({'jobs': [job]}))
+        with open(os.path.join(work_dir, 'result.txt')) as f:
+            results.append(f.read().strip())
+        
+        if results == ['miss', 'hit', 'miss']:
+            print("✅ Cache saved, restored on the next run and invalidated by its input")
+            return True
+        else:
+            print(f"❌ Unexpected cache results: {results}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing job cache: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_job_log_sink():
+    """Test that a chatty job is logged without a query per line and can be read by range"""
+    print("\n🧪 Testing the job log sink...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        engine = PipelineEngine(FakeDatabase(), FakeRepository(work_dir), cache_dir=os.path.join(work_dir, '.cache'),
+                                log_dir=os.path.join(work_dir, 'logs'))
+        job = {'name': 'chatty', 'steps': [{'run': 'seq 1 100000; echo oops >&2; exit 3'}]}
+        
+        started = time.time()
+        engine.execute_job('run-3', 'test', job, 0)
+        elapsed = time.time() - started
+        engine.log_sink.stop()
+        
+        job_id = os.path.basename(os.listdir(os.path.join(work_dir, 'logs'))[0]).split('.')[0]
+        window = engine.get_job_logs(job_id, start=50002, limit=3)
+        followed = sum(1 for _ in engine.follow_job_logs(job_id))
+        db = engine.db
+        
+        if ([entry['message'] for entry in window] == ['50000', '50001', '50002']
+                and followed == engine.log_sink.line_count(job_id) > 100000
+                and db.log_inserts <= 2 and db.log_rows == 2 and elapsed < 15):
+            print(f"✅ 100k lines logged in {elapsed:.1f}s with {db.log_inserts} database insert(s)")
+            return True
+        else:
+            print(f"❌ Unexpected log sink behaviour: {window}, {followed} lines, {db.log_inserts} inserts")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing log sink: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_change_aware_triggers():
+    """Test path filters on pipelines and jobs, and collapsing a burst of pushes"""
+    print("\n🧪 Testing change-aware pipeline triggers...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        def git(*args):
+            return subprocess.run(['git', *args], cwd=work_dir, capture_output=True, text=True, check=True).stdout.strip()
+        
+        def commit(path):
+            os.makedirs(os.path.dirname(os.path.join(work_dir, path)) or work_dir, exist_ok=True)
+            with open(os.path.join(work_dir, path), 'a') as f:
+                f.write("change\n")
+            git('add', path)
+            git('-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', path)
+            return git('rev-parse', 'HEAD')
+        
+        git('init', '-q')
+        base = commit('src/start.c')
+        
+        engine = make_engine(work_dir)
+        engine.db.pipelines = [{'id': 'heavy', 'name': 'full-build', 'config_path': ''}]
+        engine.pipeline_configs['heavy'] = {
+            'triggers': {'push': {'branches': ['main', 'release/*'], 'paths_ignore': ['docs/**', '*.md']}},
+            'jobs': [
+                {'name': 'compile', 'steps': [{'run': 'true'}]},
+                {'name': 'scripts', 'changes': ['scripts/'], 'steps': [{'run': 'true'}]},
+                {'name': 'sources', 'changes': 'src/', 'steps': [{'run': 'true'}]},
+                {'name': 'manual', 'changes': 'docs/', 'steps': [{'run': 'true'}]}
+            ]
+        }
+        integration = GitIntegration(engine, engine.repo_manager, debounce_seconds=0,
+                                     spool_dir=os.path.join(work_dir, '.spool'))
+        integration.last_triggered['main'] = base
+        
+        # Documentation only: nothing heavy runs
+        integration.notify_push('main', commit('docs/guide.md'))
+        docs_runs = integration.process_pending_triggers()
+        
+        # A burst of three pushes: one run for the newest commit covering all three changes
+        for path in ('src/a.c', 'src/b.c', 'README.md'):
+            newest = commit(path)
+            integration.notify_push('main', newest)
+        burst_runs = integration.process_pending_triggers()
+        spool_left = [name for name in os.listdir(integration.spool_dir) if name != 'state']
+        trigger = engine.active_pipelines[burst_runs[0]] if burst_runs else None
+        
+        planned = engine.plan_jobs(engine.pipeline_configs['heavy'], ['src/a.c'])
+        statuses = {job['name']: job['status'] for job in planned}
+        
+        if (docs_runs == [] and len(burst_runs) == 1 and trigger is not None
+                and spool_file_name('feature/x') != spool_file_name('feature_x')
+                and integration.last_triggered['main'] == newest
+                and spool_left == []
+                and statuses == {'compile': 'pending', 'scripts': 'filtered',
+                                 'sources': 'pending', 'manual': 'filtered'}):
+            print("✅ Docs-only commit skipped, burst collapsed to one run, unrelated job filtered")
+            return True
+        else:
+            print(f"❌ Unexpected triggers: docs={docs_runs}, burst={burst_runs}, jobs={statuses}, "
+                  f"spool={spool_left}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing triggers: {e}")
+        return False
+    finally:
+        time.sleep(0.5)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all CI/CD pipeline tests"""
+    print("🚀 Testing LFS Build System CI/CD Pipelines\n")
+    
+    tests = [
+        test_independent_jobs_run_in_parallel,
+        test_timeouts_retries_and_skips,
+        test_job_cache_restored_between_runs,
+        test_job_log_sink,
+        test_change_aware_triggers
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All CI/CD pipeline tests passed!")
+        return 0
+    else:
+        print("⚠️ Some CI/CD pipeline tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
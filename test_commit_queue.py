@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify batched, asynchronous repository commits
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from repository.commit_queue import CommitQueue
+
+class FakeRepository:
+    """Records repository writes in order; each commit is slow, as on a large tree"""
+    
+    def __init__(self, commit_seconds=0.3):
+        self.commit_seconds = commit_seconds
+        self.branch = 'main'
+        self.operations = []
+        self.commits = []
+        self.threads = set()
+    
+    def commit_to_branch(self, branch, message, paths=None, work_tree=None):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.commit_seconds)
+        commit_hash = f"{len(self.commits) + 1:040x}"
+        self.commits.append((branch or self.branch, message, commit_hash))
+        self.operations.append(('commit', branch or self.branch, tuple(paths) if paths is not None else None))
+        return commit_hash
+    
+    def create_tag(self, name, message="", commit=None):
+        self.operations.append(('tag', name, commit))
+        return True
+
+def test_stages_coalesced_off_thread():
+    """Test that a build's stage commits become one commit written by the worker"""
+    print("🧪 Testing coalescing of stage commits...")
+    
+    repo = FakeRepository()
+    queue = CommitQueue(repo, flush_interval=60)
+    try:
+        started = time.time()
+        for order in range(1, 21):
+            queue.record(f"✅ Stage {order}: stage-{order} - success", build_id='build-1', branch='build/build-1')
+        queue.record("🎉 Build build-1 - SUCCESS", build_id='build-1', branch='build/build-1')
+        queue.flush('build-1')
+        queue.tag('build-build-1-success', 'Successful LFS build build-1', build_id='build-1')
+        recorded = time.time() - started
+        queue.drain(timeout=10)
+        
+        branch, message, commit_hash = repo.commits[0] if repo.commits else (None, '', None)
+        if (len(repo.commits) == 1 and branch == 'build/build-1' and recorded < 0.1
+                and 'Build-ID: build-1' in message and 'Stage 7: stage-7' in message
+                and message.startswith('🎉 Build build-1 - SUCCESS (+20 earlier updates)')
+                and repo.operations[-1] == ('tag', 'build-build-1-success', commit_hash)
+                and repo.threads == {'repo-commit-queue'}):
+            print(f"✅ 21 updates queued in {recorded * 1000:.1f}ms and written as 1 tagged commit")
+            return True
+        else:
+            print(f"❌ Unexpected commits: {repo.commits}, {repo.operations}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing coalescing: {e}")
+        return False
+    finally:
+        queue.stop()
+
+def test_ordering_and_package_hashes():
+    """Test that builds and downloads commit in order on their own branches"""
+    print("\n🧪 Testing commit ordering across branches...")
+    
+    repo = FakeRepository(commit_seconds=0.05)
+    queue = CommitQueue(repo, flush_interval=60)
+    try:
+        hashes = {}
+        queue.record("✅ Stage 1: binutils - success", build_id='build-1', branch='build/build-1')
+        for package in ('gcc-13.2.0', 'glibc-2.39'):
+            queue.record(f"Add {package} to LFS 12.1 sources", branch='sources-12.1',
+                         paths=[f"sources/12.1/{package}.tar.xz"],
+                         on_commit=lambda commit_hash, package=package: hashes.__setitem__(package, commit_hash))
+        queue.record("❌ Stage 2: gcc - failed", build_id='build-1', branch='build/build-1')
+        queue.drain(timeout=10)
+        
+        expected = [
+            ('commit', 'build/build-1', None),
+            ('commit', 'sources-12.1', ('sources/12.1/gcc-13.2.0.tar.xz', 'sources/12.1/glibc-2.39.tar.xz'))
+        ]
+        source_hash = repo.commits[1][2] if len(repo.commits) > 1 else None
+        # Commits go straight onto their branches; the checked-out branch never changes
+        if (repo.operations == expected and repo.branch == 'main' and 'Stage 2: gcc' in repo.commits[0][1]
+                and hashes == {'gcc-13.2.0': source_hash, 'glibc-2.39': source_hash}):
+            print("✅ Build and download batches committed in order with package commit hashes reported")
+            return True
+        else:
+            print(f"❌ Unexpected ordering: {repo.operations}, {hashes}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing ordering: {e}")
+        return False
+    finally:
+        queue.stop()
+
+def test_timer_and_size_flush():
+    """Test that open batches are committed after the flush interval or when full"""
+    print("\n🧪 Testing timed and size-triggered flushes...")
+    
+    repo = FakeRepository(commit_seconds=0.01)
+    queue = CommitQueue(repo, flush_interval=0.5, max_pending=5)
+    try:
+        for order in range(5):
+            queue.record(f"Add package-{order}", branch='sources-12.1', paths=[f"package-{order}.tar.xz"])
+        time.sleep(0.2)
+        full_batch_committed = len(repo.commits) == 1
+        
+        queue.record("✅ Stage 1: binutils - success", build_id='build-2', branch='build/build-2')
+        time.sleep(0.2)
+        before_interval = len(repo.commits)
+        time.sleep(0.8)
+        
+        if full_batch_committed and before_interval == 1 and len(repo.commits) == 2:
+            print("✅ Full batch committed at once, partial batch committed by the timer")
+            return True
+        else:
+            print(f"❌ Unexpected flushes: {len(repo.commits)} commits, {repo.operations}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing flushes: {e}")
+        return False
+    finally:
+        queue.stop()
+
+class FakeDatabase:
+    """Accepts every query; inserts get increasing ids"""
+    
+    def __init__(self):
+        self.last_id = 0
+    
+    def execute_query(self, query, params=None, fetch=False, return_id=False):
+        if return_id:
+            self.last_id += 1
+            return self.last_id
+        return [] if fetch else 1
+
+def test_source_commits_stay_off_build_branch():
+    """Test with real Git that a package committed to its sources branch never lands in a build branch"""
+    print("\n🧪 Testing source and build commits in a real repository...")
+    
+    from src.repository.repo_manager import RepositoryManager
+    from src.repository.source_repo_manager import SourceRepositoryManager
+    import git
+    
+    work_dir = tempfile.mkdtemp()
+    repo = None
+    try:
+        repo_path = os.path.join(work_dir, 'repo')
+        def run_git(*args):
+            return subprocess.run(['git', *args], cwd=repo_path, capture_output=True, text=True, check=True).stdout
+        
+        os.makedirs(repo_path)
+        run_git('init', '-q', '-b', 'main')
+        run_git('config', 'user.name', 'test')
+        run_git('config', 'user.email', 'test@example.com')
+        run_git('commit', '-q', '--allow-empty', '-m', 'init')
+        run_git('checkout', '-q', '-b', 'build/x')
+        
+        # Only what commit_to_branch needs; the rest of the manager wants MySQL and settings
+        repo = RepositoryManager.__new__(RepositoryManager)
+        repo.db = FakeDatabase()
+        repo.repo_path = repo_path
+        repo.git_repo = git.Repo(repo_path)
+        repo.search_index = None
+        repo.commit_queue = CommitQueue(repo, flush_interval=60)
+        sources = SourceRepositoryManager(FakeDatabase(), repo)
+        
+        tarball = os.path.join(work_dir, 'gcc-13.2.0.tar.xz')
+        with open(tarball, 'wb') as f:
+            f.write(os.urandom(4096))
+        added = sources.add_package_to_repository('12.4', 'gcc-13.2.0', tarball, {})
+        
+        with open(os.path.join(repo_path, 'build.log'), 'w') as f:
+            f.write("stage 1 done\n")
+        repo.commit_queue.record("✅ Stage 1: binutils - success", build_id='x', branch='build/x')
+        repo.commit_queue.drain(timeout=30)
+        
+        build_files = run_git('ls-tree', '-r', '--name-only', 'build/x').split()
+        source_files = run_git('ls-tree', '-r', '--name-only', 'sources-12.4').split()
+        pointer = run_git('show', 'sources-12.4:sources/12.4/gcc-13.2.0.tar.xz')
+        head = run_git('rev-parse', '--abbrev-ref', 'HEAD').strip()
+        status = run_git('status', '--porcelain')
+        
+        if (added and build_files == ['build.log'] and head == 'build/x' and status == ''
+                and 'sources/12.4/README.md' in source_files
+                and sources.store.parse_pointer(pointer) is not None
+                and not os.path.exists(os.path.join(repo_path, 'sources', '12.4'))):
+            print("✅ Package pointer committed to sources-12.4 only; build branch and HEAD untouched")
+            return True
+        else:
+            print(f"❌ Unexpected trees: build/x={build_files}, sources-12.4={source_files}, HEAD={head}, "
+                  f"status={status!r}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing real commits: {e}")
+        return False
+    finally:
+        if repo is not None:
+            repo.commit_queue.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all commit queue tests"""
+    print("🗂️ Testing LFS Build System Commit Queue\n")
+    
+    tests = [
+        test_stages_coalesced_off_thread,
+        test_ordering_and_package_hashes,
+        test_timer_and_size_flush,
+        test_source_commits_stay_off_build_branch
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All commit queue tests passed!")
+        return 0
+    else:
+        print("⚠️ Some commit queue tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify distributed build workers on a single host
+"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from orchestration.work_coordinator import WorkCoordinator
+from orchestration.parallel_builder import ParallelBuildEngine, TaskStatus
+from orchestration.worker_agent import WorkerAgent
+
+def start_coordinator(work_dir, workers):
+    coordinator = WorkCoordinator(artifact_root=os.path.join(work_dir, 'artifacts'),
+                                  log_dir=os.path.join(work_dir, 'logs'),
+                                  lease_seconds=5, heartbeat_interval=1)
+    port = coordinator.start('127.0.0.1', 0)
+    coordinator.spawn_local_workers(workers, port, ['lfs'], work_root=os.path.join(work_dir, 'workers'))
+    return coordinator
+
+def test_throughput_scales_with_workers():
+    """Test that independent jobs spread across worker processes"""
+    print("🧪 Testing job throughput with 3 local workers...")
+    
+    work_dir = tempfile.mkdtemp()
+    coordinator = start_coordinator(work_dir, 3)
+    try:
+        started = time.time()
+        job_ids = [coordinator.submit(f"package-{i}", "sleep 2", labels=['lfs']) for i in range(6)]
+        statuses = coordinator.wait(job_ids, timeout=60)
+        elapsed = time.time() - started
+        
+        workers = {coordinator.get_job(job_id)['worker_id'] for job_id in job_ids}
+        if all(status == 'success' for status in statuses.values()) and len(workers) == 3 and elapsed < 10:
+            print(f"✅ 6 jobs of 2s finished in {elapsed:.1f}s on {len(workers)} workers")
+            return True
+        else:
+            print(f"❌ Jobs did not spread: {statuses}, {len(workers)} workers, {elapsed:.1f}s")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing throughput: {e}")
+        return False
+    finally:
+        coordinator.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_artifacts_and_logs():
+    """Test that inputs, outputs and streamed logs travel through the coordinator"""
+    print("\n🧪 Testing artifact transfer and log streaming...")
+    
+    work_dir = tempfile.mkdtemp()
+    coordinator = start_coordinator(work_dir, 2)
+    try:
+        source = os.path.join(work_dir, 'input.txt')
+        with open(source, 'w') as f:
+            f.write("linux from scratch\n")
+        digest = coordinator.artifacts.put_file(source)
+        
+        producer = coordinator.submit("produce", "cat input.txt; tr a-z A-Z < input.txt > output.txt",
+                                      inputs={'input.txt': digest}, outputs=['output.txt'])
+        coordinator.wait([producer], timeout=30)
+        job = coordinator.get_job(producer)
+        output_digest = job['artifacts'].get('output.txt')
+        
+        # A dependent job consumes the first job's output on whichever worker it lands
+        consumer = coordinator.submit("consume", "grep -q 'LINUX FROM SCRATCH' output.txt",
+                                      inputs={'output.txt': output_digest}, depends_on=[producer])
+        coordinator.wait([consumer], timeout=30)
+        
+        log = coordinator.job_log_path(producer).read_text()
+        if (job['status'] == 'success' and coordinator.get_job(consumer)['status'] == 'success'
+                and 'linux from scratch' in log):
+            print("✅ Output artifact uploaded, consumed by a dependent job and log streamed")
+            return True
+        else:
+            print(f"❌ Artifact or log transfer failed: {job}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing artifacts: {e}")
+        return False
+    finally:
+        coordinator.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_retry_timeout_and_labels():
+    """Test retries of failed jobs, timeouts and capability matching"""
+    print("\n🧪 Testing retries, timeouts and worker labels...")
+    
+    work_dir = tempfile.mkdtemp()
+    coordinator = start_coordinator(work_dir, 2)
+    try:
+        failing = coordinator.submit("failing", "exit 3", max_attempts=2)
+        slow = coordinator.submit("slow", "sleep 60", timeout=2)
+        unmatched = coordinator.submit("needs-gpu", "true", labels=['gpu'])
+        coordinator.wait([failing, slow], timeout=40)
+        
+        failing_job = coordinator.get_job(failing)
+        slow_job = coordinator.get_job(slow)
+        if (failing_job['status'] == 'failed' and failing_job['attempts'] == 2
+                and slow_job['status'] == 'failed' and 'timed out' in slow_job['error']
+                and coordinator.get_job(unmatched)['status'] == 'queued'):
+            print("✅ Failed job retried once, slow job timed out, unmatched job left queued")
+            return True
+        else:
+            print(f"❌ Unexpected job states: {failing_job['status']}, {slow_job['status']}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing retries: {e}")
+        return False
+    finally:
+        coordinator.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_undelivered_outputs_fail_job():
+    """Test that missing or unuploadable outputs fail the job instead of the worker"""
+    print("\n🧪 Testing jobs whose outputs cannot be delivered...")
+    
+    work_dir = tempfile.mkdtemp()
+    coordinator = start_coordinator(work_dir, 1)
+    try:
+        missing = coordinator.submit("no-output", "true", outputs=['result.txt'])
+        coordinator.wait([missing], timeout=30)
+        # The same worker slot still takes the next job
+        after = coordinator.submit("after", "true")
+        coordinator.wait([after], timeout=30)
+        
+        # An unreachable coordinator turns the upload into an error, not an exception
+        with open(os.path.join(work_dir, 'result.txt'), 'w') as f:
+            f.write("built\n")
+        agent = WorkerAgent('http://127.0.0.1:9', work_root=os.path.join(work_dir, 'agent'))
+        artifacts, error = agent._upload_outputs(Path(work_dir), ['result.txt'])
+        
+        missing_job = coordinator.get_job(missing)
+        if (missing_job['status'] == 'failed' and 'not produced' in missing_job['error']
+                and coordinator.get_job(after)['status'] == 'success'
+                and artifacts == {} and 'could not upload output result.txt' in error):
+            print("✅ Undelivered outputs failed the job and the worker kept running")
+            return True
+        else:
+            print(f"❌ Unexpected results: {missing_job['status']}, {artifacts}, {error!r}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing undelivered outputs: {e}")
+        return False
+    finally:
+        coordinator.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_parallel_build_runs_on_workers():
+    """Test that the stages of a build configuration are submitted to the workers"""
+    print("\n🧪 Testing a parallel build dispatched through the coordinator...")
+    
+    work_dir = tempfile.mkdtemp()
+    coordinator = start_coordinator(work_dir, 2)
+    try:
+        config_path = os.path.join(work_dir, 'build.yaml')
+        with open(config_path, 'w') as f:
+            f.write("""
+stages:
+  - name: toolchain
+    order: 1
+    command: echo "toolchain on $(hostname) pid $$"
+    runs_on: [lfs]
+  - name: system
+    order: 2
+    command: echo "system after toolchain"
+    dependencies: [toolchain]
+    runs_on: [lfs]
+""")
+        
+        engine = ParallelBuildEngine(max_workers=2, coordinator=coordinator, build_id='parallel-test')
+        count = engine.load_tasks(config_path)
+        engine.start_parallel_build()
+        
+        tasks = engine.tasks
+        if (count == 2 and all(task.status == TaskStatus.COMPLETED for task in tasks.values())
+                and 'system after toolchain' in tasks['system'].output
+                and tasks['system'].start_time >= tasks['toolchain'].end_time
+                and str(coordinator.log_dir) in tasks['toolchain'].output_log):
+            print("✅ Configured stages ran on worker agents in dependency order")
+            return True
+        else:
+            print(f"❌ Unexpected task states: {[(t.id, t.status, t.error) for t in tasks.values()]}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing parallel build dispatch: {e}")
+        return False
+    finally:
+        coordinator.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all distributed worker tests"""
+    print("🛰️ Testing LFS Build System Distributed Workers\n")
+    
+    tests = [
+        test_throughput_scales_with_workers,
+        test_artifacts_and_logs,
+        test_retry_timeout_and_labels,
+        test_undelivered_outputs_fail_job,
+        test_parallel_build_runs_on_workers
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All distributed worker tests passed!")
+        return 0
+    else:
+        print("⚠️ Some distributed worker tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
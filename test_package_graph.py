@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify package-granular stage builds
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.build.package_graph import (PackageGraph, PackageScheduler, PackageBuildManager,
+                                     parse_stage_script, load_state)
+
+def stage_script(packages):
+    """Stage script with one ``# Build X`` block per (name, body) pair"""
+    lines = ['#!/bin/bash', 'set -e', 'export STAGE=test', '']
+    for name, body in packages:
+        lines += [f"# Build {name}", f'echo "Building {name}..."', body, '']
+    return '\n'.join(lines)
+
+def make_scheduler(work_dir, packages, **options):
+    preamble, nodes = parse_stage_script(stage_script(packages))
+    graph = PackageGraph(nodes, 'book', options.pop('barriers', []), options.pop('dependencies', None))
+    return PackageScheduler(graph, preamble, os.path.join(work_dir, 'state'), env=dict(os.environ), **options)
+
+def test_barriers_serialize_graph():
+    """Test that barrier packages wait for everything before them and gate everything after"""
+    print("🧪 Testing book order barriers...")
+    
+    _, nodes = parse_stage_script(stage_script([(name, 'true') for name in
+                                                ('Binutils', 'M4', 'Ncurses', 'Bash', 'GCC', 'Make')]))
+    graph = PackageGraph(nodes, 'book')
+    depends = {node.name: sorted(node.depends) for node in graph.ordered}
+    expected = {
+        'binutils': [],
+        'm4': ['binutils'],
+        'ncurses': ['binutils'],
+        'bash': ['binutils', 'ncurses'],
+        'gcc': ['bash', 'binutils', 'm4', 'ncurses'],
+        'make': ['gcc']
+    }
+    ready = [node.name for node in graph.ready()]
+    
+    if depends == expected and ready == ['binutils']:
+        print("✅ Packages between barriers are independent, barriers wait for all before them")
+        return True
+    else:
+        print(f"❌ Unexpected dependencies: {depends}, ready {ready}")
+        return False
+
+def test_failed_package_retried_serially():
+    """Test that a failed package is retried with one make job and blocks only its dependents"""
+    print("\n🧪 Testing retries and blocked dependents...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        scheduler = make_scheduler(work_dir, [
+            ('Flaky', '[ "$LFS_MAKE_JOBS" = 1 ]'),
+            ('Broken', 'exit 3'),
+            ('Readline', 'true'),
+            ('Ncurses', 'true'),
+            ('Bash', 'true')
+        ], dependencies={'readline': ['broken']}, jobs_budget=8, retries=1)
+        summary = scheduler.run()
+        nodes = scheduler.graph.nodes
+        state = {package['name']: package for package in load_state(scheduler.state_dir)['packages']}
+        
+        if (nodes['flaky'].status == 'success' and nodes['flaky'].attempts == 2 and nodes['flaky'].make_jobs == 1
+                and nodes['broken'].status == 'failed' and nodes['broken'].attempts == 2
+                and nodes['broken'].return_code == 3
+                and nodes['readline'].status == 'blocked' and nodes['bash'].status == 'success'
+                and summary == {'packages': 5, 'success': 3, 'failed': 1, 'blocked': 1}
+                and state['flaky']['status'] == 'success' and state['readline']['status'] == 'blocked'
+                and state['bash']['depends'] == ['ncurses']):
+            print(f"✅ Flaky package passed at -j1, failure blocked only its dependent: {summary}")
+            return True
+        else:
+            print(f"❌ Unexpected package results: {summary}, "
+                  f"{[(n.name, n.status, n.attempts, n.make_jobs) for n in scheduler.graph.ordered]}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing retries: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_driver_retry_keeps_successes():
+    """Test that rerunning the driver for failed packages keeps what state.json records as built"""
+    print("\n🧪 Testing the stage driver and its state.json...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        marker = os.path.join(work_dir, 'fixed')
+        counter = os.path.join(work_dir, 'm4-builds')
+        script_path = os.path.join(work_dir, 'stage.sh')
+        with open(script_path, 'w') as f:
+            f.write(stage_script([('M4', f"echo built >> {counter}"),
+                                  ('Patch', f"test -e {marker}")]))
+        
+        manager = PackageBuildManager(os.path.join(work_dir, 'packages'))
+        manager.configure({'source_cache': {'enabled': False}, 'workspace': {'lfs_root': work_dir},
+                           'package_graph': {'retries': 0}})
+        stage = {'name': 'build_temp_system', 'command': f"bash {script_path}"}
+        
+        first = subprocess.run(manager.prepare('build-1', stage, script_path), shell=True,
+                               capture_output=True, text=True)
+        failed = manager.failed_packages('build-1', 'build_temp_system')
+        
+        open(marker, 'w').close()
+        second = subprocess.run(manager.prepare('build-1', stage, script_path, only=failed), shell=True,
+                                capture_output=True, text=True)
+        packages = {p['name']: p for p in manager.results('build-1', 'build_temp_system')}
+        with open(counter) as f:
+            m4_builds = len(f.readlines())
+        with open(manager.root_dir / 'durations.json') as f:
+            durations = json.load(f)
+        
+        if (first.returncode == 1 and failed == ['patch'] and second.returncode == 0 and m4_builds == 1
+                and packages['patch']['status'] == 'success' and packages['m4']['status'] == 'success'
+                and set(durations['build_temp_system']) == {'m4', 'patch'}):
+            print("✅ Retry built only the failed package, state.json and durations updated")
+            return True
+        else:
+            print(f"❌ Unexpected driver runs: {first.returncode}/{second.returncode}, failed={failed}, "
+                  f"m4 built {m4_builds}x, packages={packages}\n{first.stderr}{second.stderr}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing the driver: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_silent_package_killed():
+    """Test that a package without output is killed instead of hanging the stage behind the heartbeat"""
+    print("\n🧪 Testing the per-package silence timeout...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        scheduler = make_scheduler(work_dir, [('Hang', 'sleep 60'), ('Quick', 'true')],
+                                   retries=1, silence_timeout=1)
+        scheduler.heartbeat_seconds = 0.5
+        started = time.time()
+        scheduler.run()
+        elapsed = time.time() - started
+        hang = scheduler.graph.nodes['hang']
+        
+        if (hang.status == 'failed' and hang.timed_out and hang.attempts == 1 and elapsed < 20
+                and scheduler.graph.nodes['quick'].status == 'success'):
+            print(f"✅ Silent package killed after {elapsed:.1f}s without a retry")
+            return True
+        else:
+            print(f"❌ Unexpected timeout handling: {hang.status}, timed_out={hang.timed_out}, "
+                  f"attempts={hang.attempts}, {elapsed:.1f}s")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing the silence timeout: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all package graph tests"""
+    print("🧩 Testing LFS Build System Package Graph\n")
+    
+    tests = [
+        test_barriers_serialize_graph,
+        test_failed_package_retried_serially,
+        test_driver_retry_keeps_successes,
+        test_silent_package_killed
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All package graph tests passed!")
+        return 0
+    else:
+        print("⚠️ Some package graph tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
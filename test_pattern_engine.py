@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify the shared log pattern engine
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.analysis.pattern_engine import PatternEngine
+
+LIVE_ERRORS = [r'error:\s*(.+?)(?:\n|$)', r'make.*Error\s+(\d+)']
+
+def test_patterns_stay_on_their_line():
+    """Test that \\s and (?:\\n|$) do not pull the next line into a match by default"""
+    print("🧪 Testing per-line matching...")
+    
+    engine = PatternEngine()
+    engine.register('errors', LIVE_ERRORS)
+    empty = engine.scan("gcc: error:\nnext line text", ('errors',))
+    hits = engine.scan("checking for gcc... yes\ngcc: error: foo.c: No such file\nmake: *** [all] Error 2",
+                       ('errors',))
+    
+    values = [(hit.line_number, hit.value) for hit in hits]
+    if not empty and values == [(2, 'foo.c: No such file'), (3, '2')]:
+        print(f"✅ Hits kept to their lines: {values}")
+        return True
+    else:
+        print(f"❌ Unexpected hits: {[(hit.line_number, hit.value) for hit in empty]}, {values}")
+        return False
+
+def test_multiline_sets_opt_in():
+    """Test that a set registered as multiline matches across line breaks"""
+    print("\n🧪 Testing opt-in whole-text matching...")
+    
+    engine = PatternEngine()
+    text = "configure: error: no acceptable C compiler\nfound in $PATH\nmake: Error 1"
+    engine.register('stored', [('compiler', r'no acceptable C compiler\s+found'), ('make', r'Error\s+(\d+)')],
+                    multiline=True)
+    engine.register('lines', [('compiler', r'no acceptable C compiler\s+found')])
+    
+    stored = [(hit.key, hit.line_number) for hit in engine.scan(text, ('stored',))]
+    lines = engine.scan(text, ('lines',))
+    if stored == [('compiler', 1), ('make', 3)] and not lines and engine.get_stats()['multiline_patterns'] == 2:
+        print(f"✅ Multiline set matched across lines: {stored}")
+        return True
+    else:
+        print(f"❌ Unexpected hits: {stored}, {[hit.key for hit in lines]}")
+        return False
+
+def test_only_subscribed_sets_streamed():
+    """Test that the live monitor only listens to streamed output while it monitors a build"""
+    print("\n🧪 Testing live monitor subscriptions...")
+    
+    from src.analysis.pattern_engine import get_pattern_engine
+    from src.ml.monitoring.live_build_monitor import LiveBuildMonitor
+    
+    engine = get_pattern_engine()
+    monitor = LiveBuildMonitor(None, None)
+    idle = engine.subscribed_sets()
+    monitor.start_monitoring('build-1')
+    monitor.start_monitoring('build-2')
+    monitoring = engine.subscribed_sets()
+    monitor.stop_monitoring('build-1')
+    one_left = engine.subscribed_sets()
+    monitor.stop_monitoring('build-2')
+    stopped = engine.subscribed_sets()
+    
+    if ('live_monitor.errors' not in idle and 'live_monitor.errors' in monitoring
+            and 'live_monitor.errors' in one_left and 'live_monitor.errors' not in stopped
+            and 'live_monitor.packages' not in monitoring):
+        print(f"✅ Subscribed while monitoring: {sorted(monitoring)}")
+        return True
+    else:
+        print(f"❌ Unexpected subscriptions: {sorted(idle)}, {sorted(monitoring)}, {sorted(stopped)}")
+        return False
+
+def main():
+    """Run all pattern engine tests"""
+    print("🔎 Testing LFS Build System Pattern Engine\n")
+    
+    tests = [
+        test_patterns_stay_on_their_line,
+        test_multiline_sets_opt_in,
+        test_only_subscribed_sets_streamed
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All pattern engine tests passed!")
+        return 0
+    else:
+        print("⚠️ Some pattern engine tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
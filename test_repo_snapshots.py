@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify repository snapshots stored as Git refs
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+class FakeDatabase:
+    """Keeps repo_snapshots rows in memory and answers the queries the repository manager makes"""
+    
+    def __init__(self, columns=None):
+        self.columns = list(columns or ['id', 'build_id', 'snapshot_type', 'git_commit_hash', 'git_branch',
+                                        'snapshot_ref', 'base_commit', 'config_files', 'created_at'])
+        self.rows = []
+        self.alters = []
+    
+    def execute_query(self, query, params=None, fetch=False, return_id=False):
+        statement = ' '.join(query.split())
+        if 'information_schema.COLUMNS' in statement:
+            return [{'column_name': column} for column in self.columns]
+        if statement.startswith('ALTER TABLE repo_snapshots ADD COLUMN'):
+            self.alters.append(statement)
+            self.columns.append(statement.split()[5])
+        elif statement.startswith('ALTER TABLE'):
+            self.alters.append(statement)
+        elif statement.startswith('INSERT INTO repo_snapshots'):
+            build_id, commit_hash, branch, ref, base = params
+            self.rows.append({'id': len(self.rows) + 1, 'build_id': build_id, 'git_commit_hash': commit_hash,
+                              'git_branch': branch, 'snapshot_ref': ref, 'base_commit': base})
+        elif statement.startswith('SELECT git_commit_hash, snapshot_ref FROM repo_snapshots'):
+            rows = [row for row in self.rows if row['build_id'] == params[0] and row['snapshot_ref']]
+            return sorted(rows, key=lambda row: row['id'], reverse=True)[:1]
+        elif statement.startswith('DELETE FROM repo_snapshots'):
+            self.rows = [row for row in self.rows if row['snapshot_ref'] != params[0]]
+        return [] if fetch else 1
+
+class FakeSettings:
+    def get(self, key, default=None):
+        return default
+
+def make_repository(work_dir, db):
+    from src.repository.repo_manager import RepositoryManager
+    import git
+    
+    repo_path = os.path.join(work_dir, 'repo')
+    os.makedirs(repo_path)
+    for args in (['init', '-q', '-b', 'main'], ['config', 'user.name', 'test'],
+                 ['config', 'user.email', 'test@example.com']):
+        subprocess.run(['git', *args], cwd=repo_path, check=True)
+    with open(os.path.join(repo_path, 'README.md'), 'w') as f:
+        f.write("# LFS Build Repository\n")
+    subprocess.run(['git', 'add', 'README.md'], cwd=repo_path, check=True)
+    subprocess.run(['git', 'commit', '-q', '-m', 'init'], cwd=repo_path, check=True)
+    
+    # Only what snapshots need; the rest of the manager wants MySQL and user settings
+    repo = RepositoryManager.__new__(RepositoryManager)
+    repo.db = db
+    repo.settings = FakeSettings()
+    repo.repo_path = Path(repo_path)
+    repo.snapshot_root = Path(work_dir) / 'snapshots'
+    repo.git_repo = git.Repo(repo_path)
+    repo.search_index = None
+    return repo
+
+def test_migration_adds_snapshot_columns():
+    """Test that an old repo_snapshots table gains the snapshot columns once"""
+    print("🧪 Testing the repo_snapshots migration...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        db = FakeDatabase(['id', 'build_id', 'snapshot_type', 'git_commit_hash', 'git_branch',
+                           'config_files', 'created_at'])
+        repo = make_repository(work_dir, db)
+        repo._migrate_snapshot_table()
+        first = list(db.alters)
+        repo._migrate_snapshot_table()
+        
+        if (len(first) == 3 and db.alters == first and {'snapshot_ref', 'base_commit'} <= set(db.columns)
+                and 'ADD INDEX idx_snapshot_ref' in first[-1]):
+            print(f"✅ Migration ran once: {len(first)} statements")
+            return True
+        else:
+            print(f"❌ Unexpected migration statements: {db.alters}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing migration: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_snapshot_round_trip():
+    """Test that a snapshot can be written, restored and pruned"""
+    print("\n🧪 Testing snapshot write, restore and prune...")
+    
+    from src.repository.repo_manager import SNAPSHOT_REF_PREFIX, SNAPSHOT_TIME_FORMAT
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        db = FakeDatabase()
+        repo = make_repository(work_dir, db)
+        base = repo.git_repo.head.commit.hexsha
+        
+        # An untracked build artifact is part of the snapshot, not of any branch
+        with open(os.path.join(repo.repo_path, 'build.log'), 'w') as f:
+            f.write("toolchain built\n")
+        repo._store_snapshot('build-1', base)
+        restored = repo.restore_snapshot('build-1')
+        restored_log = open(os.path.join(restored, 'build.log')).read() if restored else ''
+        
+        # An expired snapshot loses its ref and its row; the recent one stays
+        stamp = (datetime.now() - timedelta(days=30)).strftime(SNAPSHOT_TIME_FORMAT)
+        old_ref = f"{SNAPSHOT_REF_PREFIX}/build-0/{stamp}"
+        repo.git_repo.git.update_ref(old_ref, base)
+        db.rows.insert(0, {'id': 0, 'build_id': 'build-0', 'git_commit_hash': base, 'git_branch': 'main',
+                           'snapshot_ref': old_ref, 'base_commit': base})
+        pruned = repo.prune_snapshots(days_to_keep=7)
+        remaining = [snapshot['build_id'] for snapshot in repo.list_snapshots()]
+        
+        row = db.rows[-1] if db.rows else {}
+        status = repo.git_repo.git.status('--porcelain')
+        if (restored_log == "toolchain built\n" and row.get('base_commit') == base
+                and row.get('snapshot_ref', '').startswith(f"{SNAPSHOT_REF_PREFIX}/build-1/")
+                and pruned == 1 and remaining == ['build-1'] and len(db.rows) == 1
+                and status == '?? build.log'):
+            print(f"✅ Snapshot restored to {os.path.basename(restored)}, expired snapshot pruned")
+            return True
+        else:
+            print(f"❌ Unexpected snapshot state: restored={restored_log!r}, pruned={pruned}, "
+                  f"remaining={remaining}, rows={db.rows}, status={status!r}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing snapshots: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all repository snapshot tests"""
+    print("📸 Testing LFS Build System Repository Snapshots\n")
+    
+    tests = [
+        test_migration_adds_snapshot_columns,
+        test_snapshot_round_trip
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All repository snapshot tests passed!")
+        return 0
+    else:
+        print("⚠️ Some repository snapshot tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
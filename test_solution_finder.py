@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+Test script for the solution finder against local HTTP stubs (no internet access needed)
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.ml.research.solution_finder import SolutionFinder
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves canned StackExchange/GitHub/Bugzilla responses"""
+    delay = 0.0
+    status = 200
+    requests_served = 0
+
+    def do_GET(self):
+        type(self).requests_served += 1
+        time.sleep(self.delay)
+
+        if self.path.startswith('/stackexchange'):
+            body = {'items': [{'is_answered': True, 'title': 'gcc fatal error: stdio.h missing',
+                               'link': 'https://stackoverflow.com/q/1', 'score': 10, 'answer_count': 2}]}
+        elif self.path.startswith('/github'):
+            body = {'items': [{'title': 'Build fails with stdio.h', 'html_url': 'https://github.com/x/y/issues/1',
+                               'score': 1, 'comments': 3, 'labels': []}]}
+        else:
+            body = {'bugs': [{'id': 42, 'summary': 'glibc headers missing', 'status': 'CLOSED'}]}
+
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub(delay=0.0, status=200):
+    handler = type('Handler', (StubHandler,), {'delay': delay, 'status': status, 'requests_served': 0})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, query, params=None):
+        self.db.statements.append(query)
+
+    def executemany(self, query, seq):
+        self.db.usage_updates.extend(seq)
+
+    def fetchone(self):
+        return None
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+class FakeDB:
+    """In-memory stand-in for the database manager"""
+
+    def __init__(self, effectiveness_rows=None):
+        self.effectiveness_rows = effectiveness_rows or []
+        self.statements = []
+        self.usage_updates = []
+
+    def execute_query(self, query, params=None, fetch=False):
+        if 'solution_effectiveness' in query:
+            return self.effectiveness_rows
+        return []
+
+    def get_connection(self):
+        return FakeConnection(self)
+
+def make_sources(servers):
+    (se, _), (gh, _), (bz, _) = servers
+    return [
+        {'name': 'Stack Overflow', 'type': 'stackexchange', 'timeout': 2,
+         'base_url': f'http://127.0.0.1:{se.server_port}/stackexchange', 'params': {'site': 'stackoverflow'}},
+        {'name': 'GitHub Issues', 'type': 'github', 'timeout': 2,
+         'base_url': f'http://127.0.0.1:{gh.server_port}/github', 'params': {}},
+        {'name': 'Red Hat Bugzilla', 'type': 'bugzilla', 'timeout': 2,
+         'base_url': f'http://127.0.0.1:{bz.server_port}/bugzilla', 'params': {}}
+    ]
+
+def test_concurrent_search():
+    """Test that sources are searched concurrently"""
+    print("🧪 Testing concurrent source fan-out...")
+
+    servers = [start_stub(delay=0.5) for _ in range(3)]
+    finder = SolutionFinder(FakeDB(), search_sources=make_sources(servers), domain_cooldown=0)
+
+    start = time.time()
+    solutions = finder.find_solutions("main.c:1: fatal error: stdio.h: No such file", 'toolchain')
+    elapsed = time.time() - start
+
+    sources = {s['source'] for s in solutions}
+    result = {'Stack Overflow', 'GitHub Issues', 'Red Hat Bugzilla'} <= sources and elapsed < 1.2
+    print(f"{'✅' if result else '❌'} {len(solutions)} solutions from {len(sources)} sources in {elapsed:.2f}s")
+
+    finder.shutdown()
+    for server, _ in servers:
+        server.shutdown()
+    return result
+
+def test_circuit_breaker():
+    """Test that a failing source is skipped once its breaker opens"""
+    print("\n🧪 Testing circuit breaker...")
+
+    servers = [start_stub(status=500), start_stub(), start_stub()]
+    finder = SolutionFinder(FakeDB(), search_sources=make_sources(servers), domain_cooldown=0)
+    failing_handler = servers[0][1]
+
+    for i in range(5):
+        finder.find_solutions(f"configure: error: C compiler cannot create executables {i}", 'toolchain')
+
+    state = finder.circuit_breakers['Stack Overflow'].state
+    result = state == 'open' and failing_handler.requests_served == 3
+    print(f"{'✅' if result else '❌'} Breaker {state} after {failing_handler.requests_served} failed requests")
+
+    finder.shutdown()
+    for server, _ in servers:
+        server.shutdown()
+    return result
+
+def test_offline_index():
+    """Test that known errors are answered locally in milliseconds"""
+    print("\n🧪 Testing offline solution index...")
+
+    servers = [start_stub() for _ in range(3)]
+    rows = [{
+        'error_message': 'make[2]: *** /mnt/lfs/sources/gcc-13.2.0/build: No rule to make target 42',
+        'solution_data': json.dumps({'solution_title': 'Re-run configure in a clean build directory',
+                                     'source_url': 'https://www.linuxfromscratch.org/lfs/faq.html'}),
+        'effectiveness_rating': 0.9
+    }]
+    finder = SolutionFinder(FakeDB(rows), search_sources=make_sources(servers), domain_cooldown=0)
+
+    start = time.time()
+    solutions = finder.find_solutions('make[2]: *** /mnt/lfs/sources/gcc-14.1.0/build: No rule to make target 7', 'toolchain')
+    elapsed_ms = (time.time() - start) * 1000
+
+    served = sum(handler.requests_served for _, handler in servers)
+    result = (bool(solutions) and solutions[0]['source'] == 'Local Knowledge Base'
+              and served == 0 and elapsed_ms < 50)
+    print(f"{'✅' if result else '❌'} Known error answered in {elapsed_ms:.1f}ms without network ({served} requests)")
+
+    finder.shutdown()
+    for server, _ in servers:
+        server.shutdown()
+    return result
+
+def test_memory_cache():
+    """Test that repeated lookups hit memory and usage counters are batched"""
+    print("\n🧪 Testing in-memory solution cache...")
+
+    servers = [start_stub() for _ in range(3)]
+    db = FakeDB()
+    finder = SolutionFinder(db, search_sources=make_sources(servers), domain_cooldown=0, usage_flush_batch=1000)
+
+    error = "undefined reference to `pthread_create'"
+    finder.find_solutions(error, 'toolchain')
+    for _ in range(10):
+        finder.find_solutions(error, 'toolchain')
+
+    served = sum(handler.requests_served for _, handler in servers)
+    pending = finder.get_cache_stats()['pending_usage_updates']
+    finder.flush_usage_counters()
+    result = served == 3 and pending == 10 and db.usage_updates == [(10, finder._error_hash(error))]
+    print(f"{'✅' if result else '❌'} {served} network requests, {pending} usage updates flushed in one batch")
+
+    finder.shutdown()
+    for server, _ in servers:
+        server.shutdown()
+    return result
+
+def main():
+    """Run all solution finder tests"""
+    print("🔍 Solution Finder Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_concurrent_search,
+        test_circuit_breaker,
+        test_offline_index,
+        test_memory_cache
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} raised: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Results: {passed}/{len(tests)} tests passed")
+    return 0 if passed == len(tests) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
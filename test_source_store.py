@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify the source tarball store behind pointer files
+"""
+
+import sys
+import os
+import stat
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.repository.source_store import SourceObjectStore
+
+class FakeDatabase:
+    def execute_query(self, query, params=None, fetch=False, return_id=False):
+        return [] if fetch else 1
+
+class FakeSettings:
+    def get(self, key, default=None):
+        return default
+
+def git(repo_path, *args):
+    return subprocess.run(['git', *args], cwd=repo_path, check=True, capture_output=True, text=True).stdout.strip()
+
+def make_sources(work_dir):
+    """Repository and source manager; the rest of the repository manager wants MySQL and user settings"""
+    from src.repository.repo_manager import RepositoryManager
+    from src.repository.commit_queue import CommitQueue
+    from src.repository.source_repo_manager import SourceRepositoryManager
+    import git as gitpython
+    
+    repo_path = os.path.join(work_dir, 'repo')
+    os.makedirs(repo_path)
+    git(repo_path, 'init', '-q', '-b', 'main')
+    git(repo_path, 'config', 'user.name', 'test')
+    git(repo_path, 'config', 'user.email', 'test@example.com')
+    with open(os.path.join(repo_path, 'README.md'), 'w') as f:
+        f.write("# LFS Build Repository\n")
+    git(repo_path, 'add', 'README.md')
+    git(repo_path, 'commit', '-q', '-m', 'init')
+    
+    repo = RepositoryManager.__new__(RepositoryManager)
+    repo.db = FakeDatabase()
+    repo.settings = FakeSettings()
+    repo.repo_path = Path(repo_path)
+    repo.git_repo = gitpython.Repo(repo_path)
+    repo.search_index = None
+    repo.commit_queue = CommitQueue(repo, flush_interval=0.1)
+    return repo, SourceRepositoryManager(FakeDatabase(), repo)
+
+def write_tarball(path, size=64 * 1024):
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+def test_pointer_round_trip():
+    """Test storing, pointer parsing and writable copies of read-only objects"""
+    print("🧪 Testing pointers and materialized copies...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        store = SourceObjectStore(os.path.join(work_dir, 'store'))
+        tarball = write_tarball(os.path.join(work_dir, 'm4-1.4.19.tar.xz'))
+        stored = store.put(tarball)
+        again = store.put(tarball)
+        
+        pointer_path = os.path.join(work_dir, 'pointer')
+        store.write_pointer(pointer_path, stored['oid'], stored['size'])
+        parsed = store.parse_pointer(open(pointer_path, 'rb').read())
+        
+        copy = store.materialize(stored['oid'], os.path.join(work_dir, 'sources', 'm4-1.4.19.tar.xz'))
+        with open(copy, 'ab') as f:
+            f.write(b'patched by a build')
+        object_path = store.object_path(stored['oid'])
+        
+        if (parsed == (stored['oid'], 64 * 1024) and again['oid'] == stored['oid'] and store.stats()['objects'] == 1
+                and store.parse_pointer(open(tarball, 'rb').read()) is None
+                and store.parse_pointer(b'oid sha256:abc\nsize 1\n') is None
+                and open(object_path, 'rb').read() == open(tarball, 'rb').read()
+                and not os.stat(object_path).st_mode & stat.S_IWUSR):
+            print("✅ Pointer round trip, deduplicated object untouched by its writable copy")
+            return True
+        else:
+            print(f"❌ Unexpected store state: parsed={parsed}, stored={stored}, stats={store.stats()}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing pointers: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_raw_tarballs_migrated():
+    """Test that tarballs committed raw by older releases are moved to the store and materialized"""
+    print("\n🧪 Testing migration of raw tarballs...")
+    
+    work_dir = tempfile.mkdtemp()
+    repo = None
+    try:
+        repo, sources = make_sources(work_dir)
+        repo_path = str(repo.repo_path)
+        
+        # What an older release committed: the tarballs themselves
+        git(repo_path, 'checkout', '-q', '-b', 'sources-12.4')
+        os.makedirs(os.path.join(repo_path, 'sources', '12.4'))
+        tarball = write_tarball(os.path.join(repo_path, 'sources', '12.4', 'bison-3.8.2.tar.xz'))
+        content = open(tarball, 'rb').read()
+        git(repo_path, 'add', '-f', 'sources')
+        git(repo_path, 'commit', '-q', '-m', 'Add bison')
+        git(repo_path, 'checkout', '-q', 'main')
+        
+        destination = os.path.join(work_dir, 'lfs', 'sources')
+        written = sources.materialize_packages('12.4', destination, ['bison'])
+        committed = git(repo_path, 'show', 'sources-12.4:sources/12.4/bison-3.8.2.tar.xz')
+        second = sources.migrate_raw_tarballs('12.4')
+        
+        if (len(written) == 1 and open(written[0], 'rb').read() == content
+                and SourceObjectStore.parse_pointer(committed + '\n') is not None and second == 0):
+            print("✅ Raw tarball replaced by a pointer and materialized from the store")
+            return True
+        else:
+            print(f"❌ Unexpected migration: written={written}, committed={committed[:80]!r}, second={second}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing migration: {e}")
+        return False
+    finally:
+        if repo:
+            repo.commit_queue.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_gc_spares_snapshot_refs():
+    """Test that garbage collection keeps tarballs only a build snapshot still refers to"""
+    print("\n🧪 Testing garbage collection with snapshot refs...")
+    
+    work_dir = tempfile.mkdtemp()
+    repo = None
+    try:
+        repo, sources = make_sources(work_dir)
+        repo_path = str(repo.repo_path)
+        snapshotted = sources.store.put(write_tarball(os.path.join(work_dir, 'gzip-1.13.tar.xz')))
+        orphan = sources.store.put(write_tarball(os.path.join(work_dir, 'sed-4.9.tar.xz')))
+        
+        # A snapshot of a build whose sources branch has since been deleted
+        git(repo_path, 'checkout', '-q', '-b', 'sources-12.3')
+        os.makedirs(os.path.join(repo_path, 'sources', '12.3'))
+        sources.store.write_pointer(os.path.join(repo_path, 'sources', '12.3', 'gzip-1.13.tar.xz'),
+                                    snapshotted['oid'], snapshotted['size'])
+        git(repo_path, 'add', '-f', 'sources')
+        git(repo_path, 'commit', '-q', '-m', 'Add gzip')
+        git(repo_path, 'update-ref', 'refs/snapshots/build-1/20240101000000000000', 'HEAD')
+        git(repo_path, 'checkout', '-q', 'main')
+        git(repo_path, 'branch', '-q', '-D', 'sources-12.3')
+        
+        result = sources.collect_garbage(grace_seconds=0)
+        
+        if (result['removed'] == 1 and sources.store.has(snapshotted['oid'])
+                and not sources.store.has(orphan['oid'])):
+            print("✅ Snapshot's tarball kept, unreferenced tarball removed")
+            return True
+        else:
+            print(f"❌ Unexpected garbage collection: {result}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing garbage collection: {e}")
+        return False
+    finally:
+        if repo:
+            repo.commit_queue.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all source store tests"""
+    print("📦 Testing LFS Build System Source Store\n")
+    
+    tests = [
+        test_pointer_round_trip,
+        test_raw_tarballs_migrated,
+        test_gc_spares_snapshot_refs
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All source store tests passed!")
+        return 0
+    else:
+        print("⚠️ Some source store tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Test script to verify how stages are started in their resource scopes
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.build.stage_resources import CgroupStageScope, ProcessTreeStageScope
+
+def test_cgroup_move_before_command():
+    """Test that a stage is moved into its cgroup by the parent before any of its command runs"""
+    print("🧪 Testing the cgroup launch gate...")
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        # A plain directory stands in for the cgroup hierarchy: the move is a write of the pid
+        scope = CgroupStageScope('build_temp_system-1', Path(work_dir))
+        process = scope.spawn('cat cgroup.procs > seen; echo "$$"', stdout=subprocess.PIPE, text=True,
+                              cwd=str(scope.path))
+        output, _ = process.communicate(timeout=30)
+        seen = (scope.path / 'seen').read_text().strip()
+        
+        if (process.returncode == 0 and seen == str(process.pid) and output.strip() == str(process.pid)
+                and scope.process is process and scope.started_at):
+            print(f"✅ Stage {process.pid} was in its cgroup before its command ran")
+            return True
+        else:
+            print(f"❌ Unexpected launch: rc={process.returncode}, seen={seen!r}, output={output!r}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing the launch gate: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def test_gate_without_release_never_runs():
+    """Test that a stage whose parent goes away before the move does not run unaccounted"""
+    print("\n🧪 Testing an unreleased gate...")
+    
+    from src.build.stage_resources import _CGROUP_GATE
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        marker = os.path.join(work_dir, 'ran')
+        gate_read, gate_write = os.pipe()
+        process = subprocess.Popen([sys.executable, '-I', '-c', _CGROUP_GATE, str(gate_read), f"touch {marker}"],
+                                   pass_fds=(gate_read,))
+        os.close(gate_read)
+        os.close(gate_write)
+        process.wait(timeout=30)
+        
+        fallback = ProcessTreeStageScope('prepare_host-1')
+        fallback_process = fallback.spawn('exit 3')
+        fallback_process.wait(timeout=30)
+        fallback.close()
+        
+        if process.returncode == 125 and not os.path.exists(marker) and fallback_process.returncode == 3:
+            print("✅ Unreleased stage exited without running, process tree scope spawns directly")
+            return True
+        else:
+            print(f"❌ Unexpected gate result: rc={process.returncode}, ran={os.path.exists(marker)}, "
+                  f"fallback rc={fallback_process.returncode}")
+            return False
+    
+    except Exception as e:
+        print(f"❌ Error testing the unreleased gate: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """Run all stage resource tests"""
+    print("📏 Testing LFS Build System Stage Resources\n")
+    
+    tests = [
+        test_cgroup_move_before_command,
+        test_gate_without_release_never_runs
+    ]
+    
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+    
+    print(f"\n📊 Test Results:")
+    print(f"Passed: {sum(results)}/{len(results)}")
+    
+    if all(results):
+        print("🎉 All stage resource tests passed!")
+        return 0
+    else:
+        print("⚠️ Some stage resource tests failed")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())